@@ -634,6 +634,29 @@ class GraphExecutor:
             nodes_map=self.nodes_map
         )
 
+    def _merge_late_preprocessed_files(self) -> None:
+        """
+        从预处理事件通道中增量拉取后台完成的文件，合并进 state.preprocessed_files。
+        任务可以在首个文件就绪时就开始规划，其余文件陆续可用。
+        """
+        if getattr(self, '_preprocess_done', False):
+            return
+        from agentic.services_preprocess import PreprocessEventChannel, apply_events
+
+        channel = PreprocessEventChannel(self.task_id)
+        cursor = getattr(self, '_preprocess_cursor', 0)
+        events, self._preprocess_cursor, self._preprocess_done = channel.collect(cursor)
+        if not events:
+            return
+
+        if self.state.preprocessed_files is None:
+            self.state.preprocessed_files = {}
+        added = apply_events(self.state.preprocessed_files, events)
+        if added:
+            # 数据目录缓存依赖 preprocessed_files，需要失效
+            self.state._data_catalog_cache = None
+            logger.info(f"[PROCESSOR] 合并后台预处理完成的文件 {added} 个 - task_id: {self.task_id}")
+
     def _find_next_node_name(self, current_node_name: str, node_output: Dict[str, Any]) -> str:
         """
         根据当前节点名称和其输出，确定下一个节点的名称。
@@ -697,6 +720,9 @@ class GraphExecutor:
         current_tool_output = None
 
         while current_node_name != "END":  # 循环直到当前节点为 "END"
+            # 合并在任务启动后才完成预处理的文件
+            self._merge_late_preprocessed_files()
+
             with transaction.atomic():  # 使用 Django 事务，确保数据库操作的原子性
 
                 node_def = self.nodes_map.get(current_node_name)  # 获取当前节点的定义
@@ -151,9 +151,15 @@ def get_data_catalog_summary_for_prompt(state: 'RuntimeState') -> str:
             tables = preprocessed_files["tables"]
             lines.append(f"\n**📊 表格** ({len(tables)} 个):")
             for table_id, table_data in list(tables.items())[:3]:
-                rows = len(table_data.get('data', []))
-                cols = len(table_data.get('headers', []))
+                rows = table_data.get('row_count', len(table_data.get('data', [])))
+                cols = table_data.get('column_count', len(table_data.get('headers', [])))
                 lines.append(f"  - `{table_id}`: {rows}行×{cols}列")
+                # 流式处理的大表只提供 schema，避免把数据塞进提示词
+                if table_data.get('schema'):
+                    schema_text = ", ".join(
+                        f"{col['name']}({col['dtype']})" for col in table_data['schema'][:20]
+                    )
+                    lines.append(f"    列: {schema_text}")
             if len(tables) > 3:
                 lines.append(f"  - ...及其他 {len(tables)-3} 个表格")
         
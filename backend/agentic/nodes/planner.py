@@ -103,17 +103,14 @@ User Prompt 长度: {len(user_prompt)} 字符
     # 记录LLM请求
     log_llm_request("planner", system_prompt, user_prompt, model_name)
     
-    try:
-        # 调用 LLM 进行规划，传入系统提示词和用户提示词
-        llm_result = LLM.invoke(user_prompt, system_prompt=system_prompt)
-        # 记录LLM响应
-        log_llm_response("planner", llm_result)
-    except Exception as e:
-        if "结构化输出解析失败" in str(e):
-            logger.warning("[PLANNER] 结构化输出解析失败，重试一次")
-            llm_result = LLM.invoke(user_prompt, system_prompt=system_prompt) # 重试一次
-        else:
-            raise e
+    # 调用 LLM 进行规划，传入系统提示词和用户提示词
+    llm_result = LLM.invoke(user_prompt, system_prompt=system_prompt)
+    # 修复解析也无法恢复（返回了默认实例）时才重新请求一次
+    if getattr(LLM, 'last_decode_info', {}).get('path') == 'default':
+        logger.warning("[PLANNER] 结构化输出解析失败，重试一次")
+        llm_result = LLM.invoke(user_prompt, system_prompt=system_prompt) # 重试一次
+    # 记录LLM响应
+    log_llm_response("planner", llm_result)
     
     # LLM结果已经在上面记录
         
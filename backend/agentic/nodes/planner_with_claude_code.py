@@ -649,20 +649,14 @@ def _make_final_decision(
     # 记录请求
     log_llm_request("planner_enhanced", system_prompt, user_prompt, model_name)
 
-    try:
-        # 调用 LLM
+    # 调用 LLM
+    llm_result = LLM.invoke(user_prompt, system_prompt=system_prompt)
+    # 修复解析也无法恢复（返回了默认实例）时才重新请求一次
+    if getattr(LLM, 'last_decode_info', {}).get('path') == 'default':
+        logger.warning("[增强 PLANNER] 结构化输出解析失败，重试一次")
         llm_result = LLM.invoke(user_prompt, system_prompt=system_prompt)
-        log_llm_response("planner_enhanced", llm_result)
-        return llm_result
-
-    except Exception as e:
-        if "结构化输出解析失败" in str(e):
-            logger.warning("[增强 PLANNER] 结构化输出解析失败，重试一次")
-            llm_result = LLM.invoke(user_prompt, system_prompt=system_prompt)
-            log_llm_response("planner_enhanced", llm_result)
-            return llm_result
-        else:
-            raise
+    log_llm_response("planner_enhanced", llm_result)
+    return llm_result
 
 
 def _post_process_decision(llm_result: PlannerOutput, state: RuntimeState) -> PlannerOutput:
@@ -210,18 +210,16 @@ def reflection_node(state: RuntimeState, nodes_map: Optional[Dict[str, Any]] = N
 """
     logger.info(reflection_debug_info)
     
-    try:
-        # 记录LLM请求
-        log_llm_request("reflection", system_prompt, user_prompt, model_name)
-        # 调用LLM进行反思评估，传入系统提示词和用户提示词
-        llm_reflection_result = structured_llm.invoke(user_prompt, system_prompt=system_prompt)
-        # 记录LLM响应
-        log_llm_response("reflection", llm_reflection_result)
-    except Exception as e:
-        if "结构化输出解析失败" in str(e):
-            llm_reflection_result = structured_llm.invoke(user_prompt, system_prompt=system_prompt) # 重试一次
-        else:
-            raise e
+    # 记录LLM请求
+    log_llm_request("reflection", system_prompt, user_prompt, model_name)
+    # 调用LLM进行反思评估，传入系统提示词和用户提示词
+    llm_reflection_result = structured_llm.invoke(user_prompt, system_prompt=system_prompt)
+    # 修复解析也无法恢复（返回了默认实例）时才重新请求一次
+    if getattr(structured_llm, 'last_decode_info', {}).get('path') == 'default':
+        logger.warning("[REFLECTION] 结构化输出解析失败，重试一次")
+        llm_reflection_result = structured_llm.invoke(user_prompt, system_prompt=system_prompt) # 重试一次
+    # 记录LLM响应
+    log_llm_response("reflection", llm_reflection_result)
     
     # 将 reflection 添加到行动历史中
     # 每个条目都是一个字典，包含 'type' 和 'data'
@@ -89,98 +89,13 @@ class AgentService:
                 ]
             }
         """
-        from tools.preprocessors.processors.document_parser import DocumentParserTool
-        from tools.preprocessors.processors.excel_processor import ExcelProcessorTool
-        from tools.preprocessors.processors.image_processor import ImageProcessorTool
-        
-        processed_files = {
-            'documents': {},  # 存储 markdown 格式的文档内容
-            'tables': {},     # 存储 pandas 格式的表格数据
-            'images': {},     # 存储图片的文字描述
-            'other_files': [] # 存储其他类型文件的路径信息
-        }
-        
+        from .services_preprocess import FilePreprocessor, empty_processed_files
+
         if not saved_files:
-            return processed_files
-            
-        document_parser = DocumentParserTool()
-        excel_processor = ExcelProcessorTool()
-        image_processor = ImageProcessorTool()
-        
-        for file_info in saved_files:
-            if not file_info:
-                continue
-                
-            file_path = file_info['path']
-            original_name = file_info['original_name']
-            file_extension = os.path.splitext(original_name)[1].lower()
-            uuid_filename = os.path.basename(file_path)
-            
-            try:
-                if file_extension in ['.docx', '.pdf']:
-                    # 使用 document_parser 工具处理 docx 和 pdf 文件
-                    result = document_parser.execute({'file_path': file_path})
-                    
-                    if result.get('status') == 'success':
-                        # 对于 PDF，可能返回 'content' 或 'markdown_content'
-                        content_key = 'markdown_content' if 'markdown_content' in result else 'content'
-                        # 使用 UUID 文件名作为键（从文件路径中提取）
-                        uuid_filename = os.path.basename(file_path)
-                        # 创建包含内容、摘要和原始文件名的对象
-                        processed_files['documents'][uuid_filename] = {
-                            'content': result.get(content_key, ''),
-                            'summary': result.get('summary', ''),
-                            'name': original_name
-                        }
-                    else:
-                        processed_files['other_files'].append(file_info)
-                        
-                elif file_extension in ['.xlsx', '.xls']:
-                    # 使用 excel_processor 工具处理 excel 文件
-                    result = excel_processor.execute({'file_path': file_path})
-                    
-                    if result.get('status') == 'success':
-                        # 将 JSON 数据转换为可以重新构建 pandas DataFrame 的格式
-                        import json
-                        table_data = json.loads(result.get('table_json', '[]'))
-                        # 使用 UUID 文件名作为键（从文件路径中提取）
-                        uuid_filename = os.path.basename(file_path)
-                        processed_files['tables'][uuid_filename] = {
-                            'data': table_data,
-                            'row_count': result.get('row_count', 0),
-                            'column_count': result.get('column_count', 0),
-                            'name': original_name
-                        }
-                    else:
-                        processed_files['other_files'].append(file_info)
-                        
-                elif file_extension in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg']:
-                    # 使用 image_processor 工具处理图片文件
-                    result = image_processor.execute({'file_path': file_path})
-                    
-                    if result.get('status') == 'success':
-                        # 使用 UUID 文件名作为键
-                        uuid_filename = os.path.basename(file_path)
-                        processed_files['images'][uuid_filename] = {
-                            'description': result.get('description', ''),
-                            'name': original_name,
-                            'file_path': file_path,
-                            'model_used': result.get('model_used', 'unknown')
-                        }
-                    else:
-                        # 如果图片处理失败，仍保留文件信息
-                        processed_files['other_files'].append(file_info)
-                        pass  # 图片处理失败时的处理将在后续添加日志
-                        
-                else:
-                    # 其他类型文件暂不预处理，保留文件路径信息
-                    processed_files['other_files'].append(file_info)
-                    
-            except Exception as e:
-                processed_files['other_files'].append(file_info)
-        
-        
-        return processed_files
+            return empty_processed_files()
+
+        # 文件在共享线程池中并发解析，相同内容的文件复用缓存结果
+        return FilePreprocessor().submit(saved_files).wait_all()
 
     def start_agent_task(self, session_id: str, messages: List[Dict], files: List[Any], graph_name: str = 'Super-Router Agent', usage: str = None, user=None) -> AgentTask:
         """
@@ -195,6 +110,7 @@ class AgentService:
         """
         from .tasks import run_graph_task
         from .models import Graph
+        from .services_preprocess import FilePreprocessor, PreprocessEventChannel, empty_processed_files
 
         # 1. 处理文件信息
         # 如果files已经是包含路径的字典列表，直接使用
@@ -212,8 +128,17 @@ class AgentService:
                     # 旧的文件对象格式，需要保存
                     saved_files.append(self._save_file(f))
 
-        # 2. 预处理文件内容（注：图片文件会被放入 other_files 中）
-        processed_files = self._preprocess_files(saved_files)
+        # 2. 并发预处理文件内容（注：图片文件会被放入 other_files 中）
+        # 开启 AGENT_PREPROCESS_START_ON_FIRST_READY 时，首个文件就绪即启动任务，
+        # 其余文件在后台继续处理，由执行器在运行中增量合并
+        batch = FilePreprocessor().submit([f for f in saved_files if f])
+        ready_files = []
+        if batch.total > 1 and getattr(settings, 'AGENT_PREPROCESS_START_ON_FIRST_READY', True):
+            processed_files, ready_files = batch.wait_first()
+        elif batch.total:
+            processed_files = batch.wait_all()
+        else:
+            processed_files = empty_processed_files()
 
         # 3. 从 other_files 中提取图片路径
         origin_images = []
@@ -251,6 +176,8 @@ class AgentService:
                 "document_names": list(processed_files.get('documents', {}).keys()),
                 "table_names": list(processed_files.get('tables', {}).keys())
             }
+        if batch.has_pending:
+            input_data["pending_files_count"] = batch.total - len(ready_files)
         if usage:
             input_data["usage"] = usage
 
@@ -285,7 +212,15 @@ class AgentService:
                 'execution_history': []
             }
         )
-        
+
+        # 登记预处理事件通道：已就绪的文件立即发布，其余文件完成后由后台线程发布
+        if batch.total:
+            channel = PreprocessEventChannel(str(agent_task.task_id))
+            channel.open(pending_count=batch.total - len(ready_files) if batch.has_pending else 0)
+            for item in ready_files:
+                channel.publish(item.to_event())
+            if batch.has_pending:
+                batch.continue_in_background(channel)
 
         # 4. 调用异步任务
         run_graph_task.delay(
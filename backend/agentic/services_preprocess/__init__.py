@@ -0,0 +1,23 @@
+"""
+Agentic Preprocess Module
+
+上传文件的并发、去重预处理服务。
+"""
+
+from .file_preprocessor import (
+    FilePreprocessor,
+    PreprocessBatch,
+    PreprocessEventChannel,
+    PreprocessedFile,
+    apply_events,
+    empty_processed_files,
+)
+
+__all__ = [
+    'FilePreprocessor',
+    'PreprocessBatch',
+    'PreprocessEventChannel',
+    'PreprocessedFile',
+    'apply_events',
+    'empty_processed_files',
+]
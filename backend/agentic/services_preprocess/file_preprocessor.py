@@ -0,0 +1,372 @@
+"""
+文件预处理服务
+
+负责在 Agent 任务启动前并发解析用户上传的文件。
+
+核心职责:
+1. 使用进程内共享的有界线程池并发解析文件
+2. 按内容哈希去重：跨任务/会话复用解析结果，同时合并进程内并发的相同文件（统一的解析结果缓存，见 tools.core.parse_cache）
+3. 每个文件就绪后发布 file_ready 事件，供 SSE 推送和执行器增量合并
+4. 支持"首个文件就绪即启动任务"，其余文件在后台继续处理
+
+设计原则:
+- 结果结构与原 AgentService._preprocess_files 完全一致
+- 缓存/事件通道不可用时退化为无缓存的并发处理
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+from django.conf import settings
+
+from tools.core.parse_cache import get_parse_cache
+
+logger = logging.getLogger('django')
+
+DOCUMENT_EXTENSIONS = ['.docx', '.pdf']
+TABLE_EXTENSIONS = ['.xlsx', '.xls']
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg']
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    """进程内共享的有界线程池，限制所有请求的总解析并发"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                max_workers = getattr(settings, 'AGENT_PREPROCESS_MAX_WORKERS', 4)
+                _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='agent-preprocess')
+    return _pool
+
+
+def empty_processed_files() -> Dict[str, Any]:
+    return {
+        'documents': {},  # 存储 markdown 格式的文档内容
+        'tables': {},     # 存储 pandas 格式的表格数据
+        'images': {},     # 存储图片的文字描述
+        'other_files': [] # 存储其他类型文件的路径信息
+    }
+
+
+@dataclass
+class PreprocessedFile:
+    """单个文件的预处理结果"""
+    file_info: Dict[str, str]
+    category: str                 # documents / tables / images / other_files
+    key: str                      # 在 processed_files[category] 中的键（UUID 文件名）
+    entry: Any = None             # 写入 processed_files 的条目
+    content_hash: str = ''
+    cache_hit: bool = False
+    elapsed_ms: int = 0
+    error: Optional[str] = None
+
+    def to_event(self) -> Dict[str, Any]:
+        return {
+            'type': 'file_ready' if self.category != 'other_files' else 'file_unprocessed',
+            'file': self.file_info.get('original_name'),
+            'key': self.key,
+            'category': self.category,
+            'cache_hit': self.cache_hit,
+            'elapsed_ms': self.elapsed_ms,
+            'error': self.error,
+        }
+
+
+def merge_preprocessed(processed_files: Dict[str, Any], item: PreprocessedFile) -> None:
+    """将单个文件结果合并进 processed_files 结构"""
+    if item.category == 'other_files':
+        processed_files['other_files'].append(item.file_info)
+    else:
+        processed_files[item.category][item.key] = item.entry
+
+
+def file_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class FilePreprocessor:
+    """
+    并发、去重的文件预处理器
+
+    单个文件的解析逻辑与原 _preprocess_files 保持一致，
+    解析结果按 (内容哈希, 扩展名) 写入解析结果缓存。
+    """
+
+    # 解析结果缓存中的解析器名称与版本；条目结构变化时递增版本
+    PARSER_NAME = "agent_preprocess"
+    PARSER_VERSION = "1"
+
+    def submit(self, saved_files: List[Dict[str, str]]) -> 'PreprocessBatch':
+        """提交一批文件，立即返回，解析在线程池中进行"""
+        pool = _get_pool()
+        futures = []
+        for file_info in saved_files:
+            if not file_info:
+                continue
+            futures.append(pool.submit(self.process_file, file_info))
+        return PreprocessBatch(futures)
+
+    def process_file(self, file_info: Dict[str, str]) -> PreprocessedFile:
+        """解析单个文件（在工作线程中执行）"""
+        started = time.monotonic()
+        file_path = file_info['path']
+        original_name = file_info['original_name']
+        file_extension = os.path.splitext(original_name)[1].lower()
+        key = os.path.basename(file_path)
+
+        if file_extension not in DOCUMENT_EXTENSIONS + TABLE_EXTENSIONS + IMAGE_EXTENSIONS:
+            # 其他类型文件暂不预处理，保留文件路径信息
+            return PreprocessedFile(file_info=file_info, category='other_files', key=key)
+
+        try:
+            content_hash = file_content_hash(file_path)
+            category, entry, cache_hit = self._process_deduplicated(
+                content_hash, file_extension, file_path
+            )
+            if category is None:
+                return PreprocessedFile(
+                    file_info=file_info, category='other_files', key=key,
+                    content_hash=content_hash, elapsed_ms=self._elapsed_ms(started)
+                )
+
+            # 缓存条目与上传无关，补上本次上传的原始文件名和路径
+            entry = dict(entry)
+            entry['name'] = original_name
+            if category == 'images':
+                entry['file_path'] = file_path
+            elif category == 'tables' and entry.get('data_path'):
+                # 旁路数据被清理后从本次上传的源文件重建（见 load_table_data）
+                entry['source_path'] = file_path
+
+            return PreprocessedFile(
+                file_info=file_info, category=category, key=key, entry=entry,
+                content_hash=content_hash, cache_hit=cache_hit,
+                elapsed_ms=self._elapsed_ms(started)
+            )
+        except Exception as e:
+            logger.warning(f"[PREPROCESS] 预处理文件失败 {original_name}: {e}")
+            return PreprocessedFile(
+                file_info=file_info, category='other_files', key=key,
+                elapsed_ms=self._elapsed_ms(started), error=str(e)
+            )
+        finally:
+            # 工作线程中的数据库连接不会被请求周期回收，需要手动关闭
+            from django.db import connection
+            connection.close()
+
+    def _process_deduplicated(self, content_hash: str, file_extension: str,
+                              file_path: str) -> Tuple[Optional[str], Optional[Dict[str, Any]], bool]:
+        """先查跨任务缓存，再合并进程内并发的相同文件，最后才真正解析"""
+        cache = get_parse_cache()
+        if cache is None:
+            category, entry = self._parse(file_extension, file_path)
+            return category, entry, False
+
+        def parse() -> Dict[str, Any]:
+            category, entry = self._parse(file_extension, file_path)
+            return {'category': category, 'entry': entry}
+
+        result, cache_hit = cache.get_or_parse(
+            content_hash, self.PARSER_NAME, self.PARSER_VERSION, parse,
+            options={'extension': file_extension},
+            cacheable=lambda r: r['category'] is not None,
+            is_valid=self._cached_files_exist
+        )
+        return result['category'], result['entry'], cache_hit
+
+    def _parse(self, file_extension: str, file_path: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """调用对应的预处理工具，返回 (分类, 条目)；解析失败时分类为 None"""
+        from tools.preprocessors.processors.document_parser import DocumentParserTool
+        from tools.preprocessors.processors.excel_processor import ExcelProcessorTool
+        from tools.preprocessors.processors.image_processor import ImageProcessorTool
+
+        if file_extension in DOCUMENT_EXTENSIONS:
+            # 使用 document_parser 工具处理 docx 和 pdf 文件
+            result = DocumentParserTool().execute({'file_path': file_path})
+            if result.get('status') != 'success':
+                return None, None
+            # 对于 PDF，可能返回 'content' 或 'markdown_content'
+            content_key = 'markdown_content' if 'markdown_content' in result else 'content'
+            return 'documents', {
+                'content': result.get(content_key, ''),
+                'summary': result.get('summary', '')
+            }
+
+        if file_extension in TABLE_EXTENSIONS:
+            # 使用 excel_processor 工具处理 excel 文件
+            result = ExcelProcessorTool().execute({'file_path': file_path})
+            if result.get('status') != 'success':
+                return None, None
+            import json
+            entry = {
+                'data': json.loads(result.get('table_json', '[]')),
+                'row_count': result.get('row_count', 0),
+                'column_count': result.get('column_count', 0)
+            }
+            if result.get('streaming'):
+                # 流式模式下 data 只是预览，完整数据在旁路文件中
+                entry.update({
+                    'is_preview': True,
+                    'data_path': result.get('data_path'),
+                    'source_path': file_path,
+                    'sheet_name': result.get('sheet_name'),
+                    'schema': result.get('schema', []),
+                    'profile': result.get('profile', {})
+                })
+            return 'tables', entry
+
+        # 使用 image_processor 工具处理图片文件
+        result = ImageProcessorTool().execute({'file_path': file_path})
+        if result.get('status') != 'success':
+            return None, None
+        return 'images', {
+            'description': result.get('description', ''),
+            'model_used': result.get('model_used', 'unknown')
+        }
+
+    @staticmethod
+    def _cached_files_exist(cached: Dict[str, Any]) -> bool:
+        """
+        流式表格条目引用首次解析时所在任务目录下的旁路文件，该任务的文件被清理后缓存不再可用，
+        视为未命中并重新画像
+        """
+        data_path = (cached.get('entry') or {}).get('data_path')
+        if data_path and not os.path.exists(data_path):
+            logger.info(f"[PREPROCESS] 缓存的旁路数据已不存在，重新解析: {data_path}")
+            return False
+        return True
+
+    @staticmethod
+    def _elapsed_ms(started: float) -> int:
+        return int((time.monotonic() - started) * 1000)
+
+
+class PreprocessBatch:
+    """一次上传对应的一批预处理任务"""
+
+    def __init__(self, futures: List[Future]):
+        self._pending = set(futures)
+        self.total = len(futures)
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def iter_ready(self, first_only: bool = False) -> Iterator[PreprocessedFile]:
+        """按完成顺序产出结果；first_only 时只等待第一批完成的文件"""
+        while self._pending:
+            done, self._pending = wait(self._pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+            if first_only:
+                return
+
+    def wait_all(self) -> Dict[str, Any]:
+        processed_files = empty_processed_files()
+        for item in self.iter_ready():
+            merge_preprocessed(processed_files, item)
+        return processed_files
+
+    def wait_first(self) -> Tuple[Dict[str, Any], List[PreprocessedFile]]:
+        """等待至少一个文件就绪，返回已就绪部分"""
+        processed_files = empty_processed_files()
+        ready = list(self.iter_ready(first_only=True))
+        for item in ready:
+            merge_preprocessed(processed_files, item)
+        return processed_files, ready
+
+    def continue_in_background(self, channel: 'PreprocessEventChannel') -> None:
+        """剩余文件在后台线程中继续等待，每完成一个就发布到事件通道"""
+        def _drain():
+            try:
+                for item in self.iter_ready():
+                    channel.publish(item.to_event(), item)
+            finally:
+                channel.close()
+
+        threading.Thread(target=_drain, name='agent-preprocess-drain', daemon=True).start()
+
+
+class PreprocessEventChannel:
+    """
+    任务级的预处理事件通道
+
+    事件存放在 Django cache（Redis）中，SSE 视图和 Celery 中的执行器
+    通过游标增量读取。
+    """
+
+    CACHE_PREFIX = "agent_preprocess_events"
+    CACHE_TTL = 3600
+
+    def __init__(self, task_id: str):
+        self.cache_key = f"{self.CACHE_PREFIX}:{task_id}"
+        self._lock = threading.Lock()
+
+    def publish(self, event: Dict[str, Any], item: Optional[PreprocessedFile] = None) -> None:
+        record = dict(event)
+        if item is not None and item.category != 'other_files':
+            record['entry'] = item.entry
+        elif item is not None:
+            record['file_info'] = item.file_info
+        with self._lock:
+            data = self._load()
+            data['events'].append(record)
+            self._save(data)
+
+    def close(self) -> None:
+        with self._lock:
+            data = self._load()
+            data['done'] = True
+            data['events'].append({'type': 'preprocess_complete'})
+            self._save(data)
+
+    def open(self, pending_count: int) -> None:
+        """任务创建时登记仍在处理中的文件数"""
+        with self._lock:
+            self._save({'events': [], 'done': pending_count == 0, 'pending_count': pending_count})
+
+    def collect(self, cursor: int = 0) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """读取游标之后的新事件，返回 (事件列表, 新游标, 是否全部完成)"""
+        data = self._load()
+        events = data['events'][cursor:]
+        return events, cursor + len(events), data.get('done', True)
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            from django.core.cache import cache
+            return cache.get(self.cache_key) or {'events': [], 'done': True}
+        except Exception as e:
+            logger.debug(f"[PREPROCESS] 读取事件通道失败: {e}")
+            return {'events': [], 'done': True}
+
+    def _save(self, data: Dict[str, Any]) -> None:
+        try:
+            from django.core.cache import cache
+            cache.set(self.cache_key, data, timeout=self.CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"[PREPROCESS] 写入事件通道失败: {e}")
+
+
+def apply_events(processed_files: Dict[str, Any], events: List[Dict[str, Any]]) -> int:
+    """将通道事件中的文件结果合并进 processed_files，返回新增文件数"""
+    added = 0
+    for event in events:
+        if event.get('type') == 'file_ready' and 'entry' in event:
+            processed_files.setdefault(event['category'], {})[event['key']] = event['entry']
+            added += 1
+        elif event.get('type') == 'file_unprocessed' and event.get('file_info'):
+            processed_files.setdefault('other_files', []).append(event['file_info'])
+    return added
@@ -0,0 +1,170 @@
+"""
+测试模块: 文件预处理
+
+上传文件在共享线程池中并发解析，首个文件就绪即可启动任务，其余文件通过事件通道增量合并：
+- 并发提交一批文件，wait_first 返回已就绪部分，剩余文件随后就绪
+- 相同内容的文件按内容哈希复用解析结果，条目换成本次上传的文件名
+- 事件通道按 open → publish → close 的顺序记录，collect 按游标增量读取
+- apply_events 把 file_ready / file_unprocessed 事件合并进 processed_files
+
+预处理缓存按内容哈希跨任务复用解析结果；流式表格条目引用首次解析任务的旁路文件，
+旁路文件被清理后缓存条目不能再命中。
+
+解析在线程池的工作线程中进行，工作线程使用各自的数据库连接，看不到 TestCase 事务内的数据，
+因此解析相关的用例使用 TransactionTestCase。
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import openpyxl
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from agentic.services_preprocess.file_preprocessor import (
+    FilePreprocessor,
+    PreprocessedFile,
+    PreprocessEventChannel,
+    apply_events,
+    empty_processed_files,
+    merge_preprocessed,
+)
+from tools.core.parse_cache import ParseCache, set_parse_cache
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class PreprocessTestMixin:
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        previous = set_parse_cache(ParseCache(ttl_seconds=3600, max_bytes=0))
+        self.addCleanup(set_parse_cache, previous)
+
+    def save_upload(self, original_name, rows=None, content=None):
+        """按上传的保存方式以 UUID 文件名落盘，返回 file_info"""
+        path = os.path.join(self.tmp_dir, f"{uuid.uuid4()}{os.path.splitext(original_name)[1]}")
+        if rows is not None:
+            workbook = openpyxl.Workbook()
+            for row in rows:
+                workbook.active.append(row)
+            workbook.save(path)
+        else:
+            with open(path, 'wb') as f:
+                f.write(content)
+        return {'path': path, 'original_name': original_name}
+
+    def copy_upload(self, file_info, original_name):
+        path = os.path.join(self.tmp_dir, f"{uuid.uuid4()}{os.path.splitext(original_name)[1]}")
+        shutil.copyfile(file_info['path'], path)
+        return {'path': path, 'original_name': original_name}
+
+
+class TestFilePreprocessor(PreprocessTestMixin, TransactionTestCase):
+
+    def test_submit_and_wait_first(self):
+        sales = self.save_upload('销售.xlsx', rows=[['区域', '收入'], ['华东', 10], ['华南', 20]])
+        costs = self.save_upload('成本.xlsx', rows=[['项目', '金额'], ['人力', 5]])
+        notes = self.save_upload('说明.txt', content="不预处理的文件".encode('utf-8'))
+
+        batch = FilePreprocessor().submit([sales, costs, notes, None])
+        self.assertEqual(batch.total, 3)
+
+        processed_files, ready = batch.wait_first()
+        self.assertGreaterEqual(len(ready), 1)
+        for item in ready:
+            self.assertIsInstance(item, PreprocessedFile)
+        remaining = list(batch.iter_ready())
+        self.assertFalse(batch.has_pending)
+        self.assertEqual(len(ready) + len(remaining), 3)
+
+        for item in remaining:
+            merge_preprocessed(processed_files, item)
+        self.assertEqual(processed_files['other_files'], [notes])
+        tables = processed_files['tables']
+        self.assertEqual(set(tables), {os.path.basename(sales['path']), os.path.basename(costs['path'])})
+        sales_entry = tables[os.path.basename(sales['path'])]
+        self.assertEqual(sales_entry['name'], '销售.xlsx')
+        self.assertEqual(sales_entry['data'], [{'区域': '华东', '收入': 10}, {'区域': '华南', '收入': 20}])
+        self.assertEqual((sales_entry['row_count'], sales_entry['column_count']), (2, 2))
+
+    def test_same_content_is_parsed_once(self):
+        original = self.save_upload('月报.xlsx', rows=[['月份', '订单'], ['一月', 3]])
+        duplicate = self.copy_upload(original, '月报副本.xlsx')
+
+        first = FilePreprocessor().submit([original]).wait_all()
+        [item] = list(FilePreprocessor().submit([duplicate]).iter_ready())
+
+        self.assertTrue(item.cache_hit)
+        self.assertEqual(item.category, 'tables')
+        self.assertEqual(item.key, os.path.basename(duplicate['path']))
+        self.assertEqual(item.entry['name'], '月报副本.xlsx')
+        self.assertEqual(item.entry['data'], first['tables'][os.path.basename(original['path'])]['data'])
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_remaining_files_are_published(self):
+        files = [self.save_upload(f'表{i}.xlsx', rows=[['序号'], [i]]) for i in range(3)]
+        channel = PreprocessEventChannel(str(uuid.uuid4()))
+        batch = FilePreprocessor().submit(files)
+
+        processed_files, ready = batch.wait_first()
+        channel.open(batch.total - len(ready))
+        batch.continue_in_background(channel)
+
+        cursor, done = 0, False
+        deadline = time.monotonic() + 30
+        while not done and time.monotonic() < deadline:
+            events, cursor, done = channel.collect(cursor)
+            apply_events(processed_files, events)
+            time.sleep(0.05)
+
+        self.assertTrue(done)
+        self.assertEqual(set(processed_files['tables']), {os.path.basename(f['path']) for f in files})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestPreprocessEventChannel(SimpleTestCase):
+
+    def test_open_publish_close_collect(self):
+        channel = PreprocessEventChannel(str(uuid.uuid4()))
+        channel.open(pending_count=2)
+        self.assertEqual(channel.collect(0), ([], 0, False))
+
+        table = PreprocessedFile(
+            file_info={'path': '/uploads/a.xlsx', 'original_name': '销售.xlsx'},
+            category='tables', key='a.xlsx', entry={'name': '销售.xlsx', 'data': [{'区域': '华东'}]}
+        )
+        other = PreprocessedFile(
+            file_info={'path': '/uploads/b.txt', 'original_name': '说明.txt'}, category='other_files', key='b.txt'
+        )
+        channel.publish(table.to_event(), table)
+        events, cursor, done = channel.collect(0)
+        self.assertEqual((len(events), cursor, done), (1, 1, False))
+
+        channel.publish(other.to_event(), other)
+        channel.close()
+        events, cursor, done = channel.collect(cursor)
+        self.assertEqual([event['type'] for event in events], ['file_unprocessed', 'preprocess_complete'])
+        self.assertEqual((cursor, done), (3, True))
+
+        processed_files = empty_processed_files()
+        all_events, _, _ = channel.collect(0)
+        self.assertEqual(apply_events(processed_files, all_events), 1)
+        self.assertEqual(processed_files['tables'], {'a.xlsx': table.entry})
+        self.assertEqual(processed_files['other_files'], [other.file_info])
+
+
+class TestPreprocessCacheSideData(SimpleTestCase):
+
+    def test_cached_table_requires_side_data(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+            data_path = f.name
+        cached = {'category': 'tables', 'entry': {'data': [], 'is_preview': True, 'data_path': data_path}}
+
+        self.assertTrue(FilePreprocessor._cached_files_exist(cached))
+        os.remove(data_path)
+        self.assertFalse(FilePreprocessor._cached_files_exist(cached))
+        self.assertTrue(FilePreprocessor._cached_files_exist({'category': 'documents', 'entry': {'content': ''}}))
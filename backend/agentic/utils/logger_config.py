@@ -103,37 +103,70 @@ Context: {context}
 
 def log_tool_call(tool_name: str, tool_input: Dict[str, Any], user_id: Optional[int] = None):
     """
-    记录工具调用
+    记录工具调用（只记录有界摘要，完整输入见 ActionSteps）
     
     Args:
         tool_name: 工具名称
         tool_input: 工具输入参数
         user_id: 用户ID
     """
-    input_str = json.dumps(tool_input, ensure_ascii=False, indent=2)
+    from tools.core.telemetry import summarize_payload
+    summary = summarize_payload(tool_input)
     logger.info(f"""
 =============== TOOL CALL [{tool_name}] ===============
 User ID: {user_id}
-Input Parameters:
-{input_str}
+Input: {summary['bytes']} bytes, sha256={summary['sha256']}
+{summary['preview']}
 ========================================================
 """)
 
 def log_tool_result(tool_name: str, result: Dict[str, Any]):
     """
-    记录工具执行结果
+    记录工具执行结果（只记录有界摘要，完整输出见 ActionSteps）
     
     Args:
         tool_name: 工具名称
         result: 执行结果
     """
-    result_str = json.dumps(result, ensure_ascii=False, indent=2) if isinstance(result, dict) else str(result)
+    from tools.core.telemetry import summarize_payload
+    summary = summarize_payload(result)
+    execution_id = result.get('metadata', {}).get('execution_id') if isinstance(result, dict) else None
     logger.info(f"""
 =============== TOOL RESULT [{tool_name}] ===============
-{result_str}
+Execution ID: {execution_id}
+Output: {summary['bytes']} bytes, sha256={summary['sha256']}
+{summary['preview']}
 ==========================================================
 """)
 
+def find_tool_payload(execution_id: str) -> Optional[Dict[str, Any]]:
+    """
+    按 execution_id 从 ActionSteps 取回一次工具调用的完整输入和输出
+    
+    日志中只保留摘要，排查问题时用此函数取完整载荷。
+    
+    Returns:
+        {'task_id', 'tool_name', 'tool_input', 'tool_output'}，找不到时返回 None
+    """
+    from ..models import ActionSteps
+    result_step = ActionSteps.objects.filter(
+        log_type=ActionSteps.LogType.TOOL_RESULT,
+        details__tool_output__metadata__execution_id=execution_id
+    ).select_related('task').first()
+    if not result_step:
+        return None
+    call_step = ActionSteps.objects.filter(
+        task=result_step.task,
+        log_type=ActionSteps.LogType.TOOL_CALL,
+        step_order__lt=result_step.step_order
+    ).order_by('-step_order').first()
+    return {
+        'task_id': result_step.task.task_id,
+        'tool_name': result_step.details.get('tool_name'),
+        'tool_input': call_step.details.get('tool_input') if call_step else None,
+        'tool_output': result_step.details.get('tool_output'),
+    }
+
 def log_execution_step(step_name: str, task_id: str = None, **kwargs):
     """
     记录执行步骤
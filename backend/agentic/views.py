@@ -224,10 +224,20 @@ class AgentTaskView(
         task_id = self.kwargs.get('task_id')
         if "text/event-stream" in request.headers.get("Accept", ""):
             def stream():
+                from .services_preprocess import PreprocessEventChannel
                 last_log_id = 0
+                preprocess_channel = PreprocessEventChannel(task_id)
+                preprocess_cursor, preprocess_done = 0, False
                 while True:
                     try:
                         task = AgentTask.objects.get(task_id=task_id, user=request.user)
+
+                        # 推送逐个文件的预处理就绪事件（不含文件内容）
+                        if not preprocess_done:
+                            events, preprocess_cursor, preprocess_done = preprocess_channel.collect(preprocess_cursor)
+                            for event in events:
+                                public_event = {k: v for k, v in event.items() if k not in ('entry', 'file_info')}
+                                yield f"data: {json.dumps({'type': 'preprocess_update', 'event': public_event})}\n\n"
                         new_logs = ActionSteps.objects.filter(task=task, id__gt=last_log_id).order_by('id')
                         
                         if new_logs:
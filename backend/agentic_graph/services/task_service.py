@@ -126,6 +126,15 @@ class TaskService:
                             'row_count': result.get('row_count', 0),
                             'column_count': result.get('column_count', 0)
                         }
+                        if result.get('streaming'):
+                            processed_files['tables'][unique_name].update({
+                                'is_preview': True,
+                                'data_path': result.get('data_path'),
+                                'source_path': file_path,
+                                'sheet_name': result.get('sheet_name'),
+                                'schema': result.get('schema', []),
+                                'profile': result.get('profile', {})
+                            })
                         logger.info(f"成功处理表格: {original_name}")
                     else:
                         processed_files['other_files'].append(file_info)
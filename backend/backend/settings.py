@@ -742,6 +742,16 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'dataset_downloader.tasks.check_heartbeat_timeout',
         'schedule': 60.0,
         'options': {'queue': 'celery'}
+    },
+    'resume-stale-knowledge-ingestion': {
+        'task': 'knowledge.tasks.resume_stale_ingestion_jobs',
+        'schedule': 300.0,  # 每5分钟重新提交中断的知识库导入任务
+        'options': {'queue': 'celery'}
+    },
+    'resume-stale-knowledge-reembedding': {
+        'task': 'knowledge.tasks.resume_stale_reembeddings',
+        'schedule': 300.0,  # 每5分钟重新提交中断的重新嵌入迁移
+        'options': {'queue': 'celery'}
     }
 }
 
@@ -762,6 +772,71 @@ MINERU_SETTINGS = {
     'USE_OSS': os.getenv('MINERU_USE_OSS', 'true').lower() == 'true',  # 启用 OSS 存储
     'CACHE_ENABLED': True,  # 启用缓存
     'CACHE_EXPIRE_DAYS': 7,  # 缓存过期天数
+    # 常驻进程池：模型只加载一次，进程按任务数或内存回收（仅CPU）
+    # 进程池按 worker 进程创建，每个 MinerU 进程常驻数GB内存，默认关闭；
+    # 只在专门执行 MinerU 解析的 worker 上设置 MINERU_WORKER_POOL_ENABLED=true
+    'WORKER_POOL_ENABLED': os.getenv('MINERU_WORKER_POOL_ENABLED', 'false').lower() == 'true',
+    'WORKER_POOL_SIZE': int(os.getenv('MINERU_WORKER_POOL_SIZE', '2')),
+    'WORKER_MAX_JOBS': int(os.getenv('MINERU_WORKER_MAX_JOBS', '50')),  # 每个进程处理多少任务后回收
+    'WORKER_MAX_RSS_MB': int(os.getenv('MINERU_WORKER_MAX_RSS_MB', '6144')),  # 进程内存超过后回收
+    'WORKER_STARTUP_TIMEOUT': int(os.getenv('MINERU_WORKER_STARTUP_TIMEOUT', '600')),  # 启动与模型加载超时（秒）
+    'JOB_TIMEOUT': int(os.getenv('MINERU_JOB_TIMEOUT', '300')),  # 单个文档的解析超时（秒）
+}
+
+# Agent 文件预处理配置
+AGENT_PREPROCESS_MAX_WORKERS = int(os.getenv('AGENT_PREPROCESS_MAX_WORKERS', '4'))  # 进程内并发解析上限
+AGENT_PREPROCESS_START_ON_FIRST_READY = os.getenv('AGENT_PREPROCESS_START_ON_FIRST_READY', 'true').lower() == 'true'  # 首个文件就绪即启动任务
+
+# 文档解析结果缓存（按文件内容哈希 + 解析器 + 版本 + 参数，见 tools.core.parse_cache）
+PARSE_CACHE_ENABLED = os.getenv('PARSE_CACHE_ENABLED', 'true').lower() == 'true'
+PARSE_CACHE_TTL_DAYS = int(os.getenv('PARSE_CACHE_TTL_DAYS', '30'))  # 条目有效期（天），0 表示不过期
+PARSE_CACHE_MAX_MB = int(os.getenv('PARSE_CACHE_MAX_MB', '1024'))  # 结果总大小上限，超过后按最近访问时间淘汰
+
+# 知识库 Embedding 配置（见 knowledge.embedding_service）
+KNOWLEDGE_EMBEDDING_BATCH_SIZE = int(os.getenv('KNOWLEDGE_EMBEDDING_BATCH_SIZE', '10'))  # 单次请求最大条数（text-embedding-v4 上限为 10）
+KNOWLEDGE_EMBEDDING_BATCH_TOKENS = int(os.getenv('KNOWLEDGE_EMBEDDING_BATCH_TOKENS', '32000'))  # 单次请求最大 token 数（按模型的 count_tokens 计数）
+# 阿里云嵌入模型分块与子批次切分使用的分词器，默认 estimate（按字符估算，不依赖外部文件）。
+# text-embedding-v4 基于 Qwen 分词器，需要精确计数时指向本地的 Qwen tokenizer.json
+# （如 HuggingFace 上 Qwen/Qwen3-Embedding-8B 仓库中的 tokenizer.json）；也可填 tiktoken 编码名称。加载失败时估算
+KNOWLEDGE_EMBEDDING_TOKENIZER = os.getenv('KNOWLEDGE_EMBEDDING_TOKENIZER', 'estimate')
+KNOWLEDGE_EMBEDDING_CONCURRENCY = int(os.getenv('KNOWLEDGE_EMBEDDING_CONCURRENCY', '4'))  # 并发请求的子批次数
+KNOWLEDGE_EMBEDDING_CACHE = os.getenv('KNOWLEDGE_EMBEDDING_CACHE', 'redis')  # 共享缓存：redis / disk / memory（仅进程内）/ off
+KNOWLEDGE_EMBEDDING_CACHE_SIZE = int(os.getenv('KNOWLEDGE_EMBEDDING_CACHE_SIZE', '4000'))  # 进程内 LRU 条目数（float32 打包，2048 维每条约 8KB）
+KNOWLEDGE_EMBEDDING_CACHE_TTL_DAYS = int(os.getenv('KNOWLEDGE_EMBEDDING_CACHE_TTL_DAYS', '30'))  # Redis 缓存有效期（天）
+KNOWLEDGE_EMBEDDING_CACHE_DIR = os.getenv('KNOWLEDGE_EMBEDDING_CACHE_DIR', os.path.join(BASE_DIR, 'media', 'knowledge_embedding_cache'))  # disk 模式的缓存目录
+KNOWLEDGE_QDRANT_HEALTH_CHECK_INTERVAL = int(os.getenv('KNOWLEDGE_QDRANT_HEALTH_CHECK_INTERVAL', '30'))  # 共享 Qdrant 客户端的健康检查间隔（秒），失败时重建
+KNOWLEDGE_RETRIEVAL_CACHE = os.getenv('KNOWLEDGE_RETRIEVAL_CACHE', 'redis')  # 检索结果缓存：redis / memory（仅进程内）/ off
+KNOWLEDGE_RETRIEVAL_CACHE_TTL = int(os.getenv('KNOWLEDGE_RETRIEVAL_CACHE_TTL', '300'))  # 检索结果有效期（秒），集合写入时立即失效
+KNOWLEDGE_RETRIEVAL_CACHE_SIZE = int(os.getenv('KNOWLEDGE_RETRIEVAL_CACHE_SIZE', '1000'))  # 进程内 LRU 条目数
+KNOWLEDGE_RERANK_MODEL = os.getenv('KNOWLEDGE_RERANK_MODEL', '')  # 路由器中 model_type=rerank 的模型名称或标识符，为空时检索不做重排序
+KNOWLEDGE_RERANK_BUDGET_MS = float(os.getenv('KNOWLEDGE_RERANK_BUDGET_MS', '1000'))  # 单次查询（检索 + 重排序）的延迟预算（毫秒），超出时跳过或只对部分候选重排序
+KNOWLEDGE_RERANK_CANDIDATES = int(os.getenv('KNOWLEDGE_RERANK_CANDIDATES', '30'))  # 参与重排序的候选数上限
+KNOWLEDGE_RERANK_TOP_N = int(os.getenv('KNOWLEDGE_RERANK_TOP_N', '5'))  # 重排序后最多返回的条数
+KNOWLEDGE_RERANK_MIN_SCORE = float(os.getenv('KNOWLEDGE_RERANK_MIN_SCORE', '0'))  # 重排序分数低于该值的结果丢弃（至少保留一条）
+KNOWLEDGE_RERANK_CACHE = os.getenv('KNOWLEDGE_RERANK_CACHE', 'redis')  # 重排序分数缓存：redis / memory（仅进程内）/ off
+KNOWLEDGE_RERANK_CACHE_SIZE = int(os.getenv('KNOWLEDGE_RERANK_CACHE_SIZE', '10000'))  # 进程内 LRU 条目数
+KNOWLEDGE_RERANK_CACHE_TTL = int(os.getenv('KNOWLEDGE_RERANK_CACHE_TTL', '86400'))  # Redis 中分数的有效期（秒）
+KNOWLEDGE_INTERACTION_LOG = os.getenv('KNOWLEDGE_INTERACTION_LOG', 'buffered')  # 交互记录写入方式：buffered（后台批量写入）/ sync（每条立即写入）
+KNOWLEDGE_INTERACTION_FLUSH_SIZE = int(os.getenv('KNOWLEDGE_INTERACTION_FLUSH_SIZE', '200'))  # 缓冲达到该条数时立即写出
+KNOWLEDGE_INTERACTION_FLUSH_INTERVAL = float(os.getenv('KNOWLEDGE_INTERACTION_FLUSH_INTERVAL', '5'))  # 后台写出间隔（秒）
+KNOWLEDGE_INTERACTION_MAX_PENDING = int(os.getenv('KNOWLEDGE_INTERACTION_MAX_PENDING', '10000'))  # 缓冲上限，超过后丢弃新事件
+KNOWLEDGE_CHUNK_TOKENS = int(os.getenv('KNOWLEDGE_CHUNK_TOKENS', '512'))  # store_knowledge 的分块 token 上限，超过时按标题/段落/表格切分
+KNOWLEDGE_CHUNK_OVERLAP_TOKENS = int(os.getenv('KNOWLEDGE_CHUNK_OVERLAP_TOKENS', '64'))  # 章节内相邻分块的重叠 token 数
+KNOWLEDGE_CHUNK_MIN_TOKENS = int(os.getenv('KNOWLEDGE_CHUNK_MIN_TOKENS', '64'))  # 短于该 token 数的章节并入下一章节
+KNOWLEDGE_INGESTION_DIR = os.getenv('KNOWLEDGE_INGESTION_DIR', os.path.join(BASE_DIR, 'media', 'knowledge_ingestion'))  # 批量导入的 JSONL 源文件目录
+KNOWLEDGE_INGESTION_STALE_SECONDS = int(os.getenv('KNOWLEDGE_INGESTION_STALE_SECONDS', '600'))  # 导入任务心跳超时（秒），超时后视为中断并重新提交
+KNOWLEDGE_REEMBED_BATCH_SIZE = int(os.getenv('KNOWLEDGE_REEMBED_BATCH_SIZE', '128'))  # 重新嵌入回填每批读取的点数
+KNOWLEDGE_REEMBED_MAX_POINTS_PER_SECOND = float(os.getenv('KNOWLEDGE_REEMBED_MAX_POINTS_PER_SECOND', '50'))  # 回填默认限速（每秒点数），Embedding 限流时自动降速
+KNOWLEDGE_REEMBED_STALE_SECONDS = int(os.getenv('KNOWLEDGE_REEMBED_STALE_SECONDS', '600'))  # 回填心跳超时（秒），超时后视为中断并重新提交
+
+# 工具执行日志配置
+TOOL_LOG_PREVIEW_CHARS = int(os.getenv('TOOL_LOG_PREVIEW_CHARS', '500'))  # 日志中输入/输出预览的最大字符数
+TOOL_LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('TOOL_LOG_PAYLOAD_SAMPLE_RATE', '0'))  # 记录完整载荷的默认采样率
+# 按工具覆盖采样率，格式: "ExcelProcessorTool=0.1,GoogleSearch=1"
+TOOL_LOG_PAYLOAD_SAMPLE_TOOLS = {
+    name.strip(): float(rate)
+    for name, _, rate in (item.partition('=') for item in os.getenv('TOOL_LOG_PAYLOAD_SAMPLE_TOOLS', '').split(','))
+    if name.strip() and rate
 }
 
 # WhiteNoise 配置
@@ -1,6 +1,13 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django import forms
-from .models import KnowledgeCollection, KnowledgeItem, KnowledgeInteraction, KnowledgeConfig
+from .models import (
+    KnowledgeCollection,
+    KnowledgeConfig,
+    KnowledgeEmbeddingMigration,
+    KnowledgeInteraction,
+    KnowledgeInteractionRollup,
+    KnowledgeItem,
+)
 from router.models import LLMModel
 
 class KnowledgeConfigForm(forms.ModelForm):
@@ -139,7 +146,23 @@ class KnowledgeCollectionAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description')
     # Ensure 'config' field is not in fieldsets or fields if it was previously.
     # Example: fields = ('name', 'description', 'mem0_collection_id', 'qdrant_collection_name', 'created_by')
-    readonly_fields = ('created_at', 'updated_at')
+    # vector_collection_name 由重新嵌入迁移切换维护
+    readonly_fields = ('vector_collection_name', 'created_at', 'updated_at')
+
+    def save_model(self, request, obj, form, change):
+        # 存储配置变化时同步到已有的 Qdrant 集合（维度变化会被拒绝）
+        if change and 'storage_profile' in form.changed_data:
+            from .services import KnowledgeService
+
+            profile = obj.storage_profile
+            obj.storage_profile = form.initial.get('storage_profile') or {}
+            super().save_model(request, obj, form, change)
+            try:
+                KnowledgeService().apply_storage_profile(obj, profile)
+            except Exception as e:
+                self.message_user(request, f"存储配置未应用: {e}", level=messages.ERROR)
+            return
+        super().save_model(request, obj, form, change)
 
 """
 知识库条目管理后台
@@ -164,3 +187,30 @@ class KnowledgeInteractionAdmin(admin.ModelAdmin):
     list_filter = ('interaction_type', 'status_code', 'collection')
     search_fields = ('user__username', 'error_message') # Assuming user has a username
     readonly_fields = ('timestamp',)
+
+
+@admin.register(KnowledgeInteractionRollup)
+class KnowledgeInteractionRollupAdmin(admin.ModelAdmin):
+    """知识库交互汇总（由交互记录缓冲写入时自动维护，只读）"""
+    list_display = ('collection', 'period', 'bucket_start', 'interaction_type', 'event_count', 'hit_count', 'error_count')
+    list_filter = ('period', 'interaction_type', 'collection')
+    date_hierarchy = 'bucket_start'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(KnowledgeEmbeddingMigration)
+class KnowledgeEmbeddingMigrationAdmin(admin.ModelAdmin):
+    """重新嵌入迁移（通过接口发起、切换与回滚，只读）"""
+    list_display = ('id', 'collection', 'status', 'processed_points', 'total_points', 'source_collection', 'target_collection', 'created_at')
+    list_filter = ('status', 'collection')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -6,7 +6,8 @@ import logging
 from typing import Dict, List, Any, Optional
 from django.db import transaction
 
-from .models import KnowledgeCollection, KnowledgeItem, KnowledgeInteraction
+from .interactions import record_interaction
+from .models import KnowledgeCollection, KnowledgeItem
 from .services import KnowledgeService
 
 logger = logging.getLogger("django")
@@ -84,7 +85,7 @@ class KnowledgeAPI:
                 logger.warning(f"Failed to store in vector database: {str(e)}")
             
             # 记录交互
-            KnowledgeInteraction.objects.create(
+            record_interaction(
                 collection=collection,
                 interaction_type='add_data',
                 request_payload={
@@ -140,7 +141,7 @@ class KnowledgeAPI:
         try:
             results = []
             
-            # 使用KnowledgeService进行向量搜索
+            # 使用KnowledgeService进行混合检索（向量 + 词法）
             try:
                 # 使用用户ID实现数据隔离
                 collection_name_with_user = f"{collection_name}_{user_id}"
@@ -153,43 +154,27 @@ class KnowledgeAPI:
                 )
                 
                 for result in search_response.get('results', []):
-                    # 转换距离到相似度分数 (0-1)
-                    score = max(0, 1 - result.get('distance', 1) / 2)
-                    if score >= threshold:
-                        results.append({
-                            'content': result.get('content', ''),
-                            'score': score,
-                            'metadata': result.get('metadata', {}),
-                            'source': result.get('source', 'vector_db')
-                        })
+                    if result.get('source') == 'database':
+                        score = 0.5  # 仅词法命中，给予固定分数
+                    else:
+                        # 转换距离到相似度分数 (0-1)
+                        score = max(0, 1 - result.get('distance', 1) / 2)
+                        if score < threshold:
+                            continue
+                    results.append({
+                        'content': result.get('content', ''),
+                        'score': score,
+                        'metadata': result.get('metadata', {}),
+                        'source': result.get('source', 'vector_db'),
+                        'item_id': result.get('id')
+                    })
             except Exception as e:
-                logger.warning(f"Vector search failed: {str(e)}")
-            
-            # 如果向量搜索结果不足，补充数据库搜索
-            if len(results) < limit:
-                try:
-                    collection = KnowledgeCollection.objects.get(name=collection_name)
-                    db_items = KnowledgeItem.objects.filter(
-                        collection=collection,
-                        content__icontains=query,
-                        status='active'
-                    )[:limit - len(results)]
-                    
-                    for item in db_items:
-                        results.append({
-                            'content': item.content,
-                            'score': 0.5,  # 文本匹配给予固定分数
-                            'metadata': item.metadata or {},
-                            'source': 'database',
-                            'item_id': item.id
-                        })
-                except:
-                    pass
+                logger.warning(f"Knowledge search failed: {str(e)}")
             
             # 记录交互
             try:
                 collection = KnowledgeCollection.objects.get(name=collection_name)
-                KnowledgeInteraction.objects.create(
+                record_interaction(
                     collection=collection,
                     interaction_type='search_data',
                     request_payload={
@@ -0,0 +1,322 @@
+"""
+按文档结构与 token 数切分分块
+
+分块过大浪费 Embedding token、稀释检索相关性，过小则向量数成倍增长。这里按 Markdown 结构切分：
+
+1. 解析为块：标题、段落、表格（Markdown 表格与 MinerU 输出的 HTML 表格）、代码块；
+   PDF 解析输出的分页标记（<!-- PAGE_BREAK_N -->、"## 第 N 页"）只用于记录页码
+2. 同一章节的块合并到接近 max_tokens；遇到标题且当前分块已达到 min_tokens 时另起分块，过短的章节并入下一章节
+3. 超长段落按句子、再按 token 窗口切开；超长 Markdown 表格按行切开，每段重复表头
+4. 章节内因长度切开的相邻分块保留 overlap_tokens 的重叠（表格、代码块不做重叠）
+
+token 数由 count_tokens 计算，应与 Embedding 模型切分子批次使用的计数一致（BatchedEmbeddings.count_tokens）。
+每个分块记录所在章节标题、页码范围与在原文中的字符区间，写入分块元数据用于追溯来源。
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .embedding_service import estimate_tokens
+
+HEADING = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+PAGE_BREAK = re.compile(r'^<!--\s*PAGE_BREAK_(\d+)\s*-->$')
+PAGE_HEADING = re.compile(r'^第\s*(\d+)\s*页$')
+TABLE_SEPARATOR = re.compile(r'^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$')
+SENTENCE_END = re.compile(r'(?<=[。！？!?；;])|(?<=[.])\s+')
+# 分块之间的分隔符按 1 个 token 计
+SEPARATOR = '\n\n'
+
+
+def parse_blocks(text: str) -> List[Dict[str, Any]]:
+    """
+    把 Markdown 文本解析为块，每块包含 type（heading/paragraph/table/code）、text、
+    start/end（在原文中的字符区间）、page（无分页标记时为 None），标题另有 level
+    """
+    blocks = []
+    page = 1 if ('PAGE_BREAK_' in text or re.search(r'^#{1,6}\s+第\s*\d+\s*页', text, re.M)) else None
+    lines = text.splitlines(keepends=True)
+    position = 0
+    # 正在累积的块：[type, start, end]
+    current = None
+
+    def close():
+        nonlocal current
+        if current:
+            kind, start, end = current
+            content = text[start:end].strip()
+            if content:
+                offset = text.index(content, start)
+                blocks.append({'type': kind, 'text': content, 'start': offset, 'end': offset + len(content), 'page': page})
+            current = None
+
+    for line in lines:
+        start, end = position, position + len(line)
+        position = end
+        stripped = line.strip()
+
+        if current and current[0] == 'code':
+            current[2] = end
+            if stripped.startswith('```') or stripped.startswith('~~~'):
+                close()
+            continue
+        if current and current[0] == 'html_table':
+            current[2] = end
+            if '</table>' in stripped.lower():
+                current[0] = 'table'
+                close()
+            continue
+
+        if not stripped:
+            close()
+            continue
+        match = PAGE_BREAK.match(stripped)
+        if match:
+            close()
+            page = int(match.group(1))
+            continue
+        match = HEADING.match(stripped)
+        if match:
+            close()
+            title = match.group(2)
+            page_match = PAGE_HEADING.match(title)
+            if page_match:
+                page = int(page_match.group(1))
+            offset = text.index(stripped, start)
+            blocks.append({
+                'type': 'heading', 'text': stripped, 'start': offset, 'end': offset + len(stripped),
+                'page': page, 'level': len(match.group(1)), 'title': title,
+            })
+            continue
+        if stripped.startswith('```') or stripped.startswith('~~~'):
+            close()
+            current = ['code', start, end]
+            continue
+        if stripped.lower().startswith('<table'):
+            close()
+            current = ['html_table', start, end]
+            if '</table>' in stripped.lower():
+                current[0] = 'table'
+                close()
+            continue
+
+        kind = 'table' if stripped.startswith('|') else 'paragraph'
+        if current and current[0] != kind:
+            close()
+        if current:
+            current[2] = end
+        else:
+            current = [kind, start, end]
+    if current and current[0] == 'html_table':
+        current[0] = 'table'
+    close()
+    return blocks
+
+
+class MarkdownChunker:
+    """按结构与 token 数切分；count_tokens 默认使用 embedding_service.estimate_tokens"""
+
+    def __init__(
+        self,
+        max_tokens: int = 512,
+        overlap_tokens: int = 64,
+        min_tokens: int = 64,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
+        self.max_tokens = max(16, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+        self.min_tokens = max(0, min(min_tokens, self.max_tokens))
+        self.count_tokens = count_tokens or estimate_tokens
+
+    def chunk(self, text: str) -> List[Dict[str, Any]]:
+        """
+        切分文本，返回分块列表，每个分块包含：
+        text、index、token_count、section（章节标题路径）、page_start/page_end、char_start/char_end
+        """
+        text = text or ''
+        chunks: List[Dict[str, Any]] = []
+        headings: List[Tuple[int, str]] = []
+        # 当前分块：units 为 (文本, 起点, 终点, 页码, 类型)，overlap 为开头的重叠文本
+        state = {'units': [], 'tokens': 0, 'overlap': '', 'section': []}
+
+        def flush(with_overlap: bool, next_tokens: int = 0):
+            units = state['units']
+            if not units:
+                return
+            parts = ([state['overlap']] if state['overlap'] else []) + [unit[0] for unit in units]
+            content = SEPARATOR.join(parts)
+            pages = [unit[3] for unit in units if unit[3] is not None]
+            chunks.append({
+                'text': content,
+                'index': len(chunks),
+                'token_count': self.count_tokens(content),
+                'section': list(state['section']),
+                'page_start': min(pages) if pages else None,
+                'page_end': max(pages) if pages else None,
+                'char_start': units[0][1],
+                'char_end': units[-1][2],
+            })
+            overlap = ''
+            if with_overlap and units[-1][4] == 'paragraph':
+                budget = min(self.overlap_tokens, self.max_tokens - next_tokens - 2)
+                overlap = self._tail(units[-1][0], budget)
+            state.update(units=[], tokens=self.count_tokens(overlap) if overlap else 0, overlap=overlap)
+
+        def add(unit: Tuple[str, int, int, Any, str], tokens: int):
+            if state['units'] and state['tokens'] + tokens + 1 > self.max_tokens:
+                flush(unit[4] == 'paragraph', tokens)
+            if not state['units']:
+                state['section'] = [title for _, title in headings]
+            state['units'].append(unit)
+            state['tokens'] += tokens + (1 if len(state['units']) > 1 or state['overlap'] else 0)
+
+        for block in parse_blocks(text):
+            if block['type'] == 'heading':
+                if state['tokens'] >= self.min_tokens:
+                    flush(False)
+                while headings and headings[-1][0] >= block['level']:
+                    headings.pop()
+                headings.append((block['level'], block['title']))
+                if not state['units']:
+                    # 标题开启新分块：之前的重叠不属于本章节
+                    state.update(tokens=0, overlap='')
+            for unit in self._units(block):
+                add(unit, self.count_tokens(unit[0]))
+        flush(False)
+        return chunks
+
+    def _units(self, block: Dict[str, Any]) -> List[Tuple[str, int, int, Any, str]]:
+        """把块切成不超过上限的单元；段落单元预留重叠的空间"""
+        kind = 'paragraph' if block['type'] in ('paragraph', 'heading') else block['type']
+        text, start, page = block['text'], block['start'], block['page']
+        if self.count_tokens(text) <= self.max_tokens:
+            return [(text, start, block['end'], page, kind)]
+        if block['type'] == 'table' and text.startswith('|'):
+            return self._split_table(block)
+        limit = self.max_tokens - (self.overlap_tokens + 2 if kind == 'paragraph' else 0)
+        spans = self._pack(text, self._sentences(text) if kind == 'paragraph' else [(0, len(text))], limit)
+        return [(text[a:b], start + a, start + b, page, kind) for a, b in spans]
+
+    def _split_table(self, block: Dict[str, Any]) -> List[Tuple[str, int, int, Any, str]]:
+        """按行切开 Markdown 表格，每段重复表头（表头与分隔行）"""
+        text, start = block['text'], block['start']
+        rows, position = [], 0
+        for line in text.split('\n'):
+            rows.append((line, position, position + len(line)))
+            position += len(line) + 1
+        header_size = 2 if len(rows) > 1 and TABLE_SEPARATOR.match(rows[1][0].strip()) else 1
+        header = '\n'.join(row[0] for row in rows[:header_size])
+        budget = self.max_tokens - self.count_tokens(header) - 1
+        units, current, current_tokens = [], [], 0
+        for row in rows[header_size:]:
+            tokens = self.count_tokens(row[0]) + 1
+            if current and current_tokens + tokens > budget:
+                units.append(current)
+                current, current_tokens = [], 0
+            current.append(row)
+            current_tokens += tokens
+        if current:
+            units.append(current)
+        # 单行超过上限时照常输出，由 Embedding 接口截断
+        return [
+            ('\n'.join([header] + [row[0] for row in group]), start + group[0][1], start + group[-1][2], block['page'], 'table')
+            for group in units
+        ]
+
+    @staticmethod
+    def _sentences(text: str) -> List[Tuple[int, int]]:
+        spans, start = [], 0
+        for match in SENTENCE_END.finditer(text):
+            end = match.start()
+            if end > start:
+                spans.append((start, end))
+                start = match.end()
+        if start < len(text):
+            spans.append((start, len(text)))
+        return spans
+
+    def _pack(self, text: str, spans: List[Tuple[int, int]], limit: int) -> List[Tuple[int, int]]:
+        """把连续的区间合并到不超过 limit 个 token，单个区间超长时按 token 窗口切开"""
+        packed, current = [], None
+        for a, b in spans:
+            if self.count_tokens(text[a:b]) > limit:
+                if current:
+                    packed.append(current)
+                    current = None
+                while a < b:
+                    end = a + self._fit(text[a:b], limit)
+                    packed.append((a, end))
+                    a = end
+                continue
+            if current and self.count_tokens(text[current[0]:b]) > limit:
+                packed.append(current)
+                current = None
+            current = (current[0], b) if current else (a, b)
+        if current:
+            packed.append(current)
+        return packed
+
+    def _fit(self, text: str, limit: int) -> int:
+        """text 中不超过 limit 个 token 的最长前缀长度（至少 1 个字符）"""
+        low, high = 1, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(text[:middle]) <= limit:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _tail(self, text: str, limit: int) -> str:
+        """text 中不超过 limit 个 token 的最长后缀；后缀内有句子边界时从句首开始"""
+        if limit <= 0:
+            return ''
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(text[-middle:]) <= limit:
+                low = middle
+            else:
+                high = middle - 1
+        tail = text[-low:] if low else ''
+        for match in SENTENCE_END.finditer(tail):
+            if 0 < match.end() < len(tail):
+                return tail[match.end():]
+        return tail
+
+
+def chunk_document(
+    text: str,
+    max_tokens: int = 512,
+    overlap_tokens: int = 64,
+    min_tokens: int = 64,
+    count_tokens: Optional[Callable[[str], int]] = None
+) -> List[Dict[str, Any]]:
+    """按结构与 token 数切分文本，见 MarkdownChunker.chunk"""
+    return MarkdownChunker(max_tokens, overlap_tokens, min_tokens, count_tokens).chunk(text)
+
+
+def lineage_metadata(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """写入分块元数据的来源信息（章节、页码、字符区间、token 数）"""
+    metadata = {
+        'section': ' > '.join(chunk['section']),
+        'char_start': chunk['char_start'],
+        'char_end': chunk['char_end'],
+        'token_count': chunk['token_count'],
+    }
+    if chunk['page_start'] is not None:
+        metadata['page_start'] = chunk['page_start']
+        metadata['page_end'] = chunk['page_end']
+    return metadata
+
+
+def chunk_source_text(content: str, metadata: Optional[Dict[str, Any]]) -> str:
+    """
+    精简 payload 不存分块正文时，按 char_start/char_end 从条目原文截出分块对应的区间
+
+    同一文档的分块共享 item_id；单块文档或缺少字符区间时返回整篇原文。截出的区间不含重叠前缀
+    与表格重复的表头。
+    """
+    metadata = metadata or {}
+    start, end = metadata.get('char_start'), metadata.get('char_end')
+    if (metadata.get('chunk_count') or 1) > 1 and isinstance(start, int) and isinstance(end, int) and start < end:
+        return content[start:end]
+    return content
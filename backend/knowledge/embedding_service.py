@@ -0,0 +1,536 @@
+"""
+知识库 Embedding 服务
+
+原先 AliyunEmbeddings.embed_documents 把整批文本放进一次请求：超过厂商的单次条数/长度限制就整体失败，
+也没有缓存，重新导入集合时未变化的分块全部重新计算，相同的查询每次检索都重新计算。
+
+BatchedEmbeddings 在具体的 Embedding 接口之上统一处理：
+- 按内容哈希查缓存（进程内 LRU + Redis/磁盘共享层，键包含模型和维度），同一批内的重复文本只计算一次
+- 未命中的文本按条数和估算 token 数切分成子批次，多个子批次并发请求
+- 限流、超时、服务端错误按退避重试；请求本身被拒绝（如超长）时把子批次对半拆分后重试，定位到单条为止
+- 统计请求数、缓存命中、重试与拆分次数
+
+子类只需实现 _embed_batch（一次请求）。FakeEmbeddings 是确定性的本地实现，用于测试和离线开发。
+"""
+import copy
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from django.conf import settings
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("django")
+
+
+class EmbeddingRequestError(Exception):
+    """单次 Embedding 请求失败；retryable 表示可原样重试（限流、超时、服务端错误）"""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文约一字一 token，其他字符约四个一 token"""
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def load_token_counter(name: str) -> Optional[Callable[[str], int]]:
+    """
+    按名称加载分词器的 token 计数函数：以 .json 结尾时按 HuggingFace tokenizer.json 加载
+    （如 Qwen 的分词器文件），否则作为 tiktoken 的编码名称；为空或 estimate 时、加载失败时返回 None，
+    调用方回退到估算
+    """
+    if not name or name == 'estimate':
+        return None
+    try:
+        if name.endswith('.json'):
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_file(name)
+            return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+        import tiktoken
+        encoding = tiktoken.get_encoding(name)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.warning(f"加载分词器 {name} 失败，token 计数回退到估算: {e}")
+        return None
+
+
+def embedding_cache_key(model: str, dimensions: Optional[int], text: str) -> str:
+    return hashlib.sha256(f"{model}|{dimensions or ''}|{text}".encode('utf-8')).hexdigest()
+
+
+def _encode_vector(vector: Sequence[float]) -> bytes:
+    return array('f', vector).tobytes()
+
+
+def _decode_vector(data: bytes) -> List[float]:
+    vector = array('f')
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+# ==================== 缓存 ====================
+
+def _get_redis_client():
+    """优先复用 django-redis 的连接池，未安装时按缓存地址直接连接"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+    except ImportError:
+        import redis
+        cache_location = settings.CACHES['default'].get('LOCATION', 'redis://localhost:6379/1')
+        return redis.from_url(cache_location)
+
+
+class RedisEmbeddingStore:
+    """Redis 共享层：多个进程/机器之间复用向量"""
+
+    KEY_PREFIX = "knowledge:embedding"
+
+    def __init__(self, client=None, ttl_seconds: int = 30 * 86400):
+        self._client = client
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _get_redis_client()
+        return self._client
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        values = self.client.mget([f"{self.KEY_PREFIX}:{key}" for key in keys])
+        return {key: _decode_vector(value) for key, value in zip(keys, values) if value}
+
+    def set_many(self, items: Dict[str, Sequence[float]]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key, vector in items.items():
+            pipe.set(f"{self.KEY_PREFIX}:{key}", _encode_vector(vector), ex=self.ttl_seconds or None)
+        pipe.execute()
+
+
+class DiskEmbeddingStore:
+    """磁盘共享层：无 Redis 的单机部署使用，文件先写临时文件再原子替换"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        for key in keys:
+            try:
+                found[key] = _decode_vector(self._path(key).read_bytes())
+            except FileNotFoundError:
+                continue
+        return found
+
+    def set_many(self, items: Dict[str, Sequence[float]]) -> None:
+        for key, vector in items.items():
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(_encode_vector(vector))
+            os.replace(tmp_path, path)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+
+class EmbeddingCache:
+    """
+    两级向量缓存：进程内 LRU 在前，共享层（Redis/磁盘，可选）在后
+
+    LRU 中的向量按 float32 打包成 bytes 保存（2048 维约 8KB；list[float] 约 64KB），读取时再解码，
+    与共享层保存的精度一致。
+    """
+
+    def __init__(self, max_entries: int = 4000, store=None):
+        self.max_entries = max_entries
+        self.store = store
+        self._lru: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._store_warned = False
+        self._stats = {'lru_hits': 0, 'store_hits': 0, 'misses': 0, 'store_errors': 0}
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        keys = list(keys)
+        packed = {}
+        with self._lock:
+            for key in keys:
+                data = self._lru.get(key)
+                if data is not None:
+                    self._lru.move_to_end(key)
+                    packed[key] = data
+            self._stats['lru_hits'] += len(packed)
+        found = {key: _decode_vector(data) for key, data in packed.items()}
+
+        remaining = [key for key in keys if key not in found]
+        if remaining and self.store is not None:
+            shared = self._call_store('get_many', remaining) or {}
+            if shared:
+                self._remember(shared)
+                found.update(shared)
+            with self._lock:
+                self._stats['store_hits'] += len(shared)
+
+        with self._lock:
+            self._stats['misses'] += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Dict[str, Sequence[float]]) -> None:
+        if not items:
+            return
+        self._remember(items)
+        if self.store is not None:
+            self._call_store('set_many', items)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['lru_entries'] = len(self._lru)
+            stats['lru_bytes'] = sum(len(data) for data in self._lru.values())
+        stats['store'] = type(self.store).__name__ if self.store is not None else None
+        return stats
+
+    def _remember(self, items: Dict[str, Sequence[float]]) -> None:
+        if self.max_entries <= 0:
+            return
+        packed = {key: _encode_vector(vector) for key, vector in items.items()}
+        with self._lock:
+            for key, data in packed.items():
+                self._lru[key] = data
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _call_store(self, method: str, arg):
+        # 共享层只是加速手段，不可用时退化为进程内缓存
+        try:
+            return getattr(self.store, method)(arg)
+        except Exception as e:
+            with self._lock:
+                self._stats['store_errors'] += 1
+                warned, self._store_warned = self._store_warned, True
+            if not warned:
+                logger.warning(f"Embedding 共享缓存不可用，仅使用进程内缓存: {e}")
+            return None
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_configured = False
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """按 settings 创建进程内共享的向量缓存，未启用时返回 None"""
+    global _embedding_cache, _embedding_cache_configured
+    if _embedding_cache_configured:
+        return _embedding_cache
+    with _embedding_cache_lock:
+        if not _embedding_cache_configured:
+            backend = getattr(settings, 'KNOWLEDGE_EMBEDDING_CACHE', 'redis')
+            if backend != 'off':
+                store = None
+                if backend == 'redis':
+                    store = RedisEmbeddingStore(
+                        ttl_seconds=getattr(settings, 'KNOWLEDGE_EMBEDDING_CACHE_TTL_DAYS', 30) * 86400
+                    )
+                elif backend == 'disk':
+                    store = DiskEmbeddingStore(
+                        getattr(settings, 'KNOWLEDGE_EMBEDDING_CACHE_DIR', '/tmp/knowledge_embedding_cache')
+                    )
+                _embedding_cache = EmbeddingCache(
+                    max_entries=getattr(settings, 'KNOWLEDGE_EMBEDDING_CACHE_SIZE', 4000),
+                    store=store
+                )
+            _embedding_cache_configured = True
+    return _embedding_cache
+
+
+def set_embedding_cache(cache: Optional[EmbeddingCache]) -> Optional[EmbeddingCache]:
+    """替换进程内的缓存实例（None 表示禁用），返回原实例"""
+    global _embedding_cache, _embedding_cache_configured
+    with _embedding_cache_lock:
+        previous = _embedding_cache
+        _embedding_cache = cache
+        _embedding_cache_configured = True
+    return previous
+
+
+# ==================== 批处理 ====================
+
+class BatchedEmbeddings(Embeddings):
+    """带缓存、子批次切分与并发请求的 Embedding 基类"""
+
+    # 退避重试的基础等待时间（秒），第 n 次重试等待 base * 2^(n-1)
+    RETRY_BACKOFF = 0.5
+
+    def __init__(
+        self,
+        model: str,
+        dimensions: Optional[int] = None,
+        max_batch_size: int = 10,
+        max_batch_tokens: int = 32000,
+        max_workers: int = 4,
+        max_retries: int = 2,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        """
+        Args:
+            model: 模型名称（缓存键的一部分）
+            dimensions: 向量维度（缓存键的一部分），None 表示模型默认
+            max_batch_size: 单次请求的最大条数
+            max_batch_tokens: 单次请求的最大估算 token 数
+            max_workers: 并发请求的子批次数
+            max_retries: 可重试错误的最大重试次数
+            cache: 向量缓存，None 表示不缓存
+        """
+        self.model = model
+        self.dimensions = dimensions
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.cache = cache
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'texts': 0, 'unique_texts': 0, 'cache_hits': 0, 'embedded': 0,
+            'requests': 0, 'retries': 0, 'splits': 0, 'failures': 0, 'request_seconds': 0.0,
+        }
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """发送一次请求，返回与 texts 一一对应的向量；失败时抛出 EmbeddingRequestError"""
+        raise NotImplementedError
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """嵌入文档列表"""
+        if not texts:
+            return []
+        keys = [embedding_cache_key(self.model, self.dimensions, text) for text in texts]
+        # 同一批内的重复文本只计算一次
+        unique: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            unique.setdefault(key, text)
+
+        vectors = self.cache.get_many(unique.keys()) if self.cache is not None else {}
+        missing = [(key, text) for key, text in unique.items() if key not in vectors]
+        self._count(texts=len(texts), unique_texts=len(unique), cache_hits=len(unique) - len(missing))
+
+        if missing:
+            vectors.update(self._embed_missing(missing))
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """嵌入单个查询"""
+        return self.embed_documents([text])[0]
+
+    def with_dimensions(self, dimensions: int) -> 'BatchedEmbeddings':
+        """同一模型的另一输出维度（共享缓存，缓存键包含维度；统计单独计数）"""
+        if dimensions == self.dimensions:
+            return self
+        clone = copy.copy(self)
+        clone.dimensions = dimensions
+        clone._stats_lock = threading.Lock()
+        clone._stats = {name: 0.0 if isinstance(value, float) else 0 for name, value in self._stats.items()}
+        return clone
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['request_seconds'] = round(stats['request_seconds'], 3)
+        stats['cache_hit_rate'] = round(stats['cache_hits'] / stats['unique_texts'], 4) if stats['unique_texts'] else 0.0
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
+
+    def count_tokens(self, text: str) -> int:
+        """token 计数，切分子批次与文档分块（knowledge.chunking）共用；默认估算，子类可换成模型的分词器"""
+        return estimate_tokens(text)
+
+    def split_batches(self, items: List[Any], text_of=lambda item: item) -> List[List[Any]]:
+        """按条数和 token 数切分子批次；单条超过 token 上限时单独成批，由接口决定是否接受"""
+        batches, current, current_tokens = [], [], 0
+        for item in items:
+            tokens = self.count_tokens(text_of(item))
+            if current and (len(current) >= self.max_batch_size or current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_missing(self, missing: List[tuple]) -> Dict[str, List[float]]:
+        batches = self.split_batches(missing, text_of=lambda item: item[1])
+        if len(batches) == 1 or self.max_workers == 1:
+            outcomes = [self._embed_outcome(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches)),
+                                    thread_name_prefix='embedding') as pool:
+                outcomes = list(pool.map(self._embed_outcome, batches))
+
+        computed, errors = {}, []
+        for batch, (vectors, error) in zip(batches, outcomes):
+            if error is not None:
+                errors.append(error)
+                continue
+            for (key, _), vector in zip(batch, vectors):
+                computed[key] = vector
+        self._count(embedded=len(computed))
+        # 部分子批次失败时，成功的结果也写入缓存，重试时不必重新计算
+        if self.cache is not None:
+            # 缓存按 float32 保存，新计算的向量按同一精度返回，命中与未命中的结果完全一致（Qdrant 同样以 float32 存储）
+            computed = {key: _decode_vector(_encode_vector(vector)) for key, vector in computed.items()}
+            self.cache.set_many(computed)
+        if errors:
+            raise errors[0]
+        return computed
+
+    def _embed_outcome(self, batch: List[tuple]):
+        try:
+            return self._embed_with_retry(batch), None
+        except EmbeddingRequestError as e:
+            return None, e
+
+    def _embed_with_retry(self, batch: List[tuple]) -> List[List[float]]:
+        texts = [text for _, text in batch]
+        attempt = 0
+        while True:
+            self._count(requests=1)
+            started = time.monotonic()
+            try:
+                vectors = self._embed_batch(texts)
+                if len(vectors) != len(texts):
+                    raise EmbeddingRequestError(f"返回向量数 {len(vectors)} 与输入数 {len(texts)} 不一致")
+                return vectors
+            except EmbeddingRequestError as e:
+                error = e
+            finally:
+                self._count(request_seconds=time.monotonic() - started)
+
+            if error.retryable:
+                if attempt < self.max_retries:
+                    attempt += 1
+                    self._count(retries=1)
+                    delay = self.RETRY_BACKOFF * (2 ** (attempt - 1))
+                    logger.warning(f"Embedding 请求失败（{error}），{delay:.1f}s 后第 {attempt} 次重试")
+                    time.sleep(delay)
+                    continue
+            elif len(batch) > 1:
+                # 请求被拒绝时拆成两半分别请求，只让有问题的文本失败
+                self._count(splits=1)
+                middle = len(batch) // 2
+                logger.warning(f"Embedding 请求失败（{error}），拆分为 {middle} + {len(batch) - middle} 条重试")
+                return self._embed_with_retry(batch[:middle]) + self._embed_with_retry(batch[middle:])
+            self._count(failures=1)
+            raise error
+
+    def _count(self, **deltas) -> None:
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+
+class WrappedEmbeddings(BatchedEmbeddings):
+    """为其他 LangChain Embeddings（如 OpenAIEmbeddings）加上缓存与批处理"""
+
+    def __init__(self, inner: Embeddings, model: str, dimensions: Optional[int] = None, **kwargs):
+        super().__init__(model, dimensions, **kwargs)
+        self.inner = inner
+        self._encoding = None
+        self._encoding_loaded = False
+
+    def count_tokens(self, text: str) -> int:
+        """OpenAI 模型使用 tiktoken 的分词结果；其他模型（或 tiktoken 不可用）时估算"""
+        if not self._encoding_loaded:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.encoding_for_model(self.model)
+            except Exception:
+                self._encoding = None
+            self._encoding_loaded = True
+        if self._encoding is None:
+            return estimate_tokens(text)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def with_dimensions(self, dimensions: int) -> 'BatchedEmbeddings':
+        if dimensions == self.dimensions:
+            return self
+        if not hasattr(self.inner, 'dimensions'):
+            raise ValueError(f"{type(self.inner).__name__} 不支持指定输出维度")
+        clone = super().with_dimensions(dimensions)
+        clone.inner = self.inner.model_copy(update={'dimensions': dimensions})
+        return clone
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        try:
+            return self.inner.embed_documents(texts)
+        except Exception as e:
+            # 内部实现自带重试，这里不再原样重试
+            raise EmbeddingRequestError(f"{type(e).__name__}: {e}") from e
+
+
+class FakeEmbeddings(BatchedEmbeddings):
+    """
+    确定性的本地 Embedding：向量由文本哈希生成并归一化，相同文本总是得到相同向量
+
+    记录每次请求的批大小；可模拟厂商限制与故障：
+    - 超过 max_batch_size 的请求被拒绝
+    - transient_failures：前 N 次请求返回可重试错误
+    - reject_texts：包含这些文本的请求被拒绝（不可重试）
+    """
+
+    def __init__(self, model: str = 'fake-embedding', dimensions: int = 32,
+                 transient_failures: int = 0, reject_texts: Iterable[str] = (), **kwargs):
+        super().__init__(model, dimensions, **kwargs)
+        self.transient_failures = transient_failures
+        self.reject_texts = set(reject_texts)
+        self.batch_sizes: List[int] = []
+        self._calls_lock = threading.Lock()
+
+    def with_dimensions(self, dimensions: int) -> 'BatchedEmbeddings':
+        clone = super().with_dimensions(dimensions)
+        if clone is not self:
+            clone.batch_sizes = []
+            clone._calls_lock = threading.Lock()
+        return clone
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        with self._calls_lock:
+            self.batch_sizes.append(len(texts))
+            if self.transient_failures > 0:
+                self.transient_failures -= 1
+                raise EmbeddingRequestError("模拟限流", retryable=True)
+        if len(texts) > self.max_batch_size:
+            raise EmbeddingRequestError(f"批大小 {len(texts)} 超过上限 {self.max_batch_size}")
+        if self.reject_texts.intersection(texts):
+            raise EmbeddingRequestError("模拟输入被拒绝")
+        return [self.vector(text) for text in texts]
+
+    def vector(self, text: str) -> List[float]:
+        values = []
+        counter = 0
+        while len(values) < self.dimensions:
+            digest = hashlib.sha256(f"{counter}|{text}".encode('utf-8')).digest()
+            values.extend(byte / 127.5 - 1.0 for byte in digest)
+            counter += 1
+        values = values[:self.dimensions]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
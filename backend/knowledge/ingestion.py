@@ -0,0 +1,443 @@
+"""
+知识库批量导入
+
+store_knowledge 每次处理一个文档：逐条嵌入、写 Qdrant、创建 KnowledgeItem 并记录交互。导入上万篇文档时，
+HTTP 调用和数据库往返次数与文档数成正比。批量导入把整个语料作为一个任务：
+
+1. create_ingestion_job 把文档写入 JSONL 源文件并创建 KnowledgeIngestionJob，由 Celery 任务执行
+2. 按批读取文档，内容哈希与已导入的版本相同的文档直接跳过；内容变化的文档先删除旧分块
+3. 按标题、段落、表格与 token 数切分（见 knowledge.chunking，分块记录章节与页码），整批嵌入（子批次切分、并发与缓存见 embedding_service），再分批 upsert 到 Qdrant、bulk_create 条目
+4. 每批在一个事务内提交并推进游标（processed_documents），记录进度与吞吐量
+
+任务中断（worker 退出、Qdrant 不可用）后从游标处继续：Qdrant 点 ID 由集合、来源与分块序号确定，
+重复执行同一批只会覆盖相同的点。心跳超时的任务由定时任务重新入队。
+"""
+import hashlib
+import json
+import logging
+import time
+import uuid
+from datetime import timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from qdrant_client.models import FieldCondition, Filter, FilterSelector, MatchAny, PointStruct
+
+from .chunking import chunk_document, lineage_metadata
+from .interactions import record_interaction
+from .lexical import build_search_text
+from .models import KnowledgeCollection, KnowledgeIngestionJob, KnowledgeItem
+from .reembedding import mirror_delete, mirror_upsert
+from .retrieval_cache import invalidate_collections
+from .storage import build_payload, resolve_profile
+
+logger = logging.getLogger("django")
+
+DEFAULT_OPTIONS = {
+    'chunk_size': 512,          # 分块的 token 上限（按 Embedding 模型的分词计数）
+    'chunk_overlap': 64,        # 章节内相邻分块的重叠 token 数
+    'min_chunk_size': 64,       # 短于该 token 数的章节并入下一章节
+    'batch_documents': 200,     # 每批处理（并提交）的文档数
+    'upsert_batch_size': 256,   # 每次写入 Qdrant 的点数
+    'item_type': 'document',
+    'user_id': 'system',
+    'force': False,             # 为 True 时不跳过未变化的文档
+}
+# 失败文档的错误信息最多保留条数
+MAX_ERRORS = 100
+# Qdrant 点 ID 的命名空间（uuid5）
+POINT_NAMESPACE = uuid.UUID('6f1c3d2e-8a4b-4c7e-9d2f-1b5a7e3c9f40')
+
+
+def chunk_text(text: str, chunk_size: int = 512, chunk_overlap: int = 64) -> List[str]:
+    """按文档结构与 token 数切分文本，只返回分块正文（来源信息见 knowledge.chunking.chunk_document）"""
+    return [chunk['text'] for chunk in chunk_document(text, chunk_size, chunk_overlap)]
+
+
+def document_hash(content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """文档内容与元数据的哈希，用于判断文档是否变化"""
+    material = json.dumps([content, metadata or {}], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def point_id(qdrant_collection_name: str, source_identifier: str, chunk_index: int) -> str:
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{qdrant_collection_name}|{source_identifier}|{chunk_index}"))
+
+
+def create_ingestion_job(
+    documents: Iterable[Dict[str, Any]],
+    collection_name: str,
+    user_id: str = "system",
+    **options
+) -> KnowledgeIngestionJob:
+    """
+    创建批量导入任务（不执行）
+
+    Args:
+        documents: 文档列表，每个文档包含 content，可选 source_identifier（或 id）、metadata、item_type；
+            未提供来源标识时按行号生成，此时无法跨任务识别未变化的文档
+        collection_name: 集合名称，Qdrant 集合为 {collection_name}_{user_id}
+        options: 覆盖 DEFAULT_OPTIONS
+    """
+    qdrant_collection_name = f"{collection_name}_{user_id}"
+    collection, _ = KnowledgeCollection.objects.get_or_create(
+        name=collection_name,
+        defaults={
+            'description': f'Collection {collection_name}',
+            'qdrant_collection_name': qdrant_collection_name,
+        }
+    )
+    job = KnowledgeIngestionJob(
+        collection=collection,
+        qdrant_collection_name=qdrant_collection_name,
+        options={**DEFAULT_OPTIONS, **options, 'user_id': user_id},
+    )
+
+    source_dir = Path(getattr(settings, 'KNOWLEDGE_INGESTION_DIR', Path(settings.MEDIA_ROOT) / 'knowledge_ingestion'))
+    source_dir.mkdir(parents=True, exist_ok=True)
+    source_path = source_dir / f"{job.id}.jsonl"
+    total = 0
+    with open(source_path, 'w', encoding='utf-8') as f:
+        for document in documents:
+            f.write(json.dumps(document, ensure_ascii=False, default=str) + '\n')
+            total += 1
+
+    job.source_path = str(source_path)
+    job.total_documents = total
+    job.save()
+    logger.info(f"创建批量导入任务 {job.id}: {total} 个文档 -> {qdrant_collection_name}")
+    return job
+
+
+def enqueue_ingestion_job(job: KnowledgeIngestionJob) -> str:
+    """提交到 Celery 执行（新任务或继续中断的任务），返回 Celery 任务 ID"""
+    from .tasks import run_ingestion_task  # tasks 导入本模块，延迟导入避免循环
+
+    result = run_ingestion_task.delay(str(job.id))
+    KnowledgeIngestionJob.objects.filter(id=job.id).update(celery_task_id=result.id)
+    return result.id
+
+
+def stale_before():
+    """心跳早于该时间的执行中任务视为已中断"""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'KNOWLEDGE_INGESTION_STALE_SECONDS', 600))
+
+
+def claim_job(job_id) -> bool:
+    """认领任务：待执行、失败或心跳超时的任务才能被认领，避免两个 worker 同时执行同一任务"""
+    now = timezone.now()
+    claimable = (
+        Q(status__in=['pending', 'failed'])
+        | Q(status='running', heartbeat_at__isnull=True)
+        | Q(status='running', heartbeat_at__lt=stale_before())
+    )
+    claimed = KnowledgeIngestionJob.objects.filter(claimable, id=job_id).update(
+        status='running', heartbeat_at=now, error_message=None
+    )
+    if claimed:
+        KnowledgeIngestionJob.objects.filter(id=job_id, started_at__isnull=True).update(started_at=now)
+    return bool(claimed)
+
+
+def run_ingestion_job(job_id, service=None) -> KnowledgeIngestionJob:
+    """
+    执行（或继续）批量导入任务
+
+    Args:
+        service: KnowledgeService 实例，提供 Qdrant 客户端与 Embedding，默认新建
+    """
+    if not claim_job(job_id):
+        job = KnowledgeIngestionJob.objects.get(id=job_id)
+        logger.info(f"批量导入任务 {job_id} 当前状态为 {job.status}，跳过")
+        return job
+
+    job = KnowledgeIngestionJob.objects.get(id=job_id)
+    if service is None:
+        from .services import KnowledgeService
+        service = KnowledgeService()
+
+    try:
+        return IngestionRunner(job, service).run()
+    except Exception as e:
+        logger.error(f"批量导入任务 {job_id} 失败，已提交 {job.processed_documents} 个文档: {e}", exc_info=True)
+        KnowledgeIngestionJob.objects.filter(id=job_id).update(status='failed', error_message=str(e))
+        raise
+
+
+def serialize_job(job: KnowledgeIngestionJob) -> Dict[str, Any]:
+    return {
+        'job_id': str(job.id),
+        'collection': job.collection.name,
+        'qdrant_collection_name': job.qdrant_collection_name,
+        'status': job.status,
+        'progress': job.progress,
+        'total_documents': job.total_documents,
+        'processed_documents': job.processed_documents,
+        'skipped_documents': job.skipped_documents,
+        'failed_documents': job.failed_documents,
+        'total_chunks': job.total_chunks,
+        'stats': job.stats,
+        'errors': job.errors[:20],
+        'error_message': job.error_message,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class IngestionRunner:
+    """按批执行一个导入任务"""
+
+    def __init__(self, job: KnowledgeIngestionJob, service):
+        self.job = job
+        self.options = {**DEFAULT_OPTIONS, **(job.options or {})}
+        self.service = service
+        self.client = service.get_qdrant_client()
+        # 模型、维度与 payload 按集合的存储配置（见 knowledge.storage）；重新嵌入迁移切换后写入新集合
+        self.profile = resolve_profile(job.collection.storage_profile)
+        self.embeddings = service.embeddings_for(self.profile)
+        self.vector_collection = job.collection.vector_collection_for(job.qdrant_collection_name)
+        self.count_tokens = getattr(self.embeddings, 'count_tokens', None)
+        self._run_started = time.monotonic()
+        self._run_start_cursor = job.processed_documents
+        self._run_chunks = 0
+        self._timings = {'embed': 0.0, 'write': 0.0}
+
+    def run(self) -> KnowledgeIngestionJob:
+        job = self.job
+        logger.info(
+            f"开始批量导入 {job.id}: 从第 {job.processed_documents + 1} 个文档继续，共 {job.total_documents} 个"
+        )
+        self.service.get_or_create_collection(self.vector_collection, self.profile)
+
+        documents = self._iter_documents()
+        while True:
+            batch = list(islice(documents, self.options['batch_documents']))
+            if not batch:
+                break
+            self._process_batch(batch)
+
+        job.status = 'completed'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+        record_interaction(
+            collection=job.collection,
+            interaction_type='add_data',
+            request_payload={
+                'action': 'bulk_ingest',
+                'job_id': str(job.id),
+                'user_id': self.options['user_id'],
+                'total_documents': job.total_documents,
+            },
+            response_payload={
+                'processed_documents': job.processed_documents,
+                'skipped_documents': job.skipped_documents,
+                'failed_documents': job.failed_documents,
+                'total_chunks': job.total_chunks,
+            },
+            duration_ms=int((job.finished_at - job.started_at).total_seconds() * 1000) if job.started_at else None,
+        )
+        logger.info(f"批量导入完成 {job.id}: {job.stats}")
+        return job
+
+    def _iter_documents(self) -> Iterator[Tuple[int, Any]]:
+        """从游标处读取源文件，返回 (行号, 文档)；无法解析的行返回错误信息"""
+        with open(self.job.source_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f):
+                if line_no < self.job.processed_documents:
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, e
+
+    def _process_batch(self, batch: List[Tuple[int, Any]]) -> None:
+        job = self.job
+        errors = []
+        skipped = 0
+
+        # 1. 校验并计算哈希；同一批内来源重复时以最后一个为准
+        prepared: Dict[str, Dict[str, Any]] = {}
+        for line_no, document in batch:
+            if isinstance(document, Exception):
+                errors.append({'line': line_no, 'error': f"无法解析: {document}"})
+                continue
+            if not isinstance(document, dict) or not str(document.get('content') or '').strip():
+                errors.append({'line': line_no, 'error': "content is required"})
+                continue
+            source = str(document.get('source_identifier') or document.get('id') or f"{job.id}:{line_no}")
+            metadata = document.get('metadata') or {}
+            if source in prepared:
+                skipped += 1
+            prepared[source] = {
+                'line': line_no,
+                'source': source,
+                'content': document['content'],
+                'metadata': metadata,
+                'item_type': document.get('item_type') or self.options['item_type'],
+                'hash': document_hash(document['content'], metadata),
+            }
+
+        # 2. 跳过未变化的文档，变化的文档记录下来以删除旧分块
+        existing: Dict[str, set] = {}
+        ingested_items = KnowledgeItem.objects.filter(
+            collection=job.collection, source_identifier__in=list(prepared), metadata__has_key='chunk_index'
+        )
+        for source, data_hash in ingested_items.values_list('source_identifier', 'data_hash').distinct():
+            existing.setdefault(source, set()).add(data_hash)
+        if not self.options['force']:
+            for source in [s for s, doc in prepared.items() if doc['hash'] in existing.get(s, ())]:
+                del prepared[source]
+                skipped += 1
+        stale_sources = [source for source in prepared if source in existing]
+
+        # 3. 切分并整批嵌入
+        chunks = []
+        for doc in prepared.values():
+            pieces = chunk_document(
+                doc['content'],
+                self.options['chunk_size'],
+                self.options['chunk_overlap'],
+                self.options['min_chunk_size'],
+                self.count_tokens,
+            )
+            for piece in pieces:
+                chunks.append((doc, piece['index'], len(pieces), piece))
+        started = time.monotonic()
+        vectors = self._embed_chunks(chunks, errors)
+        self._timings['embed'] += time.monotonic() - started
+        chunks = [chunk for chunk in chunks if (chunk[0]['source'], chunk[1]) in vectors]
+
+        # 4. 在一个事务内替换旧分块、写入条目与向量并推进游标
+        started = time.monotonic()
+        with transaction.atomic():
+            if stale_sources:
+                ingested_items.filter(source_identifier__in=stale_sources).delete()
+                stale_selector = FilterSelector(filter=Filter(must=[
+                    FieldCondition(key='metadata.source_identifier', match=MatchAny(any=stale_sources))
+                ]))
+                self.client.delete(
+                    collection_name=self.vector_collection,
+                    points_selector=stale_selector,
+                    wait=True,
+                )
+                mirror_delete(self.service, job.collection, self.vector_collection, stale_selector)
+
+            items = KnowledgeItem.objects.bulk_create([
+                KnowledgeItem(
+                    collection=job.collection,
+                    content=chunk['text'],
+                    search_text=build_search_text(chunk['text']),
+                    item_type=doc['item_type'],
+                    source_identifier=doc['source'],
+                    data_hash=doc['hash'],
+                    metadata={
+                        **doc['metadata'],
+                        'chunk_index': index,
+                        'chunk_count': count,
+                        **lineage_metadata(chunk),
+                        'vector_id': point_id(job.qdrant_collection_name, doc['source'], index),
+                        'ingestion_job_id': str(job.id),
+                    },
+                    status='active',
+                )
+                for doc, index, count, chunk in chunks
+            ], batch_size=500)
+
+            points = [
+                PointStruct(
+                    id=item.metadata['vector_id'],
+                    vector=vectors[(doc['source'], index)],
+                    payload=build_payload(chunk['text'], {
+                        **doc['metadata'],
+                        'item_id': str(item.id),
+                        'user_id': self.options['user_id'],
+                        'source': 'bulk_ingestion',
+                        'source_identifier': doc['source'],
+                        'chunk_index': index,
+                        'chunk_count': count,
+                        **lineage_metadata(chunk),
+                        'data_hash': doc['hash'],
+                    }, self.profile),
+                )
+                for item, (doc, index, count, chunk) in zip(items, chunks)
+            ]
+            upsert_batch_size = self.options['upsert_batch_size']
+            for start in range(0, len(points), upsert_batch_size):
+                self.client.upsert(
+                    collection_name=self.vector_collection,
+                    points=points[start:start + upsert_batch_size],
+                    wait=True,
+                )
+            if points:
+                # 重新嵌入迁移进行中时双写（按目标集合的配置重新嵌入）
+                mirror_upsert(
+                    self.service, job.collection, self.vector_collection,
+                    [point.id for point in points],
+                    [chunk['text'] for _, _, _, chunk in chunks],
+                    [point.payload['metadata'] for point in points],
+                )
+
+            job.processed_documents = batch[-1][0] + 1
+            job.skipped_documents += skipped
+            job.failed_documents += len(errors)
+            job.total_chunks += len(chunks)
+            job.errors = (job.errors + errors)[:MAX_ERRORS]
+            self._run_chunks += len(chunks)
+            job.heartbeat_at = timezone.now()
+            self._timings['write'] += time.monotonic() - started
+            job.stats = self._stats()
+            job.save(update_fields=[
+                'processed_documents', 'skipped_documents', 'failed_documents', 'total_chunks',
+                'errors', 'heartbeat_at', 'stats', 'updated_at',
+            ])
+
+        if chunks or stale_sources:
+            invalidate_collections(job.qdrant_collection_name)
+        logger.info(
+            f"批量导入 {job.id}: {job.processed_documents}/{job.total_documents} "
+            f"（本批写入 {len(chunks)} 个分块，跳过 {skipped}，失败 {len(errors)}）"
+        )
+
+    def _embed_chunks(self, chunks: List[tuple], errors: List[Dict[str, Any]]) -> Dict[Tuple[str, int], List[float]]:
+        """整批嵌入；失败时逐文档重试，只丢弃失败的文档（已成功的子批次由缓存复用）"""
+        if not chunks:
+            return {}
+        try:
+            vectors = self.embeddings.embed_documents([chunk['text'] for _, _, _, chunk in chunks])
+            return {(doc['source'], index): vector for (doc, index, _, _), vector in zip(chunks, vectors)}
+        except Exception as e:
+            logger.warning(f"整批嵌入失败，逐文档重试: {e}")
+
+        by_document: Dict[str, List[tuple]] = {}
+        for chunk in chunks:
+            by_document.setdefault(chunk[0]['source'], []).append(chunk)
+        vectors = {}
+        for source, document_chunks in by_document.items():
+            try:
+                embedded = self.embeddings.embed_documents([chunk['text'] for _, _, _, chunk in document_chunks])
+            except Exception as e:
+                errors.append({'line': document_chunks[0][0]['line'], 'source': source, 'error': f"嵌入失败: {e}"})
+                continue
+            for (_, index, _, _), vector in zip(document_chunks, embedded):
+                vectors[(source, index)] = vector
+        return vectors
+
+    def _stats(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self._run_started
+        documents = self.job.processed_documents - self._run_start_cursor
+        stats = {
+            'elapsed_seconds': round(elapsed, 2),
+            'documents_per_second': round(documents / elapsed, 2) if elapsed else 0.0,
+            'chunks_per_second': round(self._run_chunks / elapsed, 2) if elapsed else 0.0,
+            'embed_seconds': round(self._timings['embed'], 2),
+            'write_seconds': round(self._timings['write'], 2),
+        }
+        if hasattr(self.embeddings, 'stats'):
+            stats['embedding'] = self.embeddings.stats()
+        return stats
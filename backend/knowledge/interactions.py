@@ -0,0 +1,327 @@
+"""
+知识库交互记录的缓冲写入与小时/天汇总
+
+store_knowledge、retrieve_knowledge 等调用原来在请求路径上同步 INSERT 一条 KnowledgeInteraction，
+看板统计则要扫描整张交互表。这里改为：
+
+1. record_interaction 只把事件追加到进程内缓冲区（微秒级），由后台线程按条数或间隔批量 bulk_create
+2. 同一批事件在同一事务内增量累加到 KnowledgeInteractionRollup（每个集合、交互类型的小时与天汇总）：
+   次数、命中率、错误数、耗时直方图（用于分位数）与高频查询
+3. 进程退出时写出剩余事件；Celery prefork 子进程不继承父进程的缓冲与后台线程
+
+缓冲区满（max_pending）时丢弃新事件并计数，写库失败的批次记录错误日志后丢弃，交互记录只用于分析，
+不影响业务请求。KNOWLEDGE_INTERACTION_LOG=sync 时每条事件立即写入（与原来的行为一致）。
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from itertools import zip_longest
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import KnowledgeCollection, KnowledgeInteraction, KnowledgeInteractionRollup
+from .retrieval_cache import normalize_query
+
+logger = logging.getLogger("django")
+
+# 计算命中率的检索类交互
+SEARCH_TYPES = ('search_query', 'search_data')
+# 事件可包含的 KnowledgeInteraction 字段
+EVENT_FIELDS = (
+    'collection_id', 'user_id', 'interaction_type', 'request_payload', 'response_payload',
+    'llm_prompt_data', 'duration_ms', 'status_code', 'error_message', 'timestamp',
+)
+# 记入高频查询的最大长度
+MAX_QUERY_LENGTH = 200
+
+
+def bucket_start(timestamp, period: str):
+    """按 TIME_ZONE 切分的小时/天起点"""
+    local = timezone.localtime(timestamp)
+    if period == 'day':
+        return local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+def _empty_delta() -> Dict[str, Any]:
+    return {
+        'event_count': 0, 'hit_count': 0, 'error_count': 0, 'duration_count': 0, 'duration_total_ms': 0,
+        'latency_histogram': [0] * (len(KnowledgeInteractionRollup.LATENCY_BUCKETS_MS) + 1),
+        'top_queries': Counter(),
+    }
+
+
+def aggregate_events(events: Iterable[Dict[str, Any]]) -> Dict[Tuple, Dict[str, Any]]:
+    """把事件聚合为 {(collection_id, period, bucket_start, interaction_type): 增量}，没有集合的事件不汇总"""
+    deltas: Dict[Tuple, Dict[str, Any]] = defaultdict(_empty_delta)
+    for event in events:
+        if not event.get('collection_id'):
+            continue
+        request = event.get('request_payload') or {}
+        response = event.get('response_payload') or {}
+        query = request.get('query') if isinstance(request, dict) else None
+        duration = event.get('duration_ms')
+        is_error = bool(event.get('error_message')) or (event.get('status_code') or 0) >= 400
+
+        for period in ('hour', 'day'):
+            key = (event['collection_id'], period, bucket_start(event['timestamp'], period), event['interaction_type'])
+            delta = deltas[key]
+            delta['event_count'] += 1
+            if is_error:
+                delta['error_count'] += 1
+            if event['interaction_type'] in SEARCH_TYPES and isinstance(response, dict) \
+                    and (response.get('results_count') or 0) > 0:
+                delta['hit_count'] += 1
+            if duration is not None:
+                delta['duration_count'] += 1
+                delta['duration_total_ms'] += int(duration)
+                delta['latency_histogram'][KnowledgeInteractionRollup.latency_bucket(duration)] += 1
+            if query:
+                delta['top_queries'][normalize_query(str(query))[:MAX_QUERY_LENGTH]] += 1
+    return deltas
+
+
+def merge_rollup(rollup: KnowledgeInteractionRollup, delta: Dict[str, Any]) -> None:
+    for field in ('event_count', 'hit_count', 'error_count', 'duration_count', 'duration_total_ms'):
+        setattr(rollup, field, getattr(rollup, field) + delta[field])
+    rollup.latency_histogram = [
+        old + new for old, new in zip_longest(rollup.latency_histogram or [], delta['latency_histogram'], fillvalue=0)
+    ]
+    # 只保留前 TOP_QUERIES 个，被挤出的查询之后重新计数，结果是近似值
+    queries = Counter(rollup.top_queries or {})
+    queries.update(delta['top_queries'])
+    rollup.top_queries = dict(queries.most_common(KnowledgeInteractionRollup.TOP_QUERIES))
+
+
+def update_rollups(events: Iterable[Dict[str, Any]]) -> int:
+    """把一批事件累加到汇总表（需在事务内调用），返回更新的汇总行数"""
+    deltas = aggregate_events(events)
+    for (collection_id, period, start, interaction_type), delta in sorted(deltas.items(), key=lambda item: str(item[0])):
+        # 多个进程同时写出时按固定顺序加行锁，避免死锁
+        rollup, _ = KnowledgeInteractionRollup.objects.select_for_update().get_or_create(
+            collection_id=collection_id,
+            period=period,
+            bucket_start=start,
+            interaction_type=interaction_type,
+        )
+        merge_rollup(rollup, delta)
+        rollup.save()
+    return len(deltas)
+
+
+class InteractionBuffer:
+    """进程内交互事件缓冲区"""
+
+    def __init__(self, flush_size: int = 200, flush_interval: float = 5.0, max_pending: int = 10000,
+                 background: bool = True):
+        """
+        Args:
+            flush_size: 缓冲达到该条数时写出（background=False 时在 record 中同步写出）
+            flush_interval: 后台线程的写出间隔（秒）
+            max_pending: 缓冲区上限，超过后丢弃新事件
+            background: 是否由后台线程写出；为 False 时只在达到 flush_size 或显式 flush() 时写出
+        """
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.background = background
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._events: List[Dict[str, Any]] = []
+        self._worker: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._stats = {'recorded': 0, 'dropped': 0, 'flushed': 0, 'failed': 0, 'flushes': 0}
+
+    def record(self, **fields) -> None:
+        """追加一条交互事件，字段同 KnowledgeInteraction（外键使用 collection/collection_id、user/user_id）"""
+        if 'collection' in fields:
+            collection = fields.pop('collection')
+            fields['collection_id'] = collection.pk if collection is not None else None
+        if 'user' in fields:
+            user = fields.pop('user')
+            fields['user_id'] = user.pk if user is not None else None
+        unknown = set(fields) - set(EVENT_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的交互字段: {sorted(unknown)}")
+        fields.setdefault('timestamp', timezone.now())
+
+        with self._lock:
+            if os.getpid() != self._pid:
+                # fork 后的子进程：父进程的事件由父进程写出
+                self._events, self._worker, self._pid = [], None, os.getpid()
+            if len(self._events) >= self.max_pending:
+                self._stats['dropped'] += 1
+                return
+            self._events.append(fields)
+            self._stats['recorded'] += 1
+            pending = len(self._events)
+
+        if self.background:
+            self._ensure_worker()
+            if pending >= self.flush_size:
+                self._wakeup.set()
+        elif pending >= self.flush_size:
+            self.flush()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='knowledge-interaction-log', daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self) -> int:
+        """写出缓冲区中的全部事件并更新汇总，返回写入条数"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+            if not events:
+                return 0
+            try:
+                self._write(events)
+            except Exception as e:
+                with self._lock:
+                    self._stats['failed'] += len(events)
+                logger.error(f"写入 {len(events)} 条知识库交互记录失败: {e}", exc_info=True)
+                return 0
+            with self._lock:
+                self._stats['flushed'] += len(events)
+                self._stats['flushes'] += 1
+            return len(events)
+
+    def _write(self, events: List[Dict[str, Any]]) -> None:
+        # 事件记录后集合可能已被删除，这类事件不关联集合，也不计入汇总
+        collection_ids = {event['collection_id'] for event in events if event.get('collection_id')}
+        existing = set(KnowledgeCollection.objects.filter(id__in=collection_ids).values_list('id', flat=True))
+        for event in events:
+            if event.get('collection_id') not in existing:
+                event['collection_id'] = None
+
+        with transaction.atomic():
+            KnowledgeInteraction.objects.bulk_create([KnowledgeInteraction(**event) for event in events], batch_size=500)
+            update_rollups(events)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._events)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._events)
+        return stats
+
+
+_interaction_buffer: Optional[InteractionBuffer] = None
+_interaction_buffer_lock = threading.Lock()
+
+
+def get_interaction_buffer() -> InteractionBuffer:
+    """按 settings 创建进程内共享的缓冲区"""
+    global _interaction_buffer
+    if _interaction_buffer is None:
+        with _interaction_buffer_lock:
+            if _interaction_buffer is None:
+                if getattr(settings, 'KNOWLEDGE_INTERACTION_LOG', 'buffered') == 'sync':
+                    buffer = InteractionBuffer(flush_size=1, background=False)
+                else:
+                    buffer = InteractionBuffer(
+                        flush_size=getattr(settings, 'KNOWLEDGE_INTERACTION_FLUSH_SIZE', 200),
+                        flush_interval=getattr(settings, 'KNOWLEDGE_INTERACTION_FLUSH_INTERVAL', 5),
+                        max_pending=getattr(settings, 'KNOWLEDGE_INTERACTION_MAX_PENDING', 10000),
+                    )
+                    atexit.register(buffer.flush)
+                _interaction_buffer = buffer
+    return _interaction_buffer
+
+
+def set_interaction_buffer(buffer: Optional[InteractionBuffer]) -> Optional[InteractionBuffer]:
+    """替换进程内的缓冲区（None 表示下次取用时按 settings 重新创建），返回原实例"""
+    global _interaction_buffer
+    with _interaction_buffer_lock:
+        previous = _interaction_buffer
+        _interaction_buffer = buffer
+    return previous
+
+
+def record_interaction(**fields) -> None:
+    """
+    记录一条知识库交互（不抛出异常）
+
+    在事务内调用时，事务提交后才进入缓冲区，回滚则不记录（与原来在事务内 create 的行为一致）。
+    """
+    fields.setdefault('timestamp', timezone.now())
+
+    def record():
+        try:
+            get_interaction_buffer().record(**fields)
+        except Exception as e:
+            logger.warning(f"记录交互失败: {str(e)}")
+
+    try:
+        transaction.on_commit(record)
+    except Exception as e:
+        logger.warning(f"记录交互失败: {str(e)}")
+
+
+def record_interaction_log(interaction: KnowledgeInteraction) -> None:
+    """
+    记录一条未保存的 KnowledgeInteraction 实例（视图先构造实例、再逐步填充字段的写法），
+    与 record_interaction 一样经缓冲区写出并计入汇总，不直接 save()
+    """
+    record_interaction(**{field: getattr(interaction, field) for field in EVENT_FIELDS})
+
+
+def summarize_rollups(rollups: Iterable[KnowledgeInteractionRollup]) -> Dict[str, Any]:
+    """合并多个时间段的汇总（同一交互类型），用于看板的区间统计"""
+    total = KnowledgeInteractionRollup()
+    delta = _empty_delta()
+    for rollup in rollups:
+        for field in ('event_count', 'hit_count', 'error_count', 'duration_count', 'duration_total_ms'):
+            delta[field] += getattr(rollup, field)
+        delta['latency_histogram'] = [
+            a + b for a, b in zip_longest(delta['latency_histogram'], rollup.latency_histogram or [], fillvalue=0)
+        ]
+        delta['top_queries'].update(rollup.top_queries or {})
+    merge_rollup(total, delta)
+    return serialize_rollup(total, include_bucket=False)
+
+
+def serialize_rollup(rollup: KnowledgeInteractionRollup, include_bucket: bool = True) -> Dict[str, Any]:
+    data = {
+        'event_count': rollup.event_count,
+        'hit_count': rollup.hit_count,
+        'hit_rate': rollup.hit_rate,
+        'error_count': rollup.error_count,
+        'avg_ms': rollup.average_ms,
+        'p50_ms': rollup.percentile(0.5),
+        'p95_ms': rollup.percentile(0.95),
+        'p99_ms': rollup.percentile(0.99),
+        'top_queries': sorted(
+            ({'query': query, 'count': count} for query, count in (rollup.top_queries or {}).items()),
+            key=lambda entry: -entry['count']
+        )[:10],
+    }
+    if include_bucket:
+        data.update({
+            'bucket_start': rollup.bucket_start.isoformat(),
+            'period': rollup.period,
+            'interaction_type': rollup.interaction_type,
+        })
+    return data
@@ -0,0 +1,150 @@
+"""
+知识库词法检索与结果融合
+
+原来的数据库检索是 content__icontains，对整张表顺序扫描，且命中结果只能给固定分数。这里改为：
+
+1. 分词：英文与数字按词切分并转小写，中日韩文字按相邻两字切分（bigram），不依赖分词词典
+2. 索引：分词结果保存在 KnowledgeItem.search_text，PostgreSQL 上以 to_tsvector('simple', search_text)
+   建 GIN 索引（见迁移 0003），按 ts_rank_cd 排序；其他数据库（本地开发）在集合内按 BM25 计算
+3. 融合：向量检索与词法检索的排名按倒数排名融合（RRF），以条目 ID 去重
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from django.db import connection
+
+# 写入 search_text 的最大字符数，避免超长文档超过 tsvector 的大小限制
+MAX_INDEXED_CHARS = 50000
+# 查询最多使用的词项数
+MAX_QUERY_TERMS = 64
+# RRF 平滑常数，取常用值 60
+RRF_K = 60
+
+_TOKEN_RE = re.compile(
+    r'[0-9a-z\u00c0-\u024f]+'  # 拉丁字母与数字
+    r'|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+'  # 汉字
+    r'|[\u3040-\u30ff]+'  # 日文假名
+    r'|[\uac00-\ud7af]+'  # 韩文
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """切分为检索词项：拉丁字母与数字按词，中日韩文字按相邻两字"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or '').lower()):
+        if run[0] <= '\u024f' or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def build_search_text(content: str) -> str:
+    """生成 KnowledgeItem.search_text"""
+    return ' '.join(tokenize((content or '')[:MAX_INDEXED_CHARS]))
+
+
+def query_terms(query: str) -> List[str]:
+    """查询词项（去重并保持顺序）"""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def lexical_search(collection_id: int, query: str, limit: int) -> List[Tuple[int, float]]:
+    """在集合内做词法检索，返回按相关度降序的 (条目ID, 分数)"""
+    terms = query_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == 'postgresql':
+        return _postgres_search(collection_id, terms, limit)
+
+    from .models import KnowledgeItem
+
+    rows = KnowledgeItem.objects.filter(collection_id=collection_id, status='active').values_list('id', 'search_text')
+    return BM25Index(rows).search(terms, limit)
+
+
+def _postgres_search(collection_id: int, terms: List[str], limit: int) -> List[Tuple[int, float]]:
+    from .models import KnowledgeItem
+
+    # 表达式须与 GIN 索引一致：to_tsvector('simple', search_text)
+    tsquery = ' | '.join("'{}'".format(term.replace("'", '')) for term in terms)
+    sql = f"""
+        SELECT id, ts_rank_cd(to_tsvector('simple', search_text), query) AS score
+        FROM {KnowledgeItem._meta.db_table}, to_tsquery('simple', %s) AS query
+        WHERE collection_id = %s AND status = 'active'
+          AND to_tsvector('simple', search_text) @@ query
+        ORDER BY score DESC, id DESC
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tsquery, collection_id, limit])
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+class BM25Index:
+    """内存 BM25 索引，用于没有全文索引的数据库与基准测试"""
+
+    def __init__(self, rows: Iterable[Tuple[int, str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[Tuple[int, Counter, int]] = []
+        self.document_frequency: Counter = Counter()
+        for item_id, search_text in rows:
+            terms = (search_text or '').split()
+            frequencies = Counter(terms)
+            self.documents.append((item_id, frequencies, len(terms)))
+            self.document_frequency.update(frequencies.keys())
+        total_length = sum(length for _, _, length in self.documents)
+        self.average_length = total_length / len(self.documents) if self.documents else 0.0
+
+    def search(self, terms: Sequence[str], limit: int) -> List[Tuple[int, float]]:
+        count = len(self.documents)
+        idf = {
+            term: math.log(1 + (count - self.document_frequency[term] + 0.5) / (self.document_frequency[term] + 0.5))
+            for term in set(terms) if self.document_frequency[term]
+        }
+        if not idf:
+            return []
+        scored = []
+        for item_id, frequencies, length in self.documents:
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            for term, weight in idf.items():
+                tf = frequencies.get(term)
+                if tf:
+                    score += weight * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((item_id, score))
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored[:limit]
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, Sequence[Hashable]],
+    k: int = RRF_K,
+    weights: Optional[Dict[str, float]] = None
+) -> List[Tuple[Hashable, float, List[str]]]:
+    """
+    倒数排名融合：score = Σ weight / (k + rank)
+
+    Args:
+        rankings: {检索方式: 按相关度降序的结果键}，同一键在一个排名中重复出现时取第一次
+    Returns:
+        按融合分数降序的 (结果键, 分数, 命中的检索方式)；分数相同时保持首次出现的顺序
+    """
+    scores: Dict[Hashable, float] = {}
+    matched: Dict[Hashable, List[str]] = {}
+    for name, keys in rankings.items():
+        weight = (weights or {}).get(name, 1.0)
+        seen = set()
+        for rank, key in enumerate(keys, 1):
+            if key in seen:
+                continue
+            seen.add(key)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+            matched.setdefault(key, []).append(name)
+    order = {key: index for index, key in enumerate(scores)}
+    fused = sorted(scores, key=lambda key: (-scores[key], order[key]))
+    return [(key, scores[key], matched[key]) for key in fused]
@@ -0,0 +1,116 @@
+"""
+文档分块基准测试
+
+对大体量 Markdown（合成的 PDF/MinerU 风格文档：多级标题、段落、Markdown/HTML 表格、代码块、分页标记，
+或 --file 指定的文件）测量 knowledge.chunking 的吞吐量（MB/s、分块/s），
+并统计分块 token 数的分布、超过上限的分块数与重叠带来的额外 token 比例。
+
+token 计数默认使用 KNOWLEDGE_EMBEDDING_TOKENIZER 指定的分词器（与阿里云嵌入模型的分块和子批次切分一致，
+未配置 Qwen tokenizer.json 时为估算）；
+--tokenizer estimate 使用估算，--tokenizer tiktoken 使用 tiktoken 的 cl100k_base。
+
+用法:
+    python manage.py benchmark_chunking --pages 2000 --chunk-size 512
+    python manage.py benchmark_chunking --file /path/to/mineru_output.md --repeat 5
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from knowledge.chunking import chunk_document, parse_blocks
+from knowledge.embedding_service import estimate_tokens, load_token_counter
+from knowledge.management.commands.benchmark_retrieval import CHAR_POOL, percentile
+
+
+class Command(BaseCommand):
+    help = '文档分块基准测试（吞吐量与分块大小分布）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Markdown 文件（默认使用合成文档）')
+        parser.add_argument('--pages', type=int, default=1000, help='合成文档的页数')
+        parser.add_argument('--chunk-size', type=int, default=512, help='分块 token 上限')
+        parser.add_argument('--chunk-overlap', type=int, default=64, help='重叠 token 数')
+        parser.add_argument('--min-chunk-size', type=int, default=64, help='章节合并阈值')
+        parser.add_argument('--tokenizer', choices=['embedding', 'estimate', 'tiktoken'], default='embedding', help='token 计数方式')
+        parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最快一次）')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子')
+
+    def handle(self, *args, **options):
+        if options['file']:
+            with open(options['file'], 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            text = self._synthesize(options['pages'], random.Random(options['seed']))
+        count_tokens = self._tokenizer(options['tokenizer'])
+
+        size_mb = len(text.encode('utf-8')) / 1048576
+        started = time.perf_counter()
+        blocks = parse_blocks(text)
+        parse_seconds = time.perf_counter() - started
+        self.stdout.write(f"文档: {size_mb:.2f} MB，{len(text)} 字符，{len(blocks)} 个块（解析 {parse_seconds:.2f}s）")
+
+        timings = []
+        for _ in range(max(1, options['repeat'])):
+            started = time.perf_counter()
+            chunks = chunk_document(
+                text, options['chunk_size'], options['chunk_overlap'], options['min_chunk_size'], count_tokens
+            )
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+
+        tokens = [chunk['token_count'] for chunk in chunks]
+        source_tokens = sum(count_tokens(block['text']) for block in blocks)
+        oversized = sum(1 for count in tokens if count > options['chunk_size'])
+        with_pages = sum(1 for chunk in chunks if chunk['page_start'] is not None)
+        self.stdout.write(
+            f"分块: {len(chunks)} 个，耗时 {best:.2f}s（{size_mb / best:.2f} MB/s，{len(chunks) / best:.0f} 分块/s）"
+        )
+        self.stdout.write(
+            f"token: 平均 {sum(tokens) / len(tokens):.0f}，p50 {percentile(tokens, 0.5)}，p95 {percentile(tokens, 0.95)}，"
+            f"最大 {max(tokens)}，超过上限 {oversized} 个"
+        )
+        self.stdout.write(
+            f"总 token: 原文 {source_tokens}，分块 {sum(tokens)}（重叠与分隔增加 "
+            f"{(sum(tokens) - source_tokens) / source_tokens * 100 if source_tokens else 0:.1f}%）；"
+            f"带页码的分块 {with_pages}/{len(chunks)}"
+        )
+
+    def _tokenizer(self, name):
+        if name == 'estimate':
+            return estimate_tokens
+        if name == 'embedding':
+            return load_token_counter(getattr(settings, 'KNOWLEDGE_EMBEDDING_TOKENIZER', 'estimate')) or estimate_tokens
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            raise CommandError(f"tiktoken 不可用: {e}")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+    def _synthesize(self, pages, rng):
+        """合成 PDF 解析风格的 Markdown：每页若干章节，混合段落、表格与代码块"""
+
+        def sentence():
+            return ''.join(rng.choice(CHAR_POOL) for _ in range(rng.randint(12, 40))) + rng.choice('。。。！？；')
+
+        parts = ['# 合成手册']
+        for page in range(1, pages + 1):
+            if page > 1:
+                parts.append(f"<!-- PAGE_BREAK_{page} -->")
+            parts.append(f"## 第 {page} 页")
+            for section in range(rng.randint(1, 3)):
+                parts.append(f"### 章节 {page}.{section + 1}")
+                for _ in range(rng.randint(1, 4)):
+                    parts.append(''.join(sentence() for _ in range(rng.randint(2, 30))))
+                kind = rng.random()
+                if kind < 0.15:
+                    rows = [f"| {sentence()} | {rng.randint(1, 9999)} | {sentence()} |" for _ in range(rng.randint(3, 60))]
+                    parts.append('\n'.join(['| 项目 | 数值 | 说明 |', '| --- | --- | --- |'] + rows))
+                elif kind < 0.2:
+                    cells = ''.join(f"<tr><td>{sentence()}</td><td>{rng.randint(1, 99)}</td></tr>" for _ in range(rng.randint(2, 20)))
+                    parts.append(f"<table>{cells}</table>")
+                elif kind < 0.25:
+                    parts.append("```python\n" + '\n'.join(f"value_{i} = {i}" for i in range(rng.randint(3, 30))) + "\n```")
+        return '\n\n'.join(parts)
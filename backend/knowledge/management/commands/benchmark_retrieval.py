@@ -0,0 +1,190 @@
+"""
+知识库检索基准测试
+
+生成合成语料（按 Zipf 分布抽取的中文词汇），对比以下检索方式的召回率与延迟：
+- icontains: 原来的 content__icontains 数据库检索
+- lexical: 全文索引检索（PostgreSQL GIN，其他数据库为 BM25）
+- hybrid: KnowledgeService.retrieve_knowledge（--with-vectors，Qdrant 本地内存模式 + FakeEmbeddings，
+  向量结果与语义无关，只用于衡量各阶段耗时与融合开销）
+
+查询分两类：phrase 是目标文档中的连续片段，keywords 是目标文档中三个较少见的词（乱序）。
+每个查询只有一个相关文档（目标文档），统计 recall@k、MRR 与 p50/p95 延迟。
+
+用法:
+    python manage.py benchmark_retrieval --documents 20000 --queries 200
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from knowledge.lexical import build_search_text, lexical_search
+from knowledge.models import KnowledgeCollection, KnowledgeInteraction, KnowledgeItem
+
+# 常用汉字，用于拼出合成词汇
+CHAR_POOL = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定"
+    "行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些"
+    "然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公"
+)
+COLLECTION_NAME = 'benchmark_retrieval'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+
+class Command(BaseCommand):
+    help = '知识库检索基准测试（合成语料）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=20000, help='合成文档数')
+        parser.add_argument('--queries', type=int, default=200, help='每类查询数')
+        parser.add_argument('--top-k', type=int, default=10, help='返回结果数')
+        parser.add_argument('--vocabulary', type=int, default=5000, help='词汇量')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子')
+        parser.add_argument('--with-vectors', action='store_true', help='同时测试混合检索（写入本地内存 Qdrant）')
+        parser.add_argument('--keep', action='store_true', help='保留合成数据')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = [
+            ''.join(rng.choice(CHAR_POOL) for _ in range(rng.choice((2, 2, 3))))
+            for _ in range(options['vocabulary'])
+        ]
+        weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+        rarity = {word: rank for rank, word in enumerate(vocabulary)}
+
+        KnowledgeCollection.objects.filter(name=COLLECTION_NAME).delete()
+        collection = KnowledgeCollection.objects.create(
+            name=COLLECTION_NAME,
+            description='检索基准测试的合成语料',
+            qdrant_collection_name=f"{COLLECTION_NAME}_system",
+        )
+        try:
+            documents = self._build_corpus(rng, vocabulary, weights, options['documents'])
+            started = time.perf_counter()
+            items = self._store(collection, documents)
+            self.stdout.write(f"写入 {len(items)} 个文档: {time.perf_counter() - started:.1f}s")
+
+            queries = self._build_queries(rng, items, documents, rarity, options['queries'])
+            top_k = options['top_k']
+            methods = {
+                'icontains': lambda query: list(
+                    KnowledgeItem.objects.filter(collection=collection, content__icontains=query)
+                    .values_list('id', flat=True)[:top_k]
+                ),
+                'lexical': lambda query: [item_id for item_id, _ in lexical_search(collection.id, query, top_k)],
+            }
+            if options['with_vectors']:
+                methods['hybrid'] = self._hybrid_method(collection, top_k)
+
+            self.stdout.write(f"{'method':<10} {'queries':<9} {'recall@k':>9} {'mrr':>7} {'p50_ms':>8} {'p95_ms':>8}")
+            for kind, kind_queries in queries.items():
+                for name, search in methods.items():
+                    self._report(name, kind, kind_queries, search)
+            if options['with_vectors']:
+                self.stdout.write(f"混合检索各阶段平均耗时: {self._average_timings()}")
+        finally:
+            if not options['keep']:
+                KnowledgeInteraction.objects.filter(collection=collection).delete()
+                collection.delete()
+
+    def _build_corpus(self, rng, vocabulary, weights, count):
+        documents = []
+        for _ in range(count):
+            sentences = []
+            for _ in range(rng.randint(6, 12)):
+                sentences.append(''.join(rng.choices(vocabulary, weights=weights, k=rng.randint(6, 14))) + '。')
+            documents.append(''.join(sentences))
+        return documents
+
+    def _store(self, collection, documents):
+        return KnowledgeItem.objects.bulk_create([
+            KnowledgeItem(
+                collection=collection,
+                content=content,
+                search_text=build_search_text(content),
+                item_type='document',
+                source_identifier=f"benchmark-{index}",
+                metadata={'benchmark': True},
+            )
+            for index, content in enumerate(documents)
+        ], batch_size=1000)
+
+    def _build_queries(self, rng, items, documents, rarity, count):
+        queries = {'phrase': [], 'keywords': []}
+        for _ in range(count):
+            index = rng.randrange(len(documents))
+            content = documents[index]
+            start = rng.randrange(max(len(content) - 8, 1))
+            queries['phrase'].append((content[start:start + 8], items[index].id))
+
+            words = [word for word in rarity if word in content]
+            rare = sorted(words, key=lambda word: rarity[word], reverse=True)[:3]
+            rng.shuffle(rare)
+            queries['keywords'].append((' '.join(rare), items[index].id))
+        return queries
+
+    def _hybrid_method(self, collection, top_k):
+        from qdrant_client import QdrantClient
+        from knowledge.embedding_service import FakeEmbeddings
+        from knowledge.services import KnowledgeService
+
+        service = KnowledgeService()
+        service._qdrant_client = QdrantClient(':memory:')
+        service._embeddings = FakeEmbeddings(dimensions=2048, max_batch_size=64)
+        qdrant_name = collection.qdrant_collection_name
+        service.get_or_create_collection(qdrant_name)
+        vectorstore = service.get_vectorstore(qdrant_name)
+
+        started = time.perf_counter()
+        items = KnowledgeItem.objects.filter(collection=collection).order_by('id')
+        batch = []
+        for item in items.iterator(chunk_size=1000):
+            batch.append(item)
+            if len(batch) == 512:
+                self._add_vectors(vectorstore, batch)
+                batch = []
+        if batch:
+            self._add_vectors(vectorstore, batch)
+        self.stdout.write(f"写入向量: {time.perf_counter() - started:.1f}s")
+
+        self._timings = []
+
+        def search(query):
+            response = service.retrieve_knowledge(query, collection_name=qdrant_name, limit=top_k, distance_threshold=2.0)
+            self._timings.append(response['timings'])
+            return [result['id'] for result in response['results']]
+        return search
+
+    def _add_vectors(self, vectorstore, items):
+        from langchain_core.documents import Document
+
+        vectorstore.add_documents([
+            Document(page_content=item.content, metadata={'item_id': str(item.id)}) for item in items
+        ])
+
+    def _average_timings(self):
+        if not self._timings:
+            return {}
+        return {
+            stage: round(sum(t[stage] for t in self._timings) / len(self._timings), 2)
+            for stage in self._timings[0]
+        }
+
+    def _report(self, name, kind, queries, search):
+        hits, reciprocal_ranks, latencies = 0, 0.0, []
+        for query, relevant_id in queries:
+            started = time.perf_counter()
+            result_ids = search(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if relevant_id in result_ids:
+                hits += 1
+                reciprocal_ranks += 1.0 / (result_ids.index(relevant_id) + 1)
+        total = len(queries) or 1
+        self.stdout.write(
+            f"{name:<10} {kind:<9} {hits / total:>9.3f} {reciprocal_ranks / total:>7.3f} "
+            f"{percentile(latencies, 0.5):>8.2f} {percentile(latencies, 0.95):>8.2f}"
+        )
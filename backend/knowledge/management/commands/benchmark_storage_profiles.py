@@ -0,0 +1,174 @@
+"""
+集合存储配置基准测试
+
+对每个存储配置（见 knowledge.storage.PRESETS）建立临时 Qdrant 集合，写入同一批分块，
+以 full 配置的精确检索（exact=True）结果为基准，统计 recall@k、p50/p95 延迟与向量内存估算。
+
+语料来源：
+- --collection：从已有集合抽样分块，用当前激活配置的 Embedding 模型嵌入（各维度分别请求，结果进入嵌入缓存）
+- 默认：合成语料 + FakeEmbeddings（向量与语义无关，只衡量量化与降维对近邻结构的影响）
+
+量化只有连接真实 Qdrant 时才生效；--local 使用本地内存模式，量化配置被忽略，只用于检查流程。
+
+用法:
+    python manage.py benchmark_storage_profiles --collection product_manuals --documents 5000
+    python manage.py benchmark_storage_profiles --profiles full,scalar,binary --queries 200
+"""
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from qdrant_client.models import CollectionStatus, OptimizersConfigDiff, PointStruct, SearchParams
+
+from knowledge.management.commands.benchmark_retrieval import CHAR_POOL, percentile
+from knowledge.models import KnowledgeCollection, KnowledgeItem
+from knowledge.storage import (
+    PRESETS,
+    build_payload,
+    quantization_config,
+    resolve_profile,
+    search_params,
+    vector_memory_bytes,
+    vectors_config,
+)
+
+# 临时集合在写入该点数后开始建索引（含量化向量），默认阈值对小语料不会建索引
+INDEXING_THRESHOLD = 1000
+UPSERT_BATCH_SIZE = 256
+
+
+class Command(BaseCommand):
+    help = '集合存储配置基准测试（召回率、延迟、内存）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--collection', help='从该集合抽样分块（默认使用合成语料）')
+        parser.add_argument('--documents', type=int, default=5000, help='分块数（抽样上限或合成数量）')
+        parser.add_argument('--queries', type=int, default=100, help='查询数')
+        parser.add_argument('--top-k', type=int, default=10, help='返回结果数')
+        parser.add_argument('--profiles', default=','.join(PRESETS), help='逗号分隔的预设名')
+        parser.add_argument('--local', action='store_true', help='使用本地内存 Qdrant（不模拟量化）')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子')
+        parser.add_argument('--index-timeout', type=int, default=600, help='等待索引完成的最长秒数')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            profiles = {name: resolve_profile({'preset': name}) for name in options['profiles'].split(',') if name}
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        texts, embeddings, client = self._setup(options, rng)
+        if len(texts) <= options['queries']:
+            raise CommandError(f"分块数 {len(texts)} 不足，至少需要 {options['queries'] + 1} 个")
+        queries = [text[:40] for text in rng.sample(texts, options['queries'])]
+        top_k = options['top_k']
+
+        # 基准：full 配置的精确检索
+        baseline_profile = resolve_profile({'preset': 'full'})
+        vectors_by_dimensions = {}
+        names = []
+        try:
+            baseline = self._create(client, 'baseline', baseline_profile, texts, embeddings, vectors_by_dimensions, options)
+            names.append(baseline)
+            query_vectors = {2048: embeddings.embed_documents(queries)}
+            expected = [
+                {point.id for point in client.query_points(
+                    baseline, query=vector, limit=top_k, search_params=SearchParams(exact=True)
+                ).points}
+                for vector in query_vectors[2048]
+            ]
+
+            self.stdout.write(
+                f"{'profile':<10} {'dims':>5} {'quant':<7} {'recall@k':>9} {'p50_ms':>8} {'p95_ms':>8} "
+                f"{'ram_mb':>8} {'disk_mb':>8}"
+            )
+            for name, profile in profiles.items():
+                collection_name = self._create(client, name, profile, texts, embeddings, vectors_by_dimensions, options)
+                names.append(collection_name)
+                dimensions = profile['dimensions']
+                if dimensions not in query_vectors:
+                    query_vectors[dimensions] = embeddings.with_dimensions(dimensions).embed_documents(queries)
+                self._report(client, name, profile, collection_name, query_vectors[dimensions], expected, top_k, len(texts))
+        finally:
+            for collection_name in names:
+                client.delete_collection(collection_name)
+
+    def _setup(self, options, rng):
+        from qdrant_client import QdrantClient
+        from knowledge.embedding_service import FakeEmbeddings
+        from knowledge.services import KnowledgeService
+
+        if options['collection']:
+            try:
+                collection = KnowledgeCollection.objects.get(name=options['collection'])
+            except KnowledgeCollection.DoesNotExist:
+                raise CommandError(f"集合 {options['collection']} 不存在")
+            texts = list(
+                KnowledgeItem.objects.filter(collection=collection, status='active')
+                .order_by('?').values_list('content', flat=True)[:options['documents']]
+            )
+            service = KnowledgeService()
+            embeddings = service.get_embeddings()
+        else:
+            texts = [
+                ''.join(rng.choice(CHAR_POOL) for _ in range(rng.randint(80, 300)))
+                for _ in range(options['documents'])
+            ]
+            service = KnowledgeService()
+            embeddings = FakeEmbeddings(dimensions=2048, max_batch_size=64)
+
+        if options['local']:
+            self.stdout.write(self.style.WARNING("本地内存模式不模拟量化，量化配置的召回率与延迟不具参考意义"))
+            client = QdrantClient(':memory:')
+        else:
+            client = service.get_qdrant_client()
+        return texts, embeddings, client
+
+    def _create(self, client, name, profile, texts, embeddings, vectors_by_dimensions, options):
+        collection_name = f"benchmark_storage_{name}_{os.getpid()}"
+        dimensions = profile['dimensions']
+        if dimensions not in vectors_by_dimensions:
+            started = time.perf_counter()
+            vectors_by_dimensions[dimensions] = embeddings.with_dimensions(dimensions).embed_documents(texts)
+            self.stdout.write(f"嵌入 {len(texts)} 个分块（{dimensions} 维）: {time.perf_counter() - started:.1f}s")
+
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=vectors_config(profile),
+            quantization_config=quantization_config(profile),
+            on_disk_payload=profile['on_disk_payload'],
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD),
+        )
+        points = [
+            PointStruct(id=index, vector=vector, payload=build_payload(text, {'item_id': str(index)}, profile))
+            for index, (text, vector) in enumerate(zip(texts, vectors_by_dimensions[dimensions]))
+        ]
+        for start in range(0, len(points), UPSERT_BATCH_SIZE):
+            client.upsert(collection_name=collection_name, points=points[start:start + UPSERT_BATCH_SIZE], wait=True)
+        self._wait_indexed(client, collection_name, options['index_timeout'])
+        return collection_name
+
+    def _wait_indexed(self, client, collection_name, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if client.get_collection(collection_name).status == CollectionStatus.GREEN:
+                return
+            time.sleep(0.5)
+        self.stdout.write(self.style.WARNING(f"{collection_name} 在 {timeout}s 内未完成索引，结果可能偏慢"))
+
+    def _report(self, client, name, profile, collection_name, query_vectors, expected, top_k, count):
+        params = search_params(profile)
+        found, latencies = 0, []
+        for vector, relevant in zip(query_vectors, expected):
+            started = time.perf_counter()
+            points = client.query_points(collection_name, query=vector, limit=top_k, search_params=params).points
+            latencies.append((time.perf_counter() - started) * 1000)
+            found += len(relevant & {point.id for point in points})
+        memory = vector_memory_bytes(profile, count)
+        recall = found / (len(expected) * top_k) if expected else 0.0
+        self.stdout.write(
+            f"{name:<10} {profile['dimensions']:>5} {profile['quantization']:<7} {recall:>9.3f} "
+            f"{percentile(latencies, 0.5):>8.2f} {percentile(latencies, 0.95):>8.2f} "
+            f"{memory['ram'] / 1048576:>8.1f} {memory['disk'] / 1048576:>8.1f}"
+        )
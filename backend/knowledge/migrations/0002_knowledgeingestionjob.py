@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeIngestionJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('qdrant_collection_name', models.CharField(max_length=255, verbose_name='Qdrant Collection Name')),
+                ('source_path', models.CharField(max_length=1024, verbose_name='Source Path')),
+                ('options', models.JSONField(blank=True, default=dict, verbose_name='Options')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20, verbose_name='Status')),
+                ('total_documents', models.PositiveIntegerField(default=0, verbose_name='Total Documents')),
+                ('processed_documents', models.PositiveIntegerField(default=0, verbose_name='Processed Documents')),
+                ('skipped_documents', models.PositiveIntegerField(default=0, verbose_name='Skipped Documents')),
+                ('failed_documents', models.PositiveIntegerField(default=0, verbose_name='Failed Documents')),
+                ('total_chunks', models.PositiveIntegerField(default=0, verbose_name='Total Chunks')),
+                ('stats', models.JSONField(blank=True, default=dict, verbose_name='Stats')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Errors')),
+                ('error_message', models.TextField(blank=True, null=True, verbose_name='Error Message')),
+                ('celery_task_id', models.CharField(blank=True, max_length=255, null=True, verbose_name='Celery Task ID')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Heartbeat At')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingestion_jobs', to='knowledge.knowledgecollection', verbose_name='Collection')),
+            ],
+            options={
+                'verbose_name': '知识库批量导入任务',
+                'verbose_name_plural': '知识库批量导入任务',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
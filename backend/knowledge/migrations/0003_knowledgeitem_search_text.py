@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:00
+
+import re
+
+from django.db import migrations, models
+
+INDEX_NAME = 'knowledge_item_search_gin'
+
+# 以下为迁移编写时 knowledge.lexical 中分词逻辑的冻结副本，之后修改 lexical 不影响本迁移
+MAX_INDEXED_CHARS = 50000
+
+_TOKEN_RE = re.compile(
+    r'[0-9a-z\u00c0-\u024f]+'  # 拉丁字母与数字
+    r'|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+'  # 汉字
+    r'|[\u3040-\u30ff]+'  # 日文假名
+    r'|[\uac00-\ud7af]+'  # 韩文
+)
+
+
+def build_search_text(content):
+    tokens = []
+    for run in _TOKEN_RE.findall((content or '')[:MAX_INDEXED_CHARS].lower()):
+        if run[0] <= '\u024f' or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return ' '.join(tokens)
+
+
+def backfill_search_text(apps, schema_editor):
+    KnowledgeItem = apps.get_model('knowledge', 'KnowledgeItem')
+    batch = []
+    for item in KnowledgeItem.objects.only('id', 'content').iterator(chunk_size=1000):
+        item.search_text = build_search_text(item.content)
+        batch.append(item)
+        if len(batch) >= 1000:
+            KnowledgeItem.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    if batch:
+        KnowledgeItem.objects.bulk_update(batch, ['search_text'])
+
+
+def create_search_index(apps, schema_editor):
+    # 表达式索引，查询须使用相同的表达式（见 knowledge.lexical._postgres_search）
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('knowledge', 'KnowledgeItem')._meta.db_table
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {schema_editor.quote_name(table)} "
+        f"USING gin (to_tsvector('simple', search_text))"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0002_knowledgeingestionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgeitem',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Tokenized content for lexical search, derived from content on save.', verbose_name='Search Text'),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
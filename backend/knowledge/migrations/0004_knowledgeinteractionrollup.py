@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0003_knowledgeitem_search_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='knowledgeinteraction',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Timestamp'),
+        ),
+        migrations.CreateModel(
+            name='KnowledgeInteractionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10, verbose_name='Period')),
+                ('bucket_start', models.DateTimeField(verbose_name='Bucket Start')),
+                ('interaction_type', models.CharField(max_length=50, verbose_name='Interaction Type')),
+                ('event_count', models.PositiveIntegerField(default=0, verbose_name='Event Count')),
+                ('hit_count', models.PositiveIntegerField(default=0, verbose_name='Hit Count')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='Error Count')),
+                ('duration_count', models.PositiveIntegerField(default=0, verbose_name='Duration Count')),
+                ('duration_total_ms', models.BigIntegerField(default=0, verbose_name='Total Duration (ms)')),
+                ('latency_histogram', models.JSONField(blank=True, default=list, verbose_name='Latency Histogram')),
+                ('top_queries', models.JSONField(blank=True, default=dict, verbose_name='Top Queries')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interaction_rollups', to='knowledge.knowledgecollection', verbose_name='Collection')),
+            ],
+            options={
+                'verbose_name': '知识库交互汇总',
+                'verbose_name_plural': '知识库交互汇总',
+                'ordering': ['-bucket_start'],
+                'indexes': [models.Index(fields=['collection', 'period', 'bucket_start'], name='knowledge_rollup_lookup')],
+                'constraints': [models.UniqueConstraint(fields=('collection', 'period', 'bucket_start', 'interaction_type'), name='knowledge_rollup_unique_bucket')],
+            },
+        ),
+    ]
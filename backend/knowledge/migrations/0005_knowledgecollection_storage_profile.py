@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0004_knowledgeinteractionrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgecollection',
+            name='storage_profile',
+            field=models.JSONField(blank=True, default=dict, help_text="Vector storage options, e.g. {'preset': 'scalar'} or {'preset': 'compact', 'dimensions': 512}. Empty means full precision.", verbose_name='Storage Profile'),
+        ),
+    ]
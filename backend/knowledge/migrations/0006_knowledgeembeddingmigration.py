@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0005_knowledgecollection_storage_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgecollection',
+            name='vector_collection_name',
+            field=models.CharField(blank=True, help_text='Physical Qdrant collection serving this collection after a re-embedding switch. Empty means the Qdrant collection name.', max_length=255, null=True, verbose_name='Vector Collection Name'),
+        ),
+        migrations.CreateModel(
+            name='KnowledgeEmbeddingMigration',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('source_collection', models.CharField(max_length=255, verbose_name='Source Collection')),
+                ('source_profile', models.JSONField(blank=True, default=dict, verbose_name='Source Profile')),
+                ('target_collection', models.CharField(max_length=255, verbose_name='Target Collection')),
+                ('target_profile', models.JSONField(blank=True, default=dict, verbose_name='Target Profile')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('ready', 'Ready'), ('switched', 'Switched'), ('completed', 'Completed'), ('rolled_back', 'Rolled Back'), ('cancelled', 'Cancelled'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20, verbose_name='Status')),
+                ('total_points', models.PositiveIntegerField(default=0, verbose_name='Total Points')),
+                ('processed_points', models.PositiveIntegerField(default=0, verbose_name='Processed Points')),
+                ('failed_points', models.PositiveIntegerField(default=0, verbose_name='Failed Points')),
+                ('cursor', models.CharField(blank=True, max_length=255, null=True, verbose_name='Cursor')),
+                ('max_points_per_second', models.FloatField(default=50.0, verbose_name='Max Points Per Second')),
+                ('auto_switch', models.BooleanField(default=False, verbose_name='Auto Switch')),
+                ('stats', models.JSONField(blank=True, default=dict, verbose_name='Stats')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Errors')),
+                ('error_message', models.TextField(blank=True, null=True, verbose_name='Error Message')),
+                ('celery_task_id', models.CharField(blank=True, max_length=255, null=True, verbose_name='Celery Task ID')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Heartbeat At')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('switched_at', models.DateTimeField(blank=True, null=True, verbose_name='Switched At')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embedding_migrations', to='knowledge.knowledgecollection', verbose_name='Collection')),
+            ],
+            options={
+                'verbose_name': '知识库重新嵌入迁移',
+                'verbose_name_plural': '知识库重新嵌入迁移',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
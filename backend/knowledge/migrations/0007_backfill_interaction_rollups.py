@@ -0,0 +1,70 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:00
+
+from django.db import migrations
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay
+
+SEARCH_TYPES = ('search_query', 'search_data')
+
+
+def backfill_day_rollups(apps, schema_editor):
+    """
+    为汇总表上线之前的交互记录补写按天汇总，集合统计改为读取汇总表后历史计数不丢失
+
+    只补写最早一条汇总所在日期之前的记录，与已有汇总不重叠。补写的汇总只有次数、命中与出错数，
+    不含耗时与高频查询。
+    """
+    KnowledgeInteraction = apps.get_model('knowledge', 'KnowledgeInteraction')
+    KnowledgeInteractionRollup = apps.get_model('knowledge', 'KnowledgeInteractionRollup')
+
+    interactions = KnowledgeInteraction.objects.filter(collection__isnull=False)
+    earliest = (
+        KnowledgeInteractionRollup.objects
+        .filter(period='day')
+        .order_by('bucket_start')
+        .values_list('bucket_start', flat=True)
+        .first()
+    )
+    if earliest is not None:
+        interactions = interactions.filter(timestamp__lt=earliest)
+
+    rows = (
+        interactions
+        .annotate(day=TruncDay('timestamp'))
+        .values('collection_id', 'interaction_type', 'day')
+        .annotate(
+            events=Count('id'),
+            errors=Count('id', filter=Q(error_message__gt='') | Q(status_code__gte=400)),
+            hits=Count('id', filter=Q(interaction_type__in=SEARCH_TYPES, response_payload__results_count__gt=0)),
+        )
+        .order_by()
+    )
+    batch = []
+    for row in rows.iterator():
+        batch.append(KnowledgeInteractionRollup(
+            collection_id=row['collection_id'],
+            period='day',
+            bucket_start=row['day'],
+            interaction_type=row['interaction_type'],
+            event_count=row['events'],
+            hit_count=row['hits'],
+            error_count=row['errors'],
+            latency_histogram=[],
+            top_queries={},
+        ))
+        if len(batch) >= 1000:
+            KnowledgeInteractionRollup.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        KnowledgeInteractionRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0006_knowledgeembeddingmigration'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_day_rollups, migrations.RunPython.noop),
+    ]
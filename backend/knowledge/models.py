@@ -1,7 +1,13 @@
+import bisect
+import uuid
+
 from django.db import models
 from django.conf import settings # 用于关联 User 模型
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .lexical import build_search_text
+
 """
 知识库核心数据模型
 定义知识库系统的数据结构，包括集合、条目、交互记录和配置
@@ -16,6 +22,9 @@ class KnowledgeCollection(models.Model):
         name: 集合名称(唯一)
         description: 集合描述
         qdrant_collection_name: Qdrant中的集合名称
+        storage_profile: 向量存储配置（量化、维度、磁盘存储、精简 payload，见 knowledge.storage）
+        vector_collection_name: 实际存放向量的 Qdrant 集合；为空时即 qdrant_collection_name，
+            重新嵌入迁移切换后指向新集合（见 knowledge.reembedding）
         created_by: 创建者
         created_at: 创建时间
         updated_at: 更新时间
@@ -39,6 +48,19 @@ class KnowledgeCollection(models.Model):
         null=True,
         help_text=_("Specific Qdrant collection name, if explicitly managed.")
     )
+    storage_profile = models.JSONField(
+        _("Storage Profile"),
+        default=dict,
+        blank=True,
+        help_text=_("Vector storage options, e.g. {'preset': 'scalar'} or {'preset': 'compact', 'dimensions': 512}. Empty means full precision.")
+    )
+    vector_collection_name = models.CharField(
+        _("Vector Collection Name"),
+        max_length=255,
+        blank=True,
+        null=True,
+        help_text=_("Physical Qdrant collection serving this collection after a re-embedding switch. Empty means the Qdrant collection name.")
+    )
     # config = models.JSONField(
     #     _("Configuration"),
     #     blank=True,
@@ -64,6 +86,29 @@ class KnowledgeCollection(models.Model):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .storage import resolve_profile
+
+        try:
+            resolve_profile(self.storage_profile)
+        except ValueError as e:
+            raise ValidationError({'storage_profile': str(e)})
+
+    def vector_collection_for(self, qdrant_name: str) -> str:
+        """
+        Qdrant 集合名对应的实际向量集合
+        
+        只有本集合自己的 Qdrant 集合会被重新嵌入迁移切换；同名数据库集合下其他用户的 Qdrant 集合原样返回。
+        """
+        if self.vector_collection_name and qdrant_name == (self.qdrant_collection_name or self.name):
+            return self.vector_collection_name
+        return qdrant_name
+
+    @property
+    def vector_collection(self) -> str:
+        return self.vector_collection_for(self.qdrant_collection_name or self.name)
+
 class KnowledgeItem(models.Model):
     """
     知识条目模型
@@ -77,6 +122,7 @@ class KnowledgeItem(models.Model):
         data_hash: 数据内容哈希值
         metadata: 附加元数据
         status: 条目状态(active/archived等)
+        search_text: 词法检索用的分词结果（保存时由 content 生成，见 knowledge.lexical）
         added_at: 添加时间
         last_accessed_at: 最后访问时间
     """
@@ -142,6 +188,13 @@ class KnowledgeItem(models.Model):
         db_index=True,
         help_text=_("Status of this knowledge item.")
     )
+    search_text = models.TextField(
+        _("Search Text"),
+        blank=True,
+        default="",
+        editable=False,
+        help_text=_("Tokenized content for lexical search, derived from content on save.")
+    )
     added_at = models.DateTimeField(_("Added At"), auto_now_add=True)
     last_accessed_at = models.DateTimeField(
         _("Last Accessed At"),
@@ -161,6 +214,14 @@ class KnowledgeItem(models.Model):
     def __str__(self):
         return f"Item {self.id} in {self.collection.name}"
 
+    def save(self, *args, **kwargs):
+        # bulk_create 不经过 save，批量写入时需自行设置 search_text
+        self.search_text = build_search_text(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'search_text'}
+        super().save(*args, **kwargs)
+
 class KnowledgeInteraction(models.Model):
     """
     知识交互记录模型
@@ -243,7 +304,8 @@ class KnowledgeInteraction(models.Model):
         null=True,
         help_text=_("Error message if an error occurred.")
     )
-    timestamp = models.DateTimeField(_("Timestamp"), auto_now_add=True, db_index=True)
+    # 缓冲批量写入时保留事件发生时间，因此使用 default 而不是 auto_now_add
+    timestamp = models.DateTimeField(_("Timestamp"), default=timezone.now, editable=False, db_index=True)
 
     class Meta:
         verbose_name = _("Knowledge Interaction")
@@ -335,3 +397,231 @@ class KnowledgeConfig(models.Model):
         if self.is_active:
             KnowledgeConfig.objects.filter(is_active=True).exclude(pk=self.pk).update(is_active=False)
         super().save(*args, **kwargs)
+
+
+class KnowledgeIngestionJob(models.Model):
+    """
+    批量导入任务
+    文档先写入 JSONL 源文件，由 Celery 任务分批切分、嵌入、写入 Qdrant 与数据库。
+    processed_documents 是已提交批次的游标，任务中断后从游标处继续。
+
+    属性:
+        collection: 目标集合
+        qdrant_collection_name: 写入的 Qdrant 集合
+        source_path: JSONL 源文件路径（每行一个文档）
+        options: 导入参数（分块大小、批大小、user_id 等）
+        status: 任务状态
+        total_documents / processed_documents / skipped_documents / failed_documents: 文档进度
+        total_chunks: 写入的分块数
+        stats: 耗时与吞吐量
+        errors: 失败文档的错误信息（最多保留前100条）
+        heartbeat_at: 执行中的心跳，超时未更新视为中断，可被重新认领
+    """
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('running', _('Running')),
+        ('completed', _('Completed')),
+        ('failed', _('Failed')),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    collection = models.ForeignKey(
+        KnowledgeCollection,
+        on_delete=models.CASCADE,
+        related_name='ingestion_jobs',
+        verbose_name=_("Collection")
+    )
+    qdrant_collection_name = models.CharField(_("Qdrant Collection Name"), max_length=255)
+    source_path = models.CharField(_("Source Path"), max_length=1024)
+    options = models.JSONField(_("Options"), default=dict, blank=True)
+    status = models.CharField(_("Status"), max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    total_documents = models.PositiveIntegerField(_("Total Documents"), default=0)
+    processed_documents = models.PositiveIntegerField(_("Processed Documents"), default=0)
+    skipped_documents = models.PositiveIntegerField(_("Skipped Documents"), default=0)
+    failed_documents = models.PositiveIntegerField(_("Failed Documents"), default=0)
+    total_chunks = models.PositiveIntegerField(_("Total Chunks"), default=0)
+    stats = models.JSONField(_("Stats"), default=dict, blank=True)
+    errors = models.JSONField(_("Errors"), default=list, blank=True)
+    error_message = models.TextField(_("Error Message"), blank=True, null=True)
+    celery_task_id = models.CharField(_("Celery Task ID"), max_length=255, blank=True, null=True)
+    heartbeat_at = models.DateTimeField(_("Heartbeat At"), blank=True, null=True)
+    started_at = models.DateTimeField(_("Started At"), blank=True, null=True)
+    finished_at = models.DateTimeField(_("Finished At"), blank=True, null=True)
+    created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("知识库批量导入任务")
+        verbose_name_plural = _("知识库批量导入任务")
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Ingestion {self.id} ({self.status}) {self.processed_documents}/{self.total_documents}"
+
+    @property
+    def progress(self) -> float:
+        return round(self.processed_documents / self.total_documents * 100, 1) if self.total_documents else 0.0
+
+
+class KnowledgeInteractionRollup(models.Model):
+    """
+    知识库交互的小时/天汇总
+    交互记录缓冲写入时按批增量累加（见 knowledge.interactions），看板直接读取汇总，不扫描原始记录。
+
+    属性:
+        collection: 集合
+        period: 汇总粒度（hour/day，按 TIME_ZONE 切分）
+        bucket_start: 时间段起点
+        interaction_type: 交互类型
+        event_count: 交互次数
+        hit_count: 有结果的检索次数（仅检索类交互）
+        error_count: 出错次数
+        duration_count / duration_total_ms: 带耗时的交互数与总耗时
+        latency_histogram: 耗时直方图，第 i 格统计耗时不超过 LATENCY_BUCKETS_MS[i] 的次数，最后一格为更慢的
+        top_queries: 高频查询 {规范化查询: 次数}，只保留前 TOP_QUERIES 个（近似值）
+    """
+    PERIOD_CHOICES = [
+        ('hour', _('Hour')),
+        ('day', _('Day')),
+    ]
+    LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+    TOP_QUERIES = 50
+
+    collection = models.ForeignKey(
+        KnowledgeCollection,
+        on_delete=models.CASCADE,
+        related_name='interaction_rollups',
+        verbose_name=_("Collection")
+    )
+    period = models.CharField(_("Period"), max_length=10, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField(_("Bucket Start"))
+    interaction_type = models.CharField(_("Interaction Type"), max_length=50)
+    event_count = models.PositiveIntegerField(_("Event Count"), default=0)
+    hit_count = models.PositiveIntegerField(_("Hit Count"), default=0)
+    error_count = models.PositiveIntegerField(_("Error Count"), default=0)
+    duration_count = models.PositiveIntegerField(_("Duration Count"), default=0)
+    duration_total_ms = models.BigIntegerField(_("Total Duration (ms)"), default=0)
+    latency_histogram = models.JSONField(_("Latency Histogram"), default=list, blank=True)
+    top_queries = models.JSONField(_("Top Queries"), default=dict, blank=True)
+    updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("知识库交互汇总")
+        verbose_name_plural = _("知识库交互汇总")
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['collection', 'period', 'bucket_start', 'interaction_type'],
+                name='knowledge_rollup_unique_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['collection', 'period', 'bucket_start'], name='knowledge_rollup_lookup'),
+        ]
+
+    def __str__(self):
+        return f"{self.collection_id} {self.interaction_type} {self.period} {self.bucket_start:%Y-%m-%d %H:%M}"
+
+    @classmethod
+    def latency_bucket(cls, duration_ms: float) -> int:
+        return bisect.bisect_left(cls.LATENCY_BUCKETS_MS, duration_ms)
+
+    @classmethod
+    def histogram_percentile(cls, histogram, fraction: float):
+        """直方图分位数，返回所在格的上界（毫秒）；落在最后一格时返回最大上界"""
+        total = sum(histogram or [])
+        if not total:
+            return None
+        threshold = fraction * total
+        cumulative = 0
+        for index, count in enumerate(histogram):
+            cumulative += count
+            if cumulative >= threshold:
+                return cls.LATENCY_BUCKETS_MS[min(index, len(cls.LATENCY_BUCKETS_MS) - 1)]
+        return cls.LATENCY_BUCKETS_MS[-1]
+
+    @property
+    def hit_rate(self) -> float:
+        return round(self.hit_count / self.event_count, 4) if self.event_count else 0.0
+
+    @property
+    def average_ms(self) -> float:
+        return round(self.duration_total_ms / self.duration_count, 2) if self.duration_count else 0.0
+
+    def percentile(self, fraction: float):
+        return self.histogram_percentile(self.latency_histogram, fraction)
+
+
+class KnowledgeEmbeddingMigration(models.Model):
+    """
+    重新嵌入迁移
+    按新的 Embedding 模型/维度（target_profile）把集合的全部分块重新嵌入到影子集合，
+    回填期间读请求仍走原集合、写请求双写；回填完成后原子切换 KnowledgeCollection.vector_collection_name，
+    切换后保留原集合以便回滚，确认无误后清理（见 knowledge.reembedding）。
+
+    属性:
+        collection: 迁移的集合
+        source_collection / source_profile: 原向量集合与存储配置
+        target_collection / target_profile: 影子集合与新的存储配置
+        status: 迁移状态
+        total_points / processed_points / failed_points: 回填进度
+        cursor: 原集合 scroll 游标，任务中断后从游标处继续
+        max_points_per_second: 回填限速（每秒嵌入的点数上限）
+        auto_switch: 回填完成后自动切换
+        stats: 耗时、当前速率、重试次数等
+        errors: 失败批次的错误信息（最多保留前100条）
+        heartbeat_at: 执行中的心跳，超时未更新视为中断，可被重新认领
+    """
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('running', _('Running')),
+        ('ready', _('Ready')),
+        ('switched', _('Switched')),
+        ('completed', _('Completed')),
+        ('rolled_back', _('Rolled Back')),
+        ('cancelled', _('Cancelled')),
+        ('failed', _('Failed')),
+    ]
+    # 仍需要双写、会阻止同一集合发起新迁移的状态
+    ACTIVE_STATUSES = ('pending', 'running', 'ready', 'switched')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    collection = models.ForeignKey(
+        KnowledgeCollection,
+        on_delete=models.CASCADE,
+        related_name='embedding_migrations',
+        verbose_name=_("Collection")
+    )
+    source_collection = models.CharField(_("Source Collection"), max_length=255)
+    source_profile = models.JSONField(_("Source Profile"), default=dict, blank=True)
+    target_collection = models.CharField(_("Target Collection"), max_length=255)
+    target_profile = models.JSONField(_("Target Profile"), default=dict, blank=True)
+    status = models.CharField(_("Status"), max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    total_points = models.PositiveIntegerField(_("Total Points"), default=0)
+    processed_points = models.PositiveIntegerField(_("Processed Points"), default=0)
+    failed_points = models.PositiveIntegerField(_("Failed Points"), default=0)
+    cursor = models.CharField(_("Cursor"), max_length=255, blank=True, null=True)
+    max_points_per_second = models.FloatField(_("Max Points Per Second"), default=50.0)
+    auto_switch = models.BooleanField(_("Auto Switch"), default=False)
+    stats = models.JSONField(_("Stats"), default=dict, blank=True)
+    errors = models.JSONField(_("Errors"), default=list, blank=True)
+    error_message = models.TextField(_("Error Message"), blank=True, null=True)
+    celery_task_id = models.CharField(_("Celery Task ID"), max_length=255, blank=True, null=True)
+    heartbeat_at = models.DateTimeField(_("Heartbeat At"), blank=True, null=True)
+    started_at = models.DateTimeField(_("Started At"), blank=True, null=True)
+    finished_at = models.DateTimeField(_("Finished At"), blank=True, null=True)
+    switched_at = models.DateTimeField(_("Switched At"), blank=True, null=True)
+    created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("知识库重新嵌入迁移")
+        verbose_name_plural = _("知识库重新嵌入迁移")
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Re-embedding {self.id} ({self.status}) {self.source_collection} -> {self.target_collection}"
+
+    @property
+    def progress(self) -> float:
+        return round(self.processed_points / self.total_points * 100, 1) if self.total_points else 0.0
@@ -0,0 +1,240 @@
+"""
+Qdrant 客户端与向量存储句柄注册表
+
+KnowledgeService 原来每个实例都新建 QdrantClient、Embedding 与 QdrantVectorStore，工具每次调用都会创建新的服务实例，
+检索因此要承担建立连接、列出集合和构造包装对象的开销。这里在进程内复用：
+
+1. 客户端按端点（host/port/api_key 或本地模式的 location/path）共享，REST 客户端内部是连接池，可被多个线程/协程共用
+2. 取用时按间隔做健康检查（get_collections），失败则关闭并重建；调用方遇到连接错误可 report_failure，下次取用时立即检查
+3. Embedding 按模型配置共享，QdrantVectorStore 按 (客户端, 集合, Embedding) 缓存，已确认存在的集合不再重复列出
+
+锁使用 threading 原语，gevent monkey patch 后自动变为协程锁；健康检查与重连只持有所在端点的锁，不阻塞其他端点。
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from qdrant_client import QdrantClient
+
+logger = logging.getLogger("django")
+
+# 创建客户端时临时清除的代理环境变量（Qdrant 通常部署在内网）
+PROXY_VARS = ['http_proxy', 'https_proxy', 'HTTP_PROXY', 'HTTPS_PROXY', 'ALL_PROXY', 'no_proxy', 'NO_PROXY']
+_environ_lock = threading.Lock()
+
+
+def create_qdrant_client(endpoint: Dict[str, Any]) -> QdrantClient:
+    """按端点配置创建客户端；endpoint 含 location 或 path 时为本地模式"""
+    if endpoint.get('location') or endpoint.get('path'):
+        return QdrantClient(location=endpoint.get('location'), path=endpoint.get('path'))
+
+    # 临时清除代理环境变量；os.environ 是进程级的，创建期间加锁
+    with _environ_lock:
+        old_proxies = {var: os.environ.pop(var) for var in PROXY_VARS if var in os.environ}
+        os.environ['NO_PROXY'] = 'localhost,127.0.0.1,*.local'
+        os.environ['no_proxy'] = 'localhost,127.0.0.1,*.local'
+        try:
+            return QdrantClient(
+                host=endpoint['host'],
+                port=endpoint['port'],
+                api_key=endpoint.get('api_key'),
+                prefer_grpc=False,
+                timeout=endpoint.get('timeout', 10),
+                https=False
+            )
+        finally:
+            # 恢复代理设置
+            for var in ('NO_PROXY', 'no_proxy'):
+                os.environ.pop(var, None)
+            os.environ.update(old_proxies)
+
+
+class _ClientEntry:
+
+    def __init__(self, client: QdrantClient):
+        self.client = client
+        self.lock = threading.Lock()
+        self.checked_at = time.monotonic()
+        self.reconnects = 0
+        self.health_failures = 0
+
+
+class QdrantRegistry:
+    """进程内共享的 Qdrant 客户端、Embedding 与向量存储句柄"""
+
+    def __init__(self, factory: Callable[[Dict[str, Any]], QdrantClient] = create_qdrant_client,
+                 health_check_interval: float = 30.0):
+        self.factory = factory
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple, _ClientEntry] = {}
+        self._embeddings: Dict[Hashable, Any] = {}
+        self._vectorstores: Dict[Tuple, Any] = {}
+        # 已确认存在的集合：(id(client), 集合名) -> client；持有客户端引用，避免 id 被新对象复用
+        self._collections: Dict[Tuple[int, str], QdrantClient] = {}
+        self._stats = {'client_hits': 0, 'clients_created': 0, 'vectorstore_hits': 0, 'vectorstores_created': 0}
+
+    @staticmethod
+    def endpoint_key(endpoint: Dict[str, Any]) -> Tuple:
+        return tuple(sorted((key, str(value)) for key, value in endpoint.items() if value is not None))
+
+    # ==================== 客户端 ====================
+
+    def get_client(self, endpoint: Dict[str, Any]) -> QdrantClient:
+        """取用端点的共享客户端：首次创建，超过检查间隔时先做健康检查，不健康则重建"""
+        key = self.endpoint_key(endpoint)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                entry = _ClientEntry(self.factory(endpoint))
+                self._clients[key] = entry
+                self._stats['clients_created'] += 1
+                logger.info(f"创建 Qdrant 客户端: {self._describe(endpoint)}")
+                return entry.client
+            self._stats['client_hits'] += 1
+
+        if time.monotonic() - entry.checked_at >= self.health_check_interval:
+            with entry.lock:
+                # 等锁期间其他请求可能已完成检查
+                if time.monotonic() - entry.checked_at >= self.health_check_interval:
+                    self._check(entry, endpoint)
+        return entry.client
+
+    def _check(self, entry: _ClientEntry, endpoint: Dict[str, Any]) -> None:
+        try:
+            entry.client.get_collections()
+            entry.checked_at = time.monotonic()
+            return
+        except Exception as e:
+            entry.health_failures += 1
+            logger.warning(f"Qdrant 健康检查失败，重建客户端 {self._describe(endpoint)}: {e}")
+
+        old_client = entry.client
+        entry.client = self.factory(endpoint)
+        entry.reconnects += 1
+        entry.checked_at = time.monotonic()
+        self._forget_client(old_client)
+        try:
+            old_client.close()
+        except Exception:
+            pass
+
+    def report_failure(self, client: QdrantClient) -> None:
+        """调用方遇到连接错误时调用：下次取用该客户端前先做健康检查，并重新确认集合"""
+        with self._lock:
+            for entry in self._clients.values():
+                if entry.client is client:
+                    entry.checked_at = float('-inf')
+            self._collections = {key: value for key, value in self._collections.items() if key[0] != id(client)}
+
+    def _forget_client(self, client: QdrantClient) -> None:
+        with self._lock:
+            self._collections = {key: value for key, value in self._collections.items() if key[0] != id(client)}
+            self._vectorstores = {key: store for key, store in self._vectorstores.items() if key[0] != id(client)}
+
+    @staticmethod
+    def _describe(endpoint: Dict[str, Any]) -> str:
+        if endpoint.get('location') or endpoint.get('path'):
+            return f"local:{endpoint.get('location') or endpoint.get('path')}"
+        return f"{endpoint.get('host')}:{endpoint.get('port')}"
+
+    # ==================== Embedding 与向量存储 ====================
+
+    def get_embeddings(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """按模型配置共享 Embedding 实例（BatchedEmbeddings 是线程安全的）"""
+        with self._lock:
+            embeddings = self._embeddings.get(key)
+        if embeddings is None:
+            created = factory()
+            with self._lock:
+                embeddings = self._embeddings.setdefault(key, created)
+        return embeddings
+
+    def ensure_collection(self, client: QdrantClient, collection_name: str, create: Callable[[], None]) -> None:
+        """集合不存在时调用 create 创建；确认过的集合不再请求 Qdrant"""
+        key = (id(client), collection_name)
+        with self._lock:
+            if key in self._collections:
+                return
+        create()
+        with self._lock:
+            self._collections[key] = client
+
+    def forget_collection(self, client: QdrantClient, collection_name: str) -> None:
+        """集合被删除后调用，下次使用时重新确认（必要时重建）"""
+        with self._lock:
+            self._collections.pop((id(client), collection_name), None)
+            self._vectorstores = {
+                key: store for key, store in self._vectorstores.items()
+                if key[:2] != (id(client), collection_name)
+            }
+
+    def get_vectorstore(self, client: QdrantClient, collection_name: str, embeddings: Any,
+                        factory: Callable[[], Any]) -> Any:
+        """按 (客户端, 集合, Embedding) 缓存向量存储句柄；句柄持有客户端引用，缓存期间 id 不会复用"""
+        key = (id(client), collection_name, id(embeddings))
+        with self._lock:
+            vectorstore = self._vectorstores.get(key)
+            if vectorstore is not None:
+                self._stats['vectorstore_hits'] += 1
+                return vectorstore
+        created = factory()
+        with self._lock:
+            vectorstore = self._vectorstores.setdefault(key, created)
+            if vectorstore is created:
+                self._stats['vectorstores_created'] += 1
+        return vectorstore
+
+    # ==================== 管理 ====================
+
+    def close_all(self) -> None:
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+            self._embeddings.clear()
+            self._vectorstores.clear()
+            self._collections.clear()
+        for entry in entries:
+            try:
+                entry.client.close()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'clients': len(self._clients),
+                'vectorstores': len(self._vectorstores),
+                'collections': len(self._collections),
+                'reconnects': sum(entry.reconnects for entry in self._clients.values()),
+                'health_failures': sum(entry.health_failures for entry in self._clients.values()),
+            })
+        return stats
+
+
+_registry: Optional[QdrantRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_qdrant_registry() -> QdrantRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from django.conf import settings
+                _registry = QdrantRegistry(
+                    health_check_interval=getattr(settings, 'KNOWLEDGE_QDRANT_HEALTH_CHECK_INTERVAL', 30)
+                )
+    return _registry
+
+
+def set_qdrant_registry(registry: Optional[QdrantRegistry]) -> Optional[QdrantRegistry]:
+    """替换进程内的注册表（None 表示下次取用时按 settings 重新创建），返回原实例"""
+    global _registry
+    with _registry_lock:
+        previous = _registry
+        _registry = registry
+    return previous
@@ -0,0 +1,488 @@
+"""
+知识库重新嵌入迁移
+
+更换 Embedding 模型或输出维度后，集合中已有的向量不能再与新模型的查询向量比较，需要全部重新嵌入。
+直接原地重建会让集合在重建期间不可用，这里用影子集合完成迁移：
+
+1. create_reembedding_migration 按新的存储配置创建影子 Qdrant 集合，之后对原集合的写入同时写入影子集合（双写）
+2. Celery 任务按批 scroll 原集合，用新配置的 Embedding 重新嵌入，以相同的点 ID 与元数据写入影子集合；
+   回填限速（每秒点数），Embedding 出现重试时降速，之后逐批恢复；游标与进度随每批保存，中断后从游标处继续
+3. 回填完成后删除影子集合中原集合已不存在的点，状态变为 ready（auto_switch 时直接切换）
+4. switch_reembedding 在一个事务内把 KnowledgeCollection.vector_collection_name 指向影子集合并更新存储配置，
+   之后的检索与写入都走新集合；原集合保留并继续双写，rollback_reembedding 可随时切回
+5. cleanup_reembedding 确认后删除原集合
+
+集合切换用数据库字段而不是 Qdrant alias：已有集合本身就以逻辑名存在于 Qdrant 中，
+改用 alias 需要先删除同名集合，切换期间会有一段不可用的窗口。
+"""
+import json
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from qdrant_client.models import PointIdsList
+
+from .chunking import chunk_source_text
+from .models import KnowledgeCollection, KnowledgeEmbeddingMigration, KnowledgeItem
+from .qdrant_pool import get_qdrant_registry
+from .retrieval_cache import invalidate_collections
+from .storage import resolve_profile
+
+logger = logging.getLogger("django")
+
+# 失败批次的错误信息最多保留条数
+MAX_ERRORS = 100
+# Embedding 出现重试时速率降为原来的比例，之后每个顺利的批次恢复的比例
+THROTTLE_BACKOFF = 0.5
+THROTTLE_RECOVERY = 1.1
+# 速率下限（每秒点数）
+MIN_POINTS_PER_SECOND = 1.0
+
+
+def create_reembedding_migration(
+    collection: KnowledgeCollection,
+    target_profile: Dict[str, Any],
+    auto_switch: bool = False,
+    max_points_per_second: Optional[float] = None,
+    service=None
+) -> KnowledgeEmbeddingMigration:
+    """
+    创建重新嵌入迁移并建立影子集合（不执行回填）
+
+    Args:
+        target_profile: 新的存储配置（与 KnowledgeCollection.storage_profile 格式相同），通常修改 embedding_model 或 dimensions
+        auto_switch: 回填完成后自动切换
+        max_points_per_second: 回填限速，默认 KNOWLEDGE_REEMBED_MAX_POINTS_PER_SECOND
+    """
+    resolved = resolve_profile(target_profile)
+    if service is None:
+        from .services import KnowledgeService
+        service = KnowledgeService()
+
+    with transaction.atomic():
+        collection = KnowledgeCollection.objects.select_for_update().get(pk=collection.pk)
+        active = collection.embedding_migrations.filter(status__in=KnowledgeEmbeddingMigration.ACTIVE_STATUSES).first()
+        if active:
+            raise ValueError(f"集合 {collection.name} 已有进行中的重新嵌入迁移 {active.id}（{active.status}）")
+
+        source = collection.vector_collection
+        if not service.get_qdrant_client().collection_exists(source):
+            raise ValueError(f"集合 {collection.name} 还没有向量数据（Qdrant 集合 {source} 不存在），直接修改存储配置即可")
+
+        migration = KnowledgeEmbeddingMigration(
+            collection=collection,
+            source_collection=source,
+            source_profile=collection.storage_profile or {},
+            target_profile=dict(target_profile or {}),
+            auto_switch=auto_switch,
+            max_points_per_second=max_points_per_second or getattr(settings, 'KNOWLEDGE_REEMBED_MAX_POINTS_PER_SECOND', 50.0),
+        )
+        migration.target_collection = f"{collection.qdrant_collection_name or collection.name}__{migration.id.hex[:8]}"
+        migration.total_points = service.get_qdrant_client().count(source, exact=True).count
+        # 先建影子集合再保存迁移：迁移可见（开始双写）时影子集合已经存在
+        service.get_or_create_collection(migration.target_collection, resolved)
+        migration.save()
+
+    logger.info(
+        f"创建重新嵌入迁移 {migration.id}: {source} -> {migration.target_collection}，"
+        f"{migration.total_points} 个点，{resolved['embedding_model']}/{resolved['dimensions']} 维"
+    )
+    return migration
+
+
+def stale_before():
+    """心跳早于该时间的回填中迁移视为已中断"""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'KNOWLEDGE_REEMBED_STALE_SECONDS', 600))
+
+
+def enqueue_reembedding(migration: KnowledgeEmbeddingMigration) -> str:
+    """提交到 Celery 执行（新迁移或继续中断的迁移），返回 Celery 任务 ID"""
+    from .tasks import run_reembedding_task  # tasks 导入本模块，延迟导入避免循环
+
+    result = run_reembedding_task.delay(str(migration.id))
+    KnowledgeEmbeddingMigration.objects.filter(id=migration.id).update(celery_task_id=result.id)
+    return result.id
+
+
+def claim_migration(migration_id) -> bool:
+    """认领迁移：待执行、失败或心跳超时的迁移才能被认领，避免两个 worker 同时回填"""
+    now = timezone.now()
+    claimable = (
+        Q(status__in=['pending', 'failed'])
+        | Q(status='running', heartbeat_at__isnull=True)
+        | Q(status='running', heartbeat_at__lt=stale_before())
+    )
+    claimed = KnowledgeEmbeddingMigration.objects.filter(claimable, id=migration_id).update(
+        status='running', heartbeat_at=now, error_message=None
+    )
+    if claimed:
+        KnowledgeEmbeddingMigration.objects.filter(id=migration_id, started_at__isnull=True).update(started_at=now)
+    return bool(claimed)
+
+
+def run_reembedding(migration_id, service=None) -> KnowledgeEmbeddingMigration:
+    """
+    执行（或继续）回填
+
+    Args:
+        service: KnowledgeService 实例，提供 Qdrant 客户端与 Embedding，默认新建
+    """
+    if not claim_migration(migration_id):
+        migration = KnowledgeEmbeddingMigration.objects.get(id=migration_id)
+        logger.info(f"重新嵌入迁移 {migration_id} 当前状态为 {migration.status}，跳过")
+        return migration
+
+    migration = KnowledgeEmbeddingMigration.objects.select_related('collection').get(id=migration_id)
+    if service is None:
+        from .services import KnowledgeService
+        service = KnowledgeService()
+
+    try:
+        migration = ReembeddingRunner(migration, service).run()
+    except Exception as e:
+        logger.error(f"重新嵌入迁移 {migration_id} 失败，已处理 {migration.processed_points} 个点: {e}", exc_info=True)
+        # 回填期间被取消时保持取消状态
+        KnowledgeEmbeddingMigration.objects.filter(id=migration_id, status='running').update(
+            status='failed', error_message=str(e)
+        )
+        raise
+
+    if migration.status == 'ready' and migration.auto_switch:
+        migration = switch_reembedding(migration)
+    return migration
+
+
+def switch_reembedding(migration: KnowledgeEmbeddingMigration) -> KnowledgeEmbeddingMigration:
+    """原子切换：集合的读写改走影子集合，原集合保留（继续双写）以便回滚"""
+    with transaction.atomic():
+        migration = KnowledgeEmbeddingMigration.objects.select_for_update().get(id=migration.id)
+        if migration.status != 'ready':
+            raise ValueError(f"迁移 {migration.id} 当前状态为 {migration.status}，回填完成（ready）后才能切换")
+        collection = KnowledgeCollection.objects.select_for_update().get(pk=migration.collection_id)
+        collection.vector_collection_name = migration.target_collection
+        collection.storage_profile = migration.target_profile
+        collection.save(update_fields=['vector_collection_name', 'storage_profile', 'updated_at'])
+
+        migration.status = 'switched'
+        migration.switched_at = timezone.now()
+        migration.save(update_fields=['status', 'switched_at', 'updated_at'])
+
+    invalidate_collections(collection.qdrant_collection_name, collection.name)
+    logger.info(f"重新嵌入迁移 {migration.id}: 集合 {collection.name} 切换到 {migration.target_collection}")
+    return migration
+
+
+def rollback_reembedding(migration: KnowledgeEmbeddingMigration, service=None) -> KnowledgeEmbeddingMigration:
+    """
+    回滚：已切换的迁移切回原集合与原存储配置（状态 rolled_back）；
+    未切换的迁移直接取消（状态 cancelled，正在执行的回填在下一批前停止）。两种情况都删除影子集合。
+    """
+    with transaction.atomic():
+        migration = KnowledgeEmbeddingMigration.objects.select_for_update().get(id=migration.id)
+        if migration.status in ('completed', 'rolled_back', 'cancelled'):
+            raise ValueError(f"迁移 {migration.id} 当前状态为 {migration.status}，无法回滚")
+        collection = KnowledgeCollection.objects.select_for_update().get(pk=migration.collection_id)
+
+        if migration.status == 'switched':
+            logical = collection.qdrant_collection_name or collection.name
+            collection.vector_collection_name = None if migration.source_collection == logical else migration.source_collection
+            collection.storage_profile = migration.source_profile
+            collection.save(update_fields=['vector_collection_name', 'storage_profile', 'updated_at'])
+            migration.status = 'rolled_back'
+        else:
+            migration.status = 'cancelled'
+        migration.finished_at = timezone.now()
+        migration.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+    invalidate_collections(collection.qdrant_collection_name, collection.name)
+    _drop_collection(service, migration.target_collection)
+    logger.info(f"重新嵌入迁移 {migration.id} 已{'回滚' if migration.status == 'rolled_back' else '取消'}")
+    return migration
+
+
+def cleanup_reembedding(migration: KnowledgeEmbeddingMigration, service=None) -> KnowledgeEmbeddingMigration:
+    """确认切换无误后删除原集合（之后无法回滚）"""
+    with transaction.atomic():
+        migration = KnowledgeEmbeddingMigration.objects.select_for_update().get(id=migration.id)
+        if migration.status != 'switched':
+            raise ValueError(f"迁移 {migration.id} 当前状态为 {migration.status}，切换后才能清理原集合")
+        migration.status = 'completed'
+        migration.finished_at = timezone.now()
+        migration.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+    _drop_collection(service, migration.source_collection)
+    logger.info(f"重新嵌入迁移 {migration.id} 完成，已删除原集合 {migration.source_collection}")
+    return migration
+
+
+def mirror_targets(collection: KnowledgeCollection, vector_collection: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    写入 vector_collection 时需要同时写入的集合及其存储配置
+
+    回填期间（切换前）写入原集合的数据同时写入影子集合；切换后写入新集合的数据同时写回原集合，保证随时可以回滚。
+    """
+    targets = []
+    migrations = collection.embedding_migrations.filter(status__in=KnowledgeEmbeddingMigration.ACTIVE_STATUSES)
+    for migration in migrations:
+        if migration.status == 'switched' and vector_collection == migration.target_collection:
+            targets.append((migration.source_collection, resolve_profile(migration.source_profile)))
+        elif migration.status != 'switched' and vector_collection == migration.source_collection:
+            targets.append((migration.target_collection, resolve_profile(migration.target_profile)))
+    return targets
+
+
+def mirror_upsert(
+    service,
+    collection: KnowledgeCollection,
+    vector_collection: str,
+    ids: List[str],
+    texts: List[str],
+    metadatas: List[Dict[str, Any]]
+) -> None:
+    """双写：按各目标集合的配置重新嵌入并以相同的点 ID 写入；失败计入迁移的 failed_points，不影响主写入"""
+    for target, profile in mirror_targets(collection, vector_collection):
+        try:
+            service.upsert_texts(target, ids, texts, metadatas, profile)
+        except Exception as e:
+            logger.warning(f"双写到 {target} 失败（{len(ids)} 个点）: {e}")
+            _record_mirror_failure(collection, target, len(ids), str(e))
+
+
+def mirror_delete(service, collection: KnowledgeCollection, vector_collection: str, points_selector) -> None:
+    """双写删除"""
+    for target, _ in mirror_targets(collection, vector_collection):
+        try:
+            service.get_qdrant_client().delete(collection_name=target, points_selector=points_selector, wait=True)
+        except Exception as e:
+            logger.warning(f"双写删除 {target} 失败: {e}")
+            _record_mirror_failure(collection, target, 0, str(e))
+
+
+def _record_mirror_failure(collection: KnowledgeCollection, target: str, points: int, error: str) -> None:
+    migrations = collection.embedding_migrations.filter(
+        Q(target_collection=target) | Q(source_collection=target),
+        status__in=KnowledgeEmbeddingMigration.ACTIVE_STATUSES,
+    )
+    migrations.update(failed_points=F('failed_points') + points, error_message=f"双写失败: {error}")
+
+
+def _drop_collection(service, name: str) -> None:
+    if service is None:
+        from .services import KnowledgeService
+        service = KnowledgeService()
+    client = service.get_qdrant_client()
+    try:
+        if client.collection_exists(name):
+            client.delete_collection(name)
+    except Exception as e:
+        logger.warning(f"删除 Qdrant 集合 {name} 失败，请手动清理: {e}")
+    get_qdrant_registry().forget_collection(client, name)
+
+
+def serialize_migration(migration: KnowledgeEmbeddingMigration) -> Dict[str, Any]:
+    return {
+        'migration_id': str(migration.id),
+        'collection': migration.collection.name,
+        'source_collection': migration.source_collection,
+        'source_profile': migration.source_profile,
+        'target_collection': migration.target_collection,
+        'target_profile': migration.target_profile,
+        'status': migration.status,
+        'progress': migration.progress,
+        'total_points': migration.total_points,
+        'processed_points': migration.processed_points,
+        'failed_points': migration.failed_points,
+        'max_points_per_second': migration.max_points_per_second,
+        'auto_switch': migration.auto_switch,
+        'stats': migration.stats,
+        'errors': migration.errors[:20],
+        'error_message': migration.error_message,
+        'started_at': migration.started_at.isoformat() if migration.started_at else None,
+        'switched_at': migration.switched_at.isoformat() if migration.switched_at else None,
+        'finished_at': migration.finished_at.isoformat() if migration.finished_at else None,
+    }
+
+
+class ReembeddingRunner:
+    """按批执行一个迁移的回填"""
+
+    def __init__(self, migration: KnowledgeEmbeddingMigration, service, sleep=time.sleep):
+        self.migration = migration
+        self.service = service
+        self.client = service.get_qdrant_client()
+        self.profile = resolve_profile(migration.target_profile)
+        self.embeddings = service.embeddings_for(self.profile)
+        self.batch_size = getattr(settings, 'KNOWLEDGE_REEMBED_BATCH_SIZE', 128)
+        # 继续中断的迁移时沿用上次的速率
+        self.rate = min(migration.stats.get('points_per_second') or migration.max_points_per_second,
+                        migration.max_points_per_second)
+        self.sleep = sleep
+        self._run_started = time.monotonic()
+        self._run_start_points = migration.processed_points
+        self._throttled_seconds = 0.0
+
+    def run(self) -> KnowledgeEmbeddingMigration:
+        migration = self.migration
+        logger.info(
+            f"开始重新嵌入 {migration.id}: {migration.source_collection} -> {migration.target_collection}，"
+            f"从第 {migration.processed_points + 1} 个点继续，共 {migration.total_points} 个"
+        )
+        self.service.get_or_create_collection(migration.target_collection, self.profile)
+
+        offset = json.loads(migration.cursor) if migration.cursor else None
+        while True:
+            if self._cancelled():
+                logger.info(f"重新嵌入迁移 {migration.id} 已取消，停止回填")
+                return migration
+            points, next_offset = self.client.scroll(
+                collection_name=migration.source_collection,
+                limit=self.batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            if points:
+                self._process_batch(points, next_offset)
+            if next_offset is None:
+                break
+            offset = next_offset
+
+        pruned = self._prune_target()
+        migration.status = 'ready'
+        migration.stats = {**self._stats(), 'pruned_points': pruned}
+        updated = KnowledgeEmbeddingMigration.objects.filter(id=migration.id, status='running').update(
+            status='ready', stats=migration.stats, heartbeat_at=timezone.now()
+        )
+        if not updated:
+            migration.refresh_from_db()
+        logger.info(f"重新嵌入回填完成 {migration.id}: {migration.stats}")
+        return migration
+
+    def _cancelled(self) -> bool:
+        status = KnowledgeEmbeddingMigration.objects.filter(id=self.migration.id).values_list('status', flat=True).first()
+        if status != 'running':
+            self.migration.status = status
+            return True
+        return False
+
+    def _process_batch(self, points, next_offset) -> None:
+        migration = self.migration
+        started = time.monotonic()
+        errors = []
+
+        # 精简 payload 的点不含正文，从数据库按条目 ID 取，多块文档再按分块字符区间截取
+        missing = {
+            str(point.payload.get('metadata', {}).get('item_id')): point
+            for point in points
+            if not point.payload.get('page_content') and point.payload.get('metadata', {}).get('item_id')
+        }
+        contents = {}
+        if missing:
+            ids = [item_id for item_id in missing if item_id.isdigit()]
+            contents = {str(pk): content for pk, content in KnowledgeItem.objects.filter(id__in=ids).values_list('id', 'content')}
+
+        ids, texts, metadatas = [], [], []
+        for point in points:
+            metadata = point.payload.get('metadata') or {}
+            text = point.payload.get('page_content')
+            if not text and str(metadata.get('item_id')) in contents:
+                text = chunk_source_text(contents[str(metadata.get('item_id'))], metadata)
+            if not text:
+                errors.append({'point_id': str(point.id), 'error': "找不到分块正文"})
+                continue
+            ids.append(point.id)
+            texts.append(text)
+            metadatas.append(metadata)
+
+        retries_before = self._retries()
+        if ids:
+            try:
+                self.service.upsert_texts(migration.target_collection, ids, texts, metadatas, self.profile)
+            except Exception as e:
+                # 整批失败时保留游标，交给 Celery 重试（已写入的子批次由嵌入缓存复用）
+                logger.warning(f"重新嵌入 {migration.id} 批次失败: {e}")
+                raise
+        self._adjust_rate(self._retries() - retries_before)
+
+        migration.processed_points += len(points)
+        migration.failed_points += len(errors)
+        migration.cursor = json.dumps(next_offset) if next_offset is not None else None
+        migration.errors = (migration.errors + errors)[:MAX_ERRORS]
+        migration.heartbeat_at = timezone.now()
+        migration.stats = self._stats()
+        KnowledgeEmbeddingMigration.objects.filter(id=migration.id, status='running').update(
+            processed_points=migration.processed_points,
+            failed_points=F('failed_points') + len(errors),
+            cursor=migration.cursor,
+            errors=migration.errors,
+            heartbeat_at=migration.heartbeat_at,
+            stats=migration.stats,
+        )
+        logger.info(
+            f"重新嵌入 {migration.id}: {migration.processed_points}/{migration.total_points}"
+            f"（本批 {len(ids)} 个，失败 {len(errors)}，限速 {self.rate:.1f} 点/秒）"
+        )
+        self._throttle(len(points), time.monotonic() - started)
+
+    def _retries(self) -> int:
+        return self.embeddings.stats().get('retries', 0) if hasattr(self.embeddings, 'stats') else 0
+
+    def _adjust_rate(self, retries: int) -> None:
+        """Embedding 接口开始限流（出现重试）时降速，顺利的批次逐步恢复到上限"""
+        if retries:
+            self.rate = max(MIN_POINTS_PER_SECOND, self.rate * THROTTLE_BACKOFF)
+            logger.warning(f"重新嵌入 {self.migration.id}: Embedding 重试 {retries} 次，降速到 {self.rate:.1f} 点/秒")
+        else:
+            self.rate = min(self.migration.max_points_per_second, self.rate * THROTTLE_RECOVERY)
+
+    def _throttle(self, points: int, elapsed: float) -> None:
+        delay = points / self.rate - elapsed
+        if delay > 0:
+            self._throttled_seconds += delay
+            self.sleep(delay)
+
+    def _prune_target(self) -> int:
+        """删除影子集合中原集合已不存在的点（回填读取之后被删除、又被回填写回的点）"""
+        pruned = 0
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.migration.target_collection,
+                limit=self.batch_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids = [point.id for point in points]
+            if ids:
+                existing = {point.id for point in self.client.retrieve(
+                    self.migration.source_collection, ids=ids, with_payload=False, with_vectors=False
+                )}
+                stale = [point_id for point_id in ids if point_id not in existing]
+                if stale:
+                    self.client.delete(
+                        collection_name=self.migration.target_collection,
+                        points_selector=PointIdsList(points=stale),
+                        wait=True,
+                    )
+                    pruned += len(stale)
+            if offset is None:
+                return pruned
+
+    def _stats(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self._run_started
+        points = self.migration.processed_points - self._run_start_points
+        stats = {
+            'elapsed_seconds': round(elapsed, 2),
+            'throughput': round(points / elapsed, 2) if elapsed else 0.0,
+            'points_per_second': round(self.rate, 2),
+            'throttled_seconds': round(self._throttled_seconds, 2),
+        }
+        if hasattr(self.embeddings, 'stats'):
+            stats['embedding'] = self.embeddings.stats()
+        return stats
@@ -0,0 +1,425 @@
+"""
+检索结果重排序（交叉编码器）
+
+混合检索按向量距离与词法排名融合，排序只反映查询与分块各自的表示是否接近，调用方（如 KnowledgeBaseTool）
+只能多取结果、把边缘分块一并塞进提示词。重排序模型把 (查询, 分块) 成对打分，排序更准，可以只返回少量高分分块：
+
+1. 重排序模型复用路由器的模型配置（LLMModel.model_type='rerank'），请求体与响应解析由 RerankModelAdapter 处理
+2. 每个查询有延迟预算（从检索开始计时）：检索已用完预算时跳过重排序；剩余预算不够给全部候选打分时，
+   按历史每条耗时估算能打分的条数，只对融合排名靠前的候选打分，其余候选按原顺序排在后面；请求超时即放弃重排序
+3. (模型, 查询, 分块内容) 的分数缓存在进程内 LRU + Redis，重复查询只为新分块请求打分
+4. 打分后按 top_n 与最低分截断，返回的分块更少
+
+FakeRerankBackend 按字符二元组重合度打分，用于测试和离线开发。
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+from django.conf import settings
+
+from .embedding_service import _get_redis_client
+from .retrieval_cache import normalize_query
+
+logger = logging.getLogger("django")
+
+
+class RerankRequestError(Exception):
+    """重排序请求失败；timeout 表示因超出预算而中止"""
+
+    def __init__(self, message: str, timeout: bool = False):
+        super().__init__(message)
+        self.timeout = timeout
+
+
+def rerank_cache_key(model: str, query: str, content: str) -> str:
+    return hashlib.sha256(f"{model}|{normalize_query(query)}|{content}".encode('utf-8')).hexdigest()
+
+
+# ==================== 后端 ====================
+
+class RouterRerankBackend:
+    """通过路由器中 model_type='rerank' 的模型打分"""
+
+    def __init__(self, llm_model, api_key: str = ''):
+        self.adapter = llm_model.get_adapter()
+        self.model = llm_model.model_id
+        self.api_key = api_key
+        self.custom_headers = llm_model.custom_headers or {}
+        self.max_documents = int((llm_model.adapter_config or {}).get('max_documents') or 100)
+        endpoint = (self.adapter.endpoint or '').rstrip('/')
+        # 端点配置为服务基础地址时补上 /rerank（与 Embedding 端点的处理一致）
+        self.url = endpoint if 'rerank' in endpoint.rsplit('/', 1)[-1] else f"{endpoint}/rerank"
+
+    @classmethod
+    def from_model_name(cls, model_name: str) -> 'RouterRerankBackend':
+        from django.db.models import Q
+        from llm.config_manager import ModelConfigManager
+        from router.models import LLMModel
+
+        llm_model = LLMModel.objects.select_related('endpoint').filter(
+            Q(model_id=model_name) | Q(name=model_name), model_type='rerank'
+        ).first()
+        if not llm_model:
+            raise ValueError(f"未找到重排序模型: {model_name}")
+        api_key = ModelConfigManager().get_model_config(llm_model.model_id).get('api_key', '')
+        return cls(llm_model, api_key)
+
+    def score(self, query: str, documents: List[str], timeout: float) -> List[Optional[float]]:
+        """
+        返回与 documents 一一对应的分数，响应中缺失的文档为 None
+
+        timeout 为全部子批次共用的总时限：每个子批次只用剩余时间作为请求超时，时间用完时不再发请求
+        """
+        scores: List[Optional[float]] = []
+        deadline = time.monotonic() + timeout
+        for start in range(0, len(documents), self.max_documents):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RerankRequestError(f"重排序超出时限，已完成 {start}/{len(documents)} 条", timeout=True)
+            batch = documents[start:start + self.max_documents]
+            headers = {**self.adapter.get_headers(), **self.custom_headers}
+            if self.api_key:
+                headers['Authorization'] = f"Bearer {self.api_key}"
+            body = self.adapter.prepare_request(query, batch, top_n=len(batch), return_documents=False)
+            try:
+                response = requests.post(self.url, headers=headers, json=body, timeout=remaining)
+            except requests.Timeout as e:
+                raise RerankRequestError(f"重排序请求超时: {e}", timeout=True) from e
+            except requests.RequestException as e:
+                raise RerankRequestError(f"重排序请求异常: {e}") from e
+            if response.status_code != 200:
+                raise RerankRequestError(f"重排序接口错误 {response.status_code}: {response.text[:200]}")
+
+            payload = response.json()
+            # 阿里云 DashScope 原生接口的结果在 output 下
+            if 'output' in payload and 'results' not in payload:
+                payload = payload['output']
+            batch_scores: List[Optional[float]] = [None] * len(batch)
+            for item in self.adapter.parse_response(payload).get('results', []):
+                index, value = item.get('index'), item.get('score')
+                if isinstance(index, int) and 0 <= index < len(batch) and value is not None:
+                    batch_scores[index] = float(value)
+            scores.extend(batch_scores)
+        return scores
+
+
+class FakeRerankBackend:
+    """确定性的本地打分：查询与文档的字符二元组重合比例；delay_ms 模拟每条文档的打分耗时"""
+
+    def __init__(self, model: str = 'fake-rerank', delay_ms: float = 0.0):
+        self.model = model
+        self.delay_ms = delay_ms
+        self.calls: List[List[str]] = []
+
+    @staticmethod
+    def _bigrams(text: str) -> set:
+        text = normalize_query(text).replace(' ', '')
+        return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+    def score(self, query: str, documents: List[str], timeout: float) -> List[Optional[float]]:
+        self.calls.append(list(documents))
+        if self.delay_ms:
+            cost = self.delay_ms * len(documents) / 1000
+            if cost > timeout:
+                time.sleep(timeout)
+                raise RerankRequestError("重排序请求超时", timeout=True)
+            time.sleep(cost)
+        query_grams = self._bigrams(query)
+        return [len(query_grams & self._bigrams(document)) / len(query_grams) for document in documents]
+
+
+# ==================== 分数缓存 ====================
+
+class RerankScoreCache:
+    """(模型, 查询, 分块) 分数缓存：进程内 LRU 在前，Redis 共享层（可选）在后"""
+
+    KEY_PREFIX = "knowledge:rerank"
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 86400, shared: bool = True, client=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._client = client
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, float]" = OrderedDict()
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0}
+        self._warned = False
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _get_redis_client()
+        return self._client
+
+    def _shared_error(self, e: Exception) -> None:
+        if not self._warned:
+            logger.warning(f"重排序分数共享缓存不可用，仅使用进程内缓存: {e}")
+            self._warned = True
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, float]:
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+            self._stats['hits'] += len(found)
+
+        remaining = [key for key in keys if key not in found]
+        if remaining and self.shared:
+            try:
+                values = self.client.mget([f"{self.KEY_PREFIX}:{key}" for key in remaining])
+            except Exception as e:
+                self._shared_error(e)
+                values = []
+            shared = {key: float(value) for key, value in zip(remaining, values) if value is not None}
+            if shared:
+                self._remember(shared)
+                found.update(shared)
+            with self._lock:
+                self._stats['shared_hits'] += len(shared)
+
+        with self._lock:
+            self._stats['misses'] += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Dict[str, float]) -> None:
+        if not items:
+            return
+        self._remember(items)
+        if self.shared:
+            try:
+                pipe = self.client.pipeline(transaction=False)
+                for key, value in items.items():
+                    pipe.set(f"{self.KEY_PREFIX}:{key}", repr(value), ex=self.ttl_seconds or None)
+                pipe.execute()
+            except Exception as e:
+                self._shared_error(e)
+
+    def _remember(self, items: Dict[str, float]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, value in items.items():
+                self._lru[key] = value
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._lru)
+        return stats
+
+
+# ==================== 重排序 ====================
+
+class Reranker:
+    """
+    在延迟预算内对检索结果重排序
+
+    budget_ms 为整个查询（检索 + 重排序）的预算；max_candidates 为参与重排序的候选上限；
+    top_n 为重排序后最多返回的条数；min_score 以下的结果丢弃（至少保留一条）。
+    """
+
+    # 每条候选打分耗时的指数滑动平均系数
+    LATENCY_SMOOTHING = 0.3
+    # 剩余预算低于该值时不发请求（网络往返本身的开销）
+    MIN_REQUEST_MS = 20.0
+
+    def __init__(
+        self,
+        backend,
+        budget_ms: float = 1000.0,
+        max_candidates: int = 30,
+        top_n: int = 5,
+        min_score: float = 0.0,
+        cache: Optional[RerankScoreCache] = None
+    ):
+        self.backend = backend
+        self.model = getattr(backend, 'model', type(backend).__name__)
+        self.budget_ms = budget_ms
+        self.max_candidates = max(1, max_candidates)
+        self.top_n = max(1, top_n)
+        self.min_score = min_score
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._ms_per_document: Optional[float] = None
+        self._stats = {'applied': 0, 'partial': 0, 'skipped': 0, 'failed': 0, 'scored': 0, 'cached': 0}
+
+    def rerank(
+        self,
+        query: str,
+        results: Sequence[Dict[str, Any]],
+        limit: int,
+        elapsed_ms: float = 0.0
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        返回 (重排序后的结果, 过程信息)；结果带 rerank_score（未打分的为 None）
+
+        过程信息的 status：applied（全部候选已打分）/ partial（预算不足，只对部分候选打分）/
+        skipped（检索已用完预算）/ failed（请求失败或超时，保留原顺序）
+        """
+        started = time.perf_counter()
+        remaining_ms = self.budget_ms - elapsed_ms
+        candidates = [dict(result) for result in results[:self.max_candidates]]
+        info = {'model': self.model, 'candidates': len(candidates), 'scored': 0, 'cached': 0}
+        if not candidates:
+            return [], self._finish(info, 'applied', started)
+
+        keys = [rerank_cache_key(self.model, query, result['content'] or '') for result in candidates]
+        scores: Dict[int, float] = {}
+        if self.cache is not None:
+            cached = self.cache.get_many(set(keys))
+            scores = {i: cached[key] for i, key in enumerate(keys) if key in cached}
+        info['cached'] = len(scores)
+
+        missing = [i for i in range(len(candidates)) if i not in scores]
+        status = 'applied'
+        if missing:
+            affordable = self._affordable(remaining_ms - (time.perf_counter() - started) * 1000)
+            if affordable <= 0:
+                logger.info(f"检索已用时 {elapsed_ms:.0f}ms，超出重排序预算 {self.budget_ms:.0f}ms，跳过重排序")
+                return self._passthrough(results, limit), self._finish(info, 'skipped', started)
+            if affordable < len(missing):
+                # 融合排名靠后的候选不打分
+                missing, status = missing[:affordable], 'partial'
+
+            request_started = time.perf_counter()
+            timeout_ms = remaining_ms - (request_started - started) * 1000
+            try:
+                fresh = self.backend.score(query, [candidates[i]['content'] or '' for i in missing], timeout_ms / 1000)
+            except Exception as e:
+                logger.warning(f"重排序失败，保留检索顺序: {e}")
+                info['error'] = str(e)
+                return self._passthrough(results, limit), self._finish(info, 'failed', started)
+            self._observe((time.perf_counter() - request_started) * 1000, len(missing))
+
+            new_scores = {}
+            for i, value in zip(missing, fresh):
+                if value is not None:
+                    scores[i] = value
+                    new_scores[keys[i]] = value
+            info['scored'] = len(new_scores)
+            if self.cache is not None:
+                self.cache.set_many(new_scores)
+
+        for i, result in enumerate(candidates):
+            result['rerank_score'] = scores.get(i)
+        scored = sorted((result for result in candidates if result['rerank_score'] is not None),
+                        key=lambda result: result['rerank_score'], reverse=True)
+        unscored = [result for result in candidates if result['rerank_score'] is None]
+
+        kept = [result for result in scored if result['rerank_score'] >= self.min_score] or scored[:1]
+        reranked = (kept + unscored)[:min(limit, self.top_n)]
+        info['dropped'] = len(candidates) - len(reranked)
+        return reranked, self._finish(info, status, started)
+
+    def _affordable(self, remaining_ms: float) -> int:
+        """剩余预算内能打分的候选数；还没有历史耗时时按全部候选计"""
+        if remaining_ms < self.MIN_REQUEST_MS:
+            return 0
+        with self._lock:
+            per_document = self._ms_per_document
+        if not per_document:
+            return self.max_candidates
+        return int(remaining_ms // per_document)
+
+    def _observe(self, duration_ms: float, documents: int) -> None:
+        if documents <= 0:
+            return
+        per_document = duration_ms / documents
+        with self._lock:
+            if self._ms_per_document is None:
+                self._ms_per_document = per_document
+            else:
+                self._ms_per_document += self.LATENCY_SMOOTHING * (per_document - self._ms_per_document)
+
+    def _passthrough(self, results: Sequence[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        return [dict(result, rerank_score=None) for result in results[:limit]]
+
+    def _finish(self, info: Dict[str, Any], status: str, started: float) -> Dict[str, Any]:
+        info['status'] = status
+        info['ms'] = round((time.perf_counter() - started) * 1000, 2)
+        with self._lock:
+            self._stats[status] += 1
+            self._stats['scored'] += info['scored']
+            self._stats['cached'] += info['cached']
+        return info
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['ms_per_document'] = round(self._ms_per_document, 3) if self._ms_per_document else None
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
+
+
+# 重排序模型查找失败后，间隔该秒数再重试（期间检索不做重排序）
+RERANKER_RETRY_SECONDS = 60.0
+
+_reranker: Optional[Reranker] = None
+_reranker_configured = False
+_reranker_retry_at = 0.0
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[Reranker]:
+    """
+    按 settings 创建进程内共享的重排序器，未配置重排序模型或模型不可用时返回 None
+
+    模型查找失败（如数据库暂时不可用、模型尚未录入）不缓存结果，RERANKER_RETRY_SECONDS 后再次查找。
+    """
+    global _reranker, _reranker_configured, _reranker_retry_at
+    if _reranker_configured or time.monotonic() < _reranker_retry_at:
+        return _reranker
+    with _reranker_lock:
+        if not _reranker_configured and time.monotonic() >= _reranker_retry_at:
+            model_name = getattr(settings, 'KNOWLEDGE_RERANK_MODEL', '')
+            if model_name:
+                try:
+                    backend = RouterRerankBackend.from_model_name(model_name)
+                except Exception as e:
+                    logger.warning(
+                        f"重排序模型 {model_name} 不可用，{RERANKER_RETRY_SECONDS:.0f} 秒内检索不做重排序: {e}"
+                    )
+                    _reranker_retry_at = time.monotonic() + RERANKER_RETRY_SECONDS
+                    return None
+                cache_backend = getattr(settings, 'KNOWLEDGE_RERANK_CACHE', 'redis')
+                _reranker = Reranker(
+                    backend,
+                    budget_ms=getattr(settings, 'KNOWLEDGE_RERANK_BUDGET_MS', 1000),
+                    max_candidates=getattr(settings, 'KNOWLEDGE_RERANK_CANDIDATES', 30),
+                    top_n=getattr(settings, 'KNOWLEDGE_RERANK_TOP_N', 5),
+                    min_score=getattr(settings, 'KNOWLEDGE_RERANK_MIN_SCORE', 0.0),
+                    cache=RerankScoreCache(
+                        max_entries=getattr(settings, 'KNOWLEDGE_RERANK_CACHE_SIZE', 10000),
+                        ttl_seconds=getattr(settings, 'KNOWLEDGE_RERANK_CACHE_TTL', 86400),
+                        shared=cache_backend == 'redis',
+                    ) if cache_backend != 'off' else None,
+                )
+            _reranker_configured = True
+    return _reranker
+
+
+def set_reranker(reranker: Optional[Reranker]) -> Optional[Reranker]:
+    """替换进程内的重排序器（None 表示禁用），返回原实例"""
+    global _reranker, _reranker_configured, _reranker_retry_at
+    with _reranker_lock:
+        previous = _reranker
+        _reranker = reranker
+        _reranker_configured = True
+        _reranker_retry_at = 0.0
+    return previous
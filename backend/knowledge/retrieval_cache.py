@@ -0,0 +1,247 @@
+"""
+知识库检索结果缓存
+
+Agent 在一次任务中经常重复发出相同或几乎相同的检索，同一集合的不同请求也会重复检索。每次检索都要嵌入查询、
+查询 Qdrant、做词法检索并写交互记录。这里缓存检索结果：
+
+1. 键为 (Qdrant 集合, 集合版本, 规范化后的查询, top_k, 过滤条件)，查询规范化包括全半角、大小写、空白与首尾标点
+2. 集合写入（存储、更新、删除、批量导入）时递增集合版本，旧版本的键不再命中，无需逐个删除；
+   写入在数据库事务中时，事务提交后才递增版本
+3. 进程内 LRU + Redis 共享层：重复查询在进程内命中约为微秒级，跨进程命中为一次 Redis 往返
+4. 并发的相同查询只检索一次，其余请求等待同一结果
+
+集合版本保存在 Redis，多个进程一致；Redis 不可用时退化为进程内版本与进程内缓存。
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from .embedding_service import _get_redis_client
+
+logger = logging.getLogger("django")
+
+_TRIM_CHARS = ' .,;:!?。，、；：！？'
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询：全角转半角、转小写、合并空白、去掉首尾标点"""
+    text = unicodedata.normalize('NFKC', query or '').lower()
+    return re.sub(r'\s+', ' ', text).strip(_TRIM_CHARS)
+
+
+def retrieval_cache_key(collection: str, version: int, query: str, top_k: int,
+                        filters: Optional[Dict[str, Any]] = None) -> str:
+    material = json.dumps(
+        [collection, version, normalize_query(query), top_k, filters or {}],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class RetrievalCache:
+    """检索结果缓存（进程内 LRU + 可选的 Redis 共享层）"""
+
+    KEY_PREFIX = "knowledge:retrieval"
+    VERSION_PREFIX = "knowledge:collection_version"
+
+    def __init__(self, ttl_seconds: int = 300, max_entries: int = 1000, shared: bool = True, client=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.shared = shared
+        self._client = client
+        self._lock = threading.Lock()
+        # cache_key -> (过期时间, 结果 JSON)；保存 JSON 而不是对象，调用方修改结果不会影响缓存
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._local_versions: Dict[str, int] = {}
+        # 进程内正在检索的键：cache_key -> Future，合并并发的相同查询
+        self._inflight: Dict[str, Future] = {}
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'coalesced': 0, 'invalidations': 0}
+        self._warned = False
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _get_redis_client()
+        return self._client
+
+    def _shared_error(self, e: Exception) -> None:
+        if not self._warned:
+            logger.warning(f"检索缓存共享层不可用，仅使用进程内缓存: {e}")
+            self._warned = True
+
+    # ==================== 集合版本 ====================
+
+    def collection_version(self, collection: str) -> int:
+        if self.shared:
+            try:
+                return int(self.client.get(f"{self.VERSION_PREFIX}:{collection}") or 0)
+            except Exception as e:
+                self._shared_error(e)
+        with self._lock:
+            return self._local_versions.get(collection, 0)
+
+    def bump(self, *collections: Optional[str]) -> None:
+        """集合内容变化后调用，使该集合的所有缓存结果失效"""
+        for collection in {c for c in collections if c}:
+            with self._lock:
+                self._local_versions[collection] = self._local_versions.get(collection, 0) + 1
+                self._stats['invalidations'] += 1
+            if self.shared:
+                try:
+                    self.client.incr(f"{self.VERSION_PREFIX}:{collection}")
+                except Exception as e:
+                    self._shared_error(e)
+
+    # ==================== 读写 ====================
+
+    def _get(self, cache_key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(cache_key)
+                    self._stats['hits'] += 1
+                    return json.loads(entry[1])
+                del self._entries[cache_key]
+
+        if self.shared:
+            try:
+                payload = self.client.get(f"{self.KEY_PREFIX}:{cache_key}")
+            except Exception as e:
+                self._shared_error(e)
+                payload = None
+            if payload:
+                payload = payload.decode('utf-8') if isinstance(payload, bytes) else payload
+                self._remember(cache_key, payload)
+                with self._lock:
+                    self._stats['shared_hits'] += 1
+                return json.loads(payload)
+        return None
+
+    def _remember(self, cache_key: str, payload: str) -> None:
+        with self._lock:
+            self._entries[cache_key] = (time.monotonic() + self.ttl_seconds, payload)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _set(self, cache_key: str, payload: str) -> None:
+        self._remember(cache_key, payload)
+        if self.shared:
+            try:
+                self.client.set(f"{self.KEY_PREFIX}:{cache_key}", payload, ex=self.ttl_seconds)
+            except Exception as e:
+                self._shared_error(e)
+
+    def get_or_retrieve(
+        self,
+        collection: str,
+        query: str,
+        top_k: int,
+        retrieve: Callable[[], Any],
+        filters: Optional[Dict[str, Any]] = None,
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Any, bool]:
+        """
+        返回 (结果, 是否命中缓存)；并发的相同查询等待正在进行的检索
+
+        只有执行检索的请求写入缓存；检索抛出异常时等待者收到同一异常，不写入缓存。
+        cacheable 返回 False 的结果（例如降级的结果）只交给当前等待者，不写入缓存。
+        """
+        cache_key = retrieval_cache_key(collection, self.collection_version(collection), query, top_k, filters)
+        cached = self._get(cache_key)
+        if cached is not None:
+            return cached, True
+
+        with self._lock:
+            running = self._inflight.get(cache_key)
+            if running is None:
+                own_future = Future()
+                self._inflight[cache_key] = own_future
+                self._stats['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+        if running is not None:
+            return json.loads(running.result()), True
+
+        try:
+            result = retrieve()
+            payload = json.dumps(result, ensure_ascii=False, default=str)
+            if cacheable is None or cacheable(result):
+                self._set(cache_key, payload)
+            own_future.set_result(payload)
+        except BaseException as e:
+            own_future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(cache_key, None)
+        return result, False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_retrieval_cache: Optional[RetrievalCache] = None
+_retrieval_cache_configured = False
+_retrieval_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> Optional[RetrievalCache]:
+    """按 settings 创建进程内共享的检索缓存，未启用时返回 None"""
+    global _retrieval_cache, _retrieval_cache_configured
+    if _retrieval_cache_configured:
+        return _retrieval_cache
+    with _retrieval_cache_lock:
+        if not _retrieval_cache_configured:
+            backend = getattr(settings, 'KNOWLEDGE_RETRIEVAL_CACHE', 'redis')
+            if backend != 'off':
+                _retrieval_cache = RetrievalCache(
+                    ttl_seconds=getattr(settings, 'KNOWLEDGE_RETRIEVAL_CACHE_TTL', 300),
+                    max_entries=getattr(settings, 'KNOWLEDGE_RETRIEVAL_CACHE_SIZE', 1000),
+                    shared=backend == 'redis',
+                )
+            _retrieval_cache_configured = True
+    return _retrieval_cache
+
+
+def set_retrieval_cache(cache: Optional[RetrievalCache]) -> Optional[RetrievalCache]:
+    """替换进程内的缓存实例（None 表示禁用），返回原实例"""
+    global _retrieval_cache, _retrieval_cache_configured
+    with _retrieval_cache_lock:
+        previous = _retrieval_cache
+        _retrieval_cache = cache
+        _retrieval_cache_configured = True
+    return previous
+
+
+def invalidate_collections(*collections: Optional[str]) -> None:
+    """
+    递增集合版本（缓存未启用时不做任何事）
+
+    在事务中调用时推迟到提交之后：提交前并发的检索仍读到旧数据并按当前版本写入缓存，
+    提交后递增版本才能让这些结果失效；事务回滚时不递增。不在事务中时立即执行。
+    """
+    cache = get_retrieval_cache()
+    if cache is not None:
+        transaction.on_commit(lambda: cache.bump(*collections))
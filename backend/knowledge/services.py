@@ -3,37 +3,89 @@
 提供知识库相关的业务逻辑服务
 使用 LangChain VectorStore 替代 mem0
 """
+import hashlib
 import json
 import logging
-import os
-from typing import Dict, Any, List, Optional
+import time
+from datetime import timedelta
+from typing import Dict, Any, List, Optional, Tuple
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import CollectionParamsDiff, Disabled, PointStruct, VectorParamsDiff
 from langchain_qdrant import QdrantVectorStore
 from langchain_core.documents import Document
-from langchain_core.embeddings import Embeddings
-from typing import List
 import uuid
 import requests
 
-from .models import KnowledgeCollection, KnowledgeItem, KnowledgeInteraction, KnowledgeConfig
+from .models import (
+    KnowledgeCollection,
+    KnowledgeConfig,
+    KnowledgeEmbeddingMigration,
+    KnowledgeInteractionRollup,
+    KnowledgeItem,
+)
+from .chunking import chunk_document, chunk_source_text, lineage_metadata
 from .config_bridge import knowledge_config_bridge
+from .interactions import bucket_start, record_interaction, serialize_rollup, summarize_rollups
+from .lexical import lexical_search, reciprocal_rank_fusion
+from .qdrant_pool import get_qdrant_registry
+from .retrieval_cache import invalidate_collections
+from .reembedding import mirror_upsert
+from .rerank import Reranker, get_reranker
+from .storage import (
+    DEFAULT_PROFILE,
+    build_payload,
+    quantization_config,
+    requires_reembedding,
+    resolve_profile,
+    search_params,
+    vectors_config,
+)
+from .embedding_service import (
+    BatchedEmbeddings,
+    EmbeddingRequestError,
+    WrappedEmbeddings,
+    estimate_tokens,
+    get_embedding_cache,
+    load_token_counter,
+)
 
 logger = logging.getLogger("django")
 
+# 只被词法检索命中的结果没有向量距离，沿用原数据库检索的固定距离
+LEXICAL_ONLY_DISTANCE = 0.8
 
-class AliyunEmbeddings(Embeddings):
-    """阿里云兼容的嵌入模型"""
+
+class AliyunEmbeddings(BatchedEmbeddings):
+    """阿里云兼容的嵌入模型（缓存、子批次切分与并发请求见 BatchedEmbeddings）"""
     
-    def __init__(self, model: str, api_key: str, base_url: str):
-        self.model = model
+    def __init__(self, model: str, api_key: str, base_url: str, dimensions: Optional[int] = None,
+                 timeout: int = 60, **batch_options):
+        # text-embedding-v4 支持通过 dimensions 参数指定维度
+        if dimensions is None and model == 'text-embedding-v4':
+            dimensions = 2048  # 硬编码使用 2048 维度
+        batch_options.setdefault('cache', get_embedding_cache())
+        super().__init__(model, dimensions, **batch_options)
         self.api_key = api_key
         self.base_url = base_url.rstrip('/')
-        
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """嵌入文档列表"""
+        self.timeout = timeout
+        self._token_counter = None
+        self._token_counter_loaded = False
+
+    def count_tokens(self, text: str) -> int:
+        """使用 KNOWLEDGE_EMBEDDING_TOKENIZER 指定的分词器计数，分块与子批次切分按模型实际的 token 数；未配置或加载失败时估算"""
+        if not self._token_counter_loaded:
+            self._token_counter = load_token_counter(getattr(settings, 'KNOWLEDGE_EMBEDDING_TOKENIZER', 'estimate'))
+            self._token_counter_loaded = True
+        if self._token_counter is None:
+            return estimate_tokens(text)
+        return self._token_counter(text)
+        
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """一次请求嵌入一个子批次"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -44,36 +96,38 @@ class AliyunEmbeddings(Embeddings):
             "model": self.model,
             "input": texts
         }
+        if self.dimensions:
+            data["dimensions"] = self.dimensions
         
-        # text-embedding-v4 支持通过 dimensions 参数指定维度
-        if self.model == 'text-embedding-v4':
-            data["dimensions"] = 2048  # 硬编码使用 2048 维度
-        
-        response = requests.post(
-            f"{self.base_url}/embeddings",
-            headers=headers,
-            json=data
-        )
+        try:
+            response = requests.post(
+                f"{self.base_url}/embeddings",
+                headers=headers,
+                json=data,
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise EmbeddingRequestError(f"Embedding API 请求异常: {e}", retryable=True) from e
         
         if response.status_code != 200:
-            raise Exception(f"Embedding API error: {response.text}")
+            # 限流和服务端错误可以重试，其他错误（如输入超长）需要拆分批次
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise EmbeddingRequestError(f"Embedding API error: {response.text}", retryable=retryable)
         
         result = response.json()
-        embeddings = [item["embedding"] for item in result["data"]]
-        return embeddings
-    
-    def embed_query(self, text: str) -> List[float]:
-        """嵌入单个查询"""
-        return self.embed_documents([text])[0]
+        items = sorted(result["data"], key=lambda item: item.get("index", 0))
+        return [item["embedding"] for item in items]
 
 
 class KnowledgeService:
     """知识库服务类 - 封装所有知识库相关业务逻辑"""
     
     def __init__(self):
+        # 测试或脚本可直接注入 _qdrant_client / _embeddings / _reranker，否则从进程内注册表取用
         self._qdrant_client = None
-        self._vectorstore = None
+        self._qdrant_endpoint = None
         self._embeddings = None
+        self._reranker = None
         self._active_config = None
         
     def get_active_config(self) -> KnowledgeConfig:
@@ -89,121 +143,259 @@ class KnowledgeService:
         return self._active_config
     
     def get_qdrant_client(self) -> QdrantClient:
-        """获取或创建 Qdrant 客户端"""
-        if self._qdrant_client is None:
-            kb_config = self.get_active_config()
+        """获取 Qdrant 客户端（按端点在进程内共享，见 knowledge.qdrant_pool）"""
+        if self._qdrant_client is not None:
+            return self._qdrant_client
+        
+        if self._qdrant_endpoint is None:
+            self.get_active_config()
             vector_config = knowledge_config_bridge.get_vector_store_config()
             
             if vector_config['provider'] != 'qdrant':
                 raise ValueError(f"当前配置的向量存储不是 Qdrant: {vector_config['provider']}")
             
             qdrant_config = vector_config['config']
-            
-            # 临时清除代理环境变量
-            old_proxies = {}
-            proxy_vars = ['http_proxy', 'https_proxy', 'HTTP_PROXY', 'HTTPS_PROXY', 'ALL_PROXY', 'no_proxy', 'NO_PROXY']
-            for var in proxy_vars:
-                if var in os.environ:
-                    old_proxies[var] = os.environ[var]
-                    del os.environ[var]
-            
-            os.environ['NO_PROXY'] = 'localhost,127.0.0.1,*.local'
-            os.environ['no_proxy'] = 'localhost,127.0.0.1,*.local'
-            
-            try:
-                self._qdrant_client = QdrantClient(
-                    host=qdrant_config['host'],
-                    port=qdrant_config['port'],
-                    api_key=qdrant_config.get('api_key'),
-                    prefer_grpc=False,
-                    timeout=10,
-                    https=False
-                )
-                logger.info(f"成功连接到 Qdrant: {qdrant_config['host']}:{qdrant_config['port']}")
-            finally:
-                # 恢复代理设置
-                for var, value in old_proxies.items():
-                    os.environ[var] = value
-                if 'NO_PROXY' not in old_proxies:
-                    del os.environ['NO_PROXY']
-                if 'no_proxy' not in old_proxies:
-                    del os.environ['no_proxy']
-        
-        return self._qdrant_client
+            self._qdrant_endpoint = {
+                'host': qdrant_config['host'],
+                'port': qdrant_config['port'],
+                'api_key': qdrant_config.get('api_key'),
+                'timeout': 10,
+            }
+        
+        return get_qdrant_registry().get_client(self._qdrant_endpoint)
     
-    def get_embeddings(self):
-        """获取嵌入模型实例"""
-        if self._embeddings is None:
+    def get_embeddings(self, dimensions: Optional[int] = None, model: Optional[str] = None):
+        """
+        获取嵌入模型实例
+        
+        Args:
+            dimensions: 与模型默认维度不同时返回该维度的实例（集合存储配置可降低维度）
+            model: 与默认模型（text-embedding-v4）不同时按同一接口配置创建该模型的实例（重新嵌入迁移使用）
+        """
+        if model and model != DEFAULT_PROFILE['embedding_model']:
             embedder_config = knowledge_config_bridge.get_embedder_config()
-            
-            # 从配置中提取必要信息
-            # 硬编码使用 text-embedding-v4，支持 2048 维度
-            model = 'text-embedding-v4'  # 强制使用 v4 模型
-            api_key = embedder_config['config'].get('api_key', '')
-            base_url = embedder_config['config'].get('openai_base_url') or embedder_config['config'].get('base_url')
-            provider = embedder_config.get('provider', 'openai')
-            
-            # 根据 provider 选择合适的嵌入类
-            if provider in ['openai', 'aliyun'] and 'dashscope.aliyuncs.com' in (base_url or ''):
-                # 使用自定义的阿里云嵌入类
-                self._embeddings = AliyunEmbeddings(
-                    model=model,
-                    api_key=api_key,
-                    base_url=base_url
-                )
-                logger.info(f"初始化阿里云嵌入模型: {model} (硬编码2048维), base_url: {base_url}")
-            else:
-                # 使用标准的 OpenAI 嵌入类
-                from langchain_openai import OpenAIEmbeddings
-                self._embeddings = OpenAIEmbeddings(
-                    model=model,
-                    openai_api_key=api_key,
-                    openai_api_base=base_url
+            base = get_qdrant_registry().get_embeddings(
+                (self._embeddings_key(embedder_config), model),
+                lambda: self._create_embeddings(embedder_config, model)
+            )
+        else:
+            if self._embeddings is None:
+                embedder_config = knowledge_config_bridge.get_embedder_config()
+                self._embeddings = get_qdrant_registry().get_embeddings(
+                    self._embeddings_key(embedder_config),
+                    lambda: self._create_embeddings(embedder_config)
                 )
-                logger.info(f"初始化 OpenAI 嵌入模型: {model} (硬编码2048维), base_url: {base_url}")
+            base = self._embeddings
         
-        return self._embeddings
+        # 未指定维度的模型按集合默认维度（2048）创建集合
+        if not dimensions or dimensions == (getattr(base, 'dimensions', None) or DEFAULT_PROFILE['dimensions']):
+            return base
+        return get_qdrant_registry().get_embeddings((base, dimensions), lambda: base.with_dimensions(dimensions))
     
-    def get_or_create_collection(self, collection_name: str) -> None:
-        """获取或创建 Qdrant 集合"""
-        client = self.get_qdrant_client()
-        kb_config = self.get_active_config()
-        
-        # 检查集合是否存在
-        collections = client.get_collections().collections
-        collection_exists = any(c.name == collection_name for c in collections)
+    def embeddings_for(self, profile: Dict[str, Any]):
+        """集合存储配置对应的嵌入模型实例"""
+        return self.get_embeddings(profile['dimensions'], profile['embedding_model'])
+    
+    @staticmethod
+    def _embeddings_key(embedder_config: Dict[str, Any]) -> tuple:
+        config = embedder_config['config']
+        return (
+            embedder_config.get('provider', 'openai'),
+            config.get('api_key', ''),
+            config.get('openai_base_url') or config.get('base_url'),
+        )
+    
+    def _create_embeddings(self, embedder_config: Dict[str, Any], model: str = DEFAULT_PROFILE['embedding_model']):
+        """创建嵌入模型实例"""
+        # 从配置中提取必要信息
+        # 模型由集合存储配置决定，默认 text-embedding-v4（支持 2048 维度）
+        api_key = embedder_config['config'].get('api_key', '')
+        base_url = embedder_config['config'].get('openai_base_url') or embedder_config['config'].get('base_url')
+        provider = embedder_config.get('provider', 'openai')
+        
+        # 子批次切分与并发的限制（阿里云 text-embedding-v4 单次最多 10 条）
+        batch_options = {
+            'max_batch_size': getattr(settings, 'KNOWLEDGE_EMBEDDING_BATCH_SIZE', 10),
+            'max_batch_tokens': getattr(settings, 'KNOWLEDGE_EMBEDDING_BATCH_TOKENS', 32000),
+            'max_workers': getattr(settings, 'KNOWLEDGE_EMBEDDING_CONCURRENCY', 4),
+            'cache': get_embedding_cache(),
+        }
         
-        if not collection_exists:
-            # 创建新集合 - 硬编码使用 2048 维度（text-embedding-v4 支持）
-            embedding_dims = 2048  # 硬编码 2048 维度
-            
-            client.create_collection(
-                collection_name=collection_name,
-                vectors_config=VectorParams(
-                    size=embedding_dims,
-                    distance=Distance.COSINE
-                )
+        # 根据 provider 选择合适的嵌入类
+        if provider in ['openai', 'aliyun'] and 'dashscope.aliyuncs.com' in (base_url or ''):
+            # 使用自定义的阿里云嵌入类
+            embeddings = AliyunEmbeddings(
+                model=model,
+                api_key=api_key,
+                base_url=base_url,
+                **batch_options
             )
-            logger.info(f"创建新的 Qdrant 集合: {collection_name}, 维度: {embedding_dims}")
+            logger.info(f"初始化阿里云嵌入模型: {model} (硬编码2048维), base_url: {base_url}")
         else:
-            logger.info(f"使用现有 Qdrant 集合: {collection_name}")
+            # 使用标准的 OpenAI 嵌入类，外层加上缓存
+            from langchain_openai import OpenAIEmbeddings
+            inner = OpenAIEmbeddings(
+                model=model,
+                openai_api_key=api_key,
+                openai_api_base=base_url
+            )
+            embeddings = WrappedEmbeddings(inner, model=model, **batch_options)
+            logger.info(f"初始化 OpenAI 嵌入模型: {model} (硬编码2048维), base_url: {base_url}")
+        
+        return embeddings
+    
+    def resolve_vector_collection(self, collection_name: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        按数据库集合解析 Qdrant 集合名对应的实际集合与存储配置（见 knowledge.storage）
+        
+        重新嵌入迁移切换后，集合的向量存放在新的 Qdrant 集合中（KnowledgeCollection.vector_collection_name）；
+        没有数据库集合时使用原名与默认配置。
+        """
+        collection = (
+            KnowledgeCollection.objects.filter(qdrant_collection_name=collection_name).first()
+            or KnowledgeCollection.objects.filter(name=collection_name).first()
+        )
+        if collection is None:
+            return collection_name, resolve_profile()
+        return collection.vector_collection_for(collection_name), resolve_profile(collection.storage_profile)
+    
+    def get_or_create_collection(self, collection_name: str, profile: Optional[Dict[str, Any]] = None) -> None:
+        """
+        获取或创建 Qdrant 集合（确认存在后在进程内记住，不再重复列出集合）
+        
+        profile 为 None 时 collection_name 按数据库集合解析（见 resolve_vector_collection），
+        否则视为实际的 Qdrant 集合名。
+        """
+        if profile is None:
+            collection_name, profile = self.resolve_vector_collection(collection_name)
+        client = self.get_qdrant_client()
+        
+        def create_if_missing():
+            # 检查集合是否存在
+            collections = client.get_collections().collections
+            collection_exists = any(c.name == collection_name for c in collections)
+            
+            if not collection_exists:
+                # 维度、量化与磁盘存储按集合的存储配置创建（默认 2048 维 float32）
+                client.create_collection(
+                    collection_name=collection_name,
+                    vectors_config=vectors_config(profile),
+                    quantization_config=quantization_config(profile),
+                    on_disk_payload=profile['on_disk_payload']
+                )
+                logger.info(
+                    f"创建新的 Qdrant 集合: {collection_name}, 维度: {profile['dimensions']}, "
+                    f"量化: {profile['quantization']}"
+                )
+            else:
+                logger.info(f"使用现有 Qdrant 集合: {collection_name}")
+        
+        get_qdrant_registry().ensure_collection(client, collection_name, create_if_missing)
     
-    def get_vectorstore(self, collection_name: str) -> QdrantVectorStore:
-        """获取或创建向量存储实例"""
+    def get_vectorstore(self, collection_name: str, profile: Optional[Dict[str, Any]] = None) -> QdrantVectorStore:
+        """获取向量存储实例（按客户端、集合与 Embedding 在进程内复用；collection_name 的解析同 get_or_create_collection）"""
+        if profile is None:
+            collection_name, profile = self.resolve_vector_collection(collection_name)
         # 确保集合存在
-        self.get_or_create_collection(collection_name)
+        self.get_or_create_collection(collection_name, profile)
         
-        # 创建向量存储
         client = self.get_qdrant_client()
-        embeddings = self.get_embeddings()
+        embeddings = self.embeddings_for(profile)
         
-        vectorstore = QdrantVectorStore(
-            client=client,
+        return get_qdrant_registry().get_vectorstore(
+            client, collection_name, embeddings,
+            lambda: QdrantVectorStore(
+                client=client,
+                collection_name=collection_name,
+                embedding=embeddings
+            )
+        )
+    
+    def add_documents(
+        self,
+        collection_name: str,
+        documents: List[Document],
+        profile: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        """写入向量库；精简 payload 的集合不保存正文（metadata 须包含 item_id，检索时从数据库取正文）"""
+        if profile is None:
+            collection_name, profile = self.resolve_vector_collection(collection_name)
+        vectorstore = self.get_vectorstore(collection_name, profile)
+        if not profile['slim_payload']:
+            return vectorstore.add_documents(documents)
+        
+        ids = [str(uuid.uuid4()) for _ in documents]
+        self.upsert_texts(collection_name, ids, [doc.page_content for doc in documents],
+                          [doc.metadata for doc in documents], profile)
+        return ids
+    
+    def upsert_texts(
+        self,
+        collection_name: str,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        profile: Dict[str, Any]
+    ) -> None:
+        """按存储配置嵌入并写入指定 ID 的点（collection_name 为实际的 Qdrant 集合名）"""
+        vectors = self.embeddings_for(profile).embed_documents(texts)
+        self.get_qdrant_client().upsert(
             collection_name=collection_name,
-            embedding=embeddings
+            points=[
+                PointStruct(id=point_id, vector=vector, payload=build_payload(text, metadata, profile))
+                for point_id, vector, text, metadata in zip(ids, vectors, texts, metadatas)
+            ],
+            wait=True
         )
+    
+    def apply_storage_profile(self, collection: KnowledgeCollection, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        修改集合的存储配置并应用到已有的 Qdrant 集合
+        
+        量化与磁盘存储可以原地修改（Qdrant 在后台重建量化向量）；模型或维度变化需要重新嵌入全部分块，
+        这里拒绝修改，应使用重新嵌入迁移（knowledge.reembedding）。精简 payload 只影响之后写入的分块，
+        已写入的分块检索时照常使用 payload 中的正文。
+        """
+        new_profile = resolve_profile(profile)
+        old_profile = resolve_profile(collection.storage_profile)
+        qdrant_name = collection.qdrant_collection_name or collection.name
+        vector_collection = collection.vector_collection_for(qdrant_name)
+        client = self.get_qdrant_client()
         
-        return vectorstore
+        if requires_reembedding(old_profile, new_profile):
+            raise ValueError(
+                f"集合 {collection.name} 的 Embedding 模型或维度变化（{old_profile['embedding_model']}/"
+                f"{old_profile['dimensions']} -> {new_profile['embedding_model']}/{new_profile['dimensions']}），"
+                f"需要通过重新嵌入迁移切换"
+            )
+        active = collection.embedding_migrations.filter(status__in=KnowledgeEmbeddingMigration.ACTIVE_STATUSES).first()
+        if active:
+            raise ValueError(f"集合 {collection.name} 有进行中的重新嵌入迁移 {active.id}（{active.status}），完成或回滚后再修改")
+        
+        if client.collection_exists(vector_collection):
+            client.update_collection(
+                collection_name=vector_collection,
+                vectors_config={'': VectorParamsDiff(on_disk=new_profile['on_disk_vectors'])},
+                quantization_config=quantization_config(new_profile) or Disabled.DISABLED,
+                collection_params=CollectionParamsDiff(on_disk_payload=new_profile['on_disk_payload'])
+            )
+        
+        collection.storage_profile = profile
+        collection.save(update_fields=['storage_profile', 'updated_at'])
+        invalidate_collections(qdrant_name, collection.name)
+        logger.info(f"集合 {collection.name} 的存储配置: {old_profile['preset']} -> {new_profile['preset']}")
+        return new_profile
+    
+    def get_reranker(self) -> Optional[Reranker]:
+        """获取重排序器（未配置 KNOWLEDGE_RERANK_MODEL 时为 None，见 knowledge.rerank）"""
+        if self._reranker is not None:
+            return self._reranker
+        return get_reranker()
+    
+    def report_vector_store_failure(self) -> None:
+        """向量库请求失败后调用，下次取用客户端前先做健康检查"""
+        if self._qdrant_client is None and self._qdrant_endpoint is not None:
+            get_qdrant_registry().report_failure(self.get_qdrant_client())
     
     @transaction.atomic
     def store_knowledge(
@@ -253,7 +445,7 @@ class KnowledgeService:
         )
         
         # 记录交互
-        KnowledgeInteraction.objects.create(
+        record_interaction(
             collection=collection,
             interaction_type='add_data',
             request_payload={
@@ -266,10 +458,13 @@ class KnowledgeService:
         
         # 尝试存储到向量数据库
         vector_id = None
+        vector_ids = []
         vector_stored = False
         
         try:
-            vectorstore = self.get_vectorstore(collection_name)
+            profile = resolve_profile(collection.storage_profile)
+            # 重新嵌入迁移切换后向量存放在新集合中
+            vector_collection = collection.vector_collection_for(collection_name)
             
             # 准备文档
             doc_metadata = {
@@ -279,28 +474,56 @@ class KnowledgeService:
                 'source': source
             }
             
-            document = Document(
-                page_content=content,
-                metadata=doc_metadata
+            # 超过分块上限的长文本按结构切分（见 knowledge.chunking），各分块的向量指向同一知识项
+            chunks = chunk_document(
+                content,
+                getattr(settings, 'KNOWLEDGE_CHUNK_TOKENS', 512),
+                getattr(settings, 'KNOWLEDGE_CHUNK_OVERLAP_TOKENS', 64),
+                getattr(settings, 'KNOWLEDGE_CHUNK_MIN_TOKENS', 64),
+                getattr(self.embeddings_for(profile), 'count_tokens', None)
             )
+            if len(chunks) > 1:
+                documents = [
+                    Document(
+                        page_content=chunk['text'],
+                        metadata={
+                            **doc_metadata,
+                            'chunk_index': chunk['index'],
+                            'chunk_count': len(chunks),
+                            **lineage_metadata(chunk)
+                        }
+                    )
+                    for chunk in chunks
+                ]
+            else:
+                documents = [Document(page_content=content, metadata=doc_metadata)]
             
             # 添加到向量存储
-            vector_ids = vectorstore.add_documents([document])
+            vector_ids = self.add_documents(vector_collection, documents, profile)
             
             if vector_ids and len(vector_ids) > 0:
                 vector_id = vector_ids[0]
                 vector_stored = True
-                logger.info(f"成功存储到向量数据库: {vector_id}")
+                logger.info(f"成功存储到向量数据库: {vector_id}（{len(vector_ids)} 个分块）")
+                # 重新嵌入迁移进行中时双写
+                mirror_upsert(
+                    self, collection, vector_collection, vector_ids,
+                    [doc.page_content for doc in documents], [doc.metadata for doc in documents]
+                )
             else:
                 logger.warning("向量存储返回空ID列表")
                 
         except Exception as e:
             logger.error(f"向量数据库存储失败 - collection: {collection_name}, 错误: {str(e)}", exc_info=True)
             vector_stored = False
+            self.report_vector_store_failure()
+        
+        invalidate_collections(collection_name)
         
         return {
             'item_id': knowledge_item.id,
             'vector_id': vector_id,
+            'chunk_count': len(vector_ids) if vector_stored else 0,
             'collection': collection_name,
             'vector_stored': vector_stored,
             'content_preview': content[:200] + "..." if len(content) > 200 else content,
@@ -313,33 +536,66 @@ class KnowledgeService:
         collection_name: str = "default",
         user_id: str = "system",
         limit: int = 10,
-        distance_threshold: float = 1.0
+        distance_threshold: float = 1.0,
+        rerank: bool = False
     ) -> Dict[str, Any]:
-        """从知识库检索知识
+        """从知识库检索知识（向量检索 + 词法检索，按倒数排名融合，可选交叉编码器重排序）
         
         Args:
             query: 查询文本
             collection_name: 集合名称
             user_id: 用户ID
             limit: 返回结果数量限制
-            distance_threshold: 余弦距离阈值，范围[0,2]，越小越相似
+            distance_threshold: 余弦距离阈值，范围[0,2]，越小越相似（只作用于向量检索）
+            rerank: 是否重排序；未配置重排序模型时忽略。重排序后最多返回 KNOWLEDGE_RERANK_TOP_N 条
+        
+        Returns:
+            results 按融合分数排序（重排序时按 rerank_score），每条包含 id、score、matched_by；
+            timings 为各阶段耗时（毫秒）；重排序时 rerank 为重排序过程信息；
+            degraded 表示有检索阶段失败（failed_stages 为失败的阶段），结果只来自其余阶段，不应缓存
         """
         
         if not query:
             raise ValueError("查询内容不能为空")
         
         limit = min(limit, 50)  # 限制最大返回数量
+        # 两路各取更多候选再融合，避免只被一路命中的相关结果被截断
+        candidates = min(limit * 3, 100)
+        reranker = self.get_reranker() if rerank else None
+        if reranker is not None:
+            # 重排序从更多候选中挑选，候选数至少为重排序的候选上限
+            candidates = min(max(candidates, reranker.max_candidates), 100)
+        timings = {}
+        failed_stages = []
+        started = time.perf_counter()
+        
+        # collection_name 是 Qdrant 集合名，数据库集合按 qdrant_collection_name 关联
+        collection = None
+        profile = resolve_profile()
+        vector_collection = collection_name
+        try:
+            collection = (
+                KnowledgeCollection.objects.filter(qdrant_collection_name=collection_name).first()
+                or KnowledgeCollection.objects.filter(name=collection_name).first()
+            )
+            if collection:
+                profile = resolve_profile(collection.storage_profile)
+                vector_collection = collection.vector_collection_for(collection_name)
+        except Exception as e:
+            logger.warning(f"读取集合 {collection_name} 失败: {str(e)}")
+            failed_stages.append('collection')
         
-        # 尝试向量搜索
+        # 向量检索
         vector_results = []
-        
+        stage_started = time.perf_counter()
         try:
-            vectorstore = self.get_vectorstore(collection_name)
+            vectorstore = self.get_vectorstore(vector_collection, profile)
             
-            # 执行相似度搜索（返回的是余弦距离）
+            # 执行相似度搜索（返回的是余弦距离）；量化集合先取更多候选再用原始向量重排
             docs_with_scores = vectorstore.similarity_search_with_score(
                 query=query,
-                k=limit
+                k=candidates,
+                search_params=search_params(profile)
             )
             
             for doc, score in docs_with_scores:
@@ -352,84 +608,151 @@ class KnowledgeService:
                         'source': 'vector_db'
                     })
                     
+            vector_results = self._hydrate_slim_results(vector_results)
             logger.info(f"向量搜索返回 {len(vector_results)} 条结果")
             
         except Exception as e:
             logger.warning(f"向量搜索失败: {str(e)}")
+            self.report_vector_store_failure()
+            failed_stages.append('vector')
+        timings['vector_ms'] = round((time.perf_counter() - stage_started) * 1000, 2)
         
-        # 数据库搜索作为备份
-        db_results = []
+        # 词法检索（全文索引，见 knowledge.lexical）
+        lexical_hits = []
+        stage_started = time.perf_counter()
         try:
-            collection = KnowledgeCollection.objects.filter(
-                name=collection_name
-            ).first()
-            
             if collection:
-                items = KnowledgeItem.objects.filter(
-                    collection=collection,
-                    content__icontains=query
-                )[:limit]
-                
-                for item in items:
-                    db_results.append({
-                        'content': item.content,
-                        'distance': 0.8,  # 文本匹配给予固定距离值
-                        'metadata': item.metadata or {},
-                        'source': 'database',
-                        'created_at': item.added_at.isoformat()
-                    })
-                    
-                logger.info(f"数据库搜索返回 {len(db_results)} 条结果")
+                lexical_hits = lexical_search(collection.id, query, candidates)
+                logger.info(f"词法检索返回 {len(lexical_hits)} 条结果")
         except Exception as e:
-            logger.warning(f"数据库搜索失败: {str(e)}")
+            logger.warning(f"词法检索失败: {str(e)}")
+            failed_stages.append('lexical')
+        timings['lexical_ms'] = round((time.perf_counter() - stage_started) * 1000, 2)
+        
+        # 倒数排名融合，按条目 ID 去重（没有 item_id 的向量结果按内容去重）
+        stage_started = time.perf_counter()
+        vector_by_key = {}
+        for result in vector_results:
+            item_id = str((result['metadata'] or {}).get('item_id') or '')
+            key = int(item_id) if item_id.isdigit() else 'content:' + hashlib.sha1(result['content'].encode('utf-8')).hexdigest()
+            vector_by_key.setdefault(key, result)
+        lexical_scores = dict(lexical_hits)
+        fused = reciprocal_rank_fusion({
+            'vector': list(vector_by_key),
+            'lexical': [item_id for item_id, _ in lexical_hits],
+        })
+        lexical_only_ids = [key for key, _, matched in fused if matched == ['lexical']][:limit]
+        lexical_items = KnowledgeItem.objects.in_bulk(lexical_only_ids) if lexical_only_ids else {}
         
-        # 合并并去重结果
         all_results = []
-        seen_contents = set()
-        
-        for result in vector_results + db_results:
-            content_hash = hash(result['content'][:100])  # 使用前100字符作为去重依据
-            if content_hash not in seen_contents:
-                all_results.append(result)
-                seen_contents.add(content_hash)
-        
-        # 按距离排序（越小越相似）
-        all_results.sort(key=lambda x: x['distance'])
+        for key, score, matched in fused:
+            if key in vector_by_key:
+                result = dict(vector_by_key[key])
+            elif key in lexical_items:
+                item = lexical_items[key]
+                result = {
+                    'content': item.content,
+                    'distance': LEXICAL_ONLY_DISTANCE,
+                    'metadata': item.metadata or {},
+                    'source': 'database',
+                    'created_at': item.added_at.isoformat()
+                }
+            else:
+                continue
+            result.update({
+                'id': key if isinstance(key, int) else None,
+                'score': score,
+                'matched_by': matched,
+            })
+            if key in lexical_scores:
+                result['lexical_score'] = lexical_scores[key]
+            all_results.append(result)
+        timings['fusion_ms'] = round((time.perf_counter() - stage_started) * 1000, 2)
+        
+        # 重排序（延迟预算从检索开始计时，超出时跳过或只对部分候选打分）
+        rerank_info = None
+        if reranker is not None:
+            results, rerank_info = reranker.rerank(
+                query, all_results, limit, elapsed_ms=(time.perf_counter() - started) * 1000
+            )
+            timings['rerank_ms'] = rerank_info['ms']
+        else:
+            results = all_results[:limit]
+        timings['total_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(f"混合检索耗时: {timings}")
         
-        # 记录交互
-        try:
-            if collection:
-                KnowledgeInteraction.objects.create(
-                    collection=collection,
-                    interaction_type='search_data',
-                    request_payload={
-                        'query': query,
-                        'user_id': user_id,
-                        'limit': limit,
-                        'threshold': distance_threshold
-                    },
-                    response_payload={
-                        'results_count': len(all_results)
-                    }
-                )
-        except Exception as e:
-            logger.warning(f"记录交互失败: {str(e)}")
+        # 记录交互（缓冲后批量写入，不阻塞检索）
+        if collection:
+            record_interaction(
+                collection=collection,
+                interaction_type='search_data',
+                request_payload={
+                    'query': query,
+                    'user_id': user_id,
+                    'limit': limit,
+                    'threshold': distance_threshold,
+                    'rerank': reranker is not None
+                },
+                response_payload={
+                    'results_count': len(all_results),
+                    'returned_count': len(results),
+                    'rerank_status': rerank_info['status'] if rerank_info else None,
+                    'timings': timings
+                },
+                duration_ms=int(timings['total_ms'])
+            )
         
-        return {
-            'results': all_results[:limit],
+        response = {
+            'results': results,
             'total_count': len(all_results),
-            'vector_results_count': len([r for r in all_results if r['source'] == 'vector_db']),
-            'database_results_count': len([r for r in all_results if r['source'] == 'database'])
+            'vector_results_count': len([r for r in results if r['source'] == 'vector_db']),
+            'database_results_count': len([r for r in results if r['source'] == 'database']),
+            'timings': timings,
+            'degraded': bool(failed_stages)
+        }
+        if failed_stages:
+            response['failed_stages'] = failed_stages
+        if rerank_info is not None:
+            response['rerank'] = rerank_info
+        return response
+    
+    @staticmethod
+    def _hydrate_slim_results(vector_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """精简 payload 的结果没有正文，按 item_id 从数据库批量补齐并按分块字符区间截取；条目已删除的结果丢弃"""
+        slim_ids = {
+            int(item_id) for item_id in (
+                str((result['metadata'] or {}).get('item_id') or '') for result in vector_results if not result['content']
+            ) if item_id.isdigit()
         }
+        if not slim_ids:
+            return vector_results
+        contents = dict(KnowledgeItem.objects.filter(id__in=slim_ids).values_list('id', 'content'))
+        hydrated = []
+        for result in vector_results:
+            if not result['content']:
+                item_id = str((result['metadata'] or {}).get('item_id') or '')
+                if not item_id.isdigit() or int(item_id) not in contents:
+                    continue
+                result['content'] = chunk_source_text(contents[int(item_id)], result['metadata'])
+            hydrated.append(result)
+        return hydrated
     
     def list_collections(self, user_id: str = "system") -> List[Dict[str, Any]]:
         """列出所有可用的知识库集合"""
         collections = KnowledgeCollection.objects.all()
         collection_list = []
+        # 交互次数读取按天汇总（见 KnowledgeInteractionRollup），不扫描原始交互记录
+        interaction_counts = dict(
+            KnowledgeInteractionRollup.objects
+            .filter(period='day')
+            .values('collection_id')
+            .annotate(total=Sum('event_count'))
+            .values_list('collection_id', 'total')
+        )
         
         for collection in collections:
             item_count = KnowledgeItem.objects.filter(collection=collection).count()
-            interaction_count = KnowledgeInteraction.objects.filter(collection=collection).count()
+            interaction_count = interaction_counts.get(collection.id) or 0
             
             collection_list.append({
                 'id': collection.id,
@@ -455,7 +778,7 @@ class KnowledgeService:
             collection = knowledge_item.collection
             
             # 记录删除交互
-            KnowledgeInteraction.objects.create(
+            record_interaction(
                 collection=collection,
                 interaction_type='delete_data',
                 request_payload={
@@ -470,6 +793,7 @@ class KnowledgeService:
             
             # 删除知识项
             knowledge_item.delete()
+            invalidate_collections(collection.qdrant_collection_name, collection.name)
             
             return {
                 'success': True,
@@ -501,9 +825,10 @@ class KnowledgeService:
                 knowledge_item.metadata = metadata
             
             knowledge_item.save()
+            invalidate_collections(knowledge_item.collection.qdrant_collection_name, knowledge_item.collection.name)
             
             # 记录更新交互
-            KnowledgeInteraction.objects.create(
+            record_interaction(
                 collection=knowledge_item.collection,
                 interaction_type='add_data',  # 使用add_data表示更新
                 request_payload={
@@ -531,6 +856,45 @@ class KnowledgeService:
         except KnowledgeItem.DoesNotExist:
             raise ValueError(f"知识项 {item_id} 不存在")
     
+    def get_interaction_analytics(
+        self,
+        collection_name: str,
+        period: str = "hour",
+        hours: int = 24
+    ) -> Dict[str, Any]:
+        """
+        读取集合的交互汇总（不扫描原始交互记录）
+
+        Returns:
+            summary 按交互类型合并整个区间，buckets 为各时间段的汇总（按时间升序）
+        """
+        if period not in ('hour', 'day'):
+            raise ValueError(f"不支持的汇总粒度: {period}")
+        try:
+            collection = KnowledgeCollection.objects.get(name=collection_name)
+        except KnowledgeCollection.DoesNotExist:
+            raise ValueError(f"集合 {collection_name} 不存在")
+
+        since = timezone.now() - timedelta(hours=hours)
+        rollups = list(
+            KnowledgeInteractionRollup.objects.filter(
+                collection=collection,
+                period=period,
+                bucket_start__gte=bucket_start(since, period)
+            ).order_by('bucket_start', 'interaction_type')
+        )
+        by_type: Dict[str, list] = {}
+        for rollup in rollups:
+            by_type.setdefault(rollup.interaction_type, []).append(rollup)
+
+        return {
+            'collection_name': collection_name,
+            'period': period,
+            'since': since.isoformat(),
+            'summary': {interaction_type: summarize_rollups(items) for interaction_type, items in by_type.items()},
+            'buckets': [serialize_rollup(rollup) for rollup in rollups]
+        }
+
     def get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
         """获取集合统计信息"""
         try:
@@ -548,13 +912,18 @@ class KnowledgeService:
                     item_type=item_type
                 ).count()
             
-            # 交互统计
-            interaction_stats = {}
-            for interaction_type in ['add_data', 'search_query', 'search_data', 'get_data', 'delete_data']:
-                interaction_stats[interaction_type] = KnowledgeInteraction.objects.filter(
-                    collection=collection,
-                    interaction_type=interaction_type
-                ).count()
+            # 交互统计：读取按天汇总，不扫描原始交互记录
+            interaction_stats = dict.fromkeys(['add_data', 'search_query', 'search_data', 'get_data', 'delete_data'], 0)
+            rollup_counts = (
+                KnowledgeInteractionRollup.objects
+                .filter(collection=collection, period='day')
+                .values('interaction_type')
+                .annotate(total=Sum('event_count'))
+                .values_list('interaction_type', 'total')
+            )
+            for interaction_type, total in rollup_counts:
+                if interaction_type in interaction_stats:
+                    interaction_stats[interaction_type] = total or 0
             
             # 获取最近的项目
             recent_items = KnowledgeItem.objects.filter(
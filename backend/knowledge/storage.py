@@ -0,0 +1,121 @@
+"""
+集合存储配置（storage profile）
+
+集合默认以 2048 维 float32 向量保存在 Qdrant 内存中，payload 里还保存一份分块正文（KnowledgeItem.content
+已有一份），内存与检索延迟随语料线性增长。每个 KnowledgeCollection 可以在 storage_profile 中选择：
+
+1. 量化：scalar（int8，向量内存约 1/4）或 binary（1 bit，约 1/32），量化向量常驻内存，
+   检索时先按量化向量取 k × oversampling 个候选，再用原始向量重排（rescore）
+2. 输出维度：text-embedding-v4 支持 64～2048 维，维度减半，向量内存与计算量减半
+3. 原始向量、payload 放磁盘（on_disk_vectors / on_disk_payload）
+4. 精简 payload（slim_payload）：payload 只保存条目 ID 等元数据，检索后从数据库批量取正文
+
+Embedding 模型与维度也记录在配置中；修改它们需要重新嵌入全部分块，见 knowledge.reembedding。
+
+storage_profile 为 {'preset': 预设名, ...覆盖项}，空值等同 full。选择配置前可用
+python manage.py benchmark_storage_profiles 对比各配置的召回率、延迟与内存。
+"""
+from typing import Any, Dict, Optional
+
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+)
+
+# text-embedding-v4 支持的输出维度
+SUPPORTED_DIMENSIONS = (2048, 1536, 1024, 768, 512, 256, 128, 64)
+QUANTIZATIONS = ('none', 'scalar', 'binary')
+
+DEFAULT_PROFILE = {
+    'embedding_model': 'text-embedding-v4',
+    'quantization': 'none',     # none / scalar / binary
+    'dimensions': 2048,         # 向量维度
+    'oversampling': 2.0,        # 量化检索的候选倍数
+    'rescore': True,            # 量化检索后用原始向量重排
+    'on_disk_vectors': False,   # 原始向量放磁盘（启用量化时量化向量仍常驻内存）
+    'on_disk_payload': False,   # payload 放磁盘
+    'slim_payload': False,      # payload 不保存正文，检索时从数据库取
+}
+PRESETS = {
+    'full': {},
+    'scalar': {'quantization': 'scalar', 'on_disk_vectors': True},
+    'binary': {'quantization': 'binary', 'oversampling': 3.0, 'on_disk_vectors': True},
+    'compact': {
+        'quantization': 'scalar', 'dimensions': 1024,
+        'on_disk_vectors': True, 'on_disk_payload': True, 'slim_payload': True,
+    },
+}
+
+
+def resolve_profile(profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """把 {'preset': ..., 覆盖项} 展开为完整配置；配置无效时抛出 ValueError"""
+    profile = dict(profile or {})
+    preset = profile.pop('preset', 'full')
+    if preset not in PRESETS:
+        raise ValueError(f"未知的存储预设: {preset}，可选 {sorted(PRESETS)}")
+    unknown = set(profile) - set(DEFAULT_PROFILE)
+    if unknown:
+        raise ValueError(f"未知的存储配置项: {sorted(unknown)}")
+
+    resolved = {**DEFAULT_PROFILE, **PRESETS[preset], **profile, 'preset': preset}
+    if not isinstance(resolved['embedding_model'], str) or not resolved['embedding_model']:
+        raise ValueError("embedding_model 须为模型名称")
+    if resolved['quantization'] not in QUANTIZATIONS:
+        raise ValueError(f"quantization 须为 {QUANTIZATIONS} 之一")
+    if resolved['dimensions'] not in SUPPORTED_DIMENSIONS:
+        raise ValueError(f"dimensions 须为 {SUPPORTED_DIMENSIONS} 之一")
+    if not isinstance(resolved['oversampling'], (int, float)) or resolved['oversampling'] < 1:
+        raise ValueError("oversampling 须为不小于 1 的数")
+    return resolved
+
+
+def requires_reembedding(old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+    """模型或维度变化时已有向量不可复用"""
+    return old['embedding_model'] != new['embedding_model'] or old['dimensions'] != new['dimensions']
+
+
+def vectors_config(profile: Dict[str, Any]) -> VectorParams:
+    return VectorParams(size=profile['dimensions'], distance=Distance.COSINE, on_disk=profile['on_disk_vectors'])
+
+
+def quantization_config(profile: Dict[str, Any]):
+    if profile['quantization'] == 'scalar':
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    if profile['quantization'] == 'binary':
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def search_params(profile: Dict[str, Any]) -> Optional[SearchParams]:
+    """量化集合的检索参数；未量化时返回 None（使用 Qdrant 默认参数）"""
+    if profile['quantization'] == 'none':
+        return None
+    return SearchParams(quantization=QuantizationSearchParams(
+        rescore=profile['rescore'],
+        oversampling=float(profile['oversampling']),
+    ))
+
+
+def build_payload(content: str, metadata: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Qdrant payload（与 QdrantVectorStore 的 page_content/metadata 结构一致）；精简模式不保存正文"""
+    return {'page_content': '' if profile['slim_payload'] else content, 'metadata': metadata}
+
+
+def vector_memory_bytes(profile: Dict[str, Any], count: int) -> Dict[str, int]:
+    """估算向量占用：ram 为常驻内存，disk 为磁盘（不含 HNSW 图与 payload）"""
+    original = count * profile['dimensions'] * 4
+    quantized = {
+        'none': 0,
+        'scalar': count * profile['dimensions'],
+        'binary': count * ((profile['dimensions'] + 7) // 8),
+    }[profile['quantization']]
+    if profile['on_disk_vectors']:
+        return {'ram': quantized, 'disk': original}
+    return {'ram': original + quantized, 'disk': 0}
@@ -0,0 +1,46 @@
+import logging
+from backend.celery import app
+from backend.utils.db_connection import ensure_db_connection_safe
+from .ingestion import enqueue_ingestion_job, run_ingestion_job, stale_before
+from .models import KnowledgeEmbeddingMigration, KnowledgeIngestionJob
+from .reembedding import enqueue_reembedding, run_reembedding, stale_before as reembedding_stale_before
+
+logger = logging.getLogger('django')
+
+
+@app.task(bind=True, ignore_result=True, name='knowledge.tasks.run_ingestion')
+def run_ingestion_task(self, job_id):
+    """执行或继续批量导入任务，失败时保留游标，可再次提交继续"""
+    ensure_db_connection_safe()
+    job = run_ingestion_job(job_id)
+    return {'job_id': str(job.id), 'status': job.status, 'processed_documents': job.processed_documents}
+
+
+@app.task(bind=True, ignore_result=True, name='knowledge.tasks.resume_stale_ingestion_jobs')
+def resume_stale_ingestion_jobs(self):
+    """重新提交心跳超时（worker 中断）的导入任务"""
+    ensure_db_connection_safe()
+    stale_jobs = list(KnowledgeIngestionJob.objects.filter(status='running', heartbeat_at__lt=stale_before()))
+    for job in stale_jobs:
+        logger.warning(f"批量导入任务 {job.id} 心跳超时，从第 {job.processed_documents + 1} 个文档继续")
+        enqueue_ingestion_job(job)
+    return {'resumed_count': len(stale_jobs)}
+
+
+@app.task(bind=True, ignore_result=True, name='knowledge.tasks.run_reembedding')
+def run_reembedding_task(self, migration_id):
+    """执行或继续重新嵌入回填，失败时保留游标，可再次提交继续"""
+    ensure_db_connection_safe()
+    migration = run_reembedding(migration_id)
+    return {'migration_id': str(migration.id), 'status': migration.status, 'processed_points': migration.processed_points}
+
+
+@app.task(bind=True, ignore_result=True, name='knowledge.tasks.resume_stale_reembeddings')
+def resume_stale_reembeddings(self):
+    """重新提交心跳超时（worker 中断）的重新嵌入迁移"""
+    ensure_db_connection_safe()
+    stale = list(KnowledgeEmbeddingMigration.objects.filter(status='running', heartbeat_at__lt=reembedding_stale_before()))
+    for migration in stale:
+        logger.warning(f"重新嵌入迁移 {migration.id} 心跳超时，从第 {migration.processed_points + 1} 个点继续")
+        enqueue_reembedding(migration)
+    return {'resumed_count': len(stale)}
@@ -0,0 +1,118 @@
+"""
+文档分块测试
+
+1. 按标题切分并记录章节路径、页码与字符区间；过短的章节并入下一章节
+2. 分块不超过 token 上限，章节内切开的分块保留重叠，标题开启的分块不带重叠
+3. 超长 Markdown 表格按行切分并重复表头，HTML 表格与代码块保持完整
+4. store_knowledge 切分长文本，各分块的向量指向同一知识项
+"""
+from django.test import SimpleTestCase, TestCase, override_settings
+from qdrant_client import QdrantClient
+
+from knowledge.chunking import chunk_document, lineage_metadata, parse_blocks
+from knowledge.embedding_service import FakeEmbeddings, estimate_tokens
+from knowledge.services import KnowledgeService
+
+MANUAL = """# 产品手册
+
+## 第 1 页
+
+简介：本手册介绍安装与升级。
+
+### 安装
+
+""" + "安装步骤说明。" * 60 + """
+
+<!-- PAGE_BREAK_2 -->
+
+## 第 2 页
+
+### 升级
+
+<table><tr><td>版本</td><td>日期</td></tr><tr><td>2.0</td><td>十月</td></tr></table>
+
+```bash
+make upgrade
+```
+"""
+
+
+class ChunkingTestCase(SimpleTestCase):
+
+    def test_parse_blocks(self):
+        blocks = parse_blocks(MANUAL)
+        self.assertEqual(
+            [block['type'] for block in blocks],
+            ['heading', 'heading', 'paragraph', 'heading', 'paragraph', 'heading', 'heading', 'table', 'code']
+        )
+        self.assertEqual(blocks[-1]['page'], 2)
+        for block in blocks:
+            self.assertEqual(MANUAL[block['start']:block['end']], block['text'])
+
+    def test_sections_pages_and_limits(self):
+        chunks = chunk_document(MANUAL, max_tokens=200, overlap_tokens=30, min_tokens=20)
+
+        self.assertTrue(all(chunk['token_count'] <= 200 for chunk in chunks))
+        self.assertEqual(chunks[0]['section'], ['产品手册'])
+        self.assertIn("简介", chunks[0]['text'])
+        self.assertEqual(chunks[1]['section'], ['产品手册', '第 1 页', '安装'])
+
+        # 章节内按长度切开的分块以上一分块的结尾开头
+        install = [chunk for chunk in chunks if chunk['section'][-1:] == ['安装']]
+        self.assertGreater(len(install), 1)
+        self.assertTrue(install[1]['text'].startswith("安装步骤说明。"))
+        self.assertLess(install[1]['char_start'], install[1]['char_end'])
+
+        # 过短的"第 2 页"章节并入"升级"，章节路径记录分块开始处的标题
+        upgrade = chunks[-1]
+        self.assertEqual(upgrade['section'], ['产品手册', '第 2 页'])
+        self.assertEqual((upgrade['page_start'], upgrade['page_end']), (2, 2))
+        self.assertTrue(upgrade['text'].startswith("## 第 2 页"))
+        self.assertIn("</table>", upgrade['text'])
+        self.assertIn("make upgrade", upgrade['text'])
+
+    def test_large_table_repeats_header(self):
+        rows = '\n'.join(f"| 项目{i} | 说明说明说明说明{i} |" for i in range(100))
+        chunks = chunk_document(f"| 项目 | 说明 |\n| --- | --- |\n{rows}", max_tokens=120, overlap_tokens=20)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertTrue(chunk['text'].startswith("| 项目 | 说明 |\n| --- | --- |\n| 项目"))
+            self.assertLessEqual(chunk['token_count'], 120)
+        self.assertIn("| 项目99 |", chunks[-1]['text'])
+
+    def test_custom_token_counter(self):
+        words = ' '.join(f"word{i}" for i in range(300))
+        chunks = chunk_document(words, max_tokens=50, overlap_tokens=10, count_tokens=lambda text: len(text.split()))
+
+        self.assertTrue(all(len(chunk['text'].split()) <= 50 for chunk in chunks))
+        self.assertGreater(len(chunks), 300 // 50)
+        self.assertEqual(lineage_metadata(chunks[0])['token_count'], chunks[0]['token_count'])
+        self.assertNotIn('page_start', lineage_metadata(chunks[0]))
+
+    def test_short_text(self):
+        self.assertEqual([chunk['text'] for chunk in chunk_document("短文本")], ["短文本"])
+        self.assertEqual(chunk_document("  \n\n "), [])
+
+
+class StoreKnowledgeChunkingTestCase(TestCase):
+
+    @override_settings(KNOWLEDGE_CHUNK_TOKENS=100, KNOWLEDGE_CHUNK_OVERLAP_TOKENS=10, KNOWLEDGE_CHUNK_MIN_TOKENS=10)
+    def test_long_content_is_chunked(self):
+        client = QdrantClient(':memory:')
+        service = KnowledgeService()
+        service._qdrant_client = client
+        service._embeddings = FakeEmbeddings(dimensions=2048)
+
+        content = "# 长文档\n\n" + "第一部分的内容。" * 40 + "\n\n## 第二部分\n\n" + "第二部分的内容。" * 10
+        stored = service.store_knowledge(content, collection_name='chunked_tester', user_id='tester')
+
+        self.assertGreater(stored['chunk_count'], 1)
+        points, _ = client.scroll('chunked_tester', with_payload=True, limit=100)
+        self.assertEqual(len(points), stored['chunk_count'])
+        self.assertEqual({point.payload['metadata']['item_id'] for point in points}, {str(stored['item_id'])})
+        self.assertTrue(all(estimate_tokens(point.payload['page_content']) <= 100 for point in points))
+        self.assertIn('第二部分', {point.payload['metadata']['section'].split(' > ')[-1] for point in points})
+
+        response = service.retrieve_knowledge("第二部分的内容", collection_name='chunked_tester', distance_threshold=2.0)
+        self.assertEqual([result['id'] for result in response['results']], [stored['item_id']])
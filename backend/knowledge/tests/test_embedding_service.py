@@ -0,0 +1,146 @@
+"""
+知识库 Embedding 服务测试（使用确定性的 FakeEmbeddings，不访问外部接口）
+
+1. 按条数和 token 数切分子批次，并发请求后结果顺序与输入一致
+2. 重复文本和已缓存的文本不再请求；进程内缓存按 float32 打包保存，清空后从共享层读取
+3. 可重试错误退避重试，被拒绝的批次对半拆分
+4. 阿里云嵌入模型按 KNOWLEDGE_EMBEDDING_TOKENIZER 配置的 tokenizer.json 计数，默认估算
+"""
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from knowledge.embedding_service import (
+    BatchedEmbeddings,
+    DiskEmbeddingStore,
+    EmbeddingCache,
+    EmbeddingRequestError,
+    FakeEmbeddings,
+    estimate_tokens,
+)
+from knowledge.services import AliyunEmbeddings
+
+
+class EmbeddingBatchingTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self._backoff = BatchedEmbeddings.RETRY_BACKOFF
+        BatchedEmbeddings.RETRY_BACKOFF = 0
+
+    def tearDown(self):
+        BatchedEmbeddings.RETRY_BACKOFF = self._backoff
+
+    def test_sub_batches_keep_input_order(self):
+        embedder = FakeEmbeddings(max_batch_size=4, max_workers=3)
+        texts = [f"文本 {i}" for i in range(10)]
+
+        vectors = embedder.embed_documents(texts)
+
+        self.assertEqual(sorted(embedder.batch_sizes), [2, 4, 4])
+        self.assertEqual(vectors, [embedder.vector(text) for text in texts])
+        self.assertEqual(embedder.stats()['requests'], 3)
+
+    def test_token_limit_splits_batches(self):
+        embedder = FakeEmbeddings(max_batch_size=10, max_batch_tokens=100)
+        embedder.embed_documents(["中" * 60, "文" * 60, "字" * 30])
+        self.assertEqual(embedder.batch_sizes, [1, 2])
+
+    def test_transient_errors_are_retried(self):
+        embedder = FakeEmbeddings(transient_failures=2)
+        self.assertEqual(len(embedder.embed_documents(["a", "b"])), 2)
+        self.assertEqual(embedder.stats()['retries'], 2)
+
+    def test_rejected_batch_is_split(self):
+        embedder = FakeEmbeddings(max_batch_size=8, reject_texts={"bad"})
+        with self.assertRaises(EmbeddingRequestError):
+            embedder.embed_documents(["a", "b", "c", "bad"])
+        self.assertEqual(embedder.stats()['splits'], 2)
+        self.assertEqual(embedder.stats()['failures'], 1)
+
+
+class EmbeddingCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = EmbeddingCache(max_entries=100, store=DiskEmbeddingStore(self.cache_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_duplicates_and_repeats_hit_cache(self):
+        embedder = FakeEmbeddings(max_batch_size=4, cache=self.cache)
+        texts = ["问题一", "问题二", "问题一"]
+
+        first = embedder.embed_documents(texts)
+        second = embedder.embed_documents(texts)
+
+        self.assertEqual(embedder.batch_sizes, [2])
+        self.assertEqual(first, second)
+        self.assertEqual(first[0], first[2])
+        self.assertEqual(embedder.stats()['cache_hit_rate'], 0.5)
+
+    def test_shared_store_survives_process_cache(self):
+        FakeEmbeddings(cache=self.cache).embed_documents(["共享"])
+        self.cache.clear()
+
+        embedder = FakeEmbeddings(cache=self.cache)
+        vector = embedder.embed_query("共享")
+
+        self.assertEqual(embedder.batch_sizes, [])
+        self.assertEqual(self.cache.stats()['store_hits'], 1)
+        for cached, expected in zip(vector, embedder.vector("共享")):
+            self.assertAlmostEqual(cached, expected, places=6)
+
+    def test_key_includes_model_and_dimensions(self):
+        FakeEmbeddings(dimensions=16, cache=self.cache).embed_query("文本")
+        other = FakeEmbeddings(dimensions=32, cache=self.cache)
+        self.assertEqual(len(other.embed_query("文本")), 32)
+        self.assertEqual(other.batch_sizes, [1])
+
+    def test_lru_stores_packed_vectors(self):
+        cache = EmbeddingCache(max_entries=10)
+        cache.set_many({'k': [0.25] * 2048})
+
+        self.assertEqual(cache.stats()['lru_bytes'], 2048 * 4)
+        self.assertEqual(cache.get_many(['k']), {'k': [0.25] * 2048})
+
+    def test_partial_failure_caches_successful_batches(self):
+        embedder = FakeEmbeddings(max_batch_size=2, reject_texts={"bad"}, cache=self.cache)
+        with self.assertRaises(EmbeddingRequestError):
+            embedder.embed_documents(["a", "b", "c", "bad"])
+
+        retry = FakeEmbeddings(max_batch_size=2, cache=self.cache)
+        retry.embed_documents(["a", "b", "c", "ok"])
+        self.assertEqual(retry.batch_sizes, [2])
+
+
+class EmbeddingTokenCounterTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        # 按空白切分的词表分词器，计数结果与估算明显不同
+        tokenizer = Tokenizer(WordLevel({'[UNK]': 0, '知识库': 1, 'embedding': 2}, unk_token='[UNK]'))
+        tokenizer.pre_tokenizer = Whitespace()
+        self.tokenizer_path = os.path.join(self.tmp_dir, 'tokenizer.json')
+        tokenizer.save(self.tokenizer_path)
+
+    def embeddings(self):
+        return AliyunEmbeddings('text-embedding-v4', api_key='test-key', base_url='http://127.0.0.1:1', cache=None)
+
+    def test_configured_tokenizer_is_used(self):
+        text = '知识库 embedding 分块 切分'
+        with override_settings(KNOWLEDGE_EMBEDDING_TOKENIZER=self.tokenizer_path):
+            self.assertEqual(self.embeddings().count_tokens(text), 4)
+        self.assertNotEqual(estimate_tokens(text), 4)
+
+    def test_default_is_estimate(self):
+        text = '知识库 embedding 分块 切分'
+        self.assertEqual(self.embeddings().count_tokens(text), estimate_tokens(text))
+        with override_settings(KNOWLEDGE_EMBEDDING_TOKENIZER=os.path.join(self.tmp_dir, 'missing.json')):
+            self.assertEqual(self.embeddings().count_tokens(text), estimate_tokens(text))
@@ -0,0 +1,130 @@
+"""
+知识库批量导入测试（Qdrant 使用本地内存模式，Embedding 使用 FakeEmbeddings）
+
+1. 导入后条目与向量一一对应，重新导入未变化的文档全部跳过
+2. 内容变化的文档替换旧分块，不残留旧向量
+3. 写入 Qdrant 失败后任务保留游标，继续执行不产生重复数据
+"""
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from qdrant_client import QdrantClient
+
+from knowledge.embedding_service import FakeEmbeddings
+from knowledge.ingestion import chunk_text, create_ingestion_job, run_ingestion_job
+from knowledge.models import KnowledgeConfig, KnowledgeIngestionJob, KnowledgeItem
+from knowledge.services import KnowledgeService
+
+QDRANT_COLLECTION = 'docs_tester'
+
+
+class FlakyQdrantClient:
+    """第 fail_on 次 upsert 抛出异常，模拟导入过程中 Qdrant 不可用"""
+
+    def __init__(self, client, fail_on):
+        self._client = client
+        self._fail_on = fail_on
+        self._upserts = 0
+
+    def upsert(self, *args, **kwargs):
+        self._upserts += 1
+        if self._upserts == self._fail_on:
+            raise ConnectionError("qdrant unavailable")
+        return self._client.upsert(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class IngestionJobTestCase(TestCase):
+
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(KNOWLEDGE_INGESTION_DIR=self.source_dir)
+        self.settings_override.enable()
+        KnowledgeConfig.objects.create(name='test', is_active=True)
+        self.qdrant = QdrantClient(':memory:')
+        self.service = self._service(self.qdrant)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.source_dir, ignore_errors=True)
+
+    def _service(self, client):
+        service = KnowledgeService()
+        service._qdrant_client = client
+        service._embeddings = FakeEmbeddings(dimensions=2048, max_batch_size=10)
+        return service
+
+    def _documents(self, count, version='v1'):
+        return [
+            {'source_identifier': f'doc-{i}', 'content': f"文档 {i} {version}\n\n" + "正文。" * 200}
+            for i in range(count)
+        ]
+
+    def _ingest(self, documents, service=None, **options):
+        job = create_ingestion_job(documents, 'docs', user_id='tester', chunk_size=300, batch_documents=2, **options)
+        return run_ingestion_job(job.id, service=service or self.service)
+
+    def _point_count(self):
+        return self.qdrant.count(QDRANT_COLLECTION).count
+
+    def test_ingest_and_skip_unchanged(self):
+        job = self._ingest(self._documents(5))
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.processed_documents, job.skipped_documents, job.failed_documents), (5, 0, 0))
+        self.assertEqual(KnowledgeItem.objects.count(), job.total_chunks)
+        self.assertEqual(self._point_count(), job.total_chunks)
+        self.assertGreater(job.stats['chunks_per_second'], 0)
+
+        rerun = self._ingest(self._documents(5))
+        self.assertEqual((rerun.skipped_documents, rerun.total_chunks), (5, 0))
+        self.assertEqual(self._point_count(), job.total_chunks)
+
+    def test_changed_document_replaces_chunks(self):
+        self._ingest(self._documents(3))
+        documents = self._documents(3)
+        documents[1] = {'source_identifier': 'doc-1', 'content': "只剩一个分块"}
+
+        job = self._ingest(documents)
+
+        self.assertEqual((job.skipped_documents, job.total_chunks), (2, 1))
+        items = KnowledgeItem.objects.filter(source_identifier='doc-1')
+        self.assertEqual(list(items.values_list('content', flat=True)), ["只剩一个分块"])
+        self.assertEqual(self._point_count(), KnowledgeItem.objects.count())
+
+    def test_resume_after_interruption(self):
+        flaky = self._service(FlakyQdrantClient(self.qdrant, fail_on=2))
+        job = create_ingestion_job(self._documents(6), 'docs', user_id='tester', chunk_size=300, batch_documents=2)
+
+        with self.assertRaises(ConnectionError):
+            run_ingestion_job(job.id, service=flaky)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_documents), ('failed', 2))
+
+        job = run_ingestion_job(job.id, service=self.service)
+
+        self.assertEqual((job.status, job.processed_documents), ('completed', 6))
+        self.assertEqual(KnowledgeItem.objects.values('source_identifier').distinct().count(), 6)
+        self.assertEqual(self._point_count(), KnowledgeItem.objects.count())
+
+    def test_invalid_documents_are_recorded(self):
+        job = self._ingest([{'source_identifier': 'empty', 'content': ''}, *self._documents(1)])
+
+        self.assertEqual((job.processed_documents, job.failed_documents), (2, 1))
+        self.assertEqual(job.errors[0]['line'], 0)
+
+    def test_completed_job_is_not_rerun(self):
+        job = self._ingest(self._documents(1))
+        again = run_ingestion_job(job.id, service=self.service)
+        self.assertEqual(again.status, 'completed')
+        self.assertEqual(KnowledgeIngestionJob.objects.get(id=job.id).total_chunks, job.total_chunks)
+
+    def test_chunk_text_overlap(self):
+        chunks = chunk_text("甲" * 200 + "\n\n" + "乙" * 200, chunk_size=300, chunk_overlap=50)
+        self.assertEqual(len(chunks), 2)
+        self.assertTrue(chunks[1].startswith("甲" * 50 + "\n\n乙"))
+        self.assertTrue(all(len(chunk) <= 300 for chunk in chunk_text("丙" * 1000, chunk_size=300)))
+        self.assertEqual(chunk_text("短文本", chunk_size=300), ["短文本"])
@@ -0,0 +1,166 @@
+"""
+交互记录缓冲写入与汇总测试
+
+1. 缓冲区按条数写出，批量写入交互记录并保留事件时间
+2. 汇总按小时/天增量累加：次数、命中率、错误数、耗时分位数、高频查询
+3. 集合已删除的事件照常写入但不汇总，缓冲区满时丢弃新事件
+4. record_interaction 在事务提交后才进入缓冲区
+5. 集合统计与集合列表的交互次数读取汇总表，视图构造的交互记录实例同样经缓冲区计入汇总
+"""
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from knowledge.interactions import (
+    InteractionBuffer,
+    record_interaction,
+    record_interaction_log,
+    set_interaction_buffer,
+)
+from knowledge.models import KnowledgeCollection, KnowledgeInteraction, KnowledgeInteractionRollup
+from knowledge.services import KnowledgeService
+
+
+def at(hour, minute=0, day=18):
+    return timezone.make_aware(datetime(2026, 10, day, hour, minute))
+
+
+class InteractionBufferTestCase(TestCase):
+
+    def setUp(self):
+        self.collection = KnowledgeCollection.objects.create(name='analytics', qdrant_collection_name='analytics_tester')
+        self.buffer = InteractionBuffer(flush_size=1000, background=False)
+
+    def search(self, query, results_count, duration_ms, timestamp, **extra):
+        self.buffer.record(
+            collection=self.collection,
+            interaction_type='search_data',
+            request_payload={'query': query},
+            response_payload={'results_count': results_count},
+            duration_ms=duration_ms,
+            timestamp=timestamp,
+            **extra
+        )
+
+    def test_flush_writes_events_in_bulk(self):
+        for minute in range(5):
+            self.search("如何配置", 3, 40, at(9, minute))
+        self.assertEqual(KnowledgeInteraction.objects.count(), 0)
+        self.assertEqual(self.buffer.pending(), 5)
+
+        self.assertEqual(self.buffer.flush(), 5)
+
+        self.assertEqual(KnowledgeInteraction.objects.count(), 5)
+        self.assertEqual(
+            sorted(KnowledgeInteraction.objects.values_list('timestamp', flat=True)),
+            [at(9, minute) for minute in range(5)]
+        )
+        self.assertEqual(self.buffer.stats()['flushed'], 5)
+
+    def test_rollups_accumulate_across_flushes(self):
+        self.search("如何配置 Qdrant？", 3, 40, at(9, 5))
+        self.search("如何配置 qdrant", 0, 120, at(9, 30))
+        self.search("部署", 2, 800, at(9, 50), error_message="timeout")
+        self.buffer.flush()
+        self.search("部署", 1, 30, at(10, 10))
+        self.buffer.flush()
+
+        hour = KnowledgeInteractionRollup.objects.get(period='hour', bucket_start=at(9))
+        self.assertEqual(hour.event_count, 3)
+        self.assertEqual(hour.hit_count, 2)
+        self.assertEqual(hour.error_count, 1)
+        self.assertEqual(hour.top_queries, {'如何配置 qdrant': 2, '部署': 1})
+        self.assertEqual(hour.percentile(0.5), 250)
+        self.assertEqual(hour.percentile(0.99), 1000)
+
+        day = KnowledgeInteractionRollup.objects.get(period='day', bucket_start=at(0))
+        self.assertEqual(day.event_count, 4)
+        self.assertEqual(day.hit_rate, 0.75)
+        self.assertEqual(day.duration_total_ms, 990)
+        self.assertEqual(day.top_queries['部署'], 2)
+        self.assertEqual(KnowledgeInteractionRollup.objects.filter(period='hour').count(), 2)
+
+    def test_deleted_collection_is_not_rolled_up(self):
+        self.search("已删除", 1, 10, at(9))
+        self.collection.delete()
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertIsNone(KnowledgeInteraction.objects.get().collection_id)
+        self.assertFalse(KnowledgeInteractionRollup.objects.exists())
+
+    def test_full_buffer_drops_events(self):
+        buffer = InteractionBuffer(flush_size=1000, max_pending=2, background=False)
+        for _ in range(3):
+            buffer.record(collection=self.collection, interaction_type='add_data')
+        self.assertEqual(buffer.stats()['dropped'], 1)
+        self.assertEqual(buffer.flush(), 2)
+
+    def test_record_interaction_waits_for_commit(self):
+        previous = set_interaction_buffer(self.buffer)
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                record_interaction(collection=self.collection, interaction_type='add_data')
+                self.assertEqual(self.buffer.pending(), 0)
+            self.assertEqual(self.buffer.pending(), 1)
+        finally:
+            set_interaction_buffer(previous)
+
+    def test_service_analytics_reads_rollups(self):
+        now = timezone.now()
+        self.search("报表", 1, 20, now - timedelta(hours=1))
+        self.search("报表", 0, 60, now)
+        self.buffer.flush()
+
+        analytics = KnowledgeService().get_interaction_analytics('analytics', period='hour', hours=3)
+        summary = analytics['summary']['search_data']
+        self.assertEqual(summary['event_count'], 2)
+        self.assertEqual(summary['hit_rate'], 0.5)
+        self.assertEqual(summary['top_queries'], [{'query': '报表', 'count': 2}])
+        self.assertGreaterEqual(len(analytics['buckets']), 1)
+
+    def test_collection_stats_read_rollups(self):
+        self.search("报表", 1, 20, at(9))
+        self.search("报表", 0, 60, at(10, day=19))
+        self.buffer.flush()
+        # 不经过汇总直接写入的原始记录不计入
+        KnowledgeInteraction.objects.create(collection=self.collection, interaction_type='search_data')
+
+        service = KnowledgeService()
+        stats = service.get_collection_stats('analytics')
+        self.assertEqual(stats['interaction_stats']['search_data'], 2)
+        self.assertEqual(stats['interaction_stats']['add_data'], 0)
+        listed = {c['name']: c for c in service.list_collections()}
+        self.assertEqual(listed['analytics']['interaction_count'], 2)
+
+    def test_view_logs_are_rolled_up(self):
+        previous = set_interaction_buffer(self.buffer)
+        self.addCleanup(set_interaction_buffer, previous)
+        interaction_log = KnowledgeInteraction(interaction_type='add_data', request_payload={'user_id': 'tester'})
+        interaction_log.collection = self.collection
+        interaction_log.status_code = 500
+        interaction_log.error_message = "写入失败"
+        with self.captureOnCommitCallbacks(execute=True):
+            record_interaction_log(interaction_log)
+        self.buffer.flush()
+
+        stored = KnowledgeInteraction.objects.get()
+        self.assertEqual((stored.collection_id, stored.status_code), (self.collection.id, 500))
+        self.assertEqual(KnowledgeService().get_collection_stats('analytics')['interaction_stats']['add_data'], 1)
+        rollup = KnowledgeInteractionRollup.objects.get(period='day', interaction_type='add_data')
+        self.assertEqual(rollup.error_count, 1)
+
+
+class RollupPercentileTestCase(SimpleTestCase):
+
+    def test_histogram_percentile(self):
+        buckets = KnowledgeInteractionRollup.LATENCY_BUCKETS_MS
+        histogram = [0] * (len(buckets) + 1)
+        for duration in (3, 8, 8, 90, 20000):
+            histogram[KnowledgeInteractionRollup.latency_bucket(duration)] += 1
+
+        self.assertEqual(KnowledgeInteractionRollup.histogram_percentile(histogram, 0.2), 5)
+        self.assertEqual(KnowledgeInteractionRollup.histogram_percentile(histogram, 0.5), 10)
+        self.assertEqual(KnowledgeInteractionRollup.histogram_percentile(histogram, 0.8), 100)
+        self.assertEqual(KnowledgeInteractionRollup.histogram_percentile(histogram, 1.0), buckets[-1])
+        self.assertIsNone(KnowledgeInteractionRollup.histogram_percentile([], 0.5))
@@ -0,0 +1,67 @@
+"""
+混合检索测试
+
+1. 中文按相邻两字切分，英文按词切分并转小写
+2. BM25 按词项稀有度排序，RRF 融合后两路都命中的结果排在前面
+3. retrieve_knowledge 融合向量与词法结果，按条目 ID 去重并返回各阶段耗时
+"""
+from django.test import SimpleTestCase, TestCase
+from qdrant_client import QdrantClient
+
+from knowledge.embedding_service import FakeEmbeddings
+from knowledge.lexical import BM25Index, build_search_text, query_terms, reciprocal_rank_fusion, tokenize
+from knowledge.models import KnowledgeCollection, KnowledgeConfig, KnowledgeItem
+from knowledge.services import KnowledgeService
+
+
+class LexicalTestCase(SimpleTestCase):
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("RAG 检索增强 v2"), ['rag', '检索', '索增', '增强', 'v2'])
+        self.assertEqual(query_terms("检索 检索"), ['检索'])
+
+    def test_bm25_prefers_rare_terms(self):
+        index = BM25Index([
+            (1, build_search_text("向量数据库 检索")),
+            (2, build_search_text("检索 检索 天气")),
+            (3, build_search_text("天气预报")),
+        ])
+        ranked = index.search(query_terms("向量检索"), 10)
+        self.assertEqual([item_id for item_id, _ in ranked], [1, 2])
+
+    def test_reciprocal_rank_fusion(self):
+        fused = reciprocal_rank_fusion({'vector': [3, 1, 2], 'lexical': [1, 4, 1]})
+        self.assertEqual([key for key, _, _ in fused], [1, 3, 4, 2])
+        self.assertEqual(fused[0][2], ['vector', 'lexical'])
+
+
+class HybridRetrievalTestCase(TestCase):
+
+    def setUp(self):
+        KnowledgeConfig.objects.create(name='test', is_active=True)
+        self.service = KnowledgeService()
+        self.service._qdrant_client = QdrantClient(':memory:')
+        self.service._embeddings = FakeEmbeddings(dimensions=2048)
+        self.service.get_or_create_collection('docs_tester')
+
+    def test_fuses_vector_and_lexical_results(self):
+        contents = ["知识库支持混合检索", "今天的天气预报", "向量数据库使用余弦距离"]
+        stored = [
+            self.service.store_knowledge(content, collection_name='docs_tester', user_id='tester')
+            for content in contents
+        ]
+        # 只在数据库中、未写入向量库的条目只能被词法检索命中
+        lexical_only = KnowledgeItem.objects.create(
+            collection=KnowledgeCollection.objects.get(name='docs'), content="混合检索的融合排序"
+        )
+
+        response = self.service.retrieve_knowledge("知识库支持混合检索", collection_name='docs_tester')
+
+        results = response['results']
+        self.assertEqual(results[0]['id'], stored[0]['item_id'])
+        self.assertEqual(results[0]['matched_by'], ['vector', 'lexical'])
+        ids = [result['id'] for result in results]
+        self.assertEqual(len(ids), len(set(ids)))
+        by_id = {result['id']: result for result in results}
+        self.assertEqual(by_id[lexical_only.id]['source'], 'database')
+        self.assertEqual(set(response['timings']), {'vector_ms', 'lexical_ms', 'fusion_ms', 'total_ms'})
@@ -0,0 +1,117 @@
+"""
+Qdrant 客户端注册表测试（Qdrant 本地内存模式）
+
+1. 同一端点共享客户端，并发取用只创建一次
+2. 健康检查失败时重建客户端，report_failure 后下次取用立即检查
+3. 集合只确认一次，向量存储句柄按集合与 Embedding 复用
+"""
+import threading
+
+from django.test import SimpleTestCase, TestCase
+from qdrant_client import QdrantClient
+
+from knowledge.embedding_service import FakeEmbeddings
+from knowledge.models import KnowledgeConfig
+from knowledge.qdrant_pool import QdrantRegistry, set_qdrant_registry
+from knowledge.services import KnowledgeService
+
+LOCAL = {'location': ':memory:'}
+
+
+class BrokenClient:
+    """健康检查总是失败的客户端"""
+
+    def get_collections(self):
+        raise ConnectionError("connection reset")
+
+    def close(self):
+        pass
+
+
+class QdrantRegistryTestCase(SimpleTestCase):
+
+    def test_client_shared_per_endpoint(self):
+        created = []
+
+        def factory(endpoint):
+            created.append(endpoint)
+            return QdrantClient(**endpoint)
+
+        registry = QdrantRegistry(factory=factory)
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(registry.get_client(LOCAL))) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(client is clients[0] for client in clients))
+        self.assertIsNot(registry.get_client({'location': ':memory:', 'timeout': 5}), clients[0])
+
+    def test_unhealthy_client_is_replaced(self):
+        clients = [BrokenClient(), QdrantClient(':memory:')]
+        registry = QdrantRegistry(factory=lambda endpoint: clients.pop(0), health_check_interval=0)
+
+        broken = registry.get_client(LOCAL)
+        replacement = registry.get_client(LOCAL)
+
+        self.assertIsInstance(broken, BrokenClient)
+        self.assertIsInstance(replacement, QdrantClient)
+        self.assertIs(registry.get_client(LOCAL), replacement)
+        self.assertEqual(registry.stats()['reconnects'], 1)
+
+    def test_report_failure_forces_check(self):
+        registry = QdrantRegistry(factory=lambda endpoint: QdrantClient(**endpoint), health_check_interval=3600)
+        client = registry.get_client(LOCAL)
+        registry.ensure_collection(client, 'docs', lambda: None)
+
+        checks = []
+        original = client.get_collections
+        client.get_collections = lambda: checks.append(1) or original()
+        registry.report_failure(client)
+        self.assertIs(registry.get_client(LOCAL), client)
+        self.assertEqual(len(checks), 1)
+        self.assertEqual(registry.stats()['collections'], 0)
+
+    def test_collection_and_vectorstore_reuse(self):
+        registry = QdrantRegistry()
+        client = registry.get_client(LOCAL)
+        created, handles = [], []
+        embeddings = object()
+
+        for _ in range(3):
+            registry.ensure_collection(client, 'docs', lambda: created.append('docs'))
+            handles.append(registry.get_vectorstore(client, 'docs', embeddings, object))
+
+        self.assertEqual(created, ['docs'])
+        self.assertTrue(all(handle is handles[0] for handle in handles))
+        self.assertIsNot(registry.get_vectorstore(client, 'other', embeddings, object), handles[0])
+
+
+class KnowledgeServicePoolTestCase(TestCase):
+
+    def setUp(self):
+        KnowledgeConfig.objects.create(name='test', is_active=True)
+        self.registry = QdrantRegistry(factory=lambda endpoint: QdrantClient(':memory:'))
+        self.previous = set_qdrant_registry(self.registry)
+        self.embeddings = FakeEmbeddings(dimensions=2048)
+
+    def tearDown(self):
+        set_qdrant_registry(self.previous)
+
+    def _service(self):
+        service = KnowledgeService()
+        service._embeddings = self.embeddings
+        return service
+
+    def test_services_share_client_and_vectorstore(self):
+        first, second = self._service(), self._service()
+
+        self.assertIs(first.get_qdrant_client(), second.get_qdrant_client())
+        self.assertIs(first.get_vectorstore('docs_tester'), second.get_vectorstore('docs_tester'))
+
+        first.store_knowledge("共享客户端写入的知识", collection_name='docs_tester', user_id='tester')
+        response = second.retrieve_knowledge("共享客户端写入的知识", collection_name='docs_tester')
+        self.assertEqual(response['results'][0]['content'], "共享客户端写入的知识")
+        self.assertEqual(self.registry.stats()['clients_created'], 1)
@@ -0,0 +1,141 @@
+"""
+重新嵌入迁移测试（Qdrant 本地内存模式 + FakeEmbeddings）
+
+1. 回填：影子集合按新维度建立，进度与游标随批推进
+2. 切换后检索走新集合；回滚切回原集合并删除影子集合
+3. 迁移期间的写入双写到影子集合，切换后写回原集合
+4. 精简 payload 的集合从数据库取正文回填（多块文档按分块字符区间截取）；未切换时回滚即取消
+"""
+from django.test import TestCase
+from qdrant_client import QdrantClient
+
+from knowledge.embedding_service import FakeEmbeddings
+from knowledge.models import KnowledgeCollection, KnowledgeEmbeddingMigration
+from knowledge.reembedding import (
+    cleanup_reembedding,
+    create_reembedding_migration,
+    rollback_reembedding,
+    run_reembedding,
+    switch_reembedding,
+)
+from knowledge.services import KnowledgeService
+
+
+class ReembeddingTestCase(TestCase):
+
+    def setUp(self):
+        self.client = QdrantClient(':memory:')
+        self.service = KnowledgeService()
+        self.service._qdrant_client = self.client
+        self.service._embeddings = FakeEmbeddings(dimensions=2048)
+        self.collection = KnowledgeCollection.objects.create(name='manuals', qdrant_collection_name='manuals_tester')
+        for content in ("安装步骤", "升级说明", "常见问题"):
+            self.store(content)
+
+    def store(self, content):
+        stored = self.service.store_knowledge(content, collection_name='manuals_tester', user_id='tester')
+        self.assertTrue(stored['vector_stored'])
+        return stored
+
+    def migrate(self, profile, collection=None):
+        return create_reembedding_migration(
+            collection or self.collection, profile, max_points_per_second=10000, service=self.service
+        )
+
+    def count(self, name):
+        return self.client.count(name, exact=True).count
+
+    def test_backfill_and_switch(self):
+        migration = self.migrate({'dimensions': 1024})
+        self.assertEqual(migration.total_points, 3)
+        self.assertEqual(self.client.get_collection(migration.target_collection).config.params.vectors.size, 1024)
+
+        migration = run_reembedding(migration.id, service=self.service)
+        self.assertEqual(migration.status, 'ready')
+        self.assertEqual(migration.processed_points, 3)
+        self.assertEqual(migration.progress, 100.0)
+        self.assertEqual(self.count(migration.target_collection), 3)
+
+        switch_reembedding(migration)
+        self.collection.refresh_from_db()
+        self.assertEqual(self.collection.vector_collection, migration.target_collection)
+        self.assertEqual(self.collection.storage_profile, {'dimensions': 1024})
+
+        response = self.service.retrieve_knowledge("升级说明", collection_name='manuals_tester', distance_threshold=2.0)
+        self.assertEqual(response['results'][0]['content'], "升级说明")
+        self.assertIn('vector', response['results'][0]['matched_by'])
+
+    def test_writes_are_mirrored(self):
+        migration = self.migrate({'dimensions': 1024})
+        self.store("迁移期间写入")
+        self.assertEqual(self.count(migration.target_collection), 1)
+
+        migration = run_reembedding(migration.id, service=self.service)
+        self.assertEqual(self.count(migration.target_collection), 4)
+
+        switch_reembedding(migration)
+        self.store("切换后写入")
+        self.assertEqual(self.count(migration.target_collection), 5)
+        self.assertEqual(self.count('manuals_tester'), 5)
+
+        migration = rollback_reembedding(migration, service=self.service)
+        self.assertEqual(migration.status, 'rolled_back')
+        self.collection.refresh_from_db()
+        self.assertIsNone(self.collection.vector_collection_name)
+        self.assertEqual(self.collection.storage_profile, {})
+        self.assertFalse(self.client.collection_exists(migration.target_collection))
+
+        response = self.service.retrieve_knowledge("切换后写入", collection_name='manuals_tester', distance_threshold=2.0)
+        self.assertEqual(response['results'][0]['content'], "切换后写入")
+
+    def test_slim_payload_backfill_and_cleanup(self):
+        collection = KnowledgeCollection.objects.create(
+            name='slim', qdrant_collection_name='slim_tester', storage_profile={'preset': 'compact'}
+        )
+        self.service.store_knowledge("精简集合中的知识", collection_name='slim_tester', user_id='tester')
+
+        migration = run_reembedding(self.migrate({'preset': 'full'}, collection).id, service=self.service)
+        points, _ = self.client.scroll(migration.target_collection, with_payload=True)
+        self.assertEqual([point.payload['page_content'] for point in points], ["精简集合中的知识"])
+
+        switch_reembedding(migration)
+        migration = cleanup_reembedding(migration, service=self.service)
+        self.assertEqual(migration.status, 'completed')
+        self.assertFalse(self.client.collection_exists('slim_tester'))
+
+    def test_slim_multi_chunk_uses_chunk_spans(self):
+        collection = KnowledgeCollection.objects.create(
+            name='slim', qdrant_collection_name='slim_tester', storage_profile={'preset': 'compact'}
+        )
+        content = "\n\n".join(
+            f"## 第{section}章\n\n" + "".join(f"第{section}章第{line}条操作说明与注意事项。" for line in range(40))
+            for section in range(1, 6)
+        )
+        stored = self.service.store_knowledge(content, collection_name='slim_tester', user_id='tester')
+        self.assertGreater(stored['chunk_count'], 1)
+
+        points, _ = self.client.scroll('slim_tester', with_payload=True, limit=100)
+        spans = {content[point.payload['metadata']['char_start']:point.payload['metadata']['char_end']] for point in points}
+        self.assertEqual(len(spans), stored['chunk_count'])
+
+        response = self.service.retrieve_knowledge("第3章操作说明", collection_name='slim_tester', distance_threshold=2.0)
+        self.assertIn(response['results'][0]['content'], spans)
+
+        migration = run_reembedding(self.migrate({'preset': 'full'}, collection).id, service=self.service)
+        points, _ = self.client.scroll(migration.target_collection, with_payload=True, limit=100)
+        self.assertEqual({point.payload['page_content'] for point in points}, spans)
+
+    def test_rollback_before_switch_cancels(self):
+        migration = self.migrate({'dimensions': 512})
+        with self.assertRaises(ValueError):
+            self.migrate({'dimensions': 256})
+        with self.assertRaises(ValueError):
+            switch_reembedding(migration)
+
+        migration = rollback_reembedding(migration, service=self.service)
+        self.assertEqual(migration.status, 'cancelled')
+        self.assertFalse(self.client.collection_exists(migration.target_collection))
+        self.assertEqual(run_reembedding(migration.id, service=self.service).status, 'cancelled')
+        self.assertEqual(
+            KnowledgeEmbeddingMigration.objects.filter(status__in=KnowledgeEmbeddingMigration.ACTIVE_STATUSES).count(), 0
+        )
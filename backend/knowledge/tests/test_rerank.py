@@ -0,0 +1,153 @@
+"""
+检索重排序测试（FakeRerankBackend + Qdrant 本地内存模式）
+
+1. 按重排序分数排序并截断到 top_n，低于最低分的结果丢弃
+2. 重复的 (查询, 分块) 命中分数缓存，只为新分块请求打分
+3. 检索已用完预算时跳过；剩余预算不够时只对靠前的候选打分；请求超时保留原顺序
+4. retrieve_knowledge(rerank=True) 返回更少的结果并记录重排序耗时
+5. 分子批次请求共用总时限；模型查找失败不缓存，退避后重试
+"""
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from qdrant_client import QdrantClient
+
+from knowledge import rerank
+from knowledge.embedding_service import FakeEmbeddings
+from knowledge.rerank import (
+    FakeRerankBackend,
+    RerankRequestError,
+    RerankScoreCache,
+    Reranker,
+    RouterRerankBackend,
+    get_reranker,
+)
+from knowledge.services import KnowledgeService
+
+
+def results(*contents):
+    return [{'content': content, 'score': 1.0 / (i + 1), 'id': i} for i, content in enumerate(contents)]
+
+
+class RerankerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.backend = FakeRerankBackend()
+        self.reranker = Reranker(self.backend, budget_ms=1000, top_n=2, cache=RerankScoreCache(shared=False))
+
+    def test_reorders_and_truncates(self):
+        reranked, info = self.reranker.rerank("升级步骤", results("安装说明", "常见问题", "升级步骤说明"), limit=10)
+
+        self.assertEqual(info['status'], 'applied')
+        self.assertEqual([result['content'] for result in reranked], ["升级步骤说明", "安装说明"])
+        self.assertEqual(reranked[0]['rerank_score'], 1.0)
+        self.assertEqual(info['dropped'], 1)
+
+        self.reranker.min_score = 0.5
+        reranked, _ = self.reranker.rerank("升级步骤", results("安装说明", "升级步骤说明"), limit=10)
+        self.assertEqual([result['content'] for result in reranked], ["升级步骤说明"])
+
+    def test_scores_are_cached(self):
+        self.reranker.rerank("升级步骤", results("安装说明", "升级步骤说明"), limit=10)
+        _, info = self.reranker.rerank("升级步骤 ", results("升级步骤说明", "升级回滚"), limit=10)
+
+        self.assertEqual((info['cached'], info['scored']), (1, 1))
+        self.assertEqual(self.backend.calls[-1], ["升级回滚"])
+
+    def test_budget_exhausted_skips(self):
+        reranked, info = self.reranker.rerank("升级步骤", results("安装说明", "升级步骤说明", "常见问题"), limit=3,
+                                              elapsed_ms=1200)
+
+        self.assertEqual(info['status'], 'skipped')
+        self.assertEqual(self.backend.calls, [])
+        self.assertEqual([result['content'] for result in reranked], ["安装说明", "升级步骤说明", "常见问题"])
+
+    def test_partial_rerank_within_budget(self):
+        backend = FakeRerankBackend(delay_ms=10)
+        reranker = Reranker(backend, budget_ms=100, top_n=5)
+        reranker.rerank("问题", results("一", "二"), limit=5)
+
+        contents = [f"第{i}条问题" for i in range(10)]
+        reranked, info = reranker.rerank("问题", results(*contents), limit=5, elapsed_ms=50)
+        self.assertEqual(info['status'], 'partial')
+        self.assertLess(len(backend.calls[-1]), 10)
+        self.assertEqual(backend.calls[-1], contents[:len(backend.calls[-1])])
+        self.assertIsNone(reranked[-1]['rerank_score'])
+
+    def test_timeout_keeps_order(self):
+        reranker = Reranker(FakeRerankBackend(delay_ms=100), budget_ms=60)
+        reranked, info = reranker.rerank("问题", results("一", "二", "三"), limit=2)
+
+        self.assertEqual(info['status'], 'failed')
+        self.assertEqual([result['content'] for result in reranked], ["一", "二"])
+
+
+class RouterRerankBackendTestCase(SimpleTestCase):
+
+    def setUp(self):
+        adapter = mock.Mock(endpoint='https://rerank.example.com/v1')
+        adapter.get_headers.return_value = {}
+        adapter.parse_response.return_value = {'results': [{'index': 0, 'score': 0.5}]}
+        llm_model = mock.Mock(model_id='rerank-model', custom_headers={}, adapter_config={'max_documents': 2})
+        llm_model.get_adapter.return_value = adapter
+        self.backend = RouterRerankBackend(llm_model)
+
+    def test_batches_share_timeout(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'results': []}
+        with mock.patch.object(rerank.time, 'monotonic', side_effect=[0.0, 0.0, 0.6, 1.2]), \
+                mock.patch.object(rerank.requests, 'post', return_value=response) as post:
+            with self.assertRaises(RerankRequestError) as raised:
+                self.backend.score("问题", ["一", "二", "三", "四", "五"], timeout=1.0)
+
+        self.assertTrue(raised.exception.timeout)
+        timeouts = [call.kwargs['timeout'] for call in post.call_args_list]
+        self.assertEqual(len(timeouts), 2)
+        self.assertAlmostEqual(timeouts[0], 1.0)
+        self.assertAlmostEqual(timeouts[1], 0.4)
+
+
+@override_settings(KNOWLEDGE_RERANK_MODEL='rerank-model', KNOWLEDGE_RERANK_CACHE='off')
+class GetRerankerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(rerank, _reranker=None, _reranker_configured=False, _reranker_retry_at=0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lookup_failure_retries_after_backoff(self):
+        backend = FakeRerankBackend()
+        with mock.patch.object(RouterRerankBackend, 'from_model_name', side_effect=[ValueError("未找到"), backend]) as lookup, \
+                mock.patch.object(rerank.time, 'monotonic', return_value=100.0) as monotonic:
+            self.assertIsNone(get_reranker())
+            self.assertIsNone(get_reranker())
+            self.assertEqual(lookup.call_count, 1)
+
+            monotonic.return_value = 100.0 + rerank.RERANKER_RETRY_SECONDS
+            reranker = get_reranker()
+            self.assertIs(reranker.backend, backend)
+            self.assertIs(get_reranker(), reranker)
+            self.assertEqual(lookup.call_count, 2)
+
+
+class RetrieveWithRerankTestCase(TestCase):
+
+    def test_retrieve_knowledge_rerank(self):
+        service = KnowledgeService()
+        service._qdrant_client = QdrantClient(':memory:')
+        service._embeddings = FakeEmbeddings(dimensions=2048)
+        service._reranker = Reranker(FakeRerankBackend(), top_n=2, cache=RerankScoreCache(shared=False))
+        for content in ("安装步骤", "升级步骤与回滚", "常见问题", "联系支持", "升级前备份"):
+            service.store_knowledge(content, collection_name='rerank_tester', user_id='tester')
+
+        plain = service.retrieve_knowledge("升级步骤", collection_name='rerank_tester', distance_threshold=2.0)
+        reranked = service.retrieve_knowledge(
+            "升级步骤", collection_name='rerank_tester', distance_threshold=2.0, rerank=True
+        )
+
+        self.assertEqual(len(plain['results']), 5)
+        self.assertNotIn('rerank', plain)
+        self.assertEqual(len(reranked['results']), 2)
+        self.assertEqual(reranked['results'][0]['content'], "升级步骤与回滚")
+        self.assertEqual(reranked['rerank']['status'], 'applied')
+        self.assertIn('rerank_ms', reranked['timings'])
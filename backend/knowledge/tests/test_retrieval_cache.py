@@ -0,0 +1,166 @@
+"""
+检索结果缓存测试
+
+1. 规范化后相同的查询命中缓存，top_k 或过滤条件不同时不命中
+2. 集合版本递增后缓存失效
+3. 并发的相同查询只检索一次，检索失败或结果不可缓存时不写入缓存
+4. KnowledgeBaseTool 重复检索命中缓存，存储新知识的事务提交后重新检索；Qdrant 不可用时的降级结果不缓存
+"""
+import threading
+import time
+
+from django.test import SimpleTestCase, TestCase
+from qdrant_client import QdrantClient
+
+from knowledge.embedding_service import FakeEmbeddings
+from knowledge.models import KnowledgeConfig
+from knowledge.retrieval_cache import RetrievalCache, normalize_query, set_retrieval_cache
+from tools.libs.retrieval.knowledge_base import KnowledgeBaseTool
+
+
+class UnavailableQdrantClient:
+    """所有请求都抛出异常，模拟 Qdrant 不可用"""
+
+    def __getattr__(self, name):
+        def unavailable(*args, **kwargs):
+            raise ConnectionError("qdrant unavailable")
+        return unavailable
+
+
+class RetrievalCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = RetrievalCache(shared=False)
+        self.calls = []
+
+    def _retrieve(self, value='result'):
+        def retrieve():
+            self.calls.append(value)
+            return {'results': [value]}
+        return retrieve
+
+    def test_normalized_query_hits(self):
+        self.assertEqual(normalize_query("  混合  检索？"), normalize_query("混合 检索"))
+        self.cache.get_or_retrieve('c', "Hybrid  Search?", 10, self._retrieve())
+        result, hit = self.cache.get_or_retrieve('c', "hybrid search", 10, self._retrieve())
+
+        self.assertTrue(hit)
+        self.assertEqual(result, {'results': ['result']})
+        self.cache.get_or_retrieve('c', "hybrid search", 5, self._retrieve())
+        self.cache.get_or_retrieve('c', "hybrid search", 10, self._retrieve(), filters={'distance_threshold': 0.5})
+        self.assertEqual(len(self.calls), 3)
+
+    def test_bump_invalidates_collection(self):
+        self.cache.get_or_retrieve('c', "q", 10, self._retrieve('old'))
+        self.cache.get_or_retrieve('other', "q", 10, self._retrieve('other'))
+        self.cache.bump('c')
+
+        result, hit = self.cache.get_or_retrieve('c', "q", 10, self._retrieve('new'))
+        self.assertEqual((result, hit), ({'results': ['new']}, False))
+        self.assertTrue(self.cache.get_or_retrieve('other', "q", 10, self._retrieve())[1])
+
+    def test_cached_result_is_isolated_and_fast(self):
+        self.cache.get_or_retrieve('c', "q", 10, self._retrieve())
+        result, _ = self.cache.get_or_retrieve('c', "q", 10, self._retrieve())
+        result['results'].append('mutated')
+
+        started = time.perf_counter()
+        for _ in range(100):
+            result, hit = self.cache.get_or_retrieve('c', "q", 10, self._retrieve())
+        self.assertLess((time.perf_counter() - started) / 100, 0.005)
+        self.assertEqual(result, {'results': ['result']})
+
+    def test_concurrent_queries_are_coalesced(self):
+        release = threading.Event()
+
+        def slow_retrieve():
+            self.calls.append(1)
+            release.wait(5)
+            return {'results': ['slow']}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_retrieve('c', "q", 10, slow_retrieve)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        while self.cache.stats()['coalesced'] < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual([result for result, _ in results], [{'results': ['slow']}] * 5)
+
+    def test_failed_retrieval_is_not_cached(self):
+        def failing():
+            raise ConnectionError("qdrant unavailable")
+
+        with self.assertRaises(ConnectionError):
+            self.cache.get_or_retrieve('c', "q", 10, failing)
+        self.assertFalse(self.cache.get_or_retrieve('c', "q", 10, self._retrieve())[1])
+
+    def test_uncacheable_result_is_not_cached(self):
+        def degraded():
+            return {'results': ['unranked'], 'rerank': {'status': 'skipped'}}
+
+        def applied(result):
+            return result['rerank']['status'] == 'applied'
+
+        result, hit = self.cache.get_or_retrieve('c', "q", 10, degraded, cacheable=applied)
+        self.assertEqual((result['results'], hit), (['unranked'], False))
+        self.assertFalse(self.cache.get_or_retrieve('c', "q", 10, self._retrieve())[1])
+
+
+class KnowledgeBaseToolCacheTestCase(TestCase):
+
+    def setUp(self):
+        KnowledgeConfig.objects.create(name='test', is_active=True)
+        self.cache = RetrievalCache(shared=False)
+        self.previous = set_retrieval_cache(self.cache)
+        self.tool = KnowledgeBaseTool()
+        self.tool.service._qdrant_client = QdrantClient(':memory:')
+        self.tool.service._embeddings = FakeEmbeddings(dimensions=2048)
+        self.tool.service.get_or_create_collection('user_7_knowledge')
+
+    def tearDown(self):
+        set_retrieval_cache(self.previous)
+
+    def _run(self, action, **tool_input):
+        return self.tool.execute({'action': action, **tool_input}, user_id=7)
+
+    def test_repeat_retrieval_hits_until_store(self):
+        self._run('store', content="混合检索把向量结果和词法结果融合")
+
+        first = self._run('retrieve', query="混合检索")
+        second = self._run('retrieve', query="混合检索 ")
+        self.assertEqual((first['metadata']['cache_hit'], second['metadata']['cache_hit']), (False, True))
+        self.assertEqual(first['raw_data']['results'], second['raw_data']['results'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._run('store', content="检索缓存按集合版本失效")
+            # 事务提交前集合版本不变
+            self.assertTrue(self._run('retrieve', query="混合检索")['metadata']['cache_hit'])
+        third = self._run('retrieve', query="混合检索")
+        self.assertFalse(third['metadata']['cache_hit'])
+
+    def test_degraded_retrieval_is_not_cached(self):
+        self._run('store', content="混合检索把向量结果和词法结果融合")
+        client = self.tool.service._qdrant_client
+        self.tool.service._qdrant_client = UnavailableQdrantClient()
+
+        degraded = self._run('retrieve', query="混合检索")
+        self.assertTrue(degraded['metadata']['degraded'])
+        response = self.tool.service.retrieve_knowledge("混合检索", collection_name='user_7_knowledge')
+        self.assertEqual(response['failed_stages'], ['vector'])
+        self.assertEqual(degraded['raw_data']['results'][0]['matched_by'], ['lexical'])
+        self.assertFalse(self._run('retrieve', query="混合检索")['metadata']['cache_hit'])
+
+        self.tool.service._qdrant_client = client
+        recovered = self._run('retrieve', query="混合检索")
+        self.assertFalse(recovered['metadata']['cache_hit'])
+        self.assertFalse(recovered['metadata']['degraded'])
+        self.assertIn('vector', recovered['raw_data']['results'][0]['matched_by'])
+        self.assertTrue(self._run('retrieve', query="混合检索")['metadata']['cache_hit'])
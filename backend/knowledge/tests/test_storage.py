@@ -0,0 +1,111 @@
+"""
+集合存储配置测试（Qdrant 本地内存模式 + FakeEmbeddings）
+
+1. 预设展开、覆盖与校验，量化检索参数与内存估算
+2. 降维 + 精简 payload 的集合：按配置维度建集合，payload 不含正文，检索时从数据库补齐
+3. 量化等配置原地修改；修改维度被拒绝（需要重新嵌入）
+"""
+from django.test import SimpleTestCase, TestCase
+from qdrant_client import QdrantClient
+
+from knowledge.embedding_service import FakeEmbeddings
+from knowledge.models import KnowledgeCollection
+from knowledge.services import KnowledgeService
+from knowledge.storage import resolve_profile, search_params, vector_memory_bytes
+
+
+class StorageProfileTestCase(SimpleTestCase):
+
+    def test_resolve_presets_and_overrides(self):
+        self.assertEqual(resolve_profile({})['quantization'], 'none')
+        self.assertEqual(resolve_profile(None)['dimensions'], 2048)
+
+        profile = resolve_profile({'preset': 'compact', 'dimensions': 512})
+        self.assertEqual(profile['preset'], 'compact')
+        self.assertEqual(profile['quantization'], 'scalar')
+        self.assertEqual(profile['dimensions'], 512)
+        self.assertTrue(profile['slim_payload'])
+
+    def test_invalid_profiles(self):
+        for profile in (
+            {'preset': 'tiny'},
+            {'quantization': 'pq'},
+            {'dimensions': 1000},
+            {'oversampling': 0.5},
+            {'compression': True},
+        ):
+            with self.assertRaises(ValueError):
+                resolve_profile(profile)
+
+    def test_search_params(self):
+        self.assertIsNone(search_params(resolve_profile({})))
+        params = search_params(resolve_profile({'preset': 'binary'}))
+        self.assertTrue(params.quantization.rescore)
+        self.assertEqual(params.quantization.oversampling, 3.0)
+
+    def test_vector_memory(self):
+        self.assertEqual(vector_memory_bytes(resolve_profile({}), 1000), {'ram': 8192000, 'disk': 0})
+        self.assertEqual(
+            vector_memory_bytes(resolve_profile({'preset': 'binary'}), 1000),
+            {'ram': 256000, 'disk': 8192000}
+        )
+        self.assertEqual(vector_memory_bytes(resolve_profile({'preset': 'compact'}), 1000)['ram'], 1024000)
+
+    def test_embeddings_with_dimensions(self):
+        embeddings = FakeEmbeddings(dimensions=2048)
+        reduced = embeddings.with_dimensions(512)
+        self.assertIs(embeddings.with_dimensions(2048), embeddings)
+        self.assertEqual(len(reduced.embed_query("降维")), 512)
+        self.assertEqual(embeddings.batch_sizes, [])
+
+
+class CollectionStorageTestCase(TestCase):
+
+    def setUp(self):
+        self.client = QdrantClient(':memory:')
+        self.service = KnowledgeService()
+        self.service._qdrant_client = self.client
+        self.service._embeddings = FakeEmbeddings(dimensions=2048)
+        self.collection = KnowledgeCollection.objects.create(
+            name='manuals',
+            qdrant_collection_name='manuals_tester',
+            storage_profile={'preset': 'compact'},
+        )
+
+    def test_compact_collection_round_trip(self):
+        content = "压缩配置下写入的知识"
+        stored = self.service.store_knowledge(content, collection_name='manuals_tester', user_id='tester')
+        self.assertTrue(stored['vector_stored'])
+
+        self.assertEqual(self.client.get_collection('manuals_tester').config.params.vectors.size, 1024)
+        points, _ = self.client.scroll('manuals_tester', with_payload=True)
+        self.assertEqual(points[0].payload['page_content'], '')
+        self.assertEqual(points[0].payload['metadata']['item_id'], str(stored['item_id']))
+
+        response = self.service.retrieve_knowledge(content, collection_name='manuals_tester', distance_threshold=2.0)
+        top = response['results'][0]
+        self.assertEqual(top['content'], content)
+        self.assertEqual(top['id'], stored['item_id'])
+        self.assertIn('vector', top['matched_by'])
+
+    def test_dimension_change_is_rejected(self):
+        self.service.get_or_create_collection('manuals_tester')
+
+        with self.assertRaises(ValueError):
+            self.service.apply_storage_profile(self.collection, {'preset': 'full'})
+        self.collection.refresh_from_db()
+        self.assertEqual(self.collection.storage_profile, {'preset': 'compact'})
+
+    def test_quantization_change_in_place(self):
+        content = "原地修改量化配置"
+        self.service.store_knowledge(content, collection_name='manuals_tester', user_id='tester')
+
+        for profile in ({'preset': 'compact', 'quantization': 'none'}, {'preset': 'compact', 'quantization': 'binary'}):
+            resolved = self.service.apply_storage_profile(self.collection, profile)
+            self.collection.refresh_from_db()
+            self.assertEqual(self.collection.storage_profile, profile)
+            self.assertEqual(resolved['quantization'], profile['quantization'])
+
+            self.assertEqual(self.client.get_collection('manuals_tester').config.params.vectors.size, 1024)
+            response = self.service.retrieve_knowledge(content, collection_name='manuals_tester', distance_threshold=2.0)
+            self.assertEqual(response['results'][0]['content'], content)
@@ -13,4 +13,12 @@ urlpatterns = [
     path('data/list/', views.KnowledgeListView.as_view(), name='knowledge_list_data'),
     path('data/batch/add/', views.KnowledgeBatchAddView.as_view(), name='knowledge_batch_add'),
     path('data/batch/delete/', views.KnowledgeBatchDeleteView.as_view(), name='knowledge_batch_delete'),
+    path('ingestion/jobs/', views.KnowledgeIngestionJobView.as_view(), name='knowledge_ingestion_create'),
+    path('ingestion/jobs/<uuid:job_id>/', views.KnowledgeIngestionJobDetailView.as_view(), name='knowledge_ingestion_detail'),
+    path('ingestion/jobs/<uuid:job_id>/resume/', views.KnowledgeIngestionJobResumeView.as_view(), name='knowledge_ingestion_resume'),
+    path('collections/storage-profile/', views.KnowledgeStorageProfileView.as_view(), name='knowledge_storage_profile'),
+    path('collections/reembed/', views.KnowledgeReembeddingView.as_view(), name='knowledge_reembedding_create'),
+    path('collections/reembed/<uuid:migration_id>/', views.KnowledgeReembeddingDetailView.as_view(), name='knowledge_reembedding_detail'),
+    path('collections/reembed/<uuid:migration_id>/<str:action>/', views.KnowledgeReembeddingActionView.as_view(), name='knowledge_reembedding_action'),
+    path('analytics/interactions/', views.KnowledgeInteractionAnalyticsView.as_view(), name='knowledge_interaction_analytics'),
 ]
\ No newline at end of file
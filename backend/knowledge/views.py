@@ -20,8 +20,19 @@ from rest_framework.permissions import IsAuthenticated # 假设需要认证
 from qdrant_client import QdrantClient
 # from qdrant_client.http.exceptions import UnexpectedResponseError # 可用于更精确的"未找到集合"判断
 
-from .models import KnowledgeCollection, KnowledgeItem, KnowledgeInteraction, KnowledgeConfig
+from .models import KnowledgeCollection, KnowledgeItem, KnowledgeInteraction, KnowledgeConfig, KnowledgeIngestionJob, KnowledgeEmbeddingMigration
+from .interactions import record_interaction, record_interaction_log
+from .ingestion import DEFAULT_OPTIONS as INGESTION_OPTIONS, create_ingestion_job, enqueue_ingestion_job, serialize_job
+from .reembedding import (
+    cleanup_reembedding,
+    create_reembedding_migration,
+    enqueue_reembedding,
+    rollback_reembedding,
+    serialize_migration,
+    switch_reembedding,
+)
 from .services import KnowledgeService
+from .storage import PRESETS as STORAGE_PRESETS, resolve_profile
 from .config_bridge import knowledge_config_bridge
 
 logger = logging.getLogger(__name__)
@@ -191,7 +202,7 @@ class KnowledgeAddDataView(APIView):
             # logger.error(f"AddDataView 中发生错误: {e}", exc_info=True)
         finally:
             interaction_log.duration_ms = int((time.time() - start_time) * 1000)
-            interaction_log.save()
+            record_interaction_log(interaction_log)
 
         if interaction_log.status_code == status.HTTP_200_OK:
             return Response(response_data, status=status.HTTP_200_OK)
@@ -277,7 +288,7 @@ class KnowledgeSearchView(APIView):
             interaction_log.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         finally:
             interaction_log.duration_ms = int((time.time() - start_time) * 1000)
-            interaction_log.save()
+            record_interaction_log(interaction_log)
 
         if interaction_log.status_code == status.HTTP_200_OK:
             return Response(response_data, status=status.HTTP_200_OK)
@@ -346,11 +357,13 @@ class KnowledgeQueryView(APIView):
 
             # 使用KnowledgeService检索知识
             collection_name_with_user = f"{collection_name}_{user_id}"
+            # 检索结果直接拼进 LLM 提示词，配置了重排序模型时只保留重排序后的少量高分结果
             search_response = knowledge_service.retrieve_knowledge(
                 query=query_text,
                 collection_name=collection_name_with_user,
                 user_id=user_id,
-                limit=limit
+                limit=limit,
+                rerank=True
             )
             
             search_results = search_response.get('results', [])
@@ -417,7 +430,7 @@ class KnowledgeQueryView(APIView):
             # logger.error(f"QueryView 中发生错误: {e}", exc_info=True)
         finally:
             interaction_log.duration_ms = int((time.time() - start_time) * 1000)
-            interaction_log.save()
+            record_interaction_log(interaction_log)
 
         if interaction_log.status_code == status.HTTP_200_OK:
             return Response(response_data, status=status.HTTP_200_OK)
@@ -504,7 +517,7 @@ class KnowledgeUpdateView(APIView):
             
         finally:
             interaction_log.duration_ms = int((time.time() - start_time) * 1000)
-            interaction_log.save()
+            record_interaction_log(interaction_log)
         
         return Response(response_data, status=interaction_log.status_code)
 
@@ -576,7 +589,7 @@ class KnowledgeDeleteView(APIView):
             
         finally:
             interaction_log.duration_ms = int((time.time() - start_time) * 1000)
-            interaction_log.save()
+            record_interaction_log(interaction_log)
         
         return Response(response_data, status=interaction_log.status_code)
 
@@ -731,7 +744,7 @@ class KnowledgeBatchAddView(APIView):
                 logger.error(f"Failed to process item {idx}: {e}")
         
         # 记录交互
-        interaction_log = KnowledgeInteraction.objects.create(
+        record_interaction(
             collection=collection,
             interaction_type='add_data',
             request_payload={
@@ -827,7 +840,7 @@ class KnowledgeBatchDeleteView(APIView):
         for collection_name in collections_affected:
             try:
                 collection = KnowledgeCollection.objects.get(name=collection_name)
-                KnowledgeInteraction.objects.create(
+                record_interaction(
                     collection=collection,
                     interaction_type='delete_data',
                     request_payload={
@@ -854,3 +867,262 @@ class KnowledgeBatchDeleteView(APIView):
             response_data,
             status=status.HTTP_200_OK if not failed_items else status.HTTP_207_MULTI_STATUS
         )
+
+
+class KnowledgeIngestionJobView(APIView):
+    """
+    创建知识库批量导入任务（异步执行）
+    """
+    permission_classes = [IsAuthenticated]  # 启用认证
+
+    def post(self, request, *args, **kwargs):
+        """
+        创建批量导入任务
+
+        请求参数:
+        - documents: 文档列表 (必需)
+          - content: 内容 (必需)
+          - source_identifier: 来源标识 (可选，用于跳过未变化的文档)
+          - metadata: 元数据 (可选)
+          - item_type: 类型 (可选，默认document)
+        - collection_name: 集合名称 (可选，默认default)
+        - user_id: 用户ID (可选，默认system)
+        - options: 导入参数 (可选，chunk_size/chunk_overlap/batch_documents/force)
+        """
+        documents = request.data.get('documents') or request.data.get('items', [])
+        collection_name = request.data.get('collection_name', 'default')
+        user_id = request.data.get('user_id', 'system')
+        options = request.data.get('options') or {}
+
+        if not documents or not isinstance(documents, list):
+            return Response(
+                {"error": "documents must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(options, dict):
+            return Response({"error": "options must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+        unknown_options = set(options) - set(INGESTION_OPTIONS) - {'user_id'}
+        if unknown_options:
+            return Response(
+                {"error": f"unsupported options: {sorted(unknown_options)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        options = {key: value for key, value in options.items() if key != 'user_id'}
+
+        job = create_ingestion_job(documents, collection_name, user_id=user_id, **options)
+        enqueue_ingestion_job(job)
+        job.refresh_from_db()
+        return Response(serialize_job(job), status=status.HTTP_202_ACCEPTED)
+
+
+class KnowledgeIngestionJobDetailView(APIView):
+    """
+    查询批量导入任务的进度与吞吐量
+    """
+    permission_classes = [IsAuthenticated]  # 启用认证
+
+    def get(self, request, job_id, *args, **kwargs):
+        try:
+            job = KnowledgeIngestionJob.objects.select_related('collection').get(id=job_id)
+        except KnowledgeIngestionJob.DoesNotExist:
+            return Response({"error": "Ingestion job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serialize_job(job), status=status.HTTP_200_OK)
+
+
+class KnowledgeIngestionJobResumeView(APIView):
+    """
+    继续失败或中断的批量导入任务（从已提交的游标处继续）
+    """
+    permission_classes = [IsAuthenticated]  # 启用认证
+
+    def post(self, request, job_id, *args, **kwargs):
+        try:
+            job = KnowledgeIngestionJob.objects.select_related('collection').get(id=job_id)
+        except KnowledgeIngestionJob.DoesNotExist:
+            return Response({"error": "Ingestion job not found"}, status=status.HTTP_404_NOT_FOUND)
+        if job.status == 'completed':
+            return Response({"error": "Ingestion job already completed"}, status=status.HTTP_409_CONFLICT)
+
+        enqueue_ingestion_job(job)
+        job.refresh_from_db()
+        return Response(serialize_job(job), status=status.HTTP_202_ACCEPTED)
+
+
+class KnowledgeInteractionAnalyticsView(APIView):
+    """
+    查询集合的交互汇总（小时/天），供知识库看板使用
+    """
+    permission_classes = [IsAuthenticated]  # 启用认证
+
+    def get(self, request, *args, **kwargs):
+        """
+        查询参数:
+        - collection_name: 集合名称 (必需)
+        - period: 汇总粒度 hour/day (默认hour)
+        - hours: 统计最近多少小时 (默认24，最大2160)
+        """
+        collection_name = request.query_params.get('collection_name')
+        period = request.query_params.get('period', 'hour')
+        try:
+            hours = min(int(request.query_params.get('hours', 24)), 2160)
+        except ValueError:
+            return Response({"error": "hours must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not collection_name:
+            return Response({"error": "collection_name is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if period not in ('hour', 'day'):
+            return Response({"error": "period must be 'hour' or 'day'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            analytics = knowledge_service.get_interaction_analytics(collection_name, period=period, hours=hours)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        return Response(analytics, status=status.HTTP_200_OK)
+
+
+class KnowledgeStorageProfileView(APIView):
+    """
+    查看或修改集合的向量存储配置（量化、维度、磁盘存储、精简 payload）
+    """
+    permission_classes = [IsAuthenticated]  # 启用认证
+
+    def get(self, request, *args, **kwargs):
+        """
+        查询参数:
+        - collection_name: 集合名称 (必需)
+        """
+        collection_name = request.query_params.get('collection_name')
+        try:
+            collection = KnowledgeCollection.objects.get(name=collection_name)
+        except KnowledgeCollection.DoesNotExist:
+            return Response({"error": f"Collection '{collection_name}' does not exist"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'collection_name': collection.name,
+            'storage_profile': collection.storage_profile,
+            'resolved': resolve_profile(collection.storage_profile),
+            'presets': STORAGE_PRESETS,
+        }, status=status.HTTP_200_OK)
+
+    def post(self, request, *args, **kwargs):
+        """
+        请求参数:
+        - collection_name: 集合名称 (必需)
+        - storage_profile: 存储配置 (必需)，如 {"preset": "scalar"} 或 {"preset": "compact", "dimensions": 512}
+        """
+        collection_name = request.data.get('collection_name')
+        profile = request.data.get('storage_profile')
+        if not isinstance(profile, dict):
+            return Response({"error": "storage_profile must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            collection = KnowledgeCollection.objects.get(name=collection_name)
+        except KnowledgeCollection.DoesNotExist:
+            return Response({"error": f"Collection '{collection_name}' does not exist"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            resolved = knowledge_service.apply_storage_profile(collection, profile)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'collection_name': collection.name,
+            'storage_profile': collection.storage_profile,
+            'resolved': resolved,
+        }, status=status.HTTP_200_OK)
+
+
+class KnowledgeReembeddingView(APIView):
+    """
+    发起集合的重新嵌入迁移（更换 Embedding 模型或维度，回填在后台执行，期间集合照常可用）
+    """
+    permission_classes = [IsAuthenticated]  # 启用认证
+
+    def post(self, request, *args, **kwargs):
+        """
+        请求参数:
+        - collection_name: 集合名称 (必需)
+        - storage_profile: 新的存储配置 (必需)，如 {"preset": "scalar", "dimensions": 1024}
+        - auto_switch: 回填完成后自动切换 (可选，默认false)
+        - max_points_per_second: 回填限速 (可选)
+        """
+        collection_name = request.data.get('collection_name')
+        profile = request.data.get('storage_profile')
+        if not isinstance(profile, dict):
+            return Response({"error": "storage_profile must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+        max_points_per_second = request.data.get('max_points_per_second')
+        if max_points_per_second is not None:
+            try:
+                max_points_per_second = float(max_points_per_second)
+            except (TypeError, ValueError):
+                return Response({"error": "max_points_per_second must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+            if max_points_per_second <= 0:
+                return Response({"error": "max_points_per_second must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            collection = KnowledgeCollection.objects.get(name=collection_name)
+        except KnowledgeCollection.DoesNotExist:
+            return Response({"error": f"Collection '{collection_name}' does not exist"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            migration = create_reembedding_migration(
+                collection,
+                profile,
+                auto_switch=bool(request.data.get('auto_switch', False)),
+                max_points_per_second=max_points_per_second,
+                service=knowledge_service,
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        enqueue_reembedding(migration)
+        migration.refresh_from_db()
+        return Response(serialize_migration(migration), status=status.HTTP_202_ACCEPTED)
+
+
+class KnowledgeReembeddingDetailView(APIView):
+    """
+    查询重新嵌入迁移的进度与速率
+    """
+    permission_classes = [IsAuthenticated]  # 启用认证
+
+    def get(self, request, migration_id, *args, **kwargs):
+        try:
+            migration = KnowledgeEmbeddingMigration.objects.select_related('collection').get(id=migration_id)
+        except KnowledgeEmbeddingMigration.DoesNotExist:
+            return Response({"error": "Re-embedding migration not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serialize_migration(migration), status=status.HTTP_200_OK)
+
+
+class KnowledgeReembeddingActionView(APIView):
+    """
+    重新嵌入迁移的操作：
+    - switch: 回填完成后切换到新集合
+    - rollback: 切回原集合（未切换时取消迁移），删除影子集合
+    - resume: 继续失败或中断的回填
+    - cleanup: 确认切换后删除原集合
+    """
+    permission_classes = [IsAuthenticated]  # 启用认证
+
+    def post(self, request, migration_id, action, *args, **kwargs):
+        try:
+            migration = KnowledgeEmbeddingMigration.objects.select_related('collection').get(id=migration_id)
+        except KnowledgeEmbeddingMigration.DoesNotExist:
+            return Response({"error": "Re-embedding migration not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            if action == 'switch':
+                migration = switch_reembedding(migration)
+            elif action == 'rollback':
+                migration = rollback_reembedding(migration, service=knowledge_service)
+            elif action == 'cleanup':
+                migration = cleanup_reembedding(migration, service=knowledge_service)
+            elif action == 'resume':
+                if migration.status not in ('pending', 'running', 'failed'):
+                    return Response(
+                        {"error": f"Re-embedding migration is {migration.status}"},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                enqueue_reembedding(migration)
+                migration.refresh_from_db()
+                return Response(serialize_migration(migration), status=status.HTTP_202_ACCEPTED)
+            else:
+                return Response({"error": f"unsupported action: {action}"}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(serialize_migration(migration), status=status.HTTP_200_OK)
@@ -98,7 +98,9 @@ class ModelConfigManager:
                 'params': llm_model.params or {},
                 'vendor_name': llm_model.endpoint.vendor_name,
                 'model_type': llm_model.model_type,
-                'api_standard': llm_model.api_standard
+                'api_standard': llm_model.api_standard,
+                # 结构化输出模式：json_schema / json_object，未配置时只走提示词约束
+                'structured_output': (llm_model.adapter_config or {}).get('structured_output')
             }
             
             # logger.info(f"成功加载模型配置: {model_name}")
@@ -8,6 +8,7 @@ from pathlib import Path
 
 from .retry_utils import LLMRetryHandler, RetryConfig
 from .log_service import LLMLogService
+from .json_repair import parse_llm_json, JSONRepairError
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +18,9 @@ class CoreLLMService:
     只负责调用LLM API，不涉及鉴权和权限
     """
     
+    # ModelConfigManager 返回的配置中仅供本地使用、不能发给厂商API的字段
+    CONFIG_ONLY_KEYS = ('model_type', 'api_standard', 'structured_output')
+    
     def __init__(self):
         self._request_cache = {}
     
@@ -44,6 +48,8 @@ class CoreLLMService:
             enable_logging: 是否启用日志记录
         """
         headers = {'Content-Type': 'application/json'}
+        for key in self.CONFIG_ONLY_KEYS:
+            kwargs.pop(key, None)
         
         # 设置API key
         if api_key:
@@ -485,6 +491,8 @@ Token使用: 输入 {usage.get('prompt_tokens', 'N/A')} | 输出 {usage.get('com
 class StructuredLLMClient:
     """结构化LLM调用客户端"""
     
+    NATIVE_MODES = ('json_schema', 'json_object')
+    
     def __init__(self, core_service: CoreLLMService, output_schema, 
                  model_id: str, endpoint: str, api_key: str, 
                  custom_headers: Optional[Dict] = None, 
@@ -492,9 +500,14 @@ class StructuredLLMClient:
                  user=None, session_id: str = None,
                  model_name: str = None, vendor_name: str = None,
                  vendor_id: str = None, source_app: str = None,
-                 source_function: str = None, **kwargs):
+                 source_function: str = None,
+                 structured_output: Optional[str] = None, **kwargs):
         self.core_service = core_service
         self.output_schema = output_schema
+        # 厂商原生的结构化输出模式（来自 LLMModel.adapter_config.structured_output）
+        self.structured_output = structured_output if structured_output in self.NATIVE_MODES else None
+        # 最近一次 invoke 的解码信息：path 为 native / direct / extracted / repaired / legacy / default
+        self.last_decode_info: Dict[str, Any] = {}
         self.config = {
             'model_id': model_id,
             'endpoint': endpoint,
@@ -545,50 +558,89 @@ class StructuredLLMClient:
                 }
             ]
         
+        start_time = time.time()
+        native_mode = self.structured_output
+        response = None
+        if native_mode:
+            try:
+                response = self._call(messages, response_format=self._build_response_format(schema_json))
+            except Exception as e:
+                # 端点不支持 response_format 时退回纯提示词约束
+                logger.warning(f"原生结构化输出({native_mode})调用失败，退回普通调用: {e}")
+                native_mode = None
+        if response is None:
+            response = self._call(messages)
+        
+        # 解析结构化输出
+        result = self._parse_structured_response(response, native=bool(native_mode))
+        self.last_decode_info['native_mode'] = native_mode
+        self.last_decode_info['elapsed_ms'] = int((time.time() - start_time) * 1000)
+        logger.info(f"结构化输出解码: {self.output_schema.__name__} path={self.last_decode_info['path']} "
+                    f"native={native_mode} repairs={self.last_decode_info.get('repairs')}")
+        return result
+    
+    def _call(self, messages: List[Dict], **extra):
         # 调用核心LLM服务 (强制非流式)，传入日志相关参数
-        response = self.core_service.call_llm(
+        return self.core_service.call_llm(
             messages=messages,
             temperature=0.75,  # 结构化输出需要低温度
             stream=False,  # 结构化输出不支持流式
+            **extra,
             **self.config,
             **self.log_params  # 传入日志相关参数
         )
-        
-        # 解析结构化输出
-        return self._parse_structured_response(response)
     
-    def _parse_structured_response(self, response: Dict) -> Any:
+    def _build_response_format(self, schema_json: Dict) -> Dict:
+        if self.structured_output == 'json_schema':
+            return {
+                'type': 'json_schema',
+                'json_schema': {
+                    'name': self.output_schema.__name__,
+                    'schema': schema_json,
+                }
+            }
+        return {'type': 'json_object'}
+    
+    def _parse_structured_response(self, response: Dict, native: bool = False) -> Any:
         """
         解析LLM响应并返回结构化数据
         
+        先用 json_repair 单遍修复解析（截断、引号、转义等常见问题），
+        失败时再走旧的正则清理，最后返回默认实例。解码路径记录在 last_decode_info 中。
+        
         参数:
             response: LLM原始响应
+            native: 是否使用了厂商原生 JSON 模式
         返回:
             解析后的Pydantic模型实例
         """
         raw_response_text = None
+        self.last_decode_info = {'path': 'default', 'repairs': []}
         
         try:
             # 获取原始响应文本
             raw_response_text = response['choices'][0]['message']['content']
             
-            # 清理响应文本，提取JSON
-            json_str = self._extract_json_from_response(raw_response_text)
-            
-            # 解析JSON并返回模型实例
-            data = json.loads(json_str)
-            return self.output_schema(**data)
+            data, path, repairs = parse_llm_json(raw_response_text)
+            instance = self.output_schema(**data)
+            self.last_decode_info = {
+                'path': 'native' if native and path == 'direct' else path,
+                'repairs': repairs,
+            }
+            return instance
             
-        except json.JSONDecodeError as e:
+        except JSONRepairError as e:
             logger.error(f"结构化输出解析失败: {e}")
-            # 尝试更激进的清理
+            # 退回旧的正则清理
             if raw_response_text:
-                json_str = self._aggressive_json_cleanup(raw_response_text)
-                try:
-                    data = json.loads(json_str)
-                    return self.output_schema(**data)
-                except Exception as final_e:
-                    logger.error(f"激进清理后仍解析失败: {final_e}")
+                for cleanup in (self._extract_json_from_response, self._aggressive_json_cleanup):
+                    try:
+                        data = json.loads(cleanup(raw_response_text))
+                        instance = self.output_schema(**data)
+                        self.last_decode_info = {'path': 'legacy', 'repairs': [cleanup.__name__]}
+                        return instance
+                    except Exception as final_e:
+                        logger.error(f"{cleanup.__name__} 清理后仍解析失败: {final_e}")
         except Exception as e:
             logger.error(f"结构化输出处理失败: {e}")
         
@@ -0,0 +1,374 @@
+"""
+LLM 输出的 JSON 修复解析器
+
+对 LLM 返回的"近似 JSON"做单遍扫描修复，无需再次请求模型：
+- 去掉 markdown 代码块和前后的解释文字
+- 字符串内未转义的换行/控制字符、非法反斜杠转义
+- 单引号字符串、Python 字面量（True/False/None）
+- 缺失的逗号、多余的尾逗号
+- 输出被截断：补全未闭合的字符串、丢弃不完整的键值对、闭合所有括号
+"""
+import re
+import json
+import logging
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_VALID_ESCAPES = set('"\\/bfnrtu')
+_JSON_NUMBER = re.compile(r'^-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$')
+_LITERALS = {'true': 'true', 'false': 'false', 'null': 'null',
+             'True': 'true', 'False': 'false', 'None': 'null'}
+
+
+class JSONRepairError(ValueError):
+    """修复后仍无法解析"""
+
+
+def parse_llm_json(text: str) -> Tuple[Any, str, List[str]]:
+    """
+    解析 LLM 输出中的 JSON。
+
+    Returns:
+        (数据, 路径, 修复记录)。路径为 direct（原文可直接解析）、
+        extracted（去掉包裹文字后可解析）或 repaired（经过修复）。
+
+    Raises:
+        JSONRepairError: 修复后仍无法解析
+    """
+    stripped = text.strip()
+    try:
+        return json.loads(stripped), 'direct', []
+    except ValueError:
+        pass
+
+    candidate = _extract_candidate(stripped)
+    if candidate is None:
+        raise JSONRepairError("响应中没有找到 JSON 对象")
+    try:
+        return json.loads(candidate), 'extracted', []
+    except ValueError:
+        pass
+
+    repaired, repairs = repair_json(candidate)
+    try:
+        return json.loads(repaired), 'repaired', repairs
+    except ValueError as e:
+        raise JSONRepairError(f"JSON 修复失败: {e}") from e
+
+
+def _extract_candidate(text: str) -> Optional[str]:
+    """从第一个 { 或 [ 开始截取；结尾的多余文字交给修复器处理"""
+    starts = [i for i in (text.find('{'), text.find('[')) if i != -1]
+    if not starts:
+        return None
+    start = min(starts)
+    end = max(text.rfind('}'), text.rfind(']'))
+    if end > start:
+        tail = text[end + 1:].strip()
+        # 结尾只剩代码块标记或说明文字时直接截掉
+        if not tail or tail.startswith('```') or not any(c in tail for c in '{}[]"'):
+            return text[start:end + 1]
+    return text[start:]
+
+
+def repair_json(text: str) -> Tuple[str, List[str]]:
+    """
+    单遍扫描修复 JSON 文本。
+
+    维护括号栈、字符串状态和"当前期待的记号"，边扫描边输出修正后的文本。
+    """
+    out: List[str] = []
+    repairs: List[str] = []
+    stack: List[str] = []          # '{' 或 '['
+    in_string = False
+    quote_char = '"'
+    # 对象内部的位置：key（期待键）、colon、value（期待值）、comma（值之后）
+    expect: List[str] = []
+    i = 0
+    n = len(text)
+
+    def note(msg: str) -> None:
+        if msg not in repairs:
+            repairs.append(msg)
+
+    def value_done() -> None:
+        if expect:
+            expect[-1] = 'comma'
+
+    while i < n:
+        ch = text[i]
+
+        if in_string:
+            if ch == '\\':
+                nxt = text[i + 1] if i + 1 < n else ''
+                if nxt in _VALID_ESCAPES:
+                    # \u 后不是 4 位十六进制、或 \b \f \r 后紧跟字母（\beta、\frac、D:\report）
+                    # 时，按字面反斜杠处理
+                    if ((nxt == 'u' and not _is_hex4(text[i + 2:i + 6]))
+                            or (nxt in 'bfr' and text[i + 2:i + 3].isascii() and text[i + 2:i + 3].isalpha())):
+                        out.append('\\\\')
+                        note('invalid_escape')
+                        i += 1
+                        continue
+                    out.append(ch + nxt)
+                    i += 2
+                    continue
+                if nxt == "'":
+                    out.append("'")
+                    i += 2
+                    continue
+                # 非法转义：保留反斜杠本身
+                out.append('\\\\')
+                note('invalid_escape')
+                i += 1
+                continue
+            if ch == quote_char:
+                if quote_char == '"' and not _double_quote_closes(text, i):
+                    # 字符串内部未转义的双引号
+                    out.append('\\"')
+                    note('unescaped_quote')
+                    i += 1
+                    continue
+                if quote_char == '"' or not _single_quote_continues(text, i):
+                    out.append('"')
+                    in_string = False
+                    i += 1
+                    continue
+            if ch == '"' and quote_char == "'":
+                out.append('\\"')
+                i += 1
+                continue
+            if ch == '\n':
+                out.append('\\n')
+                note('unescaped_newline')
+            elif ch == '\r':
+                out.append('\\r')
+                note('unescaped_newline')
+            elif ch == '\t':
+                out.append('\\t')
+                note('unescaped_control')
+            elif ord(ch) < 0x20:
+                out.append(f'\\u{ord(ch):04x}')
+                note('unescaped_control')
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in ' \t\r\n':
+            out.append(ch)
+            i += 1
+            continue
+
+        # 容器内两个值之间缺逗号
+        if expect and expect[-1] == 'comma' and ch not in ',}]:':
+            _append_comma(out)
+            note('missing_comma')
+            expect[-1] = 'key' if stack[-1] == '{' else 'value'
+
+        if ch in '"\'':
+            if ch == "'":
+                note('single_quotes')
+            quote_char = ch
+            in_string = True
+            out.append('"')
+            if expect and expect[-1] == 'key':
+                expect[-1] = 'colon'
+            else:
+                value_done()
+            i += 1
+            continue
+
+        if ch in '{[':
+            if expect and expect[-1] == 'colon':
+                # 键后缺冒号
+                out.append(':')
+                note('missing_colon')
+            value_done()
+            stack.append(ch)
+            expect.append('key' if ch == '{' else 'value')
+            out.append(ch)
+            i += 1
+            continue
+
+        if ch in '}]':
+            if not stack:
+                # 多余的闭合括号（或尾部说明文字中的括号），丢弃后续内容
+                note('trailing_text')
+                break
+            _drop_dangling(out, expect, stack, note)
+            opener = stack.pop()
+            expect.pop()
+            out.append('}' if opener == '{' else ']')
+            if ch != out[-1]:
+                note('mismatched_bracket')
+            value_done()
+            i += 1
+            if not stack:
+                rest = text[i:].strip()
+                if rest:
+                    note('trailing_text')
+                break
+            continue
+
+        if ch == ',':
+            if expect and expect[-1] in ('key', 'value') and _last_significant(out) in ',[{':
+                # 连续逗号或开头逗号，跳过
+                note('extra_comma')
+            else:
+                out.append(',')
+                if expect:
+                    expect[-1] = 'key' if stack[-1] == '{' else 'value'
+            i += 1
+            continue
+
+        if ch == ':':
+            out.append(':')
+            if expect:
+                expect[-1] = 'value'
+            i += 1
+            continue
+
+        # 裸字面量：数字、true/false/null、Python 字面量，或未加引号的键
+        j = i
+        while j < n and text[j] not in ' \t\r\n,:{}[]"\'':
+            j += 1
+        token = text[i:j]
+        if not token:
+            i += 1
+            continue
+        if expect and expect[-1] == 'key':
+            out.append(json.dumps(token))
+            expect[-1] = 'colon'
+            note('unquoted_key')
+        elif token in _LITERALS:
+            if _LITERALS[token] != token:
+                note('python_literal')
+            out.append(_LITERALS[token])
+            value_done()
+        elif _normalize_number(token) is not None:
+            number = _normalize_number(token)
+            if number != token:
+                note('number_format')
+            out.append(number)
+            value_done()
+        else:
+            out.append(json.dumps(token))
+            note('unquoted_value')
+            value_done()
+        i = j
+
+    # 输出在中途被截断
+    if in_string:
+        out.append('"')
+        note('truncated')
+        value_done()
+    if stack:
+        note('truncated')
+        while stack:
+            _drop_dangling(out, expect, stack, note)
+            opener = stack.pop()
+            expect.pop()
+            out.append('}' if opener == '{' else ']')
+            value_done()
+
+    return ''.join(out), repairs
+
+
+def _append_comma(out: List[str]) -> None:
+    # 逗号插到尾随空白之前
+    k = len(out)
+    while k > 0 and out[k - 1] in (' ', '\t', '\r', '\n'):
+        k -= 1
+    out.insert(k, ',')
+
+
+def _last_significant(out: List[str]) -> str:
+    for piece in reversed(out):
+        stripped = piece.strip()
+        if stripped:
+            return stripped[-1]
+    return ''
+
+
+def _drop_dangling(out: List[str], expect: List[str], stack: List[str], note) -> None:
+    """闭合容器前移除尾逗号，以及没有值的悬空键"""
+    while True:
+        last = _last_significant(out)
+        if last == ',':
+            _pop_last_significant(out)
+            note('trailing_comma')
+            continue
+        if stack and stack[-1] == '{' and expect and expect[-1] in ('colon', 'value'):
+            # 对象里最后一个键没有值：删掉 ':' 和键
+            if last == ':':
+                _pop_last_significant(out)
+            _pop_string(out)
+            expect[-1] = 'comma'
+            note('dangling_key')
+            continue
+        break
+
+
+def _pop_last_significant(out: List[str]) -> None:
+    while out:
+        piece = out.pop()
+        if piece.strip():
+            stripped = piece.rstrip()
+            if len(stripped) > 1:
+                out.append(stripped[:-1])
+            return
+
+
+def _pop_string(out: List[str]) -> None:
+    """删除末尾的一个 JSON 字符串（键），以及它前面的逗号"""
+    while out and not out[-1].strip():
+        out.pop()
+    if not out:
+        return
+    if out[-1].startswith('"') and len(out[-1]) > 1 and out[-1].endswith('"'):
+        # 未加引号的键以 json.dumps 整段写入
+        out.pop()
+    elif out[-1] == '"':
+        out.pop()
+        while out and out[-1] != '"':
+            out.pop()
+        if out:
+            out.pop()
+    if _last_significant(out) == ',':
+        _pop_last_significant(out)
+
+
+def _single_quote_continues(text: str, i: int) -> bool:
+    """单引号字符串中的 ' 是否是撇号（如 don't）而不是字符串结尾"""
+    prev = text[i - 1] if i > 0 else ''
+    nxt = text[i + 1] if i + 1 < len(text) else ''
+    return prev.isalpha() and nxt.isalpha()
+
+
+def _is_hex4(s: str) -> bool:
+    return len(s) == 4 and all(c in '0123456789abcdefABCDEF' for c in s)
+
+
+def _double_quote_closes(text: str, i: int) -> bool:
+    """双引号后紧跟结构字符（或到达结尾）时视为字符串结束，否则是内容里的引号"""
+    j = i + 1
+    while j < len(text) and text[j] in ' \t':
+        j += 1
+    return j >= len(text) or text[j] in ',:}]\r\n"'
+
+
+def _normalize_number(token: str) -> Optional[str]:
+    """合法 JSON 数字原样返回；'1.'、'.5'、'+3' 等近似写法规范化；其他返回 None"""
+    if _JSON_NUMBER.match(token):
+        return token
+    try:
+        value = float(token)
+    except ValueError:
+        return None
+    if value != value or value in (float('inf'), float('-inf')):
+        return None
+    if value.is_integer() and not any(c in token for c in '.eE'):
+        return str(int(value))
+    return repr(value)
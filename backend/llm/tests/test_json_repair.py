@@ -0,0 +1,98 @@
+"""
+LLM 输出 JSON 修复测试
+
+使用 fixtures/malformed_llm_outputs.json 中收集的真实畸形输出（代码块包裹、前后说明文字、
+截断、未转义换行、单引号、尾逗号、Python 字面量、非法转义等），统计无需重新请求即可恢复的比例。
+"""
+import json
+import os
+from typing import List, Optional
+
+from django.test import TestCase
+from pydantic import BaseModel
+
+from llm.core_service import CoreLLMService, StructuredLLMClient
+from llm.json_repair import JSONRepairError, parse_llm_json, repair_json
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'malformed_llm_outputs.json')
+
+
+class _Decision(BaseModel):
+    thought: str
+    action: str
+    tasks: Optional[List[str]] = None
+
+
+class JSONRepairTestCase(TestCase):
+
+    def setUp(self):
+        with open(FIXTURE_PATH, encoding='utf-8') as f:
+            self.corpus = json.load(f)
+
+    def test_corpus_recovery_rate(self):
+        recovered = []
+        for case in self.corpus:
+            try:
+                data, path, _ = parse_llm_json(case['raw'])
+            except JSONRepairError:
+                continue
+            if data == case['expected']:
+                recovered.append(case['name'])
+        rate = len(recovered) / len(self.corpus)
+        missed = [c['name'] for c in self.corpus if c['name'] not in recovered]
+        self.assertEqual(rate, 1.0, f"未恢复: {missed}")
+
+    def test_valid_json_takes_direct_path(self):
+        data, path, repairs = parse_llm_json('{"a": [1, 2]}')
+        self.assertEqual((data, path, repairs), ({'a': [1, 2]}, 'direct', []))
+
+    def test_truncation_drops_dangling_key(self):
+        repaired, repairs = repair_json('{"a": 1, "b": ')
+        self.assertEqual(json.loads(repaired), {'a': 1})
+        self.assertIn('truncated', repairs)
+
+    def test_no_json_raises(self):
+        with self.assertRaises(JSONRepairError):
+            parse_llm_json('抱歉，我无法回答这个问题。')
+
+
+class StructuredDecodeTestCase(TestCase):
+
+    def _client(self, structured_output=None):
+        return StructuredLLMClient(
+            core_service=CoreLLMService(),
+            output_schema=_Decision,
+            model_id='test-model',
+            endpoint='http://localhost',
+            api_key='',
+            structured_output=structured_output,
+        )
+
+    def _response(self, content):
+        return {'choices': [{'message': {'content': content}}]}
+
+    def test_repaired_path_reported(self):
+        client = self._client()
+        result = client._parse_structured_response(self._response('{"thought": "分析", "action": "finish", "tasks": ["a",'))
+        self.assertEqual(result.tasks, ['a'])
+        self.assertEqual(client.last_decode_info['path'], 'repaired')
+
+    def test_native_path_reported(self):
+        client = self._client('json_object')
+        client._parse_structured_response(self._response('{"thought": "t", "action": "finish"}'), native=True)
+        self.assertEqual(client.last_decode_info['path'], 'native')
+
+    def test_unrecoverable_returns_default(self):
+        client = self._client()
+        result = client._parse_structured_response(self._response('无法给出 JSON'))
+        self.assertEqual(client.last_decode_info['path'], 'default')
+        self.assertIn('[解析失败]', result.thought)
+
+    def test_response_format_for_json_schema(self):
+        client = self._client('json_schema')
+        fmt = client._build_response_format(_Decision.model_json_schema())
+        self.assertEqual(fmt['type'], 'json_schema')
+        self.assertEqual(fmt['json_schema']['name'], '_Decision')
+
+    def test_unknown_mode_is_ignored(self):
+        self.assertIsNone(self._client('tool_call').structured_output)
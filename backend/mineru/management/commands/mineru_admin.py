@@ -197,38 +197,29 @@ class Command(BaseCommand):
         """管理缓存"""
         self.stdout.write('\n💾 缓存管理')
         
-        # 本地缓存管理
-        from pathlib import Path
-        cache_dir = Path(settings.MEDIA_ROOT) / 'oss-bucket' / 'mineru' / 'cache'
+        # 解析结果缓存（tools_parse_cache 表中 parser 为 mineru 的条目）
+        from tools.core.parse_cache import ParseCache
+        from tools.models import ParseCacheEntry
+        from mineru.services.storage_adapter import PARSER_NAME
         
-        if cache_dir.exists():
-            cache_files = list(cache_dir.glob('*.json'))
-            total_cache = len(cache_files)
-            cache_size = sum(f.stat().st_size for f in cache_files)
-            
-            self.stdout.write(f'缓存文件数: {total_cache}')
-            self.stdout.write(f'缓存大小: {cache_size / (1024*1024):.2f} MB')
+        mineru_stats = ParseCache().index_stats()['parsers'].get(PARSER_NAME, {})
+        self.stdout.write(f"缓存条目数: {mineru_stats.get('entries', 0)}")
+        self.stdout.write(f"缓存大小: {mineru_stats.get('size_bytes', 0) / (1024*1024):.2f} MB")
+        self.stdout.write(f"累计命中: {mineru_stats.get('hits', 0)}")
+        
+        # 清理长时间未访问的缓存
+        if options.get('force'):
+            days = options['days']
+            cutoff = timezone.now() - timedelta(days=days)
+            stale = ParseCacheEntry.objects.filter(parser=PARSER_NAME, last_accessed_at__lt=cutoff)
+            old_count = stale.count()
             
-            # 清理过期缓存
-            if options.get('force'):
-                days = options['days']
-                cutoff = timezone.now() - timedelta(days=days)
-                old_count = 0
-                
-                for cache_file in cache_files:
-                    file_time = datetime.fromtimestamp(cache_file.stat().st_mtime, tz=timezone.utc)
-                    if file_time < cutoff:
-                        old_count += 1
-                        if not options['dry_run']:
-                            cache_file.unlink()
-                
-                if old_count > 0:
-                    if not options['dry_run']:
-                        self.stdout.write(f'已清理 {old_count} 个过期缓存')
-                    else:
-                        self.stdout.write(f'[模拟] 将清理 {old_count} 个过期缓存')
-        else:
-            self.stdout.write('缓存目录不存在')
+            if old_count > 0:
+                if not options['dry_run']:
+                    stale.delete()
+                    self.stdout.write(f'已清理 {old_count} 个过期缓存')
+                else:
+                    self.stdout.write(f'[模拟] 将清理 {old_count} 个过期缓存')
     
     def test_service(self, options):
         """测试服务"""
@@ -4,6 +4,7 @@ MinerU 服务模块
 
 from .optimized_service import OptimizedMinerUService
 from .storage_adapter import MinerUStorageAdapter
+from .worker_pool import MinerUWorkerError, MinerUWorkerPool, MinerUWorkerTimeout, get_worker_pool
 
 # 为了向后兼容，创建别名
 MinerUService = OptimizedMinerUService
@@ -11,5 +12,9 @@ MinerUService = OptimizedMinerUService
 __all__ = [
     'OptimizedMinerUService',
     'MinerUStorageAdapter',
+    'MinerUWorkerPool',
+    'MinerUWorkerError',
+    'MinerUWorkerTimeout',
+    'get_worker_pool',
     'MinerUService',  # 向后兼容别名
 ]
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+MinerU 常驻解析进程
+==================
+
+由 MinerUWorkerPool 以独立脚本启动（不加载 Django），模型只在启动时加载一次，之后循环处理任务。
+
+通信协议（每行一个 JSON）：
+- 启动完成：{"ready": true, "pid": ...}，启动失败：{"ready": false, "error": "..."}
+- 任务（stdin）：{"id", "input_path", "output_dir", "parse_method", "lang", "debug"}
+- 结果（stdout）：{"id", "ok", "error", "seconds"}
+
+MinerU 及其依赖会向 stdout 打印日志，启动时把协议通道复制到独立的文件描述符，
+原 stdout 重定向到 stderr，避免日志混入结果。
+
+注意：本项目的 Django 应用也叫 mineru，脚本运行时 backend 目录不能在 sys.path 中，
+否则 `import mineru` 会导入 Django 应用而不是 MinerU。
+"""
+import json
+import os
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+def _open_protocol_channel():
+    """复制 stdout 作为协议通道，原 stdout 指向 stderr"""
+    protocol_fd = os.dup(sys.stdout.fileno())
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return os.fdopen(protocol_fd, 'w', buffering=1, encoding='utf-8')
+
+
+def serve(parse: Callable[[Dict[str, Any]], None], warmup: Optional[Callable[[], None]] = None) -> None:
+    """
+    任务循环
+
+    Args:
+        parse: 解析单个任务，结果写入 job['output_dir']，失败时抛出异常
+        warmup: 启动时执行一次（加载模型）
+    """
+    channel = _open_protocol_channel()
+
+    def send(message: Dict[str, Any]) -> None:
+        channel.write(json.dumps(message, ensure_ascii=False) + '\n')
+        channel.flush()
+
+    try:
+        if warmup:
+            warmup()
+    except Exception as e:
+        send({'ready': False, 'error': f"{type(e).__name__}: {e}"})
+        return
+    send({'ready': True, 'pid': os.getpid()})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        started = time.monotonic()
+        try:
+            parse(job)
+            send({'id': job['id'], 'ok': True, 'seconds': round(time.monotonic() - started, 3)})
+        except Exception as e:
+            traceback.print_exc()
+            send({
+                'id': job['id'],
+                'ok': False,
+                'error': f"{type(e).__name__}: {e}",
+                'seconds': round(time.monotonic() - started, 3),
+            })
+
+
+# ==================== MinerU ====================
+
+def _mineru_warmup() -> None:
+    # 导入 MinerU 并加载 pipeline 模型；模型单例在进程内常驻，后续任务直接复用
+    from mineru.backend.pipeline.pipeline_analyze import ModelSingleton
+
+    ModelSingleton().get_model(lang=None, formula_enable=True, table_enable=True)
+
+
+def _mineru_parse(job: Dict[str, Any]) -> None:
+    from mineru.cli.common import do_parse, read_fn
+
+    input_path = Path(job['input_path'])
+    do_parse(
+        output_dir=job['output_dir'],
+        pdf_file_names=[input_path.stem],
+        # 图片等格式由 read_fn 转为 PDF
+        pdf_bytes_list=[read_fn(input_path)],
+        p_lang_list=[job.get('lang') or 'ch'],
+        backend='pipeline',
+        parse_method=job.get('parse_method') or 'auto',
+        f_draw_layout_bbox=bool(job.get('debug')),
+        f_draw_span_bbox=bool(job.get('debug')),
+        f_dump_model_output=bool(job.get('debug')),
+        f_dump_orig_pdf=False,
+    )
+
+
+if __name__ == '__main__':
+    # 只使用CPU，设备由环境变量决定，须在导入 torch 之前设置
+    os.environ.setdefault('MINERU_DEVICE_MODE', 'cpu')
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    serve(_mineru_parse, warmup=_mineru_warmup)
@@ -3,6 +3,7 @@
 ===================
 
 集成 OSS 存储，提供智能缓存和高效文件管理
+解析默认交给 MinerU 常驻进程池（见 worker_pool.py），避免每个文档重新启动并加载模型
 """
 
 import os
@@ -18,6 +19,7 @@ from django.db import transaction
 
 from ..models import PDFParseTask, ParseResult
 from .storage_adapter import MinerUStorageAdapter
+from .worker_pool import MinerUWorkerStartupError, get_worker_pool
 
 logger = logging.getLogger('django')
 
@@ -61,7 +63,7 @@ class OptimizedMinerUService:
             
             # 2. 生成文件哈希并检查缓存
             file_hash = storage.generate_file_hash(file_bytes)
-            cached_result = storage.check_cache(file_hash)
+            cached_result = storage.check_cache(file_hash, task.parse_method)
             
             if cached_result:
                 logger.info(f"命中缓存，直接返回结果: {task.task_id}")
@@ -114,10 +116,13 @@ class OptimizedMinerUService:
                 # 7. 更新任务状态
                 self._update_task_success(task, parse_result)
                 
+                # 8. 写入解析结果缓存，相同文件再次上传时直接复用
+                self._save_parse_cache(storage, file_hash, task, parse_result)
+                
                 return parse_result
                 
             finally:
-                # 8. 清理临时文件
+                # 9. 清理临时文件
                 if temp_file_path.exists():
                     temp_file_path.unlink()
                     
@@ -155,6 +160,22 @@ class OptimizedMinerUService:
         cached_result['cached'] = True
         return cached_result
     
+    def _save_parse_cache(self, storage: MinerUStorageAdapter, file_hash: str,
+                          task: PDFParseTask, parse_result: Dict[str, Any]) -> None:
+        """按 _handle_cached_result 读取的结构保存缓存；结果路径指向 OSS 或任务的持久化输出目录"""
+        if self.use_oss:
+            markdown_key, json_key = parse_result.get('markdown_url'), parse_result.get('json_url')
+        else:
+            markdown_key, json_key = parse_result.get('markdown_path'), parse_result.get('json_path')
+        storage.save_cache(file_hash, {
+            'text_preview': parse_result.get('text_preview', ''),
+            'markdown_key': markdown_key or '',
+            'json_key': json_key or '',
+            'stats': parse_result.get('stats', {}),
+            'urls': parse_result.get('urls', {}),
+            'storage_type': parse_result.get('storage_type', 'local'),
+        }, task.parse_method)
+    
     def _create_temp_file(self, file_bytes: bytes, file_ext: str) -> Path:
         """创建临时文件"""
         with tempfile.NamedTemporaryFile(
@@ -175,6 +196,13 @@ class OptimizedMinerUService:
         output_path = self.temp_dir / 'outputs' / str(now.year) / f"{now.month:02d}" / str(task.task_id)
         output_path.mkdir(parents=True, exist_ok=True)
         
+        # 优先交给常驻进程池（模型已加载），进程池无法启动时退回命令行
+        if self.config.get('WORKER_POOL_ENABLED', False):
+            try:
+                return self._execute_with_worker_pool(temp_file_path, task, output_path)
+            except MinerUWorkerStartupError as e:
+                logger.warning(f"MinerU 进程池不可用，改用命令行解析: {e}")
+        
         # 构建命令
         cmd = [
             'mineru',
@@ -196,7 +224,7 @@ class OptimizedMinerUService:
             cmd,
             capture_output=True,
             text=True,
-            timeout=300
+            timeout=self.config.get('JOB_TIMEOUT', 300)
         )
         
         # 添加调试日志
@@ -215,6 +243,22 @@ class OptimizedMinerUService:
         # 收集结果
         return self._collect_results(output_path, processing_time)
     
+    def _execute_with_worker_pool(self, temp_file_path: Path, task: PDFParseTask,
+                                  output_path: Path) -> Dict[str, Any]:
+        """由常驻进程池解析，超时或失败时抛出 MinerUWorkerError"""
+        logger.info(f"提交 MinerU 进程池解析: {task.task_id}")
+        response = get_worker_pool().parse(
+            str(temp_file_path),
+            str(output_path),
+            parse_method=task.parse_method,
+            debug=task.debug_enabled,
+        )
+        logger.info(
+            f"MinerU 进程池解析完成: {task.task_id}, "
+            f"解析 {response['seconds']:.2f} 秒, 含排队 {response['latency']:.2f} 秒"
+        )
+        return self._collect_results(output_path, response['latency'])
+    
     def _collect_results(self, output_path: Path, processing_time: float) -> Dict[str, Any]:
         """收集解析结果"""
         logger.info(f"收集输出目录的结果: {output_path}")
@@ -16,8 +16,14 @@ from datetime import datetime
 
 from django.conf import settings
 
+from tools.core.parse_cache import get_parse_cache
+
 logger = logging.getLogger('django')
 
+# 解析结果缓存中的解析器名称与版本；MinerU 升级或输出结构变化时递增版本
+PARSER_NAME = 'mineru'
+PARSER_VERSION = '1'
+
 
 class MinerUStorageAdapter:
     """MinerU 存储适配器"""
@@ -35,10 +41,6 @@ class MinerUStorageAdapter:
         
         self.local_temp_dir = Path(settings.MINERU_SETTINGS.get('TEMP_DIR', '/tmp/mineru'))
         self.local_temp_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 缓存目录
-        self.cache_dir = self.base_dir / 'cache'
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
     
     def generate_file_hash(self, file_bytes: bytes) -> str:
         """
@@ -52,56 +54,65 @@ class MinerUStorageAdapter:
         """
         return hashlib.sha256(file_bytes).hexdigest()
     
-    def check_cache(self, file_hash: str) -> Optional[Dict[str, Any]]:
+    def check_cache(self, file_hash: str, parse_method: str = 'auto') -> Optional[Dict[str, Any]]:
         """
-        检查是否有缓存的解析结果
+        检查是否有缓存的解析结果（统一的解析结果缓存，见 tools.core.parse_cache）
         
         Args:
             file_hash: 文件哈希值
+            parse_method: 解析方法，不同方法的结果分别缓存
             
         Returns:
             缓存的结果信息，如果没有返回 None
         """
-        try:
-            cache_file_path = self.cache_dir / f"{file_hash}.json"
-            
-            if cache_file_path.exists():
-                with open(cache_file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"检查缓存失败: {e}")
+        cache = get_parse_cache()
+        if cache is None:
             return None
+        return cache.get(
+            file_hash, PARSER_NAME, PARSER_VERSION, {'parse_method': parse_method},
+            is_valid=self._cached_files_exist
+        )
+
+    @staticmethod
+    def _cached_files_exist(cached: Dict[str, Any]) -> bool:
+        """
+        本地模式的缓存条目指向首次解析任务的输出目录，该目录被定期清理任务删除后缓存不再可用，
+        视为未命中并重新解析；OSS 模式的结果键不受本地清理影响
+        """
+        if cached.get('storage_type') == 'oss':
+            return True
+        for key in ('markdown_key', 'json_key'):
+            path = cached.get(key)
+            if path and not os.path.exists(path):
+                logger.info(f"缓存的解析结果文件已不存在，重新解析: {path}")
+                return False
+        return True
     
-    def save_cache(self, file_hash: str, result_data: Dict[str, Any]) -> bool:
+    def save_cache(self, file_hash: str, result_data: Dict[str, Any], parse_method: str = 'auto') -> bool:
         """
         保存解析结果到缓存
         
         Args:
             file_hash: 文件哈希值
             result_data: 解析结果数据
+            parse_method: 解析方法
             
         Returns:
             是否保存成功
         """
-        try:
-            cache_file_path = self.cache_dir / f"{file_hash}.json"
-            
-            # 添加元数据
-            result_data['cached_at'] = datetime.now().isoformat()
-            result_data['file_hash'] = file_hash
-            
-            with open(cache_file_path, 'w', encoding='utf-8') as f:
-                json.dump(result_data, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f"缓存已保存: {cache_file_path}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"保存缓存失败: {e}")
+        cache = get_parse_cache()
+        if cache is None:
             return False
+        
+        result_data = {
+            **result_data,
+            'cached_at': datetime.now().isoformat(),
+            'file_hash': file_hash,
+        }
+        saved = cache.put(file_hash, PARSER_NAME, PARSER_VERSION, result_data, {'parse_method': parse_method})
+        if saved:
+            logger.info(f"缓存已保存: {file_hash[:16]} ({parse_method})")
+        return saved
     
     def upload_file(
         self, 
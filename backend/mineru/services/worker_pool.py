@@ -0,0 +1,393 @@
+"""
+MinerU 常驻进程池
+================
+
+命令行方式每个文档都要启动解释器、加载版面/OCR模型，小文档的耗时主要花在这里。
+进程池维护若干常驻的 MinerU 进程（mineru_worker.py），创建时即启动并加载模型，之后不再重复加载：
+- 任务进入队列，由空闲进程领取，每个任务有独立的超时时间
+- 超时的进程被终止并重新启动；进程崩溃时重启后重试一次
+- 进程处理满 max_jobs_per_worker 个任务或内存超过 max_rss_mb 后回收重启，释放模型推理积累的内存
+- 只使用CPU
+"""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+logger = logging.getLogger('django')
+
+WORKER_SCRIPT = Path(__file__).with_name('mineru_worker.py')
+
+_STOP = object()
+
+
+class MinerUWorkerError(RuntimeError):
+    """解析进程执行失败或异常退出"""
+
+
+class MinerUWorkerTimeout(MinerUWorkerError):
+    """任务超时"""
+
+
+class MinerUWorkerStartupError(MinerUWorkerError):
+    """解析进程无法启动（例如未安装 MinerU）"""
+
+
+@dataclass
+class _Job:
+    payload: Dict[str, Any]
+    timeout: float
+    future: Future = field(default_factory=Future)
+    attempts: int = 0
+
+
+class _WorkerProcess:
+    """一个常驻解析进程及其输出读取线程"""
+
+    def __init__(self, command: List[str], env: Dict[str, str], cwd: str, startup_timeout: float):
+        try:
+            self.process = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                env=env,
+                cwd=cwd,
+            )
+        except OSError as e:
+            raise MinerUWorkerStartupError(f"无法启动 MinerU 解析进程: {e}") from e
+        self.jobs_done = 0
+        self._lines: 'queue.Queue' = queue.Queue()
+        self._reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self._reader.start()
+
+        try:
+            message = self._receive(startup_timeout)
+        except MinerUWorkerError as e:
+            self.kill()
+            raise MinerUWorkerStartupError(f"MinerU 解析进程启动失败: {e}") from e
+        if not message.get('ready'):
+            self.kill()
+            raise MinerUWorkerStartupError(f"MinerU 解析进程启动失败: {message.get('error')}")
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def run(self, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        try:
+            self.process.stdin.write(json.dumps(payload, ensure_ascii=False) + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise MinerUWorkerError(f"解析进程已退出: {e}")
+        return self._receive(timeout)
+
+    def rss_mb(self) -> float:
+        try:
+            return psutil.Process(self.pid).memory_info().rss / 1024 / 1024
+        except psutil.Error:
+            return 0.0
+
+    def stop(self, timeout: float = 10) -> None:
+        """关闭输入，等待进程处理完当前任务后退出"""
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=timeout)
+        except Exception:
+            self.kill()
+
+    def kill(self) -> None:
+        try:
+            self.process.kill()
+            self.process.wait(timeout=10)
+        except Exception:
+            pass
+
+    def _read_stdout(self) -> None:
+        for line in self.process.stdout:
+            self._lines.put(line)
+        # EOF：进程退出
+        self._lines.put(None)
+
+    def _receive(self, timeout: float) -> Dict[str, Any]:
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            raise MinerUWorkerTimeout(f"超过 {timeout:.0f} 秒未返回")
+        if line is None:
+            raise MinerUWorkerError(f"解析进程异常退出，返回码: {self.process.wait()}")
+        return json.loads(line)
+
+
+class MinerUWorkerPool:
+    """MinerU 常驻进程池"""
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_jobs_per_worker: int = 50,
+        max_rss_mb: int = 6144,
+        job_timeout: float = 300,
+        startup_timeout: float = 600,
+        model_source: Optional[str] = None,
+        command: Optional[List[str]] = None,
+        work_dir: Optional[str] = None
+    ):
+        """
+        Args:
+            size: 常驻进程数
+            max_jobs_per_worker: 每个进程处理多少个任务后回收，0 表示不按任务数回收
+            max_rss_mb: 进程内存超过该值（MB）后回收，0 表示不按内存回收
+            job_timeout: 默认的任务超时（秒）
+            startup_timeout: 进程启动（加载模型）的超时（秒）
+            model_source: MinerU 模型来源（MINERU_MODEL_SOURCE）
+            command: 启动解析进程的命令，默认运行 mineru_worker.py
+            work_dir: 解析进程的工作目录
+        """
+        self.size = max(1, size)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.job_timeout = job_timeout
+        self.startup_timeout = startup_timeout
+        self.command = command or [sys.executable, str(WORKER_SCRIPT)]
+        self.work_dir = work_dir or str(WORKER_SCRIPT.parent)
+        self.env = self._build_env(model_source)
+
+        self._jobs: 'queue.Queue' = queue.Queue()
+        self._ids = itertools.count(1)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'timeouts': 0,
+            'crashes': 0,
+            'restarts': 0,
+            'recycled': 0,
+            'parse_seconds': 0.0,
+            'latency_seconds': 0.0,
+        }
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._slot_loop, args=(slot,), name=f'mineru-worker-{slot}', daemon=True)
+            for slot in range(self.size)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        logger.info(
+            f"MinerU 进程池启动 - 进程数 {self.size}, 每进程最多 {max_jobs_per_worker} 个任务, "
+            f"内存上限 {max_rss_mb}MB, 任务超时 {job_timeout}s"
+        )
+
+    def _build_env(self, model_source: Optional[str]) -> Dict[str, str]:
+        env = dict(os.environ)
+        # 只使用CPU；每个进程分到的计算线程数，避免多个进程争抢CPU
+        env['CUDA_VISIBLE_DEVICES'] = ''
+        env['MINERU_DEVICE_MODE'] = 'cpu'
+        threads = str(max(1, (os.cpu_count() or 1) // self.size))
+        env.setdefault('OMP_NUM_THREADS', threads)
+        env.setdefault('MKL_NUM_THREADS', threads)
+        if model_source:
+            env['MINERU_MODEL_SOURCE'] = model_source
+        # backend 目录中的 Django 应用 mineru 会遮蔽 MinerU 包
+        backend_dir = str(Path(__file__).resolve().parents[2])
+        python_path = [p for p in env.get('PYTHONPATH', '').split(os.pathsep)
+                       if p and os.path.abspath(p) != backend_dir]
+        env['PYTHONPATH'] = os.pathsep.join(python_path)
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        return env
+
+    # ==================== 提交 ====================
+
+    def submit(
+        self,
+        input_path: str,
+        output_dir: str,
+        parse_method: str = 'auto',
+        lang: Optional[str] = None,
+        debug: bool = False,
+        timeout: Optional[float] = None
+    ) -> Future:
+        """
+        提交解析任务
+
+        Future 的结果为 {'id', 'ok', 'seconds', 'latency'}，seconds 为解析耗时，latency 含排队时间；
+        失败时抛出 MinerUWorkerError（超时为 MinerUWorkerTimeout）。
+        """
+        if self._closed:
+            raise RuntimeError('MinerU 进程池已关闭')
+        job = _Job(
+            payload={
+                'id': next(self._ids),
+                'input_path': str(input_path),
+                'output_dir': str(output_dir),
+                'parse_method': parse_method,
+                'lang': lang,
+                'debug': debug,
+                'submitted_at': time.time(),
+            },
+            timeout=timeout or self.job_timeout
+        )
+        with self._stats_lock:
+            self._stats['submitted'] += 1
+        self._jobs.put(job)
+        return job.future
+
+    def parse(self, input_path: str, output_dir: str, **kwargs) -> Dict[str, Any]:
+        """提交并等待结果"""
+        return self.submit(input_path, output_dir, **kwargs).result()
+
+    # ==================== 统计与关闭 ====================
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        finished = stats['completed']
+        stats['avg_parse_seconds'] = round(stats.pop('parse_seconds') / finished, 3) if finished else 0.0
+        stats['avg_latency_seconds'] = round(stats.pop('latency_seconds') / finished, 3) if finished else 0.0
+        stats['queue_depth'] = self._jobs.qsize()
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """已提交的任务处理完后关闭所有进程"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._jobs.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        logger.info(f"MinerU 进程池已关闭，统计: {self.stats()}")
+
+    # ==================== 内部方法 ====================
+
+    def _spawn(self, slot: int) -> _WorkerProcess:
+        started = time.monotonic()
+        worker = _WorkerProcess(self.command, self.env, self.work_dir, self.startup_timeout)
+        logger.info(f"MinerU 解析进程 {slot} 已启动 (pid {worker.pid})，耗时 {time.monotonic() - started:.1f}s")
+        return worker
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += value
+
+    def _slot_loop(self, slot: int) -> None:
+        # 进程池创建时即启动进程、加载模型，第一个任务不再等待加载
+        worker: Optional[_WorkerProcess] = None
+        try:
+            worker = self._spawn(slot)
+        except MinerUWorkerStartupError as e:
+            logger.warning(f"MinerU 解析进程 {slot} 预启动失败，将在领取任务时重试: {e}")
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                break
+            # 重试的任务已处于运行状态
+            if job.attempts == 0 and not job.future.set_running_or_notify_cancel():
+                continue
+
+            job.attempts += 1
+            try:
+                if worker is None:
+                    worker = self._spawn(slot)
+                response = worker.run(job.payload, job.timeout)
+                worker.jobs_done += 1
+                if response.get('ok'):
+                    response['latency'] = round(time.time() - job.payload['submitted_at'], 3)
+                    self._count('completed')
+                    self._count('parse_seconds', response.get('seconds', 0))
+                    self._count('latency_seconds', response['latency'])
+                    job.future.set_result(response)
+                else:
+                    self._count('failed')
+                    job.future.set_exception(MinerUWorkerError(response.get('error') or 'MinerU 解析失败'))
+            except MinerUWorkerTimeout as e:
+                logger.error(f"MinerU 任务 {job.payload['id']} 超时，终止解析进程 {slot}")
+                worker.kill()
+                worker = None
+                self._count('timeouts')
+                self._count('failed')
+                job.future.set_exception(MinerUWorkerTimeout(f"MinerU 解析超时: {e}"))
+            except MinerUWorkerStartupError as e:
+                self._count('failed')
+                job.future.set_exception(e)
+            except MinerUWorkerError as e:
+                logger.error(f"MinerU 解析进程 {slot} 崩溃: {e}")
+                worker.kill()
+                worker = None
+                self._count('crashes')
+                if job.attempts <= 1:
+                    # 重启进程后重试一次
+                    self._count('restarts')
+                    self._jobs.put(job)
+                    continue
+                self._count('failed')
+                job.future.set_exception(e)
+            except Exception as e:
+                logger.error(f"MinerU 任务 {job.payload['id']} 处理异常: {e}", exc_info=True)
+                if worker is not None:
+                    worker.kill()
+                    worker = None
+                self._count('failed')
+                job.future.set_exception(e)
+
+            if worker is not None and self._should_recycle(worker):
+                logger.info(f"回收 MinerU 解析进程 {slot} (pid {worker.pid})，已处理 {worker.jobs_done} 个任务")
+                worker.stop()
+                worker = None
+                self._count('recycled')
+
+        if worker is not None:
+            worker.stop()
+
+    def _should_recycle(self, worker: _WorkerProcess) -> bool:
+        if self.max_jobs_per_worker and worker.jobs_done >= self.max_jobs_per_worker:
+            return True
+        return bool(self.max_rss_mb) and worker.rss_mb() > self.max_rss_mb
+
+
+_worker_pool: Optional[MinerUWorkerPool] = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> MinerUWorkerPool:
+    """
+    按 MINERU_SETTINGS 创建进程内的进程池
+
+    每个调用进程各自持有 WORKER_POOL_SIZE 个常驻 MinerU 进程，只应在专用 worker 上启用（WORKER_POOL_ENABLED）。
+    """
+    global _worker_pool
+    if _worker_pool is not None:
+        return _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            import atexit
+            from django.conf import settings
+
+            config = settings.MINERU_SETTINGS
+            _worker_pool = MinerUWorkerPool(
+                size=config.get('WORKER_POOL_SIZE', 2),
+                max_jobs_per_worker=config.get('WORKER_MAX_JOBS', 50),
+                max_rss_mb=config.get('WORKER_MAX_RSS_MB', 6144),
+                job_timeout=config.get('JOB_TIMEOUT', 300),
+                startup_timeout=config.get('WORKER_STARTUP_TIMEOUT', 600),
+                model_source=config.get('MODEL_SOURCE'),
+                work_dir=config.get('TEMP_DIR'),
+            )
+            atexit.register(_worker_pool.shutdown, wait=False)
+    return _worker_pool
@@ -1,8 +1,12 @@
 import os
+import sys
 import base64
+import shutil
+import tempfile
+import textwrap
 from io import BytesIO
 from pathlib import Path
-from django.test import TestCase, TransactionTestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient
@@ -10,7 +14,8 @@ from rest_framework import status
 from unittest.mock import patch, MagicMock
 
 from .models import PDFParseTask, ParseResult
-from .services import MinerUService
+from .services import MinerUService, MinerUWorkerError, MinerUWorkerPool, MinerUWorkerTimeout
+from .services.worker_pool import WORKER_SCRIPT
 from .serializers import PDFParseTaskSerializer
 
 User = get_user_model()
@@ -218,3 +223,101 @@ class SerializerTest(TestCase):
         self.assertEqual(data['status'], 'completed')
         self.assertEqual(data['status_display'], '已完成')
         self.assertIn('task_id', data)
+
+
+# 模拟 MinerU 的解析进程：启动时“加载模型”0.5秒，按输入文件内容模拟正常、失败、崩溃和卡死
+FAKE_WORKER = textwrap.dedent(f"""
+    import os, sys, time
+    sys.path.insert(0, {str(WORKER_SCRIPT.parent)!r})
+    from mineru_worker import serve
+
+    def parse(job):
+        content = open(job['input_path']).read()
+        if content == 'crash':
+            os._exit(3)
+        if content == 'hang':
+            time.sleep(60)
+        if content == 'fail':
+            raise ValueError('无法解析')
+        print('MinerU 日志输出不影响协议')
+        output = os.path.join(job['output_dir'], 'result.md')
+        with open(output, 'w') as f:
+            f.write(f"{{content}} pid={{os.getpid()}}")
+
+    serve(parse, warmup=lambda: time.sleep(0.5))
+""")
+
+
+class MinerUWorkerPoolTest(SimpleTestCase):
+    """MinerU 常驻进程池测试"""
+    
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        script = self.tmp_dir / 'fake_worker.py'
+        script.write_text(FAKE_WORKER)
+        self.command = [sys.executable, str(script)]
+        self.pools = []
+    
+    def tearDown(self):
+        for pool in self.pools:
+            pool.shutdown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def _pool(self, **kwargs):
+        pool = MinerUWorkerPool(command=self.command, work_dir=str(self.tmp_dir), **kwargs)
+        self.pools.append(pool)
+        return pool
+    
+    def _document(self, name, content):
+        path = self.tmp_dir / f'{name}.pdf'
+        path.write_text(content)
+        output_dir = self.tmp_dir / 'outputs' / name
+        output_dir.mkdir(parents=True)
+        return str(path), str(output_dir)
+    
+    def _parsed_pid(self, output_dir):
+        return (Path(output_dir) / 'result.md').read_text().split('pid=')[1]
+    
+    def test_workers_reused_across_documents(self):
+        """模型只在进程启动时加载，后续文档的耗时只有解析本身"""
+        pool = self._pool(size=2, max_jobs_per_worker=0)
+        documents = [self._document(f'doc{i}', f'doc {i}') for i in range(10)]
+        pool.parse(*documents[0])  # 预热
+        
+        results = [pool.parse(path, output_dir) for path, output_dir in documents[1:]]
+        pids = {self._parsed_pid(output_dir) for _, output_dir in documents}
+        
+        self.assertLessEqual(len(pids), 2)
+        self.assertTrue(all(r['ok'] for r in results))
+        # 启动时的 0.5 秒加载不再计入每个文档
+        self.assertLess(max(r['latency'] for r in results), 0.4)
+        self.assertEqual(pool.stats()['completed'], 10)
+    
+    def test_recycle_after_max_jobs(self):
+        pool = self._pool(size=1, max_jobs_per_worker=2)
+        documents = [self._document(f'doc{i}', f'doc {i}') for i in range(5)]
+        for path, output_dir in documents:
+            pool.parse(path, output_dir)
+        
+        pids = [self._parsed_pid(output_dir) for _, output_dir in documents]
+        self.assertEqual(len(set(pids)), 3)
+        self.assertEqual(pids[0], pids[1])
+        self.assertEqual(pool.stats()['recycled'], 2)
+    
+    def test_timeout_and_crash_recovery(self):
+        pool = self._pool(size=1, job_timeout=2)
+        
+        with self.assertRaises(MinerUWorkerTimeout):
+            pool.parse(*self._document('hang', 'hang'))
+        with self.assertRaises(MinerUWorkerError):
+            pool.parse(*self._document('crash', 'crash'))
+        with self.assertRaisesMessage(MinerUWorkerError, '无法解析'):
+            pool.parse(*self._document('fail', 'fail'))
+        
+        # 超时和崩溃后进程已重启，后续文档正常解析
+        result = pool.parse(*self._document('ok', 'ok'))
+        stats = pool.stats()
+        
+        self.assertTrue(result['ok'])
+        self.assertEqual((stats['timeouts'], stats['crashes'], stats['restarts']), (1, 2, 1))
+        self.assertEqual((stats['completed'], stats['failed']), (1, 3))
@@ -5,8 +5,10 @@ logger = logging.getLogger("django")
 import time
 import traceback
 import os
+import uuid
 from .types import ToolType
 from .output_format import ToolOutputValidator
+from .telemetry import summarize_payload, full_payload, should_capture_payload, tool_metrics
 
 class BaseTool(ABC):
     """所有工具的基础抽象类，提供统一的状态管理和日志记录"""
@@ -57,22 +59,19 @@ class BaseTool(ABC):
             runtime_state: 运行时状态对象（可选），由执行器自动传入
             user_id: 用户标识符（可选），用于个性化服务和审计追踪
         """
-        execution_id = f"{self.tool_name}_{int(time.time())}"
+        execution_id = f"{self.tool_name}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
         start_time = time.time()
         
-        logger.info(f"[{self.tool_name}] 开始执行")
-        
-        # 清晰记录工具收到的输入
-        import json
-        safe_input = self._safe_log_input(tool_input)
-        try:
-            formatted_input = json.dumps(safe_input, indent=2, ensure_ascii=False)
-        except Exception:
-            formatted_input = str(safe_input)
-        logger.warning(
-            f"\n{'='*60}\n[{self.tool_name}] 收到的输入参数:\n{'-'*60}\n"
-            f"{formatted_input}\n{'='*60}\n"
+        # 只记录有界的输入摘要；完整输入由 ActionSteps 保存，按 execution_id 查询
+        # 采样命中的调用计算精确大小与全量哈希，其余调用只序列化截断后的载荷
+        capture_payload = should_capture_payload(self.tool_name, self.config)
+        input_summary = summarize_payload(tool_input, exact=capture_payload)
+        logger.info(
+            f"[{self.tool_name}] 开始执行 [ID: {execution_id}] 输入: "
+            f"{input_summary['bytes']} 字节, sha256={input_summary['sha256']}, 预览: {input_summary['preview']}"
         )
+        if capture_payload:
+            logger.info(f"[{self.tool_name}] 完整输入（采样） [ID: {execution_id}]:\n{full_payload(tool_input)}")
         
         try:
             # 输入验证
@@ -80,6 +79,8 @@ class BaseTool(ABC):
             if not validation_result["valid"]:
                 error_msg = f"输入验证失败: {validation_result['error']}"
                 logger.error(error_msg)
+                tool_metrics.record(self.tool_name, "error", (time.time() - start_time) * 1000,
+                                    input_summary['bytes'], 0, execution_id)
                 return self.create_error_response(error_msg, execution_id)
             
             # 执行工具逻辑，传递 runtime_state 和 user_id
@@ -89,7 +90,16 @@ class BaseTool(ABC):
             standardized_result = self._standardize_output(result, execution_id)
             
             execution_time = time.time() - start_time
-            logger.info(f"[{self.tool_name}] 执行完成 - 状态: {standardized_result.get('status', 'unknown')}, 耗时: {execution_time:.2f}s")
+            status = standardized_result.get('status', 'unknown')
+            output_summary = summarize_payload(standardized_result, exact=capture_payload)
+            logger.info(
+                f"[{self.tool_name}] 执行完成 - 状态: {status}, 耗时: {execution_time:.2f}s, "
+                f"输出: {output_summary['bytes']} 字节, sha256={output_summary['sha256']}"
+            )
+            if capture_payload:
+                logger.info(f"[{self.tool_name}] 完整输出（采样） [ID: {execution_id}]:\n{full_payload(standardized_result)}")
+            tool_metrics.record(self.tool_name, status, execution_time * 1000,
+                                input_summary['bytes'], output_summary['bytes'], execution_id)
             
             return standardized_result
             
@@ -100,6 +110,8 @@ class BaseTool(ABC):
                         f"错误类型: {type(e).__name__}\n" +
                         f"错误信息: {str(e)}\n" +
                         f"错误堆栈: {traceback.format_exc()}")
+            tool_metrics.record(self.tool_name, "error", execution_time * 1000,
+                                input_summary['bytes'], 0, execution_id)
             
             return self.create_error_response(str(e), execution_id, error_type=type(e).__name__)
     
@@ -294,52 +306,6 @@ class BaseTool(ABC):
         
         return standardized
     
-    def _safe_log_input(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
-        """安全地记录输入参数，避免敏感信息泄露"""
-        safe_input = {}
-        sensitive_keys = {"api_key", "password", "token", "secret"}
-        
-        for key, value in tool_input.items():
-            if key.lower() in sensitive_keys:
-                safe_input[key] = "***HIDDEN***"
-            elif isinstance(value, str):
-                if len(value) > 500:
-                    safe_input[key] = f"{value[:500]}... [截断，总长度: {len(value)}]"
-                else:
-                    safe_input[key] = value
-            elif isinstance(value, dict):
-                # 递归处理嵌套字典
-                safe_input[key] = self._safe_log_dict(value, max_depth=3)
-            elif isinstance(value, list):
-                # 处理列表
-                if len(value) > 5:
-                    safe_input[key] = value[:5] + [f"... 还有 {len(value) - 5} 项"]
-                else:
-                    safe_input[key] = value
-            elif isinstance(value, bytes):
-                # 处理二进制数据
-                safe_input[key] = f"<二进制数据，长度: {len(value)} 字节>"
-            else:
-                safe_input[key] = value
-        
-        return safe_input
-    
-    def _safe_log_dict(self, d: Dict[str, Any], max_depth: int = 3, current_depth: int = 0) -> Dict[str, Any]:
-        """递归处理嵌套字典，限制深度"""
-        if current_depth >= max_depth:
-            return "<嵌套过深，已省略...>"
-        
-        safe_dict = {}
-        for k, v in d.items():
-            if isinstance(v, dict):
-                safe_dict[k] = self._safe_log_dict(v, max_depth, current_depth + 1)
-            elif isinstance(v, str) and len(v) > 200:
-                safe_dict[k] = f"{v[:200]}... [截断]"
-            else:
-                safe_dict[k] = v
-        
-        return safe_dict
-    
     def _ensure_text_format(self, data: Any) -> str:
         """
         确保数据是用户友好的文本格式
@@ -0,0 +1,384 @@
+"""
+文档解析结果缓存
+
+同一份文件常被不同任务、不同用户重复上传，每次都重新解析（尤其是 PDF 的 MinerU/OCR）代价很高。
+ParseCache 以 (文件内容哈希, 解析器, 解析器版本, 解析参数) 为键，把解析结果存入数据库表
+tools_parse_cache（ParseCacheEntry），所有文档解析入口共用：
+- 解析器升级时提高版本号即可让旧结果失效，不同参数的结果互不覆盖
+- 写入按唯一键 upsert，多个进程并发写同一结果时不会产生重复行或报错
+- 过期（TTL）的条目先淘汰，总大小超过上限时按最近访问时间（LRU）淘汰
+- 进程内统计命中率，数据库侧可查询各解析器的条目数与占用
+- 结果引用外部文件（旁路数据、输出目录）时，调用方传入 is_valid 校验文件仍然存在，失效的条目按未命中处理
+
+缓存只是加速手段：数据库不可用或结果无法序列化时按未命中处理，解析照常进行。
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, IntegrityError
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+logger = logging.getLogger('django')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_content_hash(file_path: str) -> str:
+    """文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(content_hash: str, parser: str, parser_version: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """缓存键：参数按键排序后序列化，键的顺序不影响结果"""
+    material = json.dumps(
+        [content_hash, parser, str(parser_version), options or {}],
+        sort_keys=True, ensure_ascii=False, cls=DjangoJSONEncoder
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ParseCache:
+    """基于数据库的解析结果缓存"""
+
+    def __init__(self, ttl_seconds: int = 30 * 86400, max_bytes: int = 1024 * 1024 * 1024,
+                 evict_every: int = 50):
+        """
+        Args:
+            ttl_seconds: 条目有效期（秒），0 表示不过期
+            max_bytes: 结果总大小上限，超过后按 LRU 淘汰到上限的 90%，0 表示不限制
+            evict_every: 每写入多少条检查一次淘汰
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evict_every = max(1, evict_every)
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+        # 进程内正在解析的键：cache_key -> Future，合并并发的相同解析
+        self._inflight: Dict[str, Future] = {}
+
+    # ==================== 读写 ====================
+
+    def get(self, content_hash: str, parser: str, parser_version: str,
+            options: Optional[Dict[str, Any]] = None,
+            is_valid: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        读取缓存结果，未命中或已过期返回 None
+
+        Args:
+            is_valid: 校验命中的结果是否仍可用（例如引用的文件仍然存在），不可用时按未命中处理
+        """
+        from tools.models import ParseCacheEntry
+
+        cache_key = make_key(content_hash, parser, parser_version, options)
+        now = timezone.now()
+        try:
+            entry = (
+                ParseCacheEntry.objects
+                .filter(cache_key=cache_key)
+                .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+                .only('id', 'result')
+                .first()
+            )
+            if entry is not None and is_valid is not None and not is_valid(entry.result):
+                logger.info(f"解析缓存条目引用的文件已不存在，按未命中处理 [{parser}]")
+                entry = None
+            if entry is not None:
+                ParseCacheEntry.objects.filter(id=entry.id).update(
+                    hit_count=F('hit_count') + 1, last_accessed_at=now
+                )
+        except DatabaseError as e:
+            logger.warning(f"解析缓存读取失败，按未命中处理: {e}")
+            entry = None
+
+        self._count(parser, 'hits' if entry is not None else 'misses')
+        return entry.result if entry is not None else None
+
+    def put(self, content_hash: str, parser: str, parser_version: str, result: Any,
+            options: Optional[Dict[str, Any]] = None) -> bool:
+        """写入缓存结果，已存在时覆盖；返回是否写入成功"""
+        from tools.models import ParseCacheEntry
+
+        try:
+            size_bytes = len(json.dumps(result, ensure_ascii=False, cls=DjangoJSONEncoder).encode('utf-8'))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"解析结果无法序列化，跳过缓存 [{parser}]: {e}")
+            return False
+        if self.max_bytes and size_bytes > self.max_bytes:
+            return False
+
+        now = timezone.now()
+        values = {
+            'content_hash': content_hash,
+            'parser': parser,
+            'parser_version': str(parser_version),
+            'options': json.loads(json.dumps(options or {}, cls=DjangoJSONEncoder)),
+            'result': result,
+            'size_bytes': size_bytes,
+            'last_accessed_at': now,
+            'expires_at': now + timedelta(seconds=self.ttl_seconds) if self.ttl_seconds else None,
+        }
+        cache_key = make_key(content_hash, parser, parser_version, options)
+        try:
+            try:
+                ParseCacheEntry.objects.update_or_create(cache_key=cache_key, defaults=values)
+            except IntegrityError:
+                # 另一个进程刚好插入了同一个键，内容相同，覆盖即可
+                ParseCacheEntry.objects.filter(cache_key=cache_key).update(**values)
+        except DatabaseError as e:
+            logger.warning(f"解析缓存写入失败 [{parser}]: {e}")
+            return False
+
+        self._count(parser, 'writes')
+        with self._lock:
+            self._writes_since_evict += 1
+            due = self._writes_since_evict >= self.evict_every
+            if due:
+                self._writes_since_evict = 0
+        if due:
+            self.evict()
+        return True
+
+    def get_or_parse(self, content_hash: str, parser: str, parser_version: str,
+                     parse: Callable[[], Any], options: Optional[Dict[str, Any]] = None,
+                     cacheable: Optional[Callable[[Any], bool]] = None,
+                     is_valid: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, bool]:
+        """
+        读取缓存，未命中时调用 parse 并写入
+
+        进程内对同一个键的并发调用只解析一次，其余调用等待并各自得到结果的副本，
+        调用方修改结果不会互相影响。
+
+        Args:
+            parse: 无参数的解析函数
+            cacheable: 判断结果是否可以缓存（例如只缓存成功结果），默认全部缓存
+            is_valid: 校验命中的结果是否仍可用，见 get()
+
+        Returns:
+            (解析结果, 是否命中缓存)
+        """
+        cached = self.get(content_hash, parser, parser_version, options, is_valid)
+        if cached is not None:
+            return cached, True
+
+        cache_key = make_key(content_hash, parser, parser_version, options)
+        with self._lock:
+            running = self._inflight.get(cache_key)
+            if running is None:
+                own_future = Future()
+                self._inflight[cache_key] = own_future
+        if running is not None:
+            return copy.deepcopy(running.result()), True
+
+        try:
+            result = parse()
+            # 等待者从快照复制，本调用返回的对象被修改也不影响它们
+            own_future.set_result(copy.deepcopy(result))
+        except BaseException as e:
+            own_future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(cache_key, None)
+
+        if result is not None and (cacheable is None or cacheable(result)):
+            self.put(content_hash, parser, parser_version, result, options)
+        return result, False
+
+    def invalidate(self, content_hash: Optional[str] = None, parser: Optional[str] = None,
+                   parser_version: Optional[str] = None) -> int:
+        """按条件删除条目（都不传时清空），返回删除数量"""
+        from tools.models import ParseCacheEntry
+
+        queryset = ParseCacheEntry.objects.all()
+        if content_hash:
+            queryset = queryset.filter(content_hash=content_hash)
+        if parser:
+            queryset = queryset.filter(parser=parser)
+        if parser_version:
+            queryset = queryset.filter(parser_version=str(parser_version))
+        deleted, _ = queryset.delete()
+        return deleted
+
+    # ==================== 淘汰 ====================
+
+    def evict(self) -> int:
+        """删除过期条目；总大小超过上限时按最近访问时间淘汰到上限的 90%，返回删除数量"""
+        from tools.models import ParseCacheEntry
+
+        try:
+            removed, _ = ParseCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+
+            if self.max_bytes:
+                total = ParseCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+                if total > self.max_bytes:
+                    target = int(self.max_bytes * 0.9)
+                    stale_ids = []
+                    oldest_first = (
+                        ParseCacheEntry.objects
+                        .order_by('last_accessed_at')
+                        .values_list('id', 'size_bytes')
+                    )
+                    for entry_id, size_bytes in oldest_first.iterator():
+                        if total <= target:
+                            break
+                        stale_ids.append(entry_id)
+                        total -= size_bytes
+                    for start in range(0, len(stale_ids), 500):
+                        deleted, _ = ParseCacheEntry.objects.filter(id__in=stale_ids[start:start + 500]).delete()
+                        removed += deleted
+        except DatabaseError as e:
+            logger.warning(f"解析缓存淘汰失败: {e}")
+            return 0
+
+        if removed:
+            logger.info(f"解析缓存淘汰 {removed} 条")
+            with self._lock:
+                self._stats.setdefault('_all', {}).setdefault('evictions', 0)
+                self._stats['_all']['evictions'] += removed
+        return removed
+
+    # ==================== 统计 ====================
+
+    def stats(self) -> Dict[str, Any]:
+        """进程内的命中统计，按解析器分组"""
+        with self._lock:
+            per_parser = {
+                name: dict(counts) for name, counts in self._stats.items() if name != '_all'
+            }
+            evictions = self._stats.get('_all', {}).get('evictions', 0)
+
+        totals = {'hits': 0, 'misses': 0, 'writes': 0}
+        for counts in per_parser.values():
+            for name in totals:
+                totals[name] += counts.get(name, 0)
+            counts['hit_rate'] = _hit_rate(counts.get('hits', 0), counts.get('misses', 0))
+        return {
+            **totals,
+            'evictions': evictions,
+            'hit_rate': _hit_rate(totals['hits'], totals['misses']),
+            'parsers': per_parser,
+        }
+
+    def index_stats(self) -> Dict[str, Any]:
+        """数据库中的条目数、总大小和累计命中，按解析器分组"""
+        from tools.models import ParseCacheEntry
+
+        rows = (
+            ParseCacheEntry.objects
+            .values('parser')
+            .annotate(entries=Count('id'), size_bytes=Sum('size_bytes'), hits=Sum('hit_count'))
+            .order_by('parser')
+        )
+        parsers = {
+            row['parser']: {
+                'entries': row['entries'],
+                'size_bytes': row['size_bytes'] or 0,
+                'hits': row['hits'] or 0,
+            }
+            for row in rows
+        }
+        return {
+            'entries': sum(p['entries'] for p in parsers.values()),
+            'size_bytes': sum(p['size_bytes'] for p in parsers.values()),
+            'max_bytes': self.max_bytes,
+            'parsers': parsers,
+        }
+
+    def _count(self, parser: str, name: str) -> None:
+        with self._lock:
+            counts = self._stats.setdefault(parser, {'hits': 0, 'misses': 0, 'writes': 0})
+            counts[name] += 1
+
+
+def _hit_rate(hits: int, misses: int) -> float:
+    return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+
+def cached_file_parse(file_path: str, parser: str, parser_version: str, parse: Callable[[], Any],
+                      options: Optional[Dict[str, Any]] = None,
+                      cacheable: Optional[Callable[[Any], bool]] = None,
+                      is_valid: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, bool]:
+    """
+    按文件内容缓存解析结果，供各解析工具使用
+
+    缓存未启用或文件无法读取时直接调用 parse。
+
+    Returns:
+        (解析结果, 是否命中缓存)
+    """
+    cache = get_parse_cache()
+    if cache is None:
+        return parse(), False
+    try:
+        content_hash = file_content_hash(file_path)
+    except OSError:
+        return parse(), False
+    return cache.get_or_parse(content_hash, parser, parser_version, parse, options, cacheable, is_valid)
+
+
+def cached_tool_result(file_path: str, parser: str, parser_version: str,
+                       execute: Callable[[], Dict[str, Any]],
+                       options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    缓存工具的完整返回结果，只缓存 status 为 success 的结果
+
+    命中时结果中的 file_path 与 message 换成本次调用的文件，并标记 cache_hit。
+    """
+    result, hit = cached_file_parse(
+        file_path, parser, parser_version, execute, options,
+        cacheable=lambda r: isinstance(r, dict) and r.get('status') == 'success'
+    )
+    if hit and result.get('status') == 'success':
+        result = {
+            **result,
+            'file_path': file_path,
+            'message': f"文件 '{os.path.basename(file_path)}' 已成功解析（复用缓存结果）。",
+            'cache_hit': True,
+        }
+    return result
+
+
+_parse_cache: Optional[ParseCache] = None
+_parse_cache_configured = False
+_parse_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """按 settings 创建进程内的缓存实例，未启用时返回 None"""
+    global _parse_cache, _parse_cache_configured
+    if _parse_cache_configured:
+        return _parse_cache
+    with _parse_cache_lock:
+        if not _parse_cache_configured:
+            if getattr(settings, 'PARSE_CACHE_ENABLED', True):
+                _parse_cache = ParseCache(
+                    ttl_seconds=getattr(settings, 'PARSE_CACHE_TTL_DAYS', 30) * 86400,
+                    max_bytes=getattr(settings, 'PARSE_CACHE_MAX_MB', 1024) * 1024 * 1024,
+                )
+            _parse_cache_configured = True
+    return _parse_cache
+
+
+def set_parse_cache(cache: Optional[ParseCache]) -> Optional[ParseCache]:
+    """替换进程内的缓存实例（None 表示禁用），返回原实例"""
+    global _parse_cache, _parse_cache_configured
+    with _parse_cache_lock:
+        previous = _parse_cache
+        _parse_cache = cache
+        _parse_cache_configured = True
+    return previous
@@ -0,0 +1,196 @@
+"""
+工具执行遥测
+
+execute_with_logging 不再把完整的输入/输出写进日志，而是记录有界的摘要：
+- 载荷先按字段截断（长字符串只保留前缀、长列表只保留前若干项、遍历节点数有上限）再序列化，
+  摘要的代价与载荷大小无关
+- 截断后的预览、近似大小和 sha256（基于截断后的文本与近似大小），足以区分绝大多数不同的载荷
+- 按工具配置的采样率，偶尔记录一次完整载荷用于排查；采样命中的调用计算精确的字节数与全量哈希
+- 每次执行的耗时、状态、载荷大小作为指标输出到 tools.metrics 日志，并在进程内聚合
+
+完整载荷本身由 ActionSteps（TOOL_CALL / TOOL_RESULT）保存，按 execution_id 查询，
+见 agentic.utils.logger_config.find_tool_payload。
+"""
+import json
+import hashlib
+import logging
+import random
+import threading
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+metrics_logger = logging.getLogger('tools.metrics')
+
+SENSITIVE_KEYS = {"api_key", "password", "token", "secret"}
+# 不属于载荷本身、序列化代价很高的注入参数
+SKIP_KEYS = {"runtime_state"}
+
+# 摘要截断：单个字符串字段保留的字符数、列表保留的项数、遍历的节点数
+FIELD_CHARS = 200
+LIST_ITEMS = 20
+MAX_NODES = 500
+
+
+def summarize_payload(payload: Any, preview_chars: Optional[int] = None, exact: bool = False) -> Dict[str, Any]:
+    """
+    生成载荷摘要：{'bytes', 'exact', 'sha256', 'preview', 'keys'}
+
+    默认先截断再序列化：bytes 为遍历到的字段的近似大小（字符数），sha256 基于截断后的文本与该大小；
+    exact=True（采样命中时）完整序列化，bytes 为精确的 UTF-8 字节数，sha256 覆盖全部内容。
+    敏感字段会被隐藏。
+    """
+    if preview_chars is None:
+        preview_chars = getattr(settings, 'TOOL_LOG_PREVIEW_CHARS', 500)
+    if isinstance(payload, dict):
+        payload = {k: v for k, v in payload.items() if k not in SKIP_KEYS}
+
+    # 先脱敏再序列化，哈希与预览基于同一份文本
+    if exact:
+        serialized = _dumps(_redact(payload))
+        encoded = serialized.encode('utf-8', errors='replace')
+        size = len(encoded)
+    else:
+        state = {'nodes': 0, 'size': 0}
+        serialized = _dumps(_bounded(payload, state))
+        size = state['size']
+        encoded = f"{size}|{serialized}".encode('utf-8', errors='replace')
+    if len(serialized) > preview_chars:
+        preview = f"{serialized[:preview_chars]}... [截断，总长度: {len(serialized)}]"
+    else:
+        preview = serialized
+    summary = {
+        'bytes': size,
+        'exact': exact,
+        'sha256': hashlib.sha256(encoded).hexdigest()[:16],
+        'preview': preview,
+    }
+    if isinstance(payload, dict):
+        summary['keys'] = list(payload.keys())[:20]
+    return summary
+
+
+def full_payload(payload: Any) -> str:
+    """采样命中时记录的完整载荷（敏感字段仍然隐藏）"""
+    if isinstance(payload, dict):
+        payload = _redact({k: v for k, v in payload.items() if k not in SKIP_KEYS})
+    return _dumps(payload, indent=2)
+
+
+def should_capture_payload(tool_name: str, tool_config: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    是否记录本次调用的完整载荷。
+
+    采样率优先级：工具实例 config['payload_log_sample_rate'] >
+    settings.TOOL_LOG_PAYLOAD_SAMPLE_TOOLS[工具名] > settings.TOOL_LOG_PAYLOAD_SAMPLE_RATE
+    """
+    rate = (tool_config or {}).get('payload_log_sample_rate')
+    if rate is None:
+        rate = getattr(settings, 'TOOL_LOG_PAYLOAD_SAMPLE_TOOLS', {}).get(tool_name)
+    if rate is None:
+        rate = getattr(settings, 'TOOL_LOG_PAYLOAD_SAMPLE_RATE', 0.0)
+    rate = float(rate)
+    return rate >= 1.0 or (rate > 0 and random.random() < rate)
+
+
+class ToolMetrics:
+    """进程内的工具执行指标聚合"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, tool_name: str, status: str, duration_ms: float,
+               input_bytes: int = 0, output_bytes: int = 0, execution_id: str = None) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(tool_name, {
+                'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'input_bytes': 0, 'output_bytes': 0,
+            })
+            stats['calls'] += 1
+            if status == 'error':
+                stats['errors'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['input_bytes'] += input_bytes
+            stats['output_bytes'] += output_bytes
+
+        metric = {
+            'tool': tool_name,
+            'status': status,
+            'duration_ms': round(duration_ms, 1),
+            'input_bytes': input_bytes,
+            'output_bytes': output_bytes,
+            'execution_id': execution_id,
+        }
+        metrics_logger.info(
+            "tool_metric " + " ".join(f"{k}={v}" for k, v in metric.items()),
+            extra={'tool_metric': metric}
+        )
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                item = dict(stats)
+                item['avg_ms'] = round(stats['total_ms'] / stats['calls'], 1) if stats['calls'] else 0.0
+                result[name] = item
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+tool_metrics = ToolMetrics()
+
+
+def _dumps(payload: Any, indent: Optional[int] = None) -> str:
+    try:
+        return json.dumps(payload, ensure_ascii=False, default=str, indent=indent)
+    except Exception:
+        return str(payload)
+
+
+def _bounded(value: Any, state: Dict[str, int]) -> Any:
+    """脱敏并截断载荷，同时在 state['size'] 中累计近似大小；节点数超过 MAX_NODES 后不再展开"""
+    state['nodes'] += 1
+    if state['nodes'] > MAX_NODES:
+        return "..."
+    if isinstance(value, str):
+        state['size'] += len(value) + 2
+        if len(value) > FIELD_CHARS:
+            return f"{value[:FIELD_CHARS]}... [+{len(value) - FIELD_CHARS} 字符]"
+        return value
+    if isinstance(value, dict):
+        state['size'] += 2
+        result = {}
+        for key, item in value.items():
+            if state['nodes'] > MAX_NODES:
+                result["..."] = f"[+{len(value) - len(result)} 项]"
+                break
+            state['size'] += len(str(key)) + 4
+            result[key] = "***HIDDEN***" if str(key).lower() in SENSITIVE_KEYS else _bounded(item, state)
+        return result
+    if isinstance(value, (list, tuple)):
+        state['size'] += 2
+        result = [_bounded(item, state) for item in value[:LIST_ITEMS]]
+        if len(value) > LIST_ITEMS:
+            # 未展开的项只计数，不计入大小
+            result.append(f"... [+{len(value) - LIST_ITEMS} 项]")
+        return result
+    if value is None or isinstance(value, (bool, int, float)):
+        state['size'] += len(str(value))
+        return value
+    # 其他对象（DataFrame 等）的 str() 本身可能很昂贵，只记录类型
+    return f"<{type(value).__name__}>"
+
+
+def _redact(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: ("***HIDDEN***" if str(k).lower() in SENSITIVE_KEYS else _redact(v))
+                for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact(v) for v in value]
+    return value
+
@@ -138,6 +138,7 @@ result = df.groupby('category').sum()
 """
 
 import io
+import json
 import contextlib
 from typing import Dict, Any, Optional, Union
 import pandas as pd
@@ -146,6 +147,7 @@ from pydantic import BaseModel, Field
 from tools.core.base import BaseTool
 from tools.core.registry import register_tool
 from tools.core.types import ToolType
+from tools.preprocessors.core.excel_stream_profiler import load_table_data
 
 
 class PandasCalculatorInput(BaseModel):
@@ -172,13 +174,26 @@ class PandasDataCalculatorTool(BaseTool):
     def get_input_schema(self) -> Dict[str, Any]:
         return PandasCalculatorInput.model_json_schema()
 
+    @staticmethod
+    def _load_dataframe_from_json(df_json: str) -> pd.DataFrame:
+        """解析JSON形式的表格；预处理表格条目（含 data_path）从旁路文件加载完整数据"""
+        try:
+            payload = json.loads(df_json)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict) and 'data_path' in payload:
+            return load_table_data(payload)
+        return pd.read_json(io.StringIO(df_json), orient='split')
+
     def execute(self, tool_input: Dict[str, Any], runtime_state: Any = None, user_id: Optional[Union[str, int]] = None) -> Dict[str, Any]:
         try:
             parsed_input = PandasCalculatorInput(**tool_input)
 
             # 处理输入：如果df是JSON字符串，则转换为DataFrame
             if isinstance(parsed_input.df, str):
-                parsed_input.df = pd.read_json(io.StringIO(parsed_input.df), orient='split')
+                parsed_input.df = self._load_dataframe_from_json(parsed_input.df)
+            elif isinstance(parsed_input.df, dict):
+                parsed_input.df = load_table_data(parsed_input.df)
 
             # 创建执行作用域，直接使用传入的DataFrame对象
             exec_globals = {'df': parsed_input.df, 'pd': pd, 'result': None}
@@ -55,7 +55,8 @@
 3. 调用KnowledgeService.retrieve_knowledge()
 4. 执行语义搜索和关键词搜索
 5. 按相似度阈值过滤结果
-6. 格式化输出结果
+6. 配置了重排序模型时（KNOWLEDGE_RERANK_MODEL）用交叉编码器重排序，只保留少量高分结果
+7. 格式化输出结果
 
 ### 3. 管理流程 (list/delete/update/stats)
 - list: 列出用户所有知识库集合
@@ -122,6 +123,7 @@ execute() -> _store_knowledge()/_retrieve_knowledge()/_search_knowledge()/_list_
 ## 性能考虑
 - 限制单次检索结果数量(最大50条)
 - 使用向量相似度阈值过滤结果
+- 重排序在延迟预算内进行，只把最相关的少量分块放进输出，减少下游提示词 token
 - 批量操作优化
 - 异常处理不影响系统稳定性
 """
@@ -132,6 +134,7 @@ from tools.core.types import ToolType
 from typing import Dict, Any, Optional, Union, List, Literal
 from pydantic import BaseModel, Field
 import logging
+from knowledge.retrieval_cache import get_retrieval_cache
 from knowledge.services import KnowledgeService
 
 logger = logging.getLogger("django")
@@ -360,14 +363,29 @@ class KnowledgeBaseTool(BaseTool):
         distance_threshold = parsed_input.distance_threshold
         
         try:
-            # 使用服务层检索知识
-            result = self.service.retrieve_knowledge(
-                query=query,
-                collection_name=collection_name,
-                user_id=user_id,
-                limit=limit,
-                distance_threshold=distance_threshold
-            )
+            # 使用服务层检索知识；相同查询命中检索缓存，集合写入后缓存失效
+            def retrieve():
+                return self.service.retrieve_knowledge(
+                    query=query,
+                    collection_name=collection_name,
+                    user_id=user_id,
+                    limit=limit,
+                    distance_threshold=distance_threshold,
+                    rerank=True
+                )
+            
+            cache = get_retrieval_cache()
+            if cache is not None:
+                # 检索阶段失败（如 Qdrant 不可用时只有词法结果）或重排序被跳过、部分完成、失败的结果是降级结果，
+                # 不写入缓存，避免依赖恢复后仍返回降级结果
+                result, cache_hit = cache.get_or_retrieve(
+                    collection_name, query, limit, retrieve,
+                    filters={'distance_threshold': distance_threshold, 'rerank': True},
+                    cacheable=lambda r: not r.get('degraded')
+                    and (r.get('rerank') or {}).get('status', 'applied') == 'applied'
+                )
+            else:
+                result, cache_hit = retrieve(), False
             
             filtered_results = result['results']
             
@@ -376,7 +394,11 @@ class KnowledgeBaseTool(BaseTool):
                 output_lines = [f"针对查询 '{query}' 找到 {len(filtered_results)} 条相关知识：\n"]
                 
                 for i, item in enumerate(filtered_results, 1):
-                    output_lines.append(f"{i}. 知识项 (ID: {item.get('id', 'N/A')}, 相似度: {1-item.get('distance', 1):.2f})")
+                    if item.get('rerank_score') is not None:
+                        relevance = f"相关度: {item['rerank_score']:.2f}"
+                    else:
+                        relevance = f"相似度: {1-item.get('distance', 1):.2f}"
+                    output_lines.append(f"{i}. 知识项 (ID: {item.get('id', 'N/A')}, {relevance})")
                     output_lines.append(f"   内容: {item.get('content', '无内容')[:200]}...")
                     if item.get('metadata'):
                         output_lines.append(f"   元数据: {item.get('metadata')}")
@@ -385,6 +407,7 @@ class KnowledgeBaseTool(BaseTool):
                 output_text = "\n".join(output_lines)
                 
                 avg_distance = sum(r.get('distance', 0) for r in filtered_results) / len(filtered_results) if filtered_results else 0
+                rerank_info = result.get('rerank')
                 
                 return {
                     "status": "success",
@@ -401,11 +424,16 @@ class KnowledgeBaseTool(BaseTool):
                         f"向量搜索: {result['vector_results_count']} 条",
                         f"数据库搜索: {result['database_results_count']} 条",
                         f"平均相似度: {1-avg_distance:.2f}"
-                    ],
+                    ] + ([
+                        f"重排序: {rerank_info['status']}（候选 {rerank_info['candidates']} 条，耗时 {rerank_info['ms']}ms）"
+                    ] if rerank_info else []),
                     "metadata": {
                         "tool_input": parsed_input.model_dump(),
                         "collection_name": collection_name,
-                        "user_id": user_id
+                        "user_id": user_id,
+                        "cache_hit": cache_hit,
+                        "degraded": result.get('degraded', False),
+                        "rerank": rerank_info
                     },
                     "message": f"成功检索到 {len(filtered_results)} 条相关知识"
                 }
@@ -419,7 +447,9 @@ class KnowledgeBaseTool(BaseTool):
                     "metadata": {
                         "tool_input": parsed_input.model_dump(),
                         "collection_name": collection_name,
-                        "user_id": user_id
+                        "user_id": user_id,
+                        "cache_hit": cache_hit,
+                        "degraded": result.get('degraded', False)
                     },
                     "message": "未找到相关知识"
                 }
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:00
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParseCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True, verbose_name='缓存键')),
+                ('content_hash', models.CharField(db_index=True, max_length=64, verbose_name='文件内容哈希')),
+                ('parser', models.CharField(max_length=64, verbose_name='解析器')),
+                ('parser_version', models.CharField(max_length=32, verbose_name='解析器版本')),
+                ('options', models.JSONField(blank=True, default=dict, verbose_name='解析参数')),
+                ('result', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='解析结果')),
+                ('size_bytes', models.PositiveIntegerField(default=0, verbose_name='结果大小（字节）')),
+                ('hit_count', models.PositiveIntegerField(default=0, verbose_name='命中次数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('last_accessed_at', models.DateTimeField(db_index=True, verbose_name='最近访问时间')),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='过期时间')),
+            ],
+            options={
+                'verbose_name': '解析结果缓存',
+                'verbose_name_plural': '解析结果缓存',
+                'db_table': 'tools_parse_cache',
+                'indexes': [models.Index(fields=['parser', 'parser_version'], name='tools_parse_parser_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,34 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
-# Create your models here.
+
+class ParseCacheEntry(models.Model):
+    """
+    文档解析结果缓存（内容寻址）
+
+    键由 (文件内容哈希, 解析器, 解析器版本, 解析参数) 计算，同一文件被不同任务、不同用户重复上传时直接复用结果。
+    读写与淘汰见 tools.core.parse_cache.ParseCache。
+    """
+
+    cache_key = models.CharField(max_length=64, unique=True, verbose_name='缓存键')
+    content_hash = models.CharField(max_length=64, db_index=True, verbose_name='文件内容哈希')
+    parser = models.CharField(max_length=64, verbose_name='解析器')
+    parser_version = models.CharField(max_length=32, verbose_name='解析器版本')
+    options = models.JSONField(default=dict, blank=True, verbose_name='解析参数')
+    result = models.JSONField(encoder=DjangoJSONEncoder, verbose_name='解析结果')
+    size_bytes = models.PositiveIntegerField(default=0, verbose_name='结果大小（字节）')
+    hit_count = models.PositiveIntegerField(default=0, verbose_name='命中次数')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    last_accessed_at = models.DateTimeField(db_index=True, verbose_name='最近访问时间')
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='过期时间')
+
+    class Meta:
+        db_table = 'tools_parse_cache'
+        verbose_name = '解析结果缓存'
+        verbose_name_plural = '解析结果缓存'
+        indexes = [
+            models.Index(fields=['parser', 'parser_version'], name='tools_parse_parser_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.parser}@{self.parser_version}:{self.content_hash[:12]}"
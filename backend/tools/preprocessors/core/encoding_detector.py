@@ -0,0 +1,163 @@
+"""
+文本编码检测与流式解码
+======================
+
+只采样文件开头的有限字节来确定编码：
+1. BOM 检查
+2. 候选编码的增量解码器在同一份样本上一次性验证
+3. 都失败时使用 charset_normalizer 做统计推断
+
+确定编码后，文件以分块方式单遍解码，同时计算整个文件的内容哈希，供上层缓存解析结果。
+"""
+import io
+import codecs
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 采样前缀大小
+SAMPLE_SIZE = 64 * 1024
+# 流式解码的块大小
+CHUNK_SIZE = 1024 * 1024
+
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 按优先级排列的候选编码；gb18030 是 gbk/gb2312 的超集
+CANDIDATE_ENCODINGS = ['utf-8', 'gb18030', 'big5']
+
+# 所有字节都能解码的兜底编码
+FALLBACK_ENCODING = 'windows-1252'
+
+
+@dataclass
+class DecodedText:
+    """流式解码结果"""
+    content: str
+    encoding: str
+    detection_method: str
+    content_hash: str
+    bytes_read: int
+    truncated: bool = False
+    decode_errors: bool = False
+
+
+def detect_encoding(sample: bytes, is_complete: bool = False) -> Tuple[str, str]:
+    """
+    根据样本字节检测编码。
+
+    Args:
+        sample: 文件开头的字节
+        is_complete: 样本是否就是完整文件（决定末尾不完整的多字节序列是否算错误）
+
+    Returns:
+        (编码名称, 检测方式)，检测方式为 bom / decoder / statistical / fallback
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding, 'bom'
+
+    for encoding in CANDIDATE_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='strict')
+        try:
+            # final=False 时，样本末尾被截断的多字节字符不会被误判为错误
+            decoder.decode(sample, final=is_complete)
+            return encoding, 'decoder'
+        except UnicodeDecodeError:
+            continue
+
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(sample).best()
+        if best is not None and best.encoding:
+            return best.encoding, 'statistical'
+    except ImportError:
+        logger.debug("charset_normalizer 未安装，跳过统计推断")
+
+    return FALLBACK_ENCODING, 'fallback'
+
+
+def read_text_streaming(file_path: str, encoding: str = 'auto',
+                        max_lines: Optional[int] = None) -> DecodedText:
+    """
+    单遍读取并解码文本文件。
+
+    读取过程中同时计算 sha256，指定 max_lines 时读够行数即停止解码，
+    但剩余字节仍参与哈希，content_hash 始终对应整个文件。
+    换行符统一转换为 '\\n'，与文本模式 open() 的行为一致。
+    """
+    hasher = hashlib.sha256()
+    parts = []
+    line_count = 0
+    bytes_read = 0
+    truncated = False
+    decode_errors = False
+
+    with open(file_path, 'rb') as f:
+        first = f.read(SAMPLE_SIZE)
+        is_complete = len(first) < SAMPLE_SIZE
+        if encoding == 'auto':
+            encoding, method = detect_encoding(first, is_complete=is_complete)
+        else:
+            method = 'specified'
+
+        decoder = _make_decoder(encoding, 'strict')
+        chunk = first
+        while chunk:
+            hasher.update(chunk)
+            bytes_read += len(chunk)
+            next_chunk = f.read(CHUNK_SIZE)
+            final = not next_chunk
+            # 解码失败时解码器状态不确定，先记下本块之前的状态（缓冲的多字节前缀与待定的 '\\r'）
+            state = decoder.getstate()
+            try:
+                text = decoder.decode(chunk, final=final)
+            except UnicodeDecodeError:
+                # 样本之后出现非法字节：从本块起点以替换模式重新解码，不再重新读取文件
+                logger.warning(f"文件 {file_path} 在 {bytes_read} 字节附近存在 {encoding} 非法序列，改用替换模式解码")
+                decode_errors = True
+                decoder = _make_decoder(encoding, 'replace')
+                decoder.setstate(state)
+                text = decoder.decode(chunk, final=final)
+            parts.append(text)
+
+            if max_lines:
+                line_count += text.count('\n')
+                if line_count >= max_lines:
+                    truncated = not final
+                    # 未解码的部分只参与哈希
+                    hasher.update(next_chunk)
+                    for rest in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        hasher.update(rest)
+                    break
+            chunk = next_chunk
+
+    content = ''.join(parts)
+    if max_lines:
+        lines = content.splitlines(keepends=True)
+        if len(lines) > max_lines:
+            truncated = True
+        content = ''.join(lines[:max_lines])
+
+    return DecodedText(
+        content=content,
+        encoding=encoding,
+        detection_method=method,
+        content_hash=hasher.hexdigest(),
+        bytes_read=bytes_read,
+        truncated=truncated,
+        decode_errors=decode_errors,
+    )
+
+
+def _make_decoder(encoding: str, errors: str) -> io.IncrementalNewlineDecoder:
+    inner = codecs.getincrementaldecoder(encoding)(errors=errors)
+    return io.IncrementalNewlineDecoder(inner, translate=True)
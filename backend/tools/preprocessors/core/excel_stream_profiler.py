@@ -0,0 +1,378 @@
+"""
+Excel流式画像器
+================
+
+针对超大工作簿的流式读取：使用 openpyxl 只读模式逐行迭代，按块推断列类型，
+用蓄水池采样计算统计量，同时保留首尾预览行。完整数据逐行写入旁路 CSV 文件，
+供后续工具按需加载，内存占用与工作簿大小无关。
+"""
+import os
+import csv
+import math
+import random
+import logging
+import datetime
+from collections import deque, Counter
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ColumnProfile:
+    """单列的流式统计信息"""
+    name: str
+    non_null: int = 0
+    nulls: int = 0
+    type_counts: Counter = field(default_factory=Counter)
+
+    # 数值列统计（Welford 在线算法）
+    num_count: int = 0
+    num_mean: float = 0.0
+    num_m2: float = 0.0
+    num_min: Optional[float] = None
+    num_max: Optional[float] = None
+    num_sum: float = 0.0
+    num_sample: List[float] = field(default_factory=list)
+
+    # 分类列统计（有上限的计数器）
+    value_counts: Counter = field(default_factory=Counter)
+    distinct_overflow: bool = False
+
+    def dtype(self) -> str:
+        """根据各块累积的类型计数推断最终列类型"""
+        counts = self.type_counts
+        total = sum(counts.values())
+        if total == 0:
+            return 'empty'
+        if counts['int'] == total:
+            return 'int64'
+        if counts['int'] + counts['float'] == total:
+            return 'float64'
+        if counts['bool'] == total:
+            return 'bool'
+        if counts['datetime'] == total:
+            return 'datetime64'
+        return 'object'
+
+
+class ExcelStreamProfiler:
+    """
+    基于 openpyxl 只读模式的流式 Excel 画像器。
+
+    只在内存中保留：每列常数级统计、固定大小的数值采样、有上限的取值计数、
+    首尾预览行，以及当前推断块。
+    """
+
+    CONFIG = {
+        'chunk_rows': 5000,          # 每个类型推断块的行数
+        'preview_rows': 20,          # 首/尾预览行数
+        'sample_size': 2000,         # 每个数值列的蓄水池采样大小
+        'max_distinct_tracked': 5000,  # 每列最多精确跟踪的不同取值数
+        'top_values': 10,            # 摘要中每列展示的高频取值数
+        'max_profiled_columns': 200, # 参与画像的最大列数
+    }
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, seed: int = 0):
+        self.config = {**self.CONFIG, **(config or {})}
+        # 固定随机种子，保证同一文件的画像结果可复现
+        self._rng = random.Random(seed)
+
+    def profile_workbook(self, file_path: str, output_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        流式读取工作簿中的所有工作表。
+
+        Args:
+            file_path: .xlsx/.xlsm 文件路径
+            output_dir: 旁路数据存放目录，默认与源文件同目录
+
+        Returns:
+            包含每个工作表 schema、profile、预览以及旁路数据路径的字典
+        """
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportError("需要安装openpyxl: pip install openpyxl")
+
+        output_dir = output_dir or os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(output_dir, exist_ok=True)
+        base_name = os.path.basename(file_path)
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheets = {}
+            for index, worksheet in enumerate(workbook.worksheets):
+                data_path = os.path.join(output_dir, f"{base_name}.sheet{index}.csv")
+                sheets[worksheet.title] = self.profile_rows(
+                    worksheet.iter_rows(values_only=True),
+                    data_path=data_path,
+                    sheet_name=worksheet.title
+                )
+        finally:
+            # 只读模式会保持文件句柄，必须显式关闭
+            workbook.close()
+
+        return {
+            'sheet_names': list(sheets.keys()),
+            'sheets': sheets,
+        }
+
+    def profile_rows(self, rows: Iterable[tuple], data_path: str, sheet_name: str = '') -> Dict[str, Any]:
+        """
+        对行迭代器做单遍画像，同时将数据写入 data_path。
+
+        第一行非空行被视为表头。
+        """
+        chunk_rows = self.config['chunk_rows']
+        preview_rows = self.config['preview_rows']
+
+        header: Optional[List[str]] = None
+        columns: List[ColumnProfile] = []
+        head: List[List[Any]] = []
+        tail: deque = deque(maxlen=preview_rows)
+        chunk: List[List[Any]] = []
+        row_count = 0
+
+        with open(data_path, 'w', encoding='utf-8', newline='') as fp:
+            writer = csv.writer(fp)
+            for raw in rows:
+                if header is None:
+                    if raw is None or all(v is None for v in raw):
+                        continue
+                    header = self._build_header(raw)
+                    columns = [ColumnProfile(name=name) for name in header]
+                    writer.writerow(header)
+                    continue
+
+                row = self._normalize_row(raw, len(header))
+                if row is None:
+                    continue
+
+                writer.writerow(['' if v is None else self._to_text(v) for v in row])
+                row_count += 1
+                if len(head) < preview_rows:
+                    head.append(row)
+                else:
+                    tail.append(row)
+
+                chunk.append(row)
+                if len(chunk) >= chunk_rows:
+                    self._consume_chunk(chunk, columns)
+                    chunk = []
+
+            if chunk:
+                self._consume_chunk(chunk, columns)
+
+        header = header or []
+        schema = [{'name': col.name, 'dtype': col.dtype()} for col in columns]
+        return {
+            'sheet_name': sheet_name,
+            'row_count': row_count,
+            'column_count': len(header),
+            'columns': header,
+            'schema': schema,
+            'profile': self._build_profile(columns, row_count),
+            'head': [self._jsonable_row(r) for r in head],
+            'tail': [self._jsonable_row(r) for r in tail],
+            'data_path': data_path,
+            'data_format': 'csv',
+        }
+
+    def _build_header(self, raw: tuple) -> List[str]:
+        """生成唯一且非空的列名"""
+        header = []
+        seen = Counter()
+        for idx, value in enumerate(raw):
+            name = str(value).strip() if value is not None else ''
+            if not name:
+                name = f"Unnamed: {idx}"
+            seen[name] += 1
+            if seen[name] > 1:
+                name = f"{name}.{seen[name] - 1}"
+            header.append(name)
+        # 去掉尾部的空列（只读模式常见的格式残留）
+        while header and header[-1].startswith('Unnamed: ') and len(header) > 1:
+            header.pop()
+        return header
+
+    @staticmethod
+    def _normalize_row(raw: tuple, width: int) -> Optional[List[Any]]:
+        if raw is None:
+            return None
+        row = list(raw[:width])
+        if len(row) < width:
+            row.extend([None] * (width - len(row)))
+        if all(v is None or (isinstance(v, str) and not v.strip()) for v in row):
+            return None
+        return row
+
+    def _consume_chunk(self, chunk: List[List[Any]], columns: List[ColumnProfile]) -> None:
+        """按块更新列统计，块内的数据在此之后即可释放"""
+        max_cols = self.config['max_profiled_columns']
+        for col_idx, column in enumerate(columns[:max_cols]):
+            for row in chunk:
+                self._update_column(column, row[col_idx])
+
+    def _update_column(self, column: ColumnProfile, value: Any) -> None:
+        if value is None or (isinstance(value, str) and not value.strip()):
+            column.nulls += 1
+            return
+        column.non_null += 1
+
+        if isinstance(value, bool):
+            column.type_counts['bool'] += 1
+            self._track_value(column, value)
+            return
+        if isinstance(value, int):
+            column.type_counts['int'] += 1
+            self._update_numeric(column, float(value))
+            return
+        if isinstance(value, float):
+            if math.isnan(value) or math.isinf(value):
+                column.type_counts['float'] += 1
+                return
+            column.type_counts['float'] += 1
+            self._update_numeric(column, value)
+            return
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            column.type_counts['datetime'] += 1
+            return
+
+        column.type_counts['str'] += 1
+        self._track_value(column, str(value))
+
+    def _update_numeric(self, column: ColumnProfile, value: float) -> None:
+        column.num_count += 1
+        column.num_sum += value
+        delta = value - column.num_mean
+        column.num_mean += delta / column.num_count
+        column.num_m2 += delta * (value - column.num_mean)
+        column.num_min = value if column.num_min is None else min(column.num_min, value)
+        column.num_max = value if column.num_max is None else max(column.num_max, value)
+
+        # 蓄水池采样，用于估计中位数等分位数
+        sample_size = self.config['sample_size']
+        if len(column.num_sample) < sample_size:
+            column.num_sample.append(value)
+        else:
+            slot = self._rng.randint(0, column.num_count - 1)
+            if slot < sample_size:
+                column.num_sample[slot] = value
+
+    def _track_value(self, column: ColumnProfile, value: Any) -> None:
+        if value in column.value_counts:
+            column.value_counts[value] += 1
+        elif len(column.value_counts) < self.config['max_distinct_tracked']:
+            column.value_counts[value] = 1
+        else:
+            column.distinct_overflow = True
+
+    def _build_profile(self, columns: List[ColumnProfile], row_count: int) -> Dict[str, Any]:
+        numeric_summary = {}
+        categorical_summary = {}
+        null_counts = {}
+        top_n = self.config['top_values']
+
+        for column in columns:
+            null_counts[column.name] = row_count - column.non_null
+            dtype = column.dtype()
+            if dtype in ('int64', 'float64') and column.num_count:
+                std = math.sqrt(column.num_m2 / (column.num_count - 1)) if column.num_count > 1 else None
+                sample = sorted(column.num_sample)
+                numeric_summary[column.name] = {
+                    'mean': column.num_mean,
+                    'std': std,
+                    'min': column.num_min,
+                    'max': column.num_max,
+                    'sum': column.num_sum,
+                    'median': self._quantile(sample, 0.5),
+                    'p25': self._quantile(sample, 0.25),
+                    'p75': self._quantile(sample, 0.75),
+                    'sampled': column.num_count > len(sample),
+                }
+            elif column.value_counts:
+                categorical_summary[column.name] = {
+                    'unique_count': len(column.value_counts),
+                    'unique_count_is_lower_bound': column.distinct_overflow,
+                    'top_values': {str(k): v for k, v in column.value_counts.most_common(top_n)},
+                }
+
+        total_cells = row_count * len(columns)
+        null_cells = sum(null_counts.values())
+        return {
+            'null_counts': null_counts,
+            'numeric_summary': numeric_summary,
+            'categorical_summary': categorical_summary,
+            'data_quality': {
+                'total_cells': total_cells,
+                'null_cells': null_cells,
+                'completeness': round((1 - null_cells / total_cells) * 100, 2) if total_cells > 0 else 0
+            }
+        }
+
+    @staticmethod
+    def _quantile(sorted_values: List[float], q: float) -> Optional[float]:
+        if not sorted_values:
+            return None
+        pos = (len(sorted_values) - 1) * q
+        lower = int(math.floor(pos))
+        upper = int(math.ceil(pos))
+        if lower == upper:
+            return sorted_values[lower]
+        return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+    @staticmethod
+    def _to_text(value: Any) -> str:
+        if isinstance(value, datetime.datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(value, datetime.date):
+            return value.strftime('%Y-%m-%d')
+        return str(value)
+
+    def _jsonable_row(self, row: List[Any]) -> List[Any]:
+        result = []
+        for value in row:
+            if isinstance(value, (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)):
+                result.append(self._to_text(value))
+            elif isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+                result.append(None)
+            else:
+                result.append(value)
+        return result
+
+
+def load_table_data(table_entry: Dict[str, Any]):
+    """
+    将预处理表格条目还原为 DataFrame。
+
+    流式模式下条目只包含预览，完整数据位于 data_path 指向的旁路 CSV 中。
+    旁路文件已被清理时，若源工作簿（source_path）仍在则重新画像生成；
+    否则抛出 FileNotFoundError，避免在预览行上静默计算出错误的聚合结果。
+    """
+    import pandas as pd
+
+    data_path = table_entry.get('data_path')
+    if not data_path:
+        return pd.DataFrame(table_entry.get('data', []))
+
+    if not os.path.exists(data_path):
+        source_path = table_entry.get('source_path')
+        if not (source_path and os.path.exists(source_path)):
+            logger.error(f"表格旁路数据不存在且无法从源文件重建: {data_path}")
+            raise FileNotFoundError(
+                f"表格完整数据文件不存在: {data_path}（条目只包含 {len(table_entry.get('data', []))} 行预览）"
+            )
+        logger.warning(f"表格旁路数据不存在，从源文件重新画像: {source_path}")
+        data_path = _reprofile_sheet(source_path, table_entry.get('sheet_name'), os.path.dirname(data_path))
+
+    return pd.read_csv(data_path)
+
+
+def _reprofile_sheet(source_path: str, sheet_name: Optional[str], output_dir: str) -> str:
+    """重新流式读取源工作簿，返回指定工作表（默认第一个）的旁路数据路径"""
+    result = ExcelStreamProfiler().profile_workbook(source_path, output_dir=output_dir or None)
+    if not result['sheet_names']:
+        raise ValueError(f"工作簿中没有工作表: {source_path}")
+    name = sheet_name if sheet_name in result['sheets'] else result['sheet_names'][0]
+    return result['sheets'][name]['data_path']
@@ -13,6 +13,7 @@ import logging
 from typing import Dict, Any, List, Optional
 from tools.core.base import BaseTool
 from tools.core.exceptions import ToolExecutionError
+from tools.core.parse_cache import cached_file_parse
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +31,9 @@ class DOCXParserTool(BaseTool):
     6. 保留文本格式（加粗、斜体、下划线等）
     7. 提取文档元数据（作者、创建时间、修改时间等）
     """
+
+    # 解析逻辑或输出结构变化时递增，旧的缓存结果随之失效
+    PARSER_VERSION = "1"
     
     def get_input_schema(self) -> Dict[str, Any]:
         return {
@@ -76,12 +80,16 @@ class DOCXParserTool(BaseTool):
             return {"status": "error", "message": f"不支持的文件格式，只支持.docx/.doc: {file_path}"}
         
         try:
-            # 解析文档
-            result = self._parse_docx(
-                file_path, 
-                extract_images=extract_images,
-                include_metadata=include_metadata,
-                preserve_formatting=preserve_formatting
+            # 解析文档（相同内容和参数的文件复用缓存结果）
+            options = {
+                'extract_images': extract_images,
+                'include_metadata': include_metadata,
+                'preserve_formatting': preserve_formatting,
+            }
+            result, _ = cached_file_parse(
+                file_path, 'docx_parser', self.PARSER_VERSION,
+                lambda: self._parse_docx(file_path, **options),
+                options=options
             )
             
             return {
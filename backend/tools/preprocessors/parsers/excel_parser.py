@@ -13,6 +13,7 @@ import logging
 from typing import Dict, Any, List, Optional, Union
 from tools.core.base import BaseTool
 from tools.core.exceptions import ToolExecutionError
+from tools.core.parse_cache import cached_file_parse
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +31,9 @@ class ExcelParserTool(BaseTool):
     6. 检测并处理合并单元格
     7. 识别表头和数据区域
     """
+
+    # 解析逻辑或输出结构变化时递增，旧的缓存结果随之失效
+    PARSER_VERSION = "1"
     
     def get_input_schema(self) -> Dict[str, Any]:
         return {
@@ -95,15 +99,19 @@ class ExcelParserTool(BaseTool):
             return {"status": "error", "message": f"不支持的文件格式: {file_path}"}
         
         try:
-            # 解析Excel
-            result = self._parse_excel(
-                file_path=file_path,
-                sheet_name=sheet_name,
-                orient=orient,
-                parse_dates=parse_dates,
-                na_values=na_values,
-                include_summary=include_summary,
-                max_rows=max_rows
+            # 解析Excel（相同内容和参数的文件复用缓存结果）
+            options = {
+                'sheet_name': sheet_name,
+                'orient': orient,
+                'parse_dates': parse_dates,
+                'na_values': na_values,
+                'include_summary': include_summary,
+                'max_rows': max_rows,
+            }
+            result, _ = cached_file_parse(
+                file_path, 'excel_parser', self.PARSER_VERSION,
+                lambda: self._parse_excel(file_path=file_path, **options),
+                options=options
             )
             
             return {
@@ -5,6 +5,7 @@ import logging
 from typing import Dict, Any
 from tools.core.base import BaseTool
 from tools.core.exceptions import ToolExecutionError
+from tools.core.parse_cache import cached_tool_result
 try:
     # 导入MinerU服务和工具接口
     from mineru.tool_interface import extract_pdf_content
@@ -21,6 +22,9 @@ class PDFParserTool(BaseTool):
     1. 直接调用外部API服务（需要8002端口服务运行）
     2. 使用pdf_converter模块的功能（可扩展）
     """
+
+    # 解析逻辑或输出结构变化时递增，旧的缓存结果随之失效
+    PARSER_VERSION = "1"
     
     def get_input_schema(self) -> Dict[str, Any]:
         return {
@@ -41,6 +45,17 @@ class PDFParserTool(BaseTool):
         }
 
     def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """解析PDF，相同内容和模式的文件复用缓存的成功结果"""
+        file_path = tool_input.get('file_path')
+        if not file_path:
+            return {"status": "error", "message": "文件路径未提供。"}
+        return cached_tool_result(
+            file_path, 'pdf_parser', self.PARSER_VERSION,
+            lambda: self._execute(tool_input),
+            options={'mode': tool_input.get('mode', 'api')}
+        )
+
+    def _execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         file_path = tool_input.get('file_path')
         mode = tool_input.get('mode', 'api')
         
@@ -9,6 +9,7 @@ import logging
 from typing import Dict, Any, Optional, Tuple
 from tools.core.base import BaseTool
 from tools.core.exceptions import ToolExecutionError
+from tools.core.parse_cache import cached_tool_result
 from ..core.pdf_complexity_analyzer import analyze_pdf_complexity, should_use_external_api
 try:
     from webapps.toolkit.image_handler import DocumentImageHandler
@@ -22,6 +23,9 @@ class PDFParserInternalTool(BaseTool):
     PDF文档解析工具（内部版本）：直接调用pdf_converter服务。
     这个版本直接在进程内调用pdf_converter的功能，避免了HTTP调用的开销。
     """
+
+    # 解析逻辑或输出结构变化时递增，旧的缓存结果随之失效
+    PARSER_VERSION = "1"
     
     def get_input_schema(self) -> Dict[str, Any]:
         return {
@@ -41,6 +45,17 @@ class PDFParserInternalTool(BaseTool):
         }
 
     def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """解析PDF，相同内容和处理方式的文件复用缓存的成功结果"""
+        file_path = tool_input.get('file_path')
+        if not file_path:
+            return {"status": "error", "message": "文件路径未提供。"}
+        return cached_tool_result(
+            file_path, 'pdf_parser_internal', self.PARSER_VERSION,
+            lambda: self._execute(tool_input),
+            options={'use_external_api': tool_input.get('use_external_api')}
+        )
+
+    def _execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         file_path = tool_input.get('file_path')
         use_external_api = tool_input.get('use_external_api', None)  # None表示自动决策
         
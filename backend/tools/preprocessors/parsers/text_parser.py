@@ -16,6 +16,8 @@ from typing import Dict, Any, List, Optional, Union
 from pathlib import Path
 from tools.core.base import BaseTool
 from tools.core.exceptions import ToolExecutionError
+from tools.core.parse_cache import get_parse_cache
+from ..core.encoding_detector import read_text_streaming
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +36,10 @@ class TextParserTool(BaseTool):
     7. 为代码文件添加语言标记
     """
     
+    # 解析结果缓存（统一的解析结果缓存，见 tools.core.parse_cache）；解析逻辑变化时递增版本
+    PARSER_VERSION = "1"
+    CACHE_MAX_CHARS = 5 * 1024 * 1024
+
     # 支持的文件扩展名和对应的处理类型
     FILE_TYPE_MAPPING = {
         # 文档类
@@ -215,9 +221,35 @@ class TextParserTool(BaseTool):
                         detect_patterns: bool = True) -> Dict[str, Any]:
         """解析文本文件的核心方法"""
         
-        # 读取文件内容
-        content = self._read_file_content(file_path, encoding, max_lines)
-        
+        # 单遍读取：检测编码、解码并计算内容哈希
+        decoded = read_text_streaming(file_path, encoding, max_lines)
+
+        # 相同内容、相同选项的解析结果直接复用；调用方指定的编码决定解码结果，也是键的一部分
+        cache = get_parse_cache()
+        if cache is None:
+            result = self._build_result(decoded, file_type, extract_structure, detect_patterns)
+            return {**result, "cache_hit": False}
+
+        options = {
+            'file_type': file_type,
+            'encoding': encoding,
+            'max_lines': max_lines,
+            'extract_structure': extract_structure,
+            'detect_patterns': detect_patterns,
+        }
+        result, hit = cache.get_or_parse(
+            decoded.content_hash, 'text_parser', self.PARSER_VERSION,
+            lambda: self._build_result(decoded, file_type, extract_structure, detect_patterns),
+            options=options,
+            cacheable=lambda r: len(r.get("content", "")) <= self.CACHE_MAX_CHARS
+        )
+        return {**result, "cache_hit": hit}
+
+    def _build_result(self, decoded, file_type: str, extract_structure: bool,
+                      detect_patterns: bool) -> Dict[str, Any]:
+        """由解码结果生成统计、元数据和结构化内容"""
+        content = decoded.content
+
         # 基础统计
         lines = content.splitlines()
         statistics = {
@@ -272,56 +304,21 @@ class TextParserTool(BaseTool):
         
         if structured_content is not None:
             result["structured_content"] = structured_content
-        
+
+        result["encoding"] = {
+            "name": decoded.encoding,
+            "detection_method": decoded.detection_method,
+            "decode_errors": decoded.decode_errors,
+            "truncated": decoded.truncated
+        }
+        result["content_hash"] = decoded.content_hash
         return result
     
     def _read_file_content(self, file_path: str, encoding: str = 'auto',
                           max_lines: Optional[int] = None) -> str:
         """读取文件内容，自动检测编码"""
-        if encoding == 'auto':
-            # 尝试多种编码
-            encodings = ['utf-8', 'utf-8-sig', 'gbk', 'gb2312', 'gb18030', 
-                        'big5', 'iso-8859-1', 'windows-1252']
-            
-            for enc in encodings:
-                try:
-                    with open(file_path, 'r', encoding=enc) as f:
-                        if max_lines:
-                            lines = []
-                            for i, line in enumerate(f):
-                                if i >= max_lines:
-                                    break
-                                lines.append(line)
-                            return ''.join(lines)
-                        else:
-                            return f.read()
-                except (UnicodeDecodeError, UnicodeError):
-                    continue
-            
-            # 如果都失败，使用错误处理模式
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                if max_lines:
-                    lines = []
-                    for i, line in enumerate(f):
-                        if i >= max_lines:
-                            break
-                        lines.append(line)
-                    return ''.join(lines)
-                else:
-                    return f.read()
-        else:
-            # 使用指定编码
-            with open(file_path, 'r', encoding=encoding) as f:
-                if max_lines:
-                    lines = []
-                    for i, line in enumerate(f):
-                        if i >= max_lines:
-                            break
-                        lines.append(line)
-                    return ''.join(lines)
-                else:
-                    return f.read()
-    
+        return read_text_streaming(file_path, encoding, max_lines).content
+
     def _parse_csv(self, content: str, delimiter: str = ',') -> List[Dict[str, Any]]:
         """解析CSV/TSV内容"""
         try:
@@ -1,5 +1,6 @@
 from tools.core.base import BaseTool
 from tools.core.exceptions import ToolExecutionError
+from tools.core.parse_cache import cached_tool_result
 from typing import Dict, Any
 from docx import Document
 import os,logging
@@ -10,6 +11,9 @@ class DocumentParserTool(BaseTool):
     """
     文档解析工具：支持将.docx和.pdf文件内容转换为Markdown文本。
     """
+
+    # 解析逻辑或输出结构变化时递增，旧的缓存结果随之失效
+    PARSER_VERSION = "1"
     
     def __init__(self, config: Dict[str, Any] = None):
         super().__init__(config)
@@ -27,6 +31,17 @@ class DocumentParserTool(BaseTool):
         }
 
     def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """解析文档并生成摘要，相同内容的文件复用缓存的成功结果（含摘要）"""
+        file_path = tool_input.get('file_path')
+        if not file_path:
+            return {"status": "error", "message": "文件路径未提供。"}
+        return cached_tool_result(
+            file_path, 'document_parser', self.PARSER_VERSION,
+            lambda: self._execute(tool_input),
+            options={'use_external_api': tool_input.get('use_external_api')}
+        )
+
+    def _execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         file_path = tool_input.get('file_path')
         
         if not file_path:
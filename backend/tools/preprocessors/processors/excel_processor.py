@@ -1,14 +1,28 @@
 from tools.core.base import BaseTool
+from tools.core.parse_cache import cached_file_parse
 from typing import Dict, Any
 import pandas as pd
+import json
 import os
 
+from ..core.excel_stream_profiler import ExcelStreamProfiler
+
+# 超过该大小的工作簿在 auto 模式下使用流式读取
+STREAMING_SIZE_THRESHOLD = 5 * 1024 * 1024  # 5MB
+
+
 class ExcelProcessorTool(BaseTool):
     """
     Excel处理工具：将Excel文件读取为Pandas DataFrame，并序列化为JSON。
     输入必须包含有效的Excel文件路径。
+
+    大文件使用流式模式：只返回 schema、统计画像和首尾预览，
+    完整数据写入旁路 CSV（data_path），供后续工具按需加载。
     """
-    
+
+    # 解析逻辑或输出结构变化时递增，旧的缓存结果随之失效
+    PARSER_VERSION = "1"
+
     def get_input_schema(self) -> Dict[str, Any]:
         return {
             "type": "object",
@@ -17,37 +31,93 @@ class ExcelProcessorTool(BaseTool):
                     "type": "string",
                     "description": "Excel文件路径，支持.xlsx和.xls格式",
                     "pattern": r"\.xlsx?$"
+                },
+                "mode": {
+                    "type": "string",
+                    "enum": ["auto", "full", "streaming"],
+                    "description": "读取模式：auto按文件大小自动选择，full全量读入，streaming流式画像",
+                    "default": "auto"
                 }
             },
             "required": ["file_path"]
         }
-    
+
     def execute(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         file_path = tool_input.get('file_path')
-        
+        mode = tool_input.get('mode', 'auto')
+
         if not os.path.exists(file_path):
             return {
                 "status": "error",
                 "message": f"文件不存在: {file_path}",
                 "file_path": file_path
             }
-        
+
         try:
-            df = pd.read_excel(file_path)
-            table_json = df.to_json(orient='records', force_ascii=False)
-            
+            if self._use_streaming(file_path, mode):
+                return self._execute_streaming(file_path)
+
+            # 全量结果可以按内容缓存；流式结果引用任务本地的旁路文件，不缓存
+            table, _ = cached_file_parse(file_path, 'excel_processor', self.PARSER_VERSION, lambda: self._read_full(file_path))
+
             return {
                 "status": "success",
                 "message": f"文件 '{os.path.basename(file_path)}' 已成功处理为JSON格式的表格数据。",
-                "table_json": table_json,
                 "file_path": file_path,
-                "row_count": len(df),
-                "column_count": len(df.columns)
+                **table
             }
-            
+
         except Exception as e:
             return {
                 "status": "error",
                 "message": f"Excel处理失败: {str(e)}",
                 "file_path": file_path
-            }
\ No newline at end of file
+            }
+
+    def _read_full(self, file_path: str) -> Dict[str, Any]:
+        df = pd.read_excel(file_path)
+        return {
+            "table_json": df.to_json(orient='records', force_ascii=False),
+            "row_count": len(df),
+            "column_count": len(df.columns)
+        }
+
+    def _use_streaming(self, file_path: str, mode: str) -> bool:
+        # openpyxl 只读模式不支持旧版 .xls，只能全量读取
+        if file_path.lower().endswith('.xls'):
+            return False
+        if mode == 'streaming':
+            return True
+        if mode == 'full':
+            return False
+        return os.path.getsize(file_path) >= STREAMING_SIZE_THRESHOLD
+
+    def _execute_streaming(self, file_path: str) -> Dict[str, Any]:
+        """流式处理：返回紧凑的 schema + 画像，完整数据落盘到旁路文件"""
+        result = ExcelStreamProfiler().profile_workbook(file_path)
+        sheets = result['sheets']
+        if not sheets:
+            raise ValueError("工作簿中没有工作表")
+
+        # 与全量模式保持一致：以第一个工作表作为主表
+        primary = sheets[result['sheet_names'][0]]
+        preview_records = [dict(zip(primary['columns'], row)) for row in primary['head']]
+
+        return {
+            "status": "success",
+            "message": (
+                f"文件 '{os.path.basename(file_path)}' 已流式处理，共 {primary['row_count']} 行，"
+                f"返回前 {len(preview_records)} 行预览，完整数据见 data_path。"
+            ),
+            "table_json": json.dumps(preview_records, ensure_ascii=False, default=str),
+            "file_path": file_path,
+            "row_count": primary['row_count'],
+            "column_count": primary['column_count'],
+            "streaming": True,
+            "data_path": primary['data_path'],
+            "sheet_name": result['sheet_names'][0],
+            "schema": primary['schema'],
+            "profile": primary['profile'],
+            "tail": primary['tail'],
+            "sheets": sheets
+        }
@@ -0,0 +1,62 @@
+"""
+文本编码检测测试
+
+验证采样检测与单遍流式解码：BOM、GBK 中文、CRLF 换行转换、max_lines 截断、
+块内出现非法字节时保留跨块的多字节前缀与 '\r'。
+"""
+import os
+import tempfile
+from django.test import TestCase
+
+from tools.preprocessors.core import encoding_detector
+from tools.preprocessors.core.encoding_detector import detect_encoding, read_text_streaming
+
+
+class EncodingDetectorTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_detect_bom(self):
+        self.assertEqual(detect_encoding(b'\xef\xbb\xbfabc'), ('utf-8-sig', 'bom'))
+
+    def test_truncated_multibyte_sample_is_not_an_error(self):
+        sample = '中文'.encode('utf-8')[:-1]
+        self.assertEqual(detect_encoding(sample)[0], 'utf-8')
+
+    def test_stream_gbk_with_crlf(self):
+        path = self._write('gbk.csv', '名称,数量\r\n苹果,3\r\n'.encode('gbk') * 100000)
+        decoded = read_text_streaming(path)
+        self.assertEqual(decoded.encoding, 'gb18030')
+        self.assertTrue(decoded.content.startswith('名称,数量\n苹果,3\n'))
+        self.assertNotIn('\r', decoded.content)
+        self.assertFalse(decoded.decode_errors)
+
+    def test_max_lines_stops_early(self):
+        path = self._write('big.log', b'INFO line\n' * 500000)
+        decoded = read_text_streaming(path, max_lines=10)
+        self.assertEqual(decoded.content.count('\n'), 10)
+        self.assertTrue(decoded.truncated)
+        self.assertLess(decoded.bytes_read, os.path.getsize(path))
+
+    def test_max_lines_hash_covers_whole_file(self):
+        first = self._write('a.log', b'INFO line\n' * 20 + b'tail a\n')
+        second = self._write('b.log', b'INFO line\n' * 20 + b'tail b\n')
+        truncated = read_text_streaming(first, max_lines=10)
+        self.assertEqual(truncated.content, read_text_streaming(second, max_lines=10).content)
+        self.assertNotEqual(truncated.content_hash, read_text_streaming(second, max_lines=10).content_hash)
+        self.assertEqual(truncated.content_hash, read_text_streaming(first).content_hash)
+
+    def test_invalid_bytes_keep_decoder_state(self):
+        # 块边界落在多字节字符与 CRLF 中间，其后一块含非法字节
+        head = b'a' * (encoding_detector.SAMPLE_SIZE - 2)
+        path = self._write('mixed.txt', head + b'\r' + '中'.encode('utf-8')[:1] + '中'.encode('utf-8')[1:] + b'\xff\n')
+        decoded = read_text_streaming(path, encoding='utf-8')
+        self.assertTrue(decoded.decode_errors)
+        self.assertEqual(decoded.content, 'a' * (encoding_detector.SAMPLE_SIZE - 2) + '\n中\ufffd\n')
@@ -0,0 +1,69 @@
+"""
+Excel流式画像测试
+
+验证 ExcelStreamProfiler 单遍读取时：
+1. 类型推断、统计量与全量计算一致
+2. 首尾预览行数受限
+3. 完整数据写入旁路 CSV
+4. 旁路文件缺失且无法从源文件重建时报错，而不是退回预览行
+"""
+import os
+import csv
+import tempfile
+from django.test import TestCase
+
+from tools.preprocessors.core.excel_stream_profiler import ExcelStreamProfiler, load_table_data
+
+
+class ExcelStreamProfilerTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_path = os.path.join(self.tmp_dir, 'sheet0.csv')
+
+    def _rows(self, count):
+        yield ('id', 'amount', 'city', None)
+        for i in range(count):
+            yield (i, i * 0.5, f"city_{i % 3}", None)
+
+    def test_profile_rows_single_pass(self):
+        profiler = ExcelStreamProfiler(config={'chunk_rows': 7, 'preview_rows': 5, 'sample_size': 50})
+        result = profiler.profile_rows(self._rows(1000), data_path=self.data_path, sheet_name='Sheet1')
+
+        self.assertEqual(result['row_count'], 1000)
+        self.assertEqual(result['columns'], ['id', 'amount', 'city'])
+        self.assertEqual(
+            [col['dtype'] for col in result['schema']],
+            ['int64', 'float64', 'object']
+        )
+
+        amount = result['profile']['numeric_summary']['amount']
+        self.assertAlmostEqual(amount['mean'], sum(i * 0.5 for i in range(1000)) / 1000)
+        self.assertEqual(amount['min'], 0.0)
+        self.assertEqual(amount['max'], 999 * 0.5)
+        self.assertTrue(amount['sampled'])
+
+        city = result['profile']['categorical_summary']['city']
+        self.assertEqual(city['unique_count'], 3)
+
+        self.assertEqual(len(result['head']), 5)
+        self.assertEqual(len(result['tail']), 5)
+        self.assertEqual(result['tail'][-1][0], 999)
+
+        with open(self.data_path, encoding='utf-8') as fp:
+            lines = list(csv.reader(fp))
+        self.assertEqual(lines[0], ['id', 'amount', 'city'])
+        self.assertEqual(len(lines), 1001)
+
+    def test_load_table_data_requires_full_data(self):
+        profiler = ExcelStreamProfiler(config={'preview_rows': 5})
+        result = profiler.profile_rows(self._rows(100), data_path=self.data_path, sheet_name='Sheet1')
+        entry = {'data': result['head'], 'data_path': self.data_path, 'is_preview': True}
+
+        self.assertEqual(len(load_table_data(entry)), 100)
+
+        os.remove(self.data_path)
+        with self.assertRaises(FileNotFoundError):
+            load_table_data(entry)
+        with self.assertRaises(FileNotFoundError):
+            load_table_data({**entry, 'source_path': os.path.join(self.tmp_dir, 'missing.xlsx')})
@@ -0,0 +1,135 @@
+"""
+解析结果缓存测试
+
+1. 键区分解析参数与解析器版本，参数顺序不影响键
+2. 过期条目不返回，淘汰时按最近访问时间删除
+3. get_or_parse 只解析一次，不可缓存的结果不写入；合并等待的调用各自得到副本
+4. 引用的文件已不存在（is_valid 返回 False）的条目按未命中处理
+5. 解析工具重复解析同一文件时命中缓存
+"""
+import os
+from concurrent.futures import Future
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from tools.core.parse_cache import ParseCache, make_key, set_parse_cache
+from tools.models import ParseCacheEntry
+from tools.preprocessors.parsers.docx_parser import DOCXParserTool
+
+CONTENT_HASH = 'a' * 64
+
+
+class ParseCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = ParseCache(ttl_seconds=3600, max_bytes=0)
+
+    def test_key_includes_options_and_version(self):
+        self.cache.put(CONTENT_HASH, 'docx_parser', '1', {'content': 'v1'}, {'extract_images': False})
+
+        self.assertEqual(self.cache.get(CONTENT_HASH, 'docx_parser', '1', {'extract_images': False}), {'content': 'v1'})
+        self.assertIsNone(self.cache.get(CONTENT_HASH, 'docx_parser', '1', {'extract_images': True}))
+        self.assertIsNone(self.cache.get(CONTENT_HASH, 'docx_parser', '2', {'extract_images': False}))
+        self.assertEqual(
+            make_key(CONTENT_HASH, 'p', '1', {'a': 1, 'b': 2}),
+            make_key(CONTENT_HASH, 'p', '1', {'b': 2, 'a': 1})
+        )
+
+    def test_put_overwrites_same_key(self):
+        self.cache.put(CONTENT_HASH, 'pdf_parser', '1', {'content': 'old'})
+        self.cache.put(CONTENT_HASH, 'pdf_parser', '1', {'content': 'new'})
+
+        self.assertEqual(ParseCacheEntry.objects.count(), 1)
+        self.assertEqual(self.cache.get(CONTENT_HASH, 'pdf_parser', '1'), {'content': 'new'})
+
+    def test_expired_entry_is_miss_and_evicted(self):
+        self.cache.put(CONTENT_HASH, 'pdf_parser', '1', {'content': 'x'})
+        ParseCacheEntry.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(self.cache.get(CONTENT_HASH, 'pdf_parser', '1'))
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertFalse(ParseCacheEntry.objects.exists())
+
+    def test_lru_eviction(self):
+        cache = ParseCache(ttl_seconds=0, max_bytes=150)
+        for index in range(3):
+            cache.put(f"{index:064d}", 'pdf_parser', '1', {'content': 'x' * 90})
+        # 第一个条目最近被访问过，淘汰时保留
+        ParseCacheEntry.objects.filter(content_hash=f"{1:064d}").update(
+            last_accessed_at=timezone.now() - timedelta(hours=2)
+        )
+        ParseCacheEntry.objects.filter(content_hash=f"{2:064d}").update(
+            last_accessed_at=timezone.now() - timedelta(hours=1)
+        )
+        cache.get(f"{0:064d}", 'pdf_parser', '1')
+
+        self.assertEqual(cache.evict(), 2)
+        self.assertEqual(list(ParseCacheEntry.objects.values_list('content_hash', flat=True)), [f"{0:064d}"])
+
+    def test_get_or_parse_and_stats(self):
+        calls = []
+
+        def parse():
+            calls.append(1)
+            return {'status': 'success', 'content': 'x'}
+
+        for _ in range(3):
+            result, _ = self.cache.get_or_parse(CONTENT_HASH, 'excel_parser', '1', parse)
+        self.assertEqual((len(calls), result['content']), (1, 'x'))
+
+        failed, hit = self.cache.get_or_parse(
+            CONTENT_HASH, 'excel_parser', '2', lambda: {'status': 'error'},
+            cacheable=lambda r: r['status'] == 'success'
+        )
+        self.assertFalse(hit)
+        self.assertIsNone(self.cache.get(CONTENT_HASH, 'excel_parser', '2'))
+
+        stats = self.cache.stats()['parsers']['excel_parser']
+        self.assertEqual((stats['hits'], stats['misses'], stats['writes']), (2, 3, 1))
+        self.assertEqual(self.cache.index_stats()['parsers']['excel_parser']['hits'], 2)
+
+
+    def test_coalesced_waiters_get_copies(self):
+        # 模拟进程内另一个调用正在解析同一个键
+        running = Future()
+        running.set_result({'rows': [1]})
+        self.cache._inflight[make_key(CONTENT_HASH, 'pdf_parser', '1')] = running
+
+        first, hit = self.cache.get_or_parse(CONTENT_HASH, 'pdf_parser', '1', lambda: self.fail('不应重复解析'))
+        first['rows'].append(2)
+        second, _ = self.cache.get_or_parse(CONTENT_HASH, 'pdf_parser', '1', lambda: self.fail('不应重复解析'))
+
+        self.assertTrue(hit)
+        self.assertEqual(second['rows'], [1])
+
+    def test_invalid_entry_is_miss(self):
+        self.cache.put(CONTENT_HASH, 'mineru', '1', {'markdown_key': '/missing/output.md'})
+
+        self.assertIsNone(self.cache.get(CONTENT_HASH, 'mineru', '1', is_valid=lambda r: False))
+        result, hit = self.cache.get_or_parse(
+            CONTENT_HASH, 'mineru', '1', lambda: {'markdown_key': '/new/output.md'},
+            is_valid=lambda r: r['markdown_key'] != '/missing/output.md'
+        )
+        self.assertFalse(hit)
+        self.assertEqual(self.cache.get(CONTENT_HASH, 'mineru', '1'), {'markdown_key': '/new/output.md'})
+
+
+class ParserToolCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = ParseCache()
+        self.previous = set_parse_cache(self.cache)
+
+    def tearDown(self):
+        set_parse_cache(self.previous)
+
+    def test_docx_parser_reuses_result(self):
+        file_path = os.path.join(os.path.dirname(__file__), 'test.docx')
+        first = DOCXParserTool().execute({'file_path': file_path})
+        second = DOCXParserTool().execute({'file_path': file_path})
+
+        self.assertEqual(first['status'], 'success')
+        self.assertEqual(first['content'], second['content'])
+        self.assertEqual(self.cache.stats()['parsers']['docx_parser']['hits'], 1)
@@ -0,0 +1,68 @@
+"""
+工具执行遥测测试
+
+验证 execute_with_logging 只记录有界摘要、按工具采样完整载荷，并聚合执行指标。
+"""
+from django.test import TestCase, override_settings
+
+from tools.core.base import BaseTool
+from tools.core.telemetry import should_capture_payload, summarize_payload, tool_metrics
+
+
+class _EchoTool(BaseTool):
+
+    def get_input_schema(self):
+        return {"type": "object", "properties": {"text": {"type": "string"}}, "required": ["text"]}
+
+    def execute(self, tool_input, runtime_state=None, user_id=None):
+        return {"status": "success", "output": tool_input["text"], "type": "text", "message": "ok"}
+
+
+class ToolTelemetryTestCase(TestCase):
+
+    def setUp(self):
+        tool_metrics.reset()
+
+    def test_summary_is_bounded_and_redacted(self):
+        payload = {"text": "数据" * 100000, "api_key": "sk-secret", "options": {"token": "t"}}
+        summary = summarize_payload(payload, preview_chars=100)
+        self.assertLess(len(summary['preview']), 200)
+        self.assertFalse(summary['exact'])
+        self.assertGreaterEqual(summary['bytes'], 200000)
+        self.assertLess(len(summarize_payload(payload, preview_chars=10**7)['preview']), 1000)
+        self.assertNotIn("sk-secret", summarize_payload(payload, preview_chars=10**7)['preview'])
+        self.assertNotIn("sk-secret", summarize_payload(payload, preview_chars=10**7, exact=True)['preview'])
+        self.assertEqual(summary['keys'], ["text", "api_key", "options"])
+        self.assertGreater(summarize_payload(payload, exact=True)['bytes'], 600000)
+
+    def test_bounded_summary_distinguishes_length(self):
+        self.assertNotEqual(
+            summarize_payload({"text": "a" * 10000})['sha256'], summarize_payload({"text": "a" * 10001})['sha256']
+        )
+        summary = summarize_payload({"rows": list(range(100000))})
+        self.assertIn("[+99980 项]", summary['preview'])
+
+    def test_same_payload_same_hash(self):
+        self.assertEqual(summarize_payload({"a": [1, 2]})['sha256'], summarize_payload({"a": [1, 2]})['sha256'])
+        self.assertNotEqual(summarize_payload({"a": 1})['sha256'], summarize_payload({"a": 2})['sha256'])
+
+    def test_runtime_state_not_serialized(self):
+        summary = summarize_payload({"text": "x", "runtime_state": object()})
+        self.assertEqual(summary['keys'], ["text"])
+
+    @override_settings(TOOL_LOG_PAYLOAD_SAMPLE_RATE=0.0, TOOL_LOG_PAYLOAD_SAMPLE_TOOLS={"_EchoTool": 1.0})
+    def test_per_tool_sampling(self):
+        self.assertTrue(should_capture_payload("_EchoTool"))
+        self.assertFalse(should_capture_payload("OtherTool"))
+        self.assertFalse(should_capture_payload("_EchoTool", {"payload_log_sample_rate": 0}))
+
+    def test_metrics_recorded(self):
+        tool = _EchoTool()
+        result = tool.execute_with_logging({"text": "hello"})
+        self.assertEqual(result["status"], "success")
+        tool.execute_with_logging({})
+
+        stats = tool_metrics.snapshot()["_EchoTool"]
+        self.assertEqual(stats["calls"], 2)
+        self.assertEqual(stats["errors"], 1)
+        self.assertGreater(stats["output_bytes"], 0)
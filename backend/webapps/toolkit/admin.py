@@ -1,11 +1,27 @@
 from django.contrib import admin
-from .models import PDFExtractorTask
+from .models import PDFExtractorTask, PDFExtractorPage
+
+
+class PDFExtractorPageInline(admin.TabularInline):
+    """任务下各页面的检查点（只读）"""
+
+    model = PDFExtractorPage
+    fields = ['page_number', 'status', 'attempts', 'error', 'updated_at']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    show_change_link = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(PDFExtractorTask)
 class PDFExtractorTaskAdmin(admin.ModelAdmin):
     """PDF提取任务管理界面"""
 
+    inlines = [PDFExtractorPageInline]
+
     list_display = [
         'id',
         'user',
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toolkit', '0004_pdfextractortask_page_range_end_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFExtractorPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.IntegerField(verbose_name='页码')),
+                ('status', models.CharField(choices=[('pending', '待处理'), ('processing', '处理中'), ('completed', '已完成'), ('error', '错误')], default='pending', max_length=20, verbose_name='页面状态')),
+                ('markdown', models.TextField(blank=True, default='', verbose_name='页面Markdown片段')),
+                ('result', models.JSONField(blank=True, default=dict, help_text='图片文件、区域坐标等元数据，路径相对于任务目录', verbose_name='页面处理结果')),
+                ('error', models.TextField(blank=True, default='', verbose_name='错误信息')),
+                ('attempts', models.IntegerField(default=0, verbose_name='处理次数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='toolkit.pdfextractortask', verbose_name='所属任务')),
+            ],
+            options={
+                'verbose_name': 'PDF提取页面',
+                'verbose_name_plural': 'PDF提取页面',
+                'db_table': 'toolkit_pdf_extractor_page',
+                'ordering': ['task', 'page_number'],
+                'unique_together': {('task', 'page_number')},
+            },
+        ),
+    ]
@@ -73,3 +73,49 @@ class PDFExtractorTask(models.Model):
 
     def __str__(self):
         return f"{self.original_filename} ({self.status})"
+
+
+class PDFExtractorPage(models.Model):
+    """
+    PDF提取任务的单页结果（页面级检查点）
+
+    每页处理完成后立即落库，任务中断后重新执行时跳过已完成的页面，
+    最终文档由各页的 markdown 片段按页码拼接。
+    """
+
+    STATUS_CHOICES = [
+        ('pending', '待处理'),
+        ('processing', '处理中'),
+        ('completed', '已完成'),
+        ('error', '错误'),
+    ]
+
+    task = models.ForeignKey(
+        PDFExtractorTask,
+        on_delete=models.CASCADE,
+        related_name='pages',
+        verbose_name='所属任务'
+    )
+    page_number = models.IntegerField(verbose_name='页码')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='页面状态')
+    markdown = models.TextField(blank=True, default='', verbose_name='页面Markdown片段')
+    result = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='页面处理结果',
+        help_text='图片文件、区域坐标等元数据，路径相对于任务目录'
+    )
+    error = models.TextField(blank=True, default='', verbose_name='错误信息')
+    attempts = models.IntegerField(default=0, verbose_name='处理次数')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'toolkit_pdf_extractor_page'
+        verbose_name = 'PDF提取页面'
+        verbose_name_plural = 'PDF提取页面'
+        ordering = ['task', 'page_number']
+        unique_together = [('task', 'page_number')]
+
+    def __str__(self):
+        return f"{self.task_id} 第{self.page_number}页 ({self.status})"
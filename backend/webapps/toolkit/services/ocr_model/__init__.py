@@ -3,7 +3,9 @@ OCR模型服务模块
 提供本地化部署的OCR模型服务，用于文档图像识别和文本提取
 """
 from .service import OCRModelService
+from .batch_client import OCRBatchClient
 
 __all__ = [
-    'OCRModelService'
+    'OCRModelService',
+    'OCRBatchClient'
 ]
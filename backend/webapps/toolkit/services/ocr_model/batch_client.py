@@ -0,0 +1,221 @@
+"""
+OCR批量客户端
+
+逐页调用OCR时，每个请求只带一张图片，且必须等上一页返回才准备下一页。
+批量客户端把多个调用方（页面线程）提交的图片合并成批次发送到OCR模型的批量接口：
+- 批次按图片数和总字节数限制，凑不满时最多等待 linger_ms 就发送
+- 同时保持多个批次在途，base64编码在调用方线程完成，与网络等待重叠
+- 每张图片对应一个 Future，批次返回后按顺序把结果分发回各自的页面
+- 统计吞吐量、排队深度和在途批次数
+"""
+import base64
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .config import OCRModelConfig
+from .service import OCRModelService
+
+logger = logging.getLogger('django')
+
+_CLOSE = object()
+
+
+@dataclass
+class _OCRItem:
+    image_base64: str
+    key: Any
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def size(self) -> int:
+        return len(self.image_base64)
+
+
+class OCRBatchClient:
+    """合并多个页面的OCR请求，批量、流水线地发送"""
+
+    def __init__(
+        self,
+        service: Optional[OCRModelService] = None,
+        max_batch_images: int = OCRModelConfig.BATCH_MAX_IMAGES,
+        max_batch_bytes: int = OCRModelConfig.BATCH_MAX_MB * 1024 * 1024,
+        max_in_flight: int = OCRModelConfig.BATCH_MAX_IN_FLIGHT,
+        linger_ms: int = OCRModelConfig.BATCH_LINGER_MS,
+        mode: str = 'convert_to_markdown',
+        max_tokens: int = OCRModelConfig.DEFAULT_MAX_TOKENS,
+        temperature: float = OCRModelConfig.DEFAULT_TEMPERATURE
+    ):
+        """
+        Args:
+            service: OCR模型服务，默认按 OCRModelConfig 创建
+            max_batch_images: 每批最多图片数
+            max_batch_bytes: 每批base64数据的最大字节数（单张超过上限时单独成批）
+            max_in_flight: 同时在途的批次数
+            linger_ms: 批次未满时最多等待的毫秒数
+        """
+        self.service = service or OCRModelService(timeout=OCRModelConfig.API_TIMEOUT)
+        self.max_batch_images = max(1, max_batch_images)
+        self.max_batch_bytes = max_batch_bytes
+        self.max_in_flight = max(1, max_in_flight)
+        self.linger = linger_ms / 1000.0
+        self.request_options = {'mode': mode, 'max_tokens': max_tokens, 'temperature': temperature}
+
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._senders = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='ocr-batch')
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'batches': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'max_queue_depth': 0,
+            'wait_seconds': 0.0,
+        }
+        self._started_at = time.monotonic()
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='ocr-batch-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+        logger.info(
+            f"OCR批量客户端启动 - 每批最多 {self.max_batch_images} 张/{max_batch_bytes // 1024 // 1024}MB, "
+            f"在途批次 {self.max_in_flight}, 等待 {linger_ms}ms"
+        )
+
+    # ==================== 提交 ====================
+
+    def submit(self, image_bytes: bytes, key: Any = None) -> Future:
+        """
+        提交一张图片，返回 Future
+
+        Future 的结果与 OCRModelService.ocr_images 返回的单张结果相同
+        （result / result_cleaned / image_size / image_count / image_regions）。
+        """
+        if self._closed:
+            raise RuntimeError('OCR批量客户端已关闭')
+        # 编码在调用方线程完成，发送线程只负责网络请求
+        item = _OCRItem(base64.b64encode(image_bytes).decode('utf-8'), key)
+        with self._stats_lock:
+            self._stats['submitted'] += 1
+        self._queue.put(item)
+        with self._stats_lock:
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._queue.qsize())
+        return item.future
+
+    def recognize(self, image_bytes: bytes, key: Any = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """提交并等待结果（页面线程使用）"""
+        return self.submit(image_bytes, key).result(timeout)
+
+    # ==================== 统计与关闭 ====================
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        elapsed = time.monotonic() - self._started_at
+        finished = stats['completed'] + stats['failed']
+        stats['queue_depth'] = self._queue.qsize()
+        stats['images_per_second'] = round(stats['completed'] / elapsed, 2) if elapsed > 0 else 0.0
+        stats['avg_batch_size'] = round(finished / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['avg_wait_seconds'] = round(stats.pop('wait_seconds') / finished, 3) if finished else 0.0
+        return stats
+
+    def close(self, wait: bool = True) -> None:
+        """停止接收新图片，已提交的图片处理完后退出"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        if wait:
+            self._dispatcher.join()
+        self._senders.shutdown(wait=wait)
+        logger.info(f"OCR批量客户端已关闭，统计: {self.stats()}")
+
+    def __enter__(self) -> 'OCRBatchClient':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    # ==================== 内部方法 ====================
+
+    def _dispatch_loop(self) -> None:
+        pending = None
+        while True:
+            first = pending if pending is not None else self._queue.get()
+            pending = None
+            if first is _CLOSE:
+                return
+
+            batch, batch_bytes = [first], first.size
+            deadline = time.monotonic() + self.linger
+            closing = False
+            while len(batch) < self.max_batch_images:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _CLOSE:
+                    closing = True
+                    break
+                if batch_bytes + item.size > self.max_batch_bytes:
+                    # 放到下一批的开头
+                    pending = item
+                    break
+                batch.append(item)
+                batch_bytes += item.size
+
+            # 在途批次已满时在这里等待，期间新图片继续排队、凑成更满的下一批
+            self._slots.acquire()
+            with self._stats_lock:
+                self._stats['batches'] += 1
+                self._stats['in_flight'] += 1
+                self._stats['max_in_flight'] = max(self._stats['max_in_flight'], self._stats['in_flight'])
+            self._senders.submit(self._send_batch, batch)
+
+            if closing:
+                self._queue.put(_CLOSE)
+
+    def _send_batch(self, batch: List[_OCRItem]) -> None:
+        try:
+            response = self.service.ocr_images(
+                images_base64=[item.image_base64 for item in batch],
+                **self.request_options
+            )
+            results = response.get('results', []) if response.get('success') else []
+            error = response.get('error') or '未获取到识别结果'
+            now = time.monotonic()
+            completed = failed = 0
+            wait_seconds = 0.0
+            for index, item in enumerate(batch):
+                wait_seconds += now - item.enqueued_at
+                result = results[index] if index < len(results) else None
+                if result is None or result.get('error'):
+                    item.future.set_result({'success': False, 'error': (result or {}).get('error', error)})
+                    failed += 1
+                else:
+                    item.future.set_result({'success': True, **result})
+                    completed += 1
+            with self._stats_lock:
+                self._stats['completed'] += completed
+                self._stats['failed'] += failed
+                self._stats['wait_seconds'] += wait_seconds
+        except Exception as e:
+            logger.error(f"OCR批次处理失败: {str(e)}", exc_info=True)
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            with self._stats_lock:
+                self._stats['failed'] += len(batch)
+        finally:
+            with self._stats_lock:
+                self._stats['in_flight'] -= 1
+            self._slots.release()
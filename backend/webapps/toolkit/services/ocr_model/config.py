@@ -12,6 +12,12 @@ class OCRModelConfig:
     API_URL = os.getenv('OCR_API_URL', 'http://172.22.217.66:9123')
     API_TIMEOUT = int(os.getenv('OCR_API_TIMEOUT', '300'))  # 请求超时时间（秒）
 
+    # 批量客户端配置（OCRBatchClient）
+    BATCH_MAX_IMAGES = int(os.getenv('OCR_BATCH_MAX_IMAGES', '8'))  # 每批最多图片数
+    BATCH_MAX_MB = int(os.getenv('OCR_BATCH_MAX_MB', '16'))  # 每批base64数据上限（MB）
+    BATCH_MAX_IN_FLIGHT = int(os.getenv('OCR_BATCH_MAX_IN_FLIGHT', '2'))  # 同时在途的批次数
+    BATCH_LINGER_MS = int(os.getenv('OCR_BATCH_LINGER_MS', '50'))  # 批次未满时最多等待的毫秒数
+
     # OCR模式配置
     OCR_MODES = {
         'convert_to_markdown': 'Markdown格式',
@@ -48,6 +54,10 @@ class OCRModelConfig:
         return {
             'api_url': cls.API_URL,
             'api_timeout': cls.API_TIMEOUT,
+            'batch_max_images': cls.BATCH_MAX_IMAGES,
+            'batch_max_mb': cls.BATCH_MAX_MB,
+            'batch_max_in_flight': cls.BATCH_MAX_IN_FLIGHT,
+            'batch_linger_ms': cls.BATCH_LINGER_MS,
             'ocr_modes': cls.OCR_MODES,
             'default_max_tokens': cls.DEFAULT_MAX_TOKENS,
             'default_temperature': cls.DEFAULT_TEMPERATURE,
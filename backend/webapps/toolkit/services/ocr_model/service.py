@@ -140,14 +140,18 @@ class OCRModelService:
                 # 清理结果（替换图片标记并提取坐标）
                 cleaned_result, image_count, image_regions = self._parse_and_replace_images(raw_result)
 
-                processed_results.append({
+                processed_result = {
                     'result': raw_result,
                     'result_cleaned': cleaned_result,
                     'image_size': result_item.get('image_size', []),
                     'mode': result_item.get('mode', mode),
                     'image_count': image_count,
                     'image_regions': image_regions  # 新增: 图片区域坐标列表
-                })
+                }
+                # 批次中单张图片识别失败时保留错误信息，调用方按图片区分成功与失败
+                if result_item.get('error'):
+                    processed_result['error'] = result_item['error']
+                processed_results.append(processed_result)
 
                 logger.info(f"图片 {i}/{len(images_base64)} 识别完成 - 尺寸: {result_item.get('image_size')}, 图片标记数: {image_count}, 区域数: {len(image_regions)}")
 
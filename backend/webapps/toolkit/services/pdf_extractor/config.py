@@ -24,6 +24,43 @@ class PDFExtractorConfig:
     IMAGE_FORMAT = 'PNG'
     SUPPORTED_FORMATS = ['.pdf']
 
+    # 页面流水线并发配置
+    # CPU阶段（渲染、裁剪）使用的进程数，0 表示在页面线程内直接执行
+    # gevent worker（Celery -P gevent）中始终不创建进程池：页面线程是协程，fork 会复制 gevent 的 hub 与锁；
+    # 需要页面级CPU并行时，把 PDF 提取任务路由到独立的 prefork 或线程池 worker
+    CPU_WORKERS = int(os.getenv('PDF_EXTRACTOR_CPU_WORKERS', '2'))
+    # 同时进行的OCR/LLM请求数
+    LLM_CONCURRENCY = int(os.getenv('PDF_EXTRACTOR_LLM_CONCURRENCY', '4'))
+    # OCR批量客户端：多页OCR请求合并成批次直接发送到OCR模型的批量接口（需要能访问 OCR_API_URL）
+    # 批次大小、在途批次数见 OCRModelConfig.BATCH_*
+    OCR_BATCH_ENABLED = os.getenv('PDF_EXTRACTOR_OCR_BATCH_ENABLED', 'false').lower() == 'true'
+    # 处理过程中任务进度写入数据库的最小间隔（秒），逐页状态通过任务事件流推送
+    PROGRESS_DB_INTERVAL_SECONDS = float(os.getenv('PDF_EXTRACTOR_PROGRESS_DB_INTERVAL', '10'))
+    # SSE事件流：无新事件时阻塞读取的毫秒数（之后发送心跳），单个连接的最长时间（秒，之后客户端带 Last-Event-ID 重连）
+    SSE_BLOCK_MS = int(os.getenv('PDF_EXTRACTOR_SSE_BLOCK_MS', '15000'))
+    SSE_MAX_SECONDS = int(os.getenv('PDF_EXTRACTOR_SSE_MAX_SECONDS', '600'))
+    # worker 进程的内存上限（MB，进程及其子进程的RSS之和，含CPU进程池），超过后暂停领取新页面直到处理中的页面完成，0 表示不限制
+    # 按进程而不是按任务统计：同一 worker 进程内并发的多个任务共享这一上限，各自在超限时暂停
+    MEMORY_LIMIT_MB = int(os.getenv('PDF_EXTRACTOR_MEMORY_LIMIT_MB', '3072'))
+    # 跨页上下文：相邻页文本层截取的字符数
+    PAGE_CONTEXT_CHARS = int(os.getenv('PDF_EXTRACTOR_PAGE_CONTEXT_CHARS', '300'))
+
+    # 快速路径：版式简单的原生文本页面直接转换文本层，不渲染也不调用OCR
+    FAST_PATH_ENABLED = os.getenv('PDF_EXTRACTOR_FAST_PATH_ENABLED', 'true').lower() == 'true'
+    # 直接文本提取策略的最低置信度
+    FAST_PATH_MIN_CONFIDENCE = float(os.getenv('PDF_EXTRACTOR_FAST_PATH_MIN_CONFIDENCE', '0.8'))
+    # 允许的矢量绘图元素数（分隔线、下划线等）
+    FAST_PATH_MAX_DRAWINGS = int(os.getenv('PDF_EXTRACTOR_FAST_PATH_MAX_DRAWINGS', '20'))
+
+    # 渲染/裁剪缓存（按PDF内容哈希寻址，重复处理同一文件时复用截图、裁剪图和编码结果）
+    # 默认放在 MEDIA_ROOT 之外，避免缓存的页面截图被静态文件服务暴露
+    RENDER_CACHE_ENABLED = os.getenv('PDF_EXTRACTOR_RENDER_CACHE_ENABLED', 'true').lower() == 'true'
+    RENDER_CACHE_DIR = Path(os.getenv(
+        'PDF_EXTRACTOR_RENDER_CACHE_DIR',
+        str(Path(settings.BASE_DIR) / 'cache' / 'pdf_extractor')
+    ))
+    RENDER_CACHE_MAX_MB = int(os.getenv('PDF_EXTRACTOR_RENDER_CACHE_MAX_MB', '2048'))
+
     # Qwen3-VL API配置
     # 这些配置应该从环境变量或数据库配置中读取
     QWEN_API_KEY = os.getenv('DASHSCOPE_API_KEY', '')
@@ -72,6 +109,13 @@ class PDFExtractorConfig:
             'image_format': cls.IMAGE_FORMAT,
             'supported_formats': cls.SUPPORTED_FORMATS,
             'qwen_model': cls.QWEN_MODEL,
+            'cpu_workers': cls.CPU_WORKERS,
+            'llm_concurrency': cls.LLM_CONCURRENCY,
+            'fast_path_enabled': cls.FAST_PATH_ENABLED,
+            'ocr_batch_enabled': cls.OCR_BATCH_ENABLED,
+            'memory_limit_mb': cls.MEMORY_LIMIT_MB,
+            'render_cache_enabled': cls.RENDER_CACHE_ENABLED,
+            'render_cache_max_mb': cls.RENDER_CACHE_MAX_MB,
             'task_retention_days': cls.TASK_RETENTION_DAYS,
         }
 
@@ -6,9 +6,10 @@ Step1: 文档结构分析器
 import logging
 import json
 import re
-import fitz
 from typing import Optional
 
+from ..document_session import PDFDocumentSession, open_session
+
 logger = logging.getLogger('django')
 
 
@@ -40,7 +41,8 @@ class DocumentAnalyzer:
     def analyze_document_structure(
         self,
         pdf_path: str,
-        sample_pages: int = 3
+        sample_pages: int = 3,
+        session: Optional[PDFDocumentSession] = None
     ) -> dict:
         """
         分析PDF文档的整体结构，提取标题层级规则
@@ -48,6 +50,7 @@ class DocumentAnalyzer:
         Args:
             pdf_path: PDF文件路径
             sample_pages: 采样页数（前N页）
+            session: 共享的文档会话（可选），不传时临时打开PDF
 
         Returns:
             标题规则字典，例如：
@@ -64,16 +67,16 @@ class DocumentAnalyzer:
             return {}
 
         try:
-            doc = fitz.open(pdf_path)
-            sample_text = []
-
-            # 采样前几页
-            for page_num in range(min(sample_pages, doc.page_count)):
-                page = doc[page_num]
-                text = page.get_text("text")
-                sample_text.append(text)
-
-            doc.close()
+            session, owned = open_session(pdf_path, session)
+            try:
+                # 采样前几页
+                sample_text = [
+                    session.get_text(page_num, "text")
+                    for page_num in range(1, min(sample_pages, session.page_count) + 1)
+                ]
+            finally:
+                if owned:
+                    session.close()
 
             # 合并采样文本
             combined_sample = "\n\n=== 页面分隔 ===\n\n".join(sample_text)
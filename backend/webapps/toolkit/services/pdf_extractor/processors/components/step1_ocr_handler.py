@@ -5,11 +5,15 @@ Step1 OCR处理器
 """
 import logging
 import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Tuple, Dict, Any, Optional
-import fitz  # PyMuPDF
 from openai import OpenAI
 
+from ..document_session import PDFDocumentSession, open_session
+
 logger = logging.getLogger('django')
 
 
@@ -79,7 +83,8 @@ class OCRHandler:
         pdf_path: str,
         page_number: int,
         dpi: int = 144,
-        image_format: str = "png"
+        image_format: str = "png",
+        session: Optional[PDFDocumentSession] = None
     ) -> bytes:
         """
         将PDF页面渲染为图片
@@ -89,6 +94,7 @@ class OCRHandler:
             page_number: 页码（从1开始）
             dpi: 分辨率（DPI）
             image_format: 图片格式（png/jpeg）
+            session: 共享的文档会话（可选），不传时临时打开PDF
 
         Returns:
             图片字节数据
@@ -97,31 +103,15 @@ class OCRHandler:
             FileNotFoundError: PDF文件不存在
             ValueError: 页码无效或格式不支持
         """
-        pdf_path = Path(pdf_path)
-        if not pdf_path.exists():
-            raise FileNotFoundError(f"PDF文件不存在: {pdf_path}")
-
         if image_format.lower() not in ['png', 'jpeg', 'jpg']:
             raise ValueError(f"不支持的图片格式: {image_format}")
 
+        owned = False
         try:
-            doc = fitz.open(pdf_path)
-
-            # 验证页码
-            if page_number < 1 or page_number > doc.page_count:
-                raise ValueError(
-                    f"页码无效: {page_number}，总页数: {doc.page_count}"
-                )
-
-            # 获取页面
-            page = doc[page_number - 1]
-
-            # 设置缩放比例（DPI转换）
-            zoom = dpi / 72  # 72是PDF的默认DPI
-            mat = fitz.Matrix(zoom, zoom)
+            session, owned = open_session(pdf_path, session)
 
             # 渲染页面为图片
-            pix = page.get_pixmap(matrix=mat)
+            pix = session.render_pixmap(page_number, dpi)
 
             # 转换为字节
             if image_format.lower() == 'png':
@@ -129,8 +119,6 @@ class OCRHandler:
             else:
                 image_bytes = pix.tobytes("jpeg")
 
-            doc.close()
-
             logger.info(
                 f"页面 {page_number} 已渲染为图片，"
                 f"尺寸: {pix.width}x{pix.height}，"
@@ -145,6 +133,9 @@ class OCRHandler:
                 exc_info=True
             )
             raise
+        finally:
+            if owned:
+                session.close()
 
     def save_page_image(
         self,
@@ -302,34 +293,68 @@ class OCRHandler:
         self,
         pdf_path: str,
         page_numbers: list[int],
-        dpi: int = 144
+        dpi: int = 144,
+        max_in_flight: int = 4
     ) -> Dict[int, Tuple[str, Dict[str, Any]]]:
         """
         批量OCR多个页面
 
+        多模态对话接口每次只能识别一张图片，这里把渲染和识别流水线化：
+        当前线程依次渲染页面（共享一个文档会话），识别请求交给线程池并行发送，
+        最多 max_in_flight 个请求在途，渲染下一页与等待上一页的响应重叠。
+
         Args:
             pdf_path: PDF文件路径
             page_numbers: 页码列表
             dpi: 渲染DPI
+            max_in_flight: 同时在途的识别请求数
 
         Returns:
             Dict[page_number, (recognized_text, debug_info)]
         """
-        logger.info(f"开始批量OCR识别，共 {len(page_numbers)} 页")
+        logger.info(f"开始批量OCR识别，共 {len(page_numbers)} 页，在途请求上限 {max_in_flight}")
 
         results = {}
-        for page_num in page_numbers:
+        slots = threading.BoundedSemaphore(max(1, max_in_flight))
+
+        def recognize(page_num: int, image_bytes: bytes) -> Tuple[str, Dict[str, Any]]:
             try:
-                text, debug_info = self.ocr_pdf_page(pdf_path, page_num, dpi)
-                results[page_num] = (text, debug_info)
-            except Exception as e:
-                logger.error(f"OCR识别页面 {page_num} 失败: {str(e)}")
-                # 记录失败但继续处理其他页面
-                results[page_num] = (
-                    f"[OCR识别失败: {str(e)}]",
-                    {"error": str(e)}
-                )
-
-        logger.info(f"批量OCR完成，成功 {len(results)} 页")
-
-        return results
+                text, debug_info = self.ocr_from_image_bytes(image_bytes)
+                debug_info.update({'pdf_path': str(pdf_path), 'page_number': page_num, 'dpi': dpi})
+                return text, debug_info
+            finally:
+                slots.release()
+
+        started = time.monotonic()
+        futures = {}
+        with PDFDocumentSession(pdf_path) as session, \
+                ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix='ocr-page') as pool:
+            for page_num in page_numbers:
+                try:
+                    image_bytes = self.extract_page_image(pdf_path, page_num, dpi, session=session)
+                except Exception as e:
+                    results[page_num] = (f"[OCR识别失败: {str(e)}]", {"error": str(e)})
+                    continue
+                # 在途请求已满时等待，避免渲染结果在内存中堆积
+                slots.acquire()
+                futures[page_num] = pool.submit(recognize, page_num, image_bytes)
+
+            for page_num, future in futures.items():
+                try:
+                    results[page_num] = future.result()
+                except Exception as e:
+                    logger.error(f"OCR识别页面 {page_num} 失败: {str(e)}")
+                    # 记录失败但继续处理其他页面
+                    results[page_num] = (
+                        f"[OCR识别失败: {str(e)}]",
+                        {"error": str(e)}
+                    )
+
+        elapsed = time.monotonic() - started
+        failed = sum(1 for _, info in results.values() if 'error' in info)
+        logger.info(
+            f"批量OCR完成，成功 {len(results) - failed}/{len(page_numbers)} 页，"
+            f"耗时 {elapsed:.1f}s，吞吐 {len(page_numbers) / elapsed if elapsed > 0 else 0:.2f} 页/秒"
+        )
+
+        return {page_num: results[page_num] for page_num in page_numbers if page_num in results}
@@ -5,10 +5,9 @@ Step1 页面元素分析器
 """
 import logging
 from dataclasses import dataclass
-from pathlib import Path
-from typing import Dict, Any
-import pdfplumber
-import fitz  # PyMuPDF
+from typing import Dict, Any, Optional
+
+from ..document_session import PDFDocumentSession, open_session
 
 logger = logging.getLogger('django')
 
@@ -121,13 +120,19 @@ class PageAnalyzer:
         """初始化分析器"""
         pass
 
-    def analyze_page(self, pdf_path: str, page_number: int) -> PageAnalysisResult:
+    def analyze_page(
+        self,
+        pdf_path: str,
+        page_number: int,
+        session: Optional[PDFDocumentSession] = None
+    ) -> PageAnalysisResult:
         """
         分析PDF页面的元素构成
 
         Args:
             pdf_path: PDF文件路径
             page_number: 页码（从1开始）
+            session: 共享的文档会话（可选），不传时临时打开PDF
 
         Returns:
             PageAnalysisResult: 页面分析结果
@@ -136,10 +141,14 @@ class PageAnalyzer:
             FileNotFoundError: PDF文件不存在
             ValueError: 页码无效
         """
-        pdf_path = Path(pdf_path)
-        if not pdf_path.exists():
-            raise FileNotFoundError(f"PDF文件不存在: {pdf_path}")
+        session, owned = open_session(pdf_path, session)
+        try:
+            return self._analyze_page(session, page_number)
+        finally:
+            if owned:
+                session.close()
 
+    def _analyze_page(self, session: PDFDocumentSession, page_number: int) -> PageAnalysisResult:
         logger.info(f"开始分析页面 {page_number} 的元素构成")
 
         # 初始化结果变量
@@ -151,13 +160,8 @@ class PageAnalyzer:
 
         # 方法1: 使用 pdfplumber 分析
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-
-                if page_number < 1 or page_number > total_pages:
-                    raise ValueError(f"页码无效: {page_number}，总页数: {total_pages}")
-
-                page = pdf.pages[page_number - 1]
+            with session.lock:
+                page = session.plumber_page(page_number)
 
                 # 页面尺寸
                 width = float(page.width)
@@ -202,31 +206,29 @@ class PageAnalyzer:
         # 方法2: 使用 PyMuPDF 补充分析
         has_cid_fonts = False
         try:
-            doc = fitz.open(pdf_path)
-            page = doc[page_number - 1]
+            with session.lock:
+                page = session.fitz_page(page_number)
 
-            # 提取文本块
-            text_blocks = page.get_text('blocks')
-            text_blocks_count = len(text_blocks)
+                # 提取文本块
+                text_blocks = page.get_text('blocks')
+                text_blocks_count = len(text_blocks)
 
-            # 提取链接
-            links = page.get_links()
-            link_count = len(links)
+                # 提取链接
+                links = page.get_links()
+                link_count = len(links)
 
-            # 提取绘图命令
-            drawings = page.get_drawings()
-            drawing_count = len(drawings)
+                # 提取绘图命令
+                drawings = page.get_drawings()
+                drawing_count = len(drawings)
 
-            # 检测CID字体
-            has_cid_fonts = self._detect_cid_fonts(page)
+                # 检测CID字体
+                has_cid_fonts = self._detect_cid_fonts(page)
             if has_cid_fonts:
                 logger.warning(
                     f"页面 {page_number} 检测到CID字体（Identity-H编码），"
                     f"直接文本提取可能产生乱码"
                 )
 
-            doc.close()
-
             logger.debug(f"PyMuPDF分析完成 - 文本块: {text_blocks_count}, "
                        f"链接: {link_count}, 绘图: {drawing_count}, "
                        f"CID字体: {has_cid_fonts}")
@@ -283,31 +285,31 @@ class PageAnalyzer:
         Returns:
             Dict[int, PageAnalysisResult]: 页码到分析结果的映射
         """
-        pdf_path = Path(pdf_path)
-
-        # 获取总页数
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
-
-        if end_page is None:
-            end_page = total_pages
-
-        # 验证页码范围
-        if start_page < 1 or end_page > total_pages or start_page > end_page:
-            raise ValueError(
-                f"页码范围无效: {start_page}-{end_page}，总页数: {total_pages}"
-            )
-
-        logger.info(f"开始批量分析页面 {start_page} 到 {end_page}")
-
-        results = {}
-        for page_num in range(start_page, end_page + 1):
-            try:
-                result = self.analyze_page(pdf_path, page_num)
-                results[page_num] = result
-            except Exception as e:
-                logger.error(f"分析页面 {page_num} 失败: {str(e)}")
-                # 继续分析下一页
+        # 所有页面共用一个会话，PDF只解析一次
+        with PDFDocumentSession(pdf_path) as session:
+            total_pages = session.page_count
+
+            if end_page is None:
+                end_page = total_pages
+
+            # 验证页码范围
+            if start_page < 1 or end_page > total_pages or start_page > end_page:
+                raise ValueError(
+                    f"页码范围无效: {start_page}-{end_page}，总页数: {total_pages}"
+                )
+
+            logger.info(f"开始批量分析页面 {start_page} 到 {end_page}")
+
+            results = {}
+            for page_num in range(start_page, end_page + 1):
+                try:
+                    result = self.analyze_page(pdf_path, page_num, session=session)
+                    results[page_num] = result
+                except Exception as e:
+                    logger.error(f"分析页面 {page_num} 失败: {str(e)}")
+                    # 继续分析下一页
+                finally:
+                    session.release_page(page_num)
 
         logger.info(f"批量分析完成，成功分析 {len(results)} 页")
 
@@ -0,0 +1,152 @@
+"""
+Step1 文本层转换器
+
+将PDF文本层直接转换为Markdown，不调用OCR/LLM，用于版式简单的原生文本页面：
+- 以正文字号（按字符数加权的众数）为基准，明显更大的文本块识别为标题
+- 同一文本块内的行合并为段落，处理英文断词连字符，中文行间不插入空格
+- 保留项目符号和编号列表
+"""
+import logging
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from ..document_session import PDFDocumentSession, open_session
+
+logger = logging.getLogger('django')
+
+_BULLET_RE = re.compile(r'^[•●▪■◦·‣∙\-\*]\s*')
+_NUMBERED_RE = re.compile(r'^(\d{1,3}|[a-zA-Z])[.)、]\s+')
+_CJK_RE = re.compile(r'[　-ヿ㐀-鿿＀-￯]')
+
+
+class TextLayerConverter:
+    """PDF文本层 → Markdown"""
+
+    # (字号/正文字号 的下限, 标题级别)，从大到小匹配
+    HEADING_RATIOS = ((1.6, 1), (1.3, 2), (1.12, 3))
+    # 超过该长度的文本块即使字号较大也按正文处理
+    HEADING_MAX_CHARS = 120
+
+    def convert(
+        self,
+        pdf_path: str,
+        page_number: int,
+        session: Optional[PDFDocumentSession] = None
+    ) -> str:
+        """
+        转换单个页面
+
+        Args:
+            pdf_path: PDF文件路径
+            page_number: 页码（从1开始）
+            session: 共享的文档会话（可选），不传时临时打开PDF
+
+        Returns:
+            Markdown文本
+        """
+        session, owned = open_session(pdf_path, session)
+        try:
+            with session.lock:
+                page_dict = session.fitz_page(page_number).get_text('dict', sort=True)
+        finally:
+            if owned:
+                session.close()
+        return self.convert_page_dict(page_dict)
+
+    def convert_page_dict(self, page_dict: Dict[str, Any]) -> str:
+        """将 fitz get_text('dict') 的结果转换为Markdown"""
+        blocks = [self._read_block(b) for b in page_dict.get('blocks', []) if b.get('type') == 0]
+        blocks = [b for b in blocks if b['lines']]
+        if not blocks:
+            return ''
+
+        body_size = self._body_font_size(blocks)
+        parts = []
+        for block in blocks:
+            level = self._heading_level(block, body_size)
+            if level:
+                text = ' '.join(line['text'] for line in block['lines'])
+                parts.append(f"{'#' * level} {text}")
+            else:
+                parts.extend(self._block_paragraphs(block['lines']))
+        return '\n\n'.join(parts) + '\n'
+
+    # ==================== 内部方法 ====================
+
+    @staticmethod
+    def _read_block(block: Dict[str, Any]) -> Dict[str, Any]:
+        lines = []
+        for line in block.get('lines', []):
+            spans = [s for s in line.get('spans', []) if s.get('text', '').strip()]
+            if not spans:
+                continue
+            text = ''.join(s['text'] for s in spans).strip()
+            lines.append({
+                'text': ' '.join(text.split()),
+                'size': max(s.get('size', 0) for s in spans),
+                'chars': sum(len(s['text'].strip()) for s in spans),
+            })
+        return {'lines': lines}
+
+    @staticmethod
+    def _body_font_size(blocks: List[Dict[str, Any]]) -> float:
+        """正文字号：按字符数加权出现最多的字号"""
+        sizes = Counter()
+        for block in blocks:
+            for line in block['lines']:
+                sizes[round(line['size'], 1)] += line['chars']
+        return sizes.most_common(1)[0][0] if sizes else 0.0
+
+    def _heading_level(self, block: Dict[str, Any], body_size: float) -> int:
+        if body_size <= 0:
+            return 0
+        chars = sum(line['chars'] for line in block['lines'])
+        if chars > self.HEADING_MAX_CHARS:
+            return 0
+        ratio = min(line['size'] for line in block['lines']) / body_size
+        for min_ratio, level in self.HEADING_RATIOS:
+            if ratio >= min_ratio:
+                return level
+        return 0
+
+    @classmethod
+    def _block_paragraphs(cls, lines: List[Dict[str, Any]]) -> List[str]:
+        """合并文本块内的行，列表项单独成行"""
+        items: List[List[str]] = []
+        for line in lines:
+            text = line['text']
+            bullet = _BULLET_RE.match(text)
+            if bullet and len(text) > bullet.end():
+                items.append([f"- {text[bullet.end():]}"])
+            elif _NUMBERED_RE.match(text) or not items:
+                items.append([text])
+            else:
+                items[-1].append(text)
+
+        paragraphs = [cls._join_lines(item) for item in items]
+        # 连续的列表项放在同一段内，不插入空行
+        merged: List[str] = []
+        for paragraph in paragraphs:
+            if merged and cls._is_list_item(paragraph) and cls._is_list_item(merged[-1].split('\n')[-1]):
+                merged[-1] = f"{merged[-1]}\n{paragraph}"
+            else:
+                merged.append(paragraph)
+        return merged
+
+    @staticmethod
+    def _is_list_item(text: str) -> bool:
+        return text.startswith('- ') or bool(_NUMBERED_RE.match(text))
+
+    @staticmethod
+    def _join_lines(lines: List[str]) -> str:
+        result = lines[0]
+        for line in lines[1:]:
+            if result.endswith('-') and len(result) > 1 and result[-2].isalpha() and line[:1].islower():
+                # 英文断词：去掉行尾连字符直接拼接
+                result = result[:-1] + line
+            elif _CJK_RE.match(result[-1]) or _CJK_RE.match(line[0]):
+                result += line
+            else:
+                result += ' ' + line
+        return result
@@ -7,10 +7,11 @@ import logging
 import json
 import re
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
 import numpy as np
 from openai import OpenAI
 
+from ..render_cache import get_render_cache
 from .step4_image_processor import ImageProcessor
 from .step4_prompt_builder import InsertionPromptBuilder
 from .step4_data_models import InsertionInstruction
@@ -43,7 +44,8 @@ class InstructionHandler:
         region_images: List[np.ndarray],
         page_number: int,
         output_dir: Path = None,
-        region_bboxes: List[List[int]] = None
+        region_bboxes: List[List[int]] = None,
+        page_key: Optional[str] = None
     ) -> List[InsertionInstruction]:
         """
         调用VL模型获取图片插入指令
@@ -55,30 +57,46 @@ class InstructionHandler:
             page_number: 页码
             output_dir: 输出目录（用于保存缩放后的图像）
             region_bboxes: 分割区域bbox坐标列表 [[x1,y1,x2,y2], ...], 与region_images对应
+            page_key: 页面的渲染缓存键（可选），提供时复用已编码的base64图片；
+                      此时 region_images 必须是 full_page_image 按 region_bboxes 裁剪的结果
 
         Returns:
             InsertionInstruction对象列表
         """
         try:
-            # 缩放完整页面图像（发送给VL模型）
-            resized_full_page = self.image_processor.resize_image_for_vl(
-                full_page_image,
-                max_dimension=1440
-            )
+            max_dimension = 1440
 
-            # 保存缩放后的图像（如果指定了输出目录）
+            # 缩放完整页面图像（发送给VL模型）
             if output_dir:
+                resized_full_page = self.image_processor.resize_image_for_vl(
+                    full_page_image,
+                    max_dimension=max_dimension
+                )
+                # 保存缩放后的图像
                 self.image_processor.save_resized_image(resized_full_page, output_dir)
 
+                def encode_full_page() -> str:
+                    return self.image_processor.image_to_base64(resized_full_page)
+            else:
+                # 缓存命中时连缩放也可以省掉
+                def encode_full_page() -> str:
+                    return self.image_processor.image_to_base64(
+                        self.image_processor.resize_image_for_vl(full_page_image, max_dimension=max_dimension)
+                    )
+
             # 将缩放后的完整页面图像转为base64
-            full_page_base64 = self.image_processor.image_to_base64(resized_full_page)
+            full_page_base64 = self._cached_base64(page_key, encode_full_page, variant=f'vl{max_dimension}.b64')
 
             # 将分割图片转为base64（保持原始尺寸）
             region_base64_list = []
-            for region_img in region_images:
-                region_base64_list.append(
-                    self.image_processor.image_to_base64(region_img)
-                )
+            for i, region_img in enumerate(region_images):
+                bbox = region_bboxes[i] if region_bboxes and i < len(region_bboxes) else None
+                region_base64_list.append(self._cached_base64(
+                    page_key if bbox else None,
+                    lambda region_img=region_img: self.image_processor.image_to_base64(region_img),
+                    bbox=bbox,
+                    variant='crop.b64'
+                ))
 
             # 构建消息内容
             message_content = [
@@ -163,6 +181,20 @@ class InstructionHandler:
             logger.error(f"获取插入指令失败: {str(e)}", exc_info=True)
             return []
 
+    @staticmethod
+    def _cached_base64(
+        page_key: Optional[str],
+        encode: Callable[[], str],
+        bbox: Optional[List[int]] = None,
+        variant: str = 'b64'
+    ) -> str:
+        """通过渲染缓存获取base64编码，没有缓存键时直接编码"""
+        cache = get_render_cache() if page_key else None
+        if cache is None:
+            return encode()
+        data = cache.get_or_create(page_key, lambda: encode().encode('ascii'), bbox=bbox, variant=variant)
+        return data.decode('ascii')
+
     def _parse_instructions(
         self,
         response_text: str,
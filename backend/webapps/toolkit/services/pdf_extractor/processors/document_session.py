@@ -0,0 +1,181 @@
+"""
+PDF文档会话
+
+一个任务内各步骤共享同一份已打开的PDF：
+- 一个 fitz 文档，整个任务期间只打开一次
+- 一个按需创建的 pdfplumber 句柄，页面对象按页缓存（pdfplumber 解析出的对象树挂在 Page 上，
+  同一页再次访问时不需要重新解析）
+
+PyMuPDF 和 pdfplumber 都不是线程安全的，会话内部用锁串行化访问。
+进程池中的子进程通过 PDFDocumentSession.for_process() 各自持有一份会话。
+"""
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger('django')
+
+# 每个进程按文件路径缓存的会话（供进程池中的阶段函数使用）
+_process_sessions: Dict[Tuple[int, str], 'PDFDocumentSession'] = {}
+_process_sessions_lock = threading.Lock()
+
+
+class PDFDocumentSession:
+    """单个PDF文件的共享句柄"""
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = Path(pdf_path)
+        if not self.pdf_path.exists():
+            raise FileNotFoundError(f"PDF文件不存在: {self.pdf_path}")
+
+        self._lock = threading.RLock()
+        self._doc = fitz.open(self.pdf_path)
+        self._plumber = None
+        self._plumber_pages = {}
+        self._content_hash = None
+        self.stats = {'fitz_opens': 1, 'plumber_opens': 0, 'plumber_page_hits': 0, 'plumber_page_misses': 0}
+
+    @classmethod
+    def for_process(cls, pdf_path: str) -> 'PDFDocumentSession':
+        """
+        获取当前进程内该文件的会话，不存在时创建
+
+        以进程号区分，fork 出的子进程不会复用父进程的文件句柄。
+        """
+        key = (os.getpid(), str(Path(pdf_path).resolve()))
+        with _process_sessions_lock:
+            session = _process_sessions.get(key)
+            if session is None or session.closed:
+                session = cls(pdf_path)
+                _process_sessions[key] = session
+            return session
+
+    @classmethod
+    def close_process_session(cls, pdf_path: str) -> None:
+        key = (os.getpid(), str(Path(pdf_path).resolve()))
+        with _process_sessions_lock:
+            session = _process_sessions.pop(key, None)
+        if session is not None:
+            session.close()
+
+    @property
+    def content_hash(self) -> str:
+        """PDF文件内容的 sha256，渲染缓存以此寻址（首次访问时计算）"""
+        if self._content_hash is None:
+            digest = hashlib.sha256()
+            with open(self.pdf_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    # ==================== fitz ====================
+
+    @property
+    def lock(self) -> threading.RLock:
+        """直接操作 fitz 页面对象时需要持有此锁"""
+        return self._lock
+
+    @property
+    def closed(self) -> bool:
+        return self._doc is None
+
+    @property
+    def page_count(self) -> int:
+        return self._doc.page_count
+
+    def fitz_page(self, page_number: int):
+        """
+        获取 fitz 页面对象（页码从1开始）
+
+        调用方需要在 session.lock 内使用返回的页面对象。
+        """
+        self._check_page(page_number)
+        return self._doc[page_number - 1]
+
+    def render_pixmap(self, page_number: int, dpi: int = 144, alpha: bool = False):
+        """渲染页面为 fitz.Pixmap"""
+        with self._lock:
+            zoom = dpi / 72.0  # PDF默认72 DPI
+            return self.fitz_page(page_number).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=alpha)
+
+    def render_png(self, page_number: int, dpi: int = 144) -> Tuple[bytes, List[int]]:
+        """渲染页面为PNG，返回 (PNG数据, [宽, 高])"""
+        pix = self.render_pixmap(page_number, dpi)
+        return pix.tobytes('png'), [pix.width, pix.height]
+
+    def get_text(self, page_number: int, option: str = 'text'):
+        with self._lock:
+            return self.fitz_page(page_number).get_text(option)
+
+    # ==================== pdfplumber ====================
+
+    def plumber_page(self, page_number: int):
+        """
+        获取 pdfplumber 页面对象（按页缓存）
+
+        首次调用时才打开 pdfplumber；调用方需要在 session.lock 内使用返回的页面对象。
+        """
+        self._check_page(page_number)
+        with self._lock:
+            page = self._plumber_pages.get(page_number)
+            if page is not None:
+                self.stats['plumber_page_hits'] += 1
+                return page
+            if self._plumber is None:
+                import pdfplumber
+                self._plumber = pdfplumber.open(self.pdf_path)
+                self.stats['plumber_opens'] += 1
+            page = self._plumber.pages[page_number - 1]
+            self._plumber_pages[page_number] = page
+            self.stats['plumber_page_misses'] += 1
+            return page
+
+    def release_page(self, page_number: int) -> None:
+        """页面处理完后释放 pdfplumber 缓存的对象树，控制大文档的内存占用"""
+        with self._lock:
+            page = self._plumber_pages.pop(page_number, None)
+            if page is not None:
+                # 老版本 pdfplumber 没有 Page.close()
+                (getattr(page, 'close', None) or page.flush_cache)()
+
+    # ==================== 生命周期 ====================
+
+    def close(self) -> None:
+        with self._lock:
+            if self._plumber is not None:
+                self._plumber.close()
+                self._plumber = None
+            self._plumber_pages.clear()
+            if self._doc is not None:
+                self._doc.close()
+                self._doc = None
+
+    def __enter__(self) -> 'PDFDocumentSession':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _check_page(self, page_number: int) -> None:
+        if self._doc is None:
+            raise RuntimeError(f"文档会话已关闭: {self.pdf_path}")
+        if page_number < 1 or page_number > self._doc.page_count:
+            raise ValueError(f"页码无效: {page_number}，总页数: {self._doc.page_count}")
+
+
+def open_session(pdf_path: str, session: Optional[PDFDocumentSession] = None) -> Tuple[PDFDocumentSession, bool]:
+    """
+    复用传入的会话，没有时临时打开一个
+
+    Returns:
+        (会话, 是否由调用方负责关闭)
+    """
+    if session is not None:
+        return session, False
+    return PDFDocumentSession(pdf_path), True
@@ -0,0 +1,118 @@
+"""
+worker 进程内存预算
+
+上千页的扫描件会让 worker 的常驻内存（RSS）持续上涨直至被 OOM 终止。
+MemoryBudget 在每页开始处理前检查当前进程及其子进程（CPU进程池）的 RSS：
+- 未超过上限时直接放行
+- 超过上限时先回收内存（gc、PyMuPDF 资源缓存），仍超过则等待正在处理的页面完成后再放行
+- 没有正在处理的页面时总是放行，保证任务不会因预算而停滞
+
+页面截图、裁剪图由各阶段落盘后按路径传递，页面片段写入检查点，内存中只保留正在处理的页面。
+RSS 按进程统计，无法区分同一进程内的各个任务：上限约束的是整个 worker 进程，
+同一进程内并发的任务共享这一上限，每个任务只统计自己正在处理的页面数。
+"""
+import gc
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+import psutil
+
+logger = logging.getLogger('django')
+
+
+def process_tree_rss() -> int:
+    """当前进程及所有子进程的 RSS 之和（字节）"""
+    process = psutil.Process()
+    total = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            # 子进程可能刚好退出
+            continue
+    return total
+
+
+def release_memory() -> None:
+    """回收可释放的内存：Python 循环引用和 PyMuPDF 的资源缓存"""
+    gc.collect()
+    try:
+        import fitz
+        fitz.TOOLS.store_shrink(100)
+    except Exception:
+        pass
+
+
+class MemoryBudget:
+    """按 RSS 上限控制页面准入"""
+
+    def __init__(self, rss_limit_mb: int, poll_interval: float = 0.5):
+        """
+        Args:
+            rss_limit_mb: RSS上限（MB），0 表示不限制
+            poll_interval: 超过上限时重新检查的间隔（秒）
+        """
+        self.rss_limit = rss_limit_mb * 1024 * 1024
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        self._active = 0
+        self._stats = {'admitted': 0, 'throttled': 0, 'wait_seconds': 0.0, 'peak_rss_mb': 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rss_limit > 0
+
+    @contextmanager
+    def page_slot(self):
+        """处理一页期间持有的准入，超过预算时在这里等待"""
+        self._admit()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+        stats['wait_seconds'] = round(stats['wait_seconds'], 2)
+        stats['rss_limit_mb'] = self.rss_limit // 1024 // 1024
+        return stats
+
+    def _admit(self) -> None:
+        if not self.enabled:
+            with self._cond:
+                self._active += 1
+                self._stats['admitted'] += 1
+            return
+
+        rss = self._sample()
+        if rss > self.rss_limit:
+            release_memory()
+            rss = self._sample()
+
+        with self._cond:
+            if rss > self.rss_limit and self._active > 0:
+                self._stats['throttled'] += 1
+                logger.warning(
+                    f"内存超过预算（{rss / 1024 / 1024:.0f}MB > {self.rss_limit / 1024 / 1024:.0f}MB），"
+                    f"等待 {self._active} 个处理中的页面完成"
+                )
+                started = time.monotonic()
+                while self._active > 0:
+                    self._cond.wait(self.poll_interval)
+                    if self._sample() <= self.rss_limit:
+                        break
+                self._stats['wait_seconds'] += time.monotonic() - started
+            self._active += 1
+            self._stats['admitted'] += 1
+
+    def _sample(self) -> int:
+        rss = process_tree_rss()
+        with self._cond:
+            self._stats['peak_rss_mb'] = max(self._stats['peak_rss_mb'], round(rss / 1024 / 1024, 1))
+        return rss
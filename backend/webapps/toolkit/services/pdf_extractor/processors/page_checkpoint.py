@@ -0,0 +1,119 @@
+"""
+页面级检查点
+
+每页处理完成（或失败）后立即把结果写入 PDFExtractorPage：
+- markdown 片段、图片文件与区域元数据、状态、错误信息、处理次数
+- 任务被中断后重新执行（worker 重启、OOM、上游服务故障导致的重新投递），只处理未完成的页面
+- 可以指定页码重新处理，其余页面保持不变
+- 最终文档由各页片段按页码拼接，不再依赖磁盘上的页面文件
+- 大文档按块读取片段（iter_fragments），合并时内存中只保留一块
+"""
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F
+
+logger = logging.getLogger('django')
+
+
+class PageCheckpointStore:
+    """单个任务的页面检查点读写"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+
+    @property
+    def _pages(self):
+        from webapps.toolkit.models import PDFExtractorPage
+        return PDFExtractorPage.objects.filter(task_id=self.task_id)
+
+    def prepare(self, page_numbers: Iterable[int]) -> None:
+        """
+        为页码范围创建检查点记录（已存在的保留）
+
+        上次执行中断时停留在 processing 的页面重置为 pending。
+        """
+        from webapps.toolkit.models import PDFExtractorPage
+
+        page_numbers = list(page_numbers)
+        with transaction.atomic():
+            PDFExtractorPage.objects.bulk_create(
+                [PDFExtractorPage(task_id=self.task_id, page_number=n) for n in page_numbers],
+                ignore_conflicts=True
+            )
+            interrupted = self._pages.filter(page_number__in=page_numbers, status='processing').update(status='pending')
+        if interrupted:
+            logger.info(f"任务 {self.task_id} 有 {interrupted} 页上次处理被中断，将重新处理")
+
+    def statuses(self, page_numbers: Iterable[int]) -> Dict[int, str]:
+        return dict(self._pages.filter(page_number__in=list(page_numbers)).values_list('page_number', 'status'))
+
+    def incomplete_pages(self, page_numbers: Iterable[int]) -> List[int]:
+        """未完成的页码（按页码排序），没有检查点记录的页面也视为未完成"""
+        page_numbers = sorted(page_numbers)
+        statuses = self.statuses(page_numbers)
+        return [n for n in page_numbers if statuses.get(n) != 'completed']
+
+    def reset(self, page_numbers: Iterable[int]) -> int:
+        """将指定页面重置为 pending，用于重新处理"""
+        return self._pages.filter(page_number__in=list(page_numbers)).update(status='pending', error='')
+
+    def mark_processing(self, page_number: int) -> None:
+        self._pages.filter(page_number=page_number).update(status='processing', attempts=F('attempts') + 1)
+
+    def save_completed(self, page_number: int, markdown: str, result: Dict) -> None:
+        self._pages.filter(page_number=page_number).update(
+            status='completed',
+            markdown=markdown,
+            result=result,
+            error=''
+        )
+
+    def save_error(self, page_number: int, error: str) -> None:
+        self._pages.filter(page_number=page_number).update(status='error', error=error)
+
+    def completed_results(self, page_numbers: Iterable[int]) -> Dict[int, Dict]:
+        """已完成页面的处理结果，用于恢复 task.json 中的页面信息"""
+        rows = self._pages.filter(page_number__in=list(page_numbers), status='completed').values_list(
+            'page_number', 'result'
+        )
+        return {page_number: result for page_number, result in rows}
+
+    def completed_count(self, start_page: int, end_page: int) -> int:
+        return self._pages.filter(
+            page_number__gte=start_page, page_number__lte=end_page, status='completed'
+        ).count()
+
+    def iter_fragments(
+        self,
+        start_page: int,
+        end_page: int,
+        chunk_size: int = 100
+    ) -> Iterator[Tuple[int, Optional[str]]]:
+        """
+        按页码顺序逐页返回 (页码, 片段)，未完成的页面片段为 None
+
+        每次只查询 chunk_size 页，上千页的文档合并时不会一次性把所有片段读入内存。
+        """
+        for chunk_start in range(start_page, end_page + 1, chunk_size):
+            chunk_end = min(chunk_start + chunk_size - 1, end_page)
+            fragments = self.fragments(chunk_start, chunk_end)
+            for page_number in range(chunk_start, chunk_end + 1):
+                yield page_number, fragments[page_number]
+
+    def fragments(self, start_page: int, end_page: int) -> Dict[int, Optional[str]]:
+        """
+        页码范围内各页的 markdown 片段
+
+        Returns:
+            {页码: 片段}，未完成的页面为 None
+        """
+        rows = self._pages.filter(page_number__gte=start_page, page_number__lte=end_page).values_list(
+            'page_number', 'status', 'markdown'
+        )
+        fragments = {n: None for n in range(start_page, end_page + 1)}
+        for page_number, status, markdown in rows:
+            if status == 'completed':
+                fragments[page_number] = markdown
+        return fragments
@@ -0,0 +1,365 @@
+"""
+页面流水线: 多页并行处理
+
+原先每页严格串行：渲染 → OCR → 翻译 → 裁剪 → 重构，且前一页的结果作为后一页的上下文。
+流水线把各阶段按资源类型拆开：
+- CPU 阶段（渲染、裁剪与重构）提交到进程池；gevent 打过补丁的进程（生产环境的 Celery worker）中
+  页面"线程"是协程，fork 出的子进程也会继承 gevent 的 hub 与锁，因此不创建进程池，
+  CPU 阶段在页面协程内执行，并行度来自多个 worker 进程（见 PageStageRunner._create_cpu_pool）
+- OCR / LLM 阶段（网络请求）由信号量限制并发
+- 跨页上下文改为从PDF文本层预先截取的相邻页首尾片段，页与页之间不再互相等待
+- 简单的原生文本页面由路由阶段在本地转换，不渲染也不调用OCR（见 page_router.py）
+- 启用OCR批量客户端时，各页面的OCR请求合并成批次发送，并发由客户端的在途批次数限制
+- 设置内存预算时，进程RSS超过上限后暂停领取新页面，等待处理中的页面完成（见 memory_budget.py）
+
+结果按页码顺序返回，最终合并顺序与串行处理一致。
+PDF在每个进程内只打开一次（PDFDocumentSession.for_process），各页面共享。
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .document_session import PDFDocumentSession, open_session
+from .memory_budget import MemoryBudget
+from .render_cache import get_render_cache, page_cache_key, png_size
+from .step1_text_extractor import render_page_png, save_page_image
+
+logger = logging.getLogger('django')
+
+
+def _noop() -> None:
+    return None
+
+
+def gevent_patched() -> bool:
+    """当前进程是否已被 gevent monkey patch（Celery -P gevent）"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+# ==================== 进程池中执行的阶段函数 ====================
+
+def render_page_stage(pdf_path: str, page_number: int, dpi: int, page_dir: str) -> Dict[str, Any]:
+    """
+    渲染页面并保存 full_page.png，返回截图路径
+
+    截图只以文件形式在阶段之间传递，OCR前再读取，页面排队等待期间不占用内存。
+    page_key 是该页面的渲染缓存键，后续裁剪阶段以它为前缀缓存裁剪图。
+    """
+    page_dir = Path(page_dir)
+    page_dir.mkdir(parents=True, exist_ok=True)
+    session = PDFDocumentSession.for_process(pdf_path)
+    page_key = page_cache_key(session.content_hash, page_number, dpi)
+    image_path = page_dir / "full_page.png"
+
+    # 缓存中已是编码好的PNG，命中时直接写文件，不再解码、重新编码
+    cache = get_render_cache()
+    cached = cache.get(page_key) if cache is not None else None
+    if cached is not None:
+        image_path.write_bytes(cached)
+        return {'image_path': str(image_path), 'image_size': png_size(cached), 'page_key': page_key}
+
+    if cache is None:
+        image_bytes, image_size = render_page_png(pdf_path, page_number, dpi, session=session)
+        save_page_image(image_bytes, image_path)
+    else:
+        # 未命中时缓存优化压缩后的文件，之后命中时直接复用
+        image_bytes, image_size = session.render_png(page_number, dpi)
+        save_page_image(image_bytes, image_path)
+        cache.put(page_key, image_path.read_bytes())
+    return {'image_path': str(image_path), 'image_size': image_size, 'page_key': page_key}
+
+
+def finalize_page_stage(
+    page_dir: str,
+    page_number: int,
+    task_id: Optional[str],
+    page_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """Step3 裁剪图片区域 + Step4 占位符替换，返回可序列化的结果"""
+    import numpy as np
+    from PIL import Image
+    from .step3_semantic_segmentor import SemanticSegmentor
+    from .step4_markdown_reconstructor import MarkdownReconstructor
+
+    page_dir = Path(page_dir)
+    image_path = page_dir / "full_page.png"
+    if not image_path.exists():
+        raise FileNotFoundError(f"页面截图不存在: {image_path}")
+
+    with Image.open(image_path) as img:
+        full_page_image = np.array(img)
+
+    regions, region_paths = SemanticSegmentor().segment_and_save(
+        full_page_image, page_dir, page_number, page_key=page_key
+    )
+    _, final_md_path = MarkdownReconstructor().reconstruct_and_save(
+        page_number=page_number,
+        output_dir=page_dir,
+        task_id=task_id
+    )
+    return {
+        'regions': [r.to_dict() for r in regions],
+        'region_paths': [str(p) for p in region_paths],
+        'final_markdown_path': str(final_md_path),
+    }
+
+
+def route_page_stage(
+    pdf_path: str,
+    page_number: int,
+    page_dir: str,
+    min_confidence: float,
+    max_drawings: int
+) -> Dict[str, Any]:
+    """
+    页面路由；判定为简单文本页时直接在本地转换为Markdown
+
+    Returns:
+        {'route': PageRoute.to_dict(), 'markdown': 本地转换结果，走视觉模型时为 None}
+    """
+    from .components import TextLayerConverter
+    from .page_router import ROUTE_VISION, PageRoute
+
+    session = PDFDocumentSession.for_process(pdf_path)
+    route = _get_page_router(min_confidence, max_drawings).route_page(pdf_path, page_number, session=session)
+    # 路由分析缓存的 pdfplumber 页面对象不再需要
+    session.release_page(page_number)
+    if not route.is_local:
+        return {'route': route.to_dict(), 'markdown': None}
+
+    markdown = TextLayerConverter().convert(pdf_path, page_number, session=session)
+    if not markdown.strip():
+        route = PageRoute(page_number, ROUTE_VISION, '文本层转换结果为空', route.metrics)
+        return {'route': route.to_dict(), 'markdown': None}
+
+    page_dir = Path(page_dir)
+    page_dir.mkdir(parents=True, exist_ok=True)
+    # 与OCR路径保持相同的中间文件，翻译和排查问题时不需要区分来源
+    (page_dir / f"page_{page_number}_step1_final.md").write_text(markdown, encoding='utf-8')
+    return {'route': route.to_dict(), 'markdown': markdown}
+
+
+_page_routers: Dict[tuple, Any] = {}
+
+
+def _get_page_router(min_confidence: float, max_drawings: int):
+    """每个进程按参数复用一个路由器"""
+    from .page_router import PageRouter
+
+    key = (min_confidence, max_drawings)
+    router = _page_routers.get(key)
+    if router is None:
+        router = _page_routers[key] = PageRouter(min_confidence=min_confidence, max_drawings=max_drawings)
+    return router
+
+
+# ==================== 调度 ====================
+
+class PageStageRunner:
+    """
+    阶段执行器
+
+    cpu() 在进程池中执行（没有进程池时直接在当前线程执行），
+    llm_slot() 返回限制OCR/LLM并发的上下文管理器。
+    ocr_client 为 OCRBatchClient 时，OCR请求交给它合并发送，不再占用 llm_slot。
+    """
+
+    def __init__(self, cpu_workers: int = 0, llm_concurrency: Optional[int] = None, ocr_client=None):
+        self._cpu_pool = self._create_cpu_pool(cpu_workers)
+        self._llm_slots = threading.BoundedSemaphore(llm_concurrency) if llm_concurrency else None
+        self.ocr_client = ocr_client
+
+    @staticmethod
+    def _create_cpu_pool(cpu_workers: int) -> Optional[ProcessPoolExecutor]:
+        if cpu_workers <= 0:
+            return None
+        if multiprocessing.current_process().daemon:
+            # prefork 模式的 Celery worker 是守护进程，不能再创建子进程
+            logger.warning("当前进程为守护进程，CPU阶段改为在页面线程内执行")
+            return None
+        if gevent_patched():
+            # gevent worker 中 fork 会复制 hub 与可能被其他协程持有的锁；CPU 阶段在页面协程内执行
+            logger.info("当前进程已被 gevent 打补丁，不创建CPU进程池，CPU阶段在页面协程内执行")
+            return None
+        # fork 方式启动，子进程无需重新导入 Django 环境
+        pool = ProcessPoolExecutor(
+            max_workers=cpu_workers,
+            mp_context=multiprocessing.get_context('fork')
+        )
+        # fork 方式下第一次提交会启动全部子进程：在页面线程启动前完成 fork，避免在持有锁的页面线程中 fork
+        pool.submit(_noop).result()
+        return pool
+
+    def cpu(self, fn: Callable, *args):
+        if self._cpu_pool is None:
+            return fn(*args)
+        return self._cpu_pool.submit(fn, *args).result()
+
+    def llm_slot(self):
+        return self._llm_slots if self._llm_slots is not None else nullcontext()
+
+    def shutdown(self):
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=True)
+            self._cpu_pool = None
+        if self.ocr_client is not None:
+            self.ocr_client.close()
+
+
+class PageContextIndex:
+    """
+    跨页上下文索引
+
+    从PDF文本层截取每页开头和结尾的片段，处理某一页时提供前一页结尾和后一页开头，
+    用于保持跨页断句、术语翻译的一致性。扫描件没有文本层时上下文为空。
+    """
+
+    def __init__(self, snippets: Dict[int, Dict[str, str]]):
+        self._snippets = snippets
+
+    @classmethod
+    def build(
+        cls,
+        pdf_path: str,
+        page_numbers: List[int],
+        max_chars: int = 300,
+        session: Optional[PDFDocumentSession] = None
+    ) -> 'PageContextIndex':
+        wanted = set(page_numbers)
+        for page in page_numbers:
+            wanted.update((page - 1, page + 1))
+
+        snippets = {}
+        try:
+            session, owned = open_session(pdf_path, session)
+            try:
+                for page in sorted(wanted):
+                    if 1 <= page <= session.page_count:
+                        text = ' '.join(session.get_text(page, 'text').split())
+                        snippets[page] = {'head': text[:max_chars], 'tail': text[-max_chars:]}
+            finally:
+                if owned:
+                    session.close()
+        except Exception as e:
+            logger.warning(f"构建跨页上下文失败，将不使用上下文: {str(e)}")
+        return cls(snippets)
+
+    def around(self, page_number: int) -> Dict[str, str]:
+        return {
+            'previous_tail': self._snippets.get(page_number - 1, {}).get('tail', ''),
+            'next_head': self._snippets.get(page_number + 1, {}).get('head', ''),
+        }
+
+
+class PagePipeline:
+    """
+    多页并行处理
+
+    页面线程数 = LLM并发数 + CPU进程数，保证OCR/LLM请求占满并发的同时，
+    其他页面的渲染和裁剪可以在进程池中同时进行。
+    启用OCR批量客户端时，页面线程数至少能填满所有在途批次。
+    """
+
+    def __init__(
+        self,
+        processor,
+        cpu_workers: int = 2,
+        llm_concurrency: int = 4,
+        context_chars: int = 300,
+        ocr_client_factory: Optional[Callable[[], Any]] = None,
+        memory_limit_mb: int = 0
+    ):
+        """
+        Args:
+            ocr_client_factory: 创建 OCRBatchClient 的函数，None 表示逐页调用OCR
+            memory_limit_mb: 任务的RSS上限（MB，含CPU进程池），0 表示不限制
+        """
+        self.processor = processor
+        self.cpu_workers = max(0, cpu_workers)
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.context_chars = context_chars
+        self.ocr_client_factory = ocr_client_factory
+        self.memory_limit_mb = max(0, memory_limit_mb)
+
+    def run(
+        self,
+        pdf_path: str,
+        page_numbers: List[int],
+        task_dir: Path,
+        task_id: str,
+        translate_options: Optional[Dict[str, Any]] = None,
+        on_page_done: Optional[Callable[[Dict[str, Any]], None]] = None,
+        fast_path: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        处理多个页面
+
+        Args:
+            on_page_done: 每页完成（成功或失败）后在页面线程中回调
+            fast_path: 文档级快速路径判断（PageRouter.check_document），None 表示不启用
+
+        Returns:
+            按页码顺序排列的页面结果
+        """
+        # 当前进程的共享会话：构建上下文、无进程池时的渲染都复用它
+        session = PDFDocumentSession.for_process(pdf_path)
+        context = PageContextIndex.build(pdf_path, page_numbers, self.context_chars, session=session)
+        ocr_client = self.ocr_client_factory() if self.ocr_client_factory else None
+        runner = PageStageRunner(self.cpu_workers, self.llm_concurrency, ocr_client=ocr_client)
+        budget = MemoryBudget(self.memory_limit_mb)
+        page_threads = self.llm_concurrency + self.cpu_workers
+        if ocr_client is not None:
+            page_threads = max(page_threads, ocr_client.max_batch_images * ocr_client.max_in_flight + self.cpu_workers)
+
+        logger.info(
+            f"页面流水线启动: {len(page_numbers)} 页, "
+            f"页面线程 {page_threads}, CPU进程 {self.cpu_workers}, LLM并发 {self.llm_concurrency}, "
+            f"OCR批量 {'开启' if ocr_client is not None else '关闭'}, "
+            f"内存上限 {f'{self.memory_limit_mb}MB' if budget.enabled else '不限制'}"
+        )
+
+        def run_page(page_number: int) -> Dict[str, Any]:
+            from django.db import connection
+            try:
+                with budget.page_slot():
+                    result = self.processor.process_page_stages(
+                        pdf_path,
+                        page_number,
+                        task_dir,
+                        task_id,
+                        runner=runner,
+                        translate_options=translate_options,
+                        page_context=context.around(page_number),
+                        fast_path=fast_path
+                    )
+                if on_page_done:
+                    on_page_done(result)
+                return result
+            finally:
+                # 线程池中的线程各自持有数据库连接，用完即关
+                connection.close()
+
+        try:
+            with ThreadPoolExecutor(max_workers=page_threads, thread_name_prefix='pdf-page') as pool:
+                futures = [pool.submit(run_page, page) for page in page_numbers]
+                return [future.result() for future in futures]
+        finally:
+            # 进程池关闭时子进程退出，子进程中的会话随之释放
+            runner.shutdown()
+            PDFDocumentSession.close_process_session(pdf_path)
+            cache = get_render_cache()
+            if cache is not None:
+                # 进程池中的命中不计入当前进程的统计
+                logger.info(f"渲染缓存统计（当前进程）: {cache.stats()}")
+            if ocr_client is not None:
+                logger.info(f"OCR批量统计: {ocr_client.stats()}")
+            if budget.enabled:
+                logger.info(f"内存预算统计: {budget.stats()}")
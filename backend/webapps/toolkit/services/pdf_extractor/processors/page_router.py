@@ -0,0 +1,152 @@
+"""
+页面路由: 按页决定走本地快速路径还是视觉模型
+
+原生文本页面（报告、论文正文）的文本层已经是干净有序的文字，渲染后再交给OCR模型识别既慢又贵。
+路由分两级：
+- 文档级：AdvancedPDFComplexityAnalyzer 判断整份文档需要外部处理（加密、大比例扫描页等）时，所有页面走视觉模型
+- 页面级：PageAnalyzer 统计页面元素，ExtractionStrategyDecider 给出策略；
+  只有“直接文本提取 + 置信度足够 + 无图片/表格/CID字体/复杂绘图 + 文本无乱码”的页面走本地转换
+
+本地路径不渲染、不调用OCR，由 TextLayerConverter 直接把文本层转换为Markdown；其余页面照常走视觉模型。
+"""
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, Optional
+
+from .components import ExtractionStrategy, ExtractionStrategyDecider, PageAnalyzer
+from .document_session import PDFDocumentSession
+
+logger = logging.getLogger('django')
+
+ROUTE_LOCAL = 'local'
+ROUTE_VISION = 'vision'
+
+# 文本层中出现这些字符说明字体映射有问题，本地提取会得到乱码
+_GARBLED_CHARS = ('�', '\x00')
+
+
+@dataclass
+class PageRoute:
+    """单页路由决策"""
+    page_number: int
+    route: str
+    reason: str
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def is_local(self) -> bool:
+        return self.route == ROUTE_LOCAL
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class PageRouter:
+    """页面路由器"""
+
+    def __init__(
+        self,
+        min_confidence: float = 0.8,
+        max_drawings: int = 20,
+        max_garbled_ratio: float = 0.01
+    ):
+        """
+        Args:
+            min_confidence: 直接文本提取策略的最低置信度
+            max_drawings: 允许的矢量绘图元素数（分隔线、下划线等），超过视为图表页面
+            max_garbled_ratio: 文本层中乱码字符的最大占比
+        """
+        self.min_confidence = min_confidence
+        self.max_drawings = max_drawings
+        self.max_garbled_ratio = max_garbled_ratio
+        self.analyzer = PageAnalyzer()
+        self.decider = ExtractionStrategyDecider()
+
+    @staticmethod
+    def check_document(pdf_path: str) -> Dict[str, Any]:
+        """
+        文档级判断是否允许本地快速路径
+
+        分析失败（例如PyPDF2无法解析）时不阻止快速路径，仅依赖页面级判断。
+
+        Returns:
+            {'fast_path_allowed': bool, 'reason': str, 'recommendation': str, 'complexity_score': float}
+        """
+        from tools.preprocessors.core.pdf_complexity_analyzer import AdvancedPDFComplexityAnalyzer
+
+        try:
+            analysis = AdvancedPDFComplexityAnalyzer().analyze_pdf_complexity(str(pdf_path))
+        except Exception as e:
+            logger.warning(f"文档复杂度分析失败，仅按页面判断路由: {str(e)}")
+            return {
+                'fast_path_allowed': True,
+                'reason': f"文档复杂度分析失败: {str(e)}",
+                'recommendation': '',
+                'complexity_score': None,
+            }
+
+        allowed = not analysis.is_encrypted and analysis.processing_recommendation != 'external'
+        reason = '；'.join(analysis.reasons) or '文档结构简单'
+        return {
+            'fast_path_allowed': allowed,
+            'reason': reason if allowed else f"文档需要视觉模型处理: {reason}",
+            'recommendation': analysis.processing_recommendation,
+            'complexity_score': round(analysis.complexity_score, 2),
+        }
+
+    def route_page(
+        self,
+        pdf_path: str,
+        page_number: int,
+        session: Optional[PDFDocumentSession] = None
+    ) -> PageRoute:
+        """根据页面元素统计决定单页路由"""
+        result = self.analyzer.analyze_page(pdf_path, page_number, session=session)
+        decision = self.decider.decide_strategy(result)
+
+        garbled = sum(result.raw_text.count(c) for c in _GARBLED_CHARS)
+        garbled_ratio = garbled / len(result.raw_text) if result.raw_text else 0.0
+        metrics = {
+            **decision['metrics'],
+            'strategy': decision['strategy'].value,
+            'confidence': round(decision['confidence'], 2),
+            'curve_count': result.curve_count,
+            'has_cid_fonts': result.has_cid_fonts,
+            'garbled_ratio': round(garbled_ratio, 4),
+        }
+
+        if decision['strategy'] != ExtractionStrategy.DIRECT_TEXT:
+            reason = decision['reason']
+        elif decision['confidence'] < self.min_confidence:
+            reason = f"直接提取置信度不足（{decision['confidence']:.2f}）"
+        elif result.image_count or result.table_count:
+            reason = f"包含图片（{result.image_count}）或表格（{result.table_count}）"
+        elif result.has_cid_fonts:
+            reason = '包含CID字体'
+        elif result.drawing_count > self.max_drawings or result.curve_count > 0:
+            reason = f"包含矢量图形（{result.drawing_count}个绘图元素，{result.curve_count}条曲线）"
+        elif garbled_ratio > self.max_garbled_ratio:
+            reason = f"文本层含乱码字符（占比 {garbled_ratio:.2%}）"
+        else:
+            return PageRoute(page_number, ROUTE_LOCAL, decision['reason'], metrics)
+        return PageRoute(page_number, ROUTE_VISION, reason, metrics)
+
+
+def summarize_routes(routes: Iterable[Dict[str, Any]], document: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    汇总任务的路由决策
+
+    Args:
+        routes: 各页 PageRoute.to_dict()
+        document: check_document() 的结果
+
+    Returns:
+        {'local': 本地页数, 'vision': 视觉模型页数, 'document': ..., 'pages': {页码: {'route', 'reason'}}}
+    """
+    routes = sorted(routes, key=lambda r: r['page_number'])
+    return {
+        ROUTE_LOCAL: sum(1 for r in routes if r['route'] == ROUTE_LOCAL),
+        ROUTE_VISION: sum(1 for r in routes if r['route'] == ROUTE_VISION),
+        'document': document or {},
+        'pages': {str(r['page_number']): {'route': r['route'], 'reason': r['reason']} for r in routes},
+    }
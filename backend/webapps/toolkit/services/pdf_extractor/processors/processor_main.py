@@ -1,21 +1,37 @@
 """
 主处理器: PDF文档完整处理流程
 
-串联所有处理步骤，完成从PDF到Markdown的完整转换
+串联所有处理步骤，完成从PDF到Markdown的完整转换。
+多页文档通过 PagePipeline 并行处理，见 page_pipeline.py
+每页结果写入页面检查点，任务中断后从未完成的页面继续，见 page_checkpoint.py
+简单的原生文本页面走本地快速路径，不调用OCR，见 page_router.py
+处理过程通过任务事件流（Redis Stream）推送页面状态和片段，见 progress_stream.py
 """
 import logging
 import json
 import os
+import threading
+import time
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Dict, Any, List
-import fitz  # PyMuPDF
-from PIL import Image
-import numpy as np
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Union
 
+from .document_session import PDFDocumentSession
 from .step1_text_extractor import TextExtractor
 # from .step2_page_renderer import PageRenderer  # 已废弃，Step1已保存full_page.png
 from .step3_semantic_segmentor import SemanticSegmentor, ImageRegion
 from .step4_markdown_reconstructor import MarkdownReconstructor
+from .page_pipeline import (
+    PagePipeline,
+    PageStageRunner,
+    finalize_page_stage,
+    render_page_stage,
+    route_page_stage,
+)
+from .page_checkpoint import PageCheckpointStore
+from .page_router import ROUTE_LOCAL, ROUTE_VISION, PageRouter, summarize_routes
+from .progress_stream import CoarseProgressWriter, TaskEventStream
+from ..config import PDFExtractorConfig
 
 logger = logging.getLogger('django')
 
@@ -77,6 +93,9 @@ class PDFProcessor:
             model=self.model
         )
 
+        # task.json 会被多个页面线程同时更新
+        self._status_lock = threading.Lock()
+
         logger.info("PDF处理器初始化完成")
 
     def get_pdf_page_count(self, pdf_path: str) -> int:
@@ -89,28 +108,8 @@ class PDFProcessor:
         Returns:
             总页数
         """
-        doc = fitz.open(pdf_path)
-        page_count = doc.page_count
-        doc.close()
-        return page_count
-
-    def _update_task_progress(self, task_id: str, total_pages: int, processed_pages: int):
-        """
-        更新数据库中的任务进度
-
-        Args:
-            task_id: 任务UUID
-            total_pages: 总页数
-            processed_pages: 已处理页数
-        """
-        try:
-            from webapps.toolkit.models import PDFExtractorTask
-            task = PDFExtractorTask.objects.get(id=task_id)
-            task.total_pages = total_pages
-            task.processed_pages = processed_pages
-            task.save(update_fields=['total_pages', 'processed_pages', 'updated_at'])
-        except Exception as e:
-            logger.warning(f"更新任务进度失败: {task_id}, 错误: {str(e)}")
+        with PDFDocumentSession(pdf_path) as session:
+            return session.page_count
 
     def process_single_page(
         self,
@@ -121,108 +120,173 @@ class PDFProcessor:
         previous_page_content: str = None
     ) -> Dict[str, Any]:
         """
-        处理单个PDF页面（4个步骤）
+        处理单个PDF页面（4个步骤，在当前线程内顺序执行）
 
         Args:
             pdf_path: PDF文件路径
             page_number: 页码（从1开始）
             task_dir: 任务根目录
             task_id: 任务UUID（用于生成完整media路径）
-            previous_page_content: 前一页的格式化内容（可选，用于上下文参考）
+            previous_page_content: 已废弃，跨页上下文改由 PageContextIndex 提供
 
         Returns:
             页面处理结果
         """
+        from .page_pipeline import PageContextIndex
+
+        session = PDFDocumentSession.for_process(pdf_path)
+        try:
+            return self.process_page_stages(
+                pdf_path,
+                page_number,
+                task_dir,
+                task_id,
+                runner=PageStageRunner(),
+                translate_options=self._get_translate_options(task_id),
+                page_context=PageContextIndex.build(pdf_path, [page_number], session=session).around(page_number)
+            )
+        finally:
+            PDFDocumentSession.close_process_session(pdf_path)
+
+    def process_page_stages(
+        self,
+        pdf_path: str,
+        page_number: int,
+        task_dir: Path,
+        task_id: str = None,
+        runner: PageStageRunner = None,
+        translate_options: Optional[Dict[str, Any]] = None,
+        page_context: Optional[Dict[str, str]] = None,
+        fast_path: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        按阶段处理单个页面
+
+        CPU阶段（路由、渲染、裁剪与重构）通过 runner.cpu() 执行，
+        OCR和翻译在 runner.llm_slot() 内执行以限制并发。
+        路由判定为简单文本页时跳过渲染、OCR和裁剪，直接使用文本层转换结果。
+
+        Args:
+            runner: 阶段执行器，None 时全部在当前线程执行
+            translate_options: {'target_language': ...}，None 表示不翻译
+            page_context: 相邻页的首尾片段，用于翻译时保持跨页连贯
+            fast_path: 文档级快速路径判断（PageRouter.check_document），None 表示不启用
+
+        Returns:
+            页面处理结果
+        """
+        runner = runner or PageStageRunner()
+        checkpoint = PageCheckpointStore(task_id) if task_id else None
+        events = TaskEventStream(task_id) if task_id else None
+        # 各阶段耗时（秒）
+        timings = {}
+        started_at = time.monotonic()
         try:
             logger.info(f"开始处理第 {page_number} 页")
 
             # 标记为processing状态
             self.update_page_status(task_dir, page_number, 'processing')
+            if checkpoint:
+                checkpoint.mark_processing(page_number)
+            if events:
+                events.publish('page_started', page=page_number)
 
             # 创建页面目录
             page_dir = task_dir / f"page_{page_number}"
             page_dir.mkdir(parents=True, exist_ok=True)
 
-            # ==================== 步骤1: OCR提取文本并生成截图 ====================
-            logger.info(f"[步骤1/4] OCR提取文本（DPI 144）并保存页面截图...")
-            result = self.text_extractor.extract_page(
-                pdf_path=pdf_path,
-                page_number=page_number,
-                output_dir=page_dir,
-                save_debug=True  # 保存调试信息和full_page.png
-            )
-
-            if not result['success']:
-                raise RuntimeError(f"页面 {page_number} OCR识别失败: {result.get('error')}")
+            # ==================== 页面路由（CPU） ====================
+            stage_start = time.monotonic()
+            if fast_path and fast_path.get('fast_path_allowed'):
+                routed = runner.cpu(
+                    route_page_stage,
+                    str(pdf_path),
+                    page_number,
+                    str(page_dir),
+                    PDFExtractorConfig.FAST_PATH_MIN_CONFIDENCE,
+                    PDFExtractorConfig.FAST_PATH_MAX_DRAWINGS
+                )
+                route = routed['route']
+            else:
+                routed = {'markdown': None}
+                route = {
+                    'page_number': page_number,
+                    'route': ROUTE_VISION,
+                    'reason': fast_path['reason'] if fast_path else '未启用快速路径',
+                }
+            timings['route'] = time.monotonic() - stage_start
+            logger.info(f"[路由] 第 {page_number} 页 → {route['route']}: {route['reason']}")
 
-            page_text = result['markdown_cleaned']  # 使用清理后的Markdown文本
+            rendered = None
             text_path = page_dir / f"page_{page_number}_step1_final.md"
+            if route['route'] == ROUTE_LOCAL:
+                # 文本层本地转换，已写入 step1_final.md
+                page_text = routed['markdown']
+            else:
+                # ==================== 步骤1: 渲染页面截图（CPU） ====================
+                logger.info(f"[步骤1/4] 渲染页面（DPI {self.dpi}）并保存截图...")
+                stage_start = time.monotonic()
+                rendered = runner.cpu(render_page_stage, str(pdf_path), page_number, self.dpi, str(page_dir))
+                timings['render'] = time.monotonic() - stage_start
+
+                # ==================== 步骤1: OCR提取文本 ====================
+                logger.info(f"[步骤1/4] OCR提取文本...")
+                stage_start = time.monotonic()
+                # 批量客户端自行限制在途批次，不占用 llm_slot
+                with runner.llm_slot() if runner.ocr_client is None else nullcontext():
+                    # 截图在取得OCR并发名额后才读入内存，请求结束即释放
+                    result = self.text_extractor.recognize_page(
+                        Path(rendered['image_path']).read_bytes(),
+                        rendered['image_size'],
+                        page_number,
+                        output_dir=page_dir,
+                        save_debug=True,  # 保存调试信息
+                        save_image=False,  # full_page.png 已在渲染阶段保存
+                        ocr_client=runner.ocr_client
+                    )
+
+                timings['ocr'] = time.monotonic() - stage_start
+                if not result['success']:
+                    raise RuntimeError(f"页面 {page_number} OCR识别失败: {result.get('error')}")
+
+                page_text = result['markdown_cleaned']  # 使用清理后的Markdown文本
 
             # ==================== 翻译step1的结果（如果需要） ====================
-            # 从数据库获取任务翻译配置
-            from webapps.toolkit.models import PDFExtractorTask
-            task = PDFExtractorTask.objects.get(id=task_id)
-
-            if task.translate:
-                logger.info(f"[翻译] 翻译第 {page_number} 页的step1结果，目标语言: {task.target_language}")
-                page_text = self._translate_page_content(
-                    page_text,
-                    task.target_language,
-                    page_number
-                )
+            if translate_options:
+                target_language = translate_options['target_language']
+                logger.info(f"[翻译] 翻译第 {page_number} 页的step1结果，目标语言: {target_language}")
+                stage_start = time.monotonic()
+                with runner.llm_slot():
+                    page_text = self._translate_page_content(
+                        page_text,
+                        target_language,
+                        page_number,
+                        page_context=page_context
+                    )
                 # 保存翻译后的内容覆盖原文件
                 with open(text_path, 'w', encoding='utf-8') as f:
                     f.write(page_text)
+                timings['translate'] = time.monotonic() - stage_start
                 logger.info(f"[翻译] 第 {page_number} 页翻译完成")
 
-            # ==================== 步骤2: 读取截图（跳过重新渲染） ====================
-            logger.info(f"[步骤2/4] 读取Step1生成的页面截图...")
-            image_path = page_dir / "full_page.png"
-
-            if not image_path.exists():
-                raise FileNotFoundError(f"页面截图不存在: {image_path}")
-
-            # 读取图片为numpy数组（供Step3使用）
-            full_page_image = np.array(Image.open(image_path))
-            logger.info(f"页面截图已读取 - 尺寸: {full_page_image.shape}")
-
-            # ==================== 步骤3: 语义分割 ====================
-            logger.info(f"[步骤3/4] 语义分割...")
-            regions, region_paths = self.segmentor.segment_and_save(
-                full_page_image,
-                page_dir,
-                page_number
-            )
-
-            # 读取分割图片（过滤掉visualization.png和metadata.json）
-            region_images = []
-            for region_path in region_paths:
-                # 只读取image_*.png文件
-                if region_path.name.startswith('image_') and region_path.suffix == '.png':
-                    region_img = Image.open(region_path)
-                    region_images.append(np.array(region_img))
-
-            # 提取region bbox坐标列表
-            region_bboxes = [region.bbox for region in regions]
-
-            # ==================== 步骤4: Markdown重构 ====================
-            logger.info(f"[步骤4/4] Markdown重构...")
-
-            # 所有页面都统一经过Step4处理，无论是否有图片
-            # 根据配置决定是否启用空间优化（传递bbox坐标）
-            bbox_param = region_bboxes if self.USE_SPATIAL_OPTIMIZATION else None
-            reconstructed_md, final_md_path = self.reconstructor.reconstruct_and_save(
-                page_text,
-                full_page_image,
-                region_images,  # 可能为空列表（无图片页面）
-                page_number,
-                page_dir,
-                task_id,
-                bbox_param
-            )
+            stage_start = time.monotonic()
+            if rendered is None:
+                # 本地路径没有图片区域，文本即最终结果
+                final_md_path = page_dir / f"page_{page_number}_final.md"
+                final_md_path.write_text(page_text, encoding='utf-8')
+                finalized = {'regions': [], 'region_paths': [], 'final_markdown_path': str(final_md_path)}
+            else:
+                # ==================== 步骤2-4: 读取截图、裁剪区域、Markdown重构（CPU） ====================
+                logger.info(f"[步骤2-4/4] 语义分割与Markdown重构...")
+                finalized = runner.cpu(
+                    finalize_page_stage, str(page_dir), page_number, task_id, rendered.get('page_key')
+                )
 
-            if not region_images:
-                logger.info(f"第 {page_number} 页无图片区域，直接使用OCR文本")
+                if not finalized['regions']:
+                    logger.info(f"第 {page_number} 页无图片区域，直接使用OCR文本")
+            timings['finalize'] = time.monotonic() - stage_start
+            timings['total'] = time.monotonic() - started_at
+            timings = {stage: round(seconds, 3) for stage, seconds in timings.items()}
 
             logger.info(f"第 {page_number} 页处理完成")
 
@@ -230,16 +294,33 @@ class PDFProcessor:
                 'page': page_number,
                 'status': 'completed',
                 'text_length': len(page_text),
-                'regions_count': len(regions),
+                'regions_count': len(finalized['regions']),
                 'text_file': str(text_path.relative_to(task_dir)),
-                'full_image': str(image_path.relative_to(task_dir)),
-                'region_files': [str(p.relative_to(task_dir)) for p in region_paths],
-                'final_markdown': str(final_md_path.relative_to(task_dir)),
-                'regions': [r.to_dict() for r in regions]
+                'full_image': str((page_dir / "full_page.png").relative_to(task_dir)) if rendered else None,
+                'region_files': [str(Path(p).relative_to(task_dir)) for p in finalized['region_paths']],
+                'final_markdown': str(Path(finalized['final_markdown_path']).relative_to(task_dir)),
+                'regions': finalized['regions'],
+                'route': route['route'],
+                'route_reason': route['reason'],
+                'timings': timings
             }
 
+            # 页面结果落库后才算完成，任务中断时不会再重复处理这一页
+            final_markdown = Path(finalized['final_markdown_path']).read_text(encoding='utf-8')
+            if checkpoint:
+                checkpoint.save_completed(page_number, final_markdown, page_result)
+
             # 更新task.json中该页面的状态
             self.update_page_status(task_dir, page_number, 'completed', page_result)
+            if events:
+                # 客户端可以在整份文档完成前先阅读已完成的页面
+                events.publish(
+                    'page_finished',
+                    page=page_number,
+                    route=route['route'],
+                    timings=timings,
+                    markdown=final_markdown
+                )
 
             return page_result
 
@@ -254,9 +335,35 @@ class PDFProcessor:
 
             # 更新task.json中该页面的错误状态
             self.update_page_status(task_dir, page_number, 'error', error_result)
+            if events:
+                events.publish('page_failed', page=page_number, error=str(e))
+            if checkpoint:
+                try:
+                    checkpoint.save_error(page_number, str(e))
+                except Exception as db_error:
+                    logger.warning(f"保存第 {page_number} 页错误状态失败: {str(db_error)}")
 
             return error_result
 
+    def _create_ocr_batch_client(self):
+        """按当前OCR参数创建批量客户端（直接调用OCR模型的批量接口）"""
+        from webapps.toolkit.services.ocr_model import OCRBatchClient
+        return OCRBatchClient(
+            mode=self.text_extractor.ocr_mode,
+            max_tokens=self.text_extractor.ocr_max_tokens,
+            temperature=self.text_extractor.ocr_temperature
+        )
+
+    def _get_translate_options(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务的翻译配置，不需要翻译时返回 None"""
+        if not task_id:
+            return None
+        from webapps.toolkit.models import PDFExtractorTask
+        task = PDFExtractorTask.objects.get(id=task_id)
+        if not task.translate:
+            return None
+        return {'target_language': task.target_language}
+
     def _normalize_heading_levels(self, markdown_text: str) -> str:
         """
         规范化Markdown标题层级，确保全文档一致性
@@ -306,17 +413,22 @@ class PDFProcessor:
         page_count: int,
         task_id: str,
         start_page: int = 1,
-        end_page: int = None
+        end_page: int = None,
+        fragments: Optional[Union[Dict[int, Optional[str]], Iterable[Tuple[int, Optional[str]]]]] = None
     ) -> Path:
         """
         合并所有页面的markdown文档，并确保标题层级一致性
 
+        各页内容逐页写入结果文件，不在内存中拼接整份文档。
+
         Args:
             task_dir: 任务目录
             page_count: 总页数
             task_id: 任务UUID
             start_page: 起始页码
             end_page: 结束页码
+            fragments: 页面检查点中的markdown片段，{页码: 片段} 或按页码顺序的 (页码, 片段)
+                （PageCheckpointStore.iter_fragments）；为 None 时读取各页的 page_{n}_final.md
 
         Returns:
             最终markdown文件路径
@@ -327,32 +439,29 @@ class PDFProcessor:
 
             logger.info(f"合并页码范围 {start_page}-{end_page} 的markdown...")
 
-            merged_content = []
-
-            for page_num in range(start_page, end_page + 1):
-                # 统一读取page_{num}_final.md（所有页面都由Step4生成）
-                final_md_path = task_dir / f"page_{page_num}" / f"page_{page_num}_final.md"
-
-                if final_md_path.exists():
-                    with open(final_md_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
+            if fragments is None:
+                pages = ((page_num, self._read_page_markdown(task_dir, page_num))
+                         for page_num in range(start_page, end_page + 1))
+            elif isinstance(fragments, dict):
+                pages = ((page_num, fragments.get(page_num)) for page_num in range(start_page, end_page + 1))
+            else:
+                pages = fragments
 
-                    # 规范化标题层级
-                    content = self._normalize_heading_levels(content)
+            # 保存最终文档
+            final_path = task_dir / f"{task_id}_result.md"
+            with open(final_path, 'w', encoding='utf-8') as f:
+                for page_num, content in pages:
+                    if content is None:
+                        logger.warning(f"第 {page_num} 页未完成或markdown不存在，合并时跳过")
+                        continue
 
                     # 直接添加内容，不添加页面分隔符
                     # 如果需要页面间的间隔，只添加适当的空行
                     if page_num > 1:
-                        merged_content.append("\n\n")
-
-                    merged_content.append(content)
-                else:
-                    logger.warning(f"第 {page_num} 页markdown不存在: {final_md_path}，跳过")
+                        f.write("\n\n")
 
-            # 保存最终文档
-            final_path = task_dir / f"{task_id}_result.md"
-            with open(final_path, 'w', encoding='utf-8') as f:
-                f.write(''.join(merged_content))
+                    # 规范化标题层级
+                    f.write(self._normalize_heading_levels(content))
 
             logger.info(f"Markdown合并完成（已规范化标题层级）: {final_path}")
 
@@ -362,11 +471,20 @@ class PDFProcessor:
             logger.error(f"合并markdown失败: {str(e)}", exc_info=True)
             raise
 
+    def _read_page_markdown(self, task_dir: Path, page_num: int) -> Optional[str]:
+        """读取 page_{num}_final.md（所有页面都由Step4生成），不存在时返回 None"""
+        final_md_path = task_dir / f"page_{page_num}" / f"page_{page_num}_final.md"
+        if not final_md_path.exists():
+            return None
+        with open(final_md_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
     def _translate_page_content(
         self,
         content: str,
         target_language: str,
-        page_number: int
+        page_number: int,
+        page_context: Optional[Dict[str, str]] = None
     ) -> str:
         """
         使用qwen3-max模型翻译单页的markdown内容
@@ -375,6 +493,7 @@ class PDFProcessor:
             content: markdown内容字符串
             target_language: 目标语言（'zh'或'en'）
             page_number: 页码（用于日志）
+            page_context: 相邻页的首尾片段（可选），仅作参考，不翻译
 
         Returns:
             翻译后的markdown内容字符串
@@ -403,6 +522,15 @@ class PDFProcessor:
 
             user_prompt = f"请将以下Markdown文档翻译成{target_lang_name}：\n\n{content}"
 
+            # 相邻页片段只用于衔接跨页断开的句子和统一术语，不出现在译文中
+            if page_context and (page_context.get('previous_tail') or page_context.get('next_head')):
+                context_lines = ["以下是相邻页面的原文片段，仅供参考，不要翻译或输出："]
+                if page_context.get('previous_tail'):
+                    context_lines.append(f"【上一页结尾】{page_context['previous_tail']}")
+                if page_context.get('next_head'):
+                    context_lines.append(f"【下一页开头】{page_context['next_head']}")
+                user_prompt = "\n".join(context_lines) + "\n\n" + user_prompt
+
             # 调用qwen3-max模型进行翻译
             from llm.core_service import CoreLLMService
             from llm.config_manager import ModelConfigManager
@@ -443,7 +571,9 @@ class PDFProcessor:
     def init_task_json(
         self,
         task_dir: Path,
-        total_pages: int
+        total_pages: int,
+        start_page: int = 1,
+        completed_pages: Optional[Dict[int, Dict[str, Any]]] = None
     ) -> None:
         """
         初始化task.json，创建pending状态
@@ -451,21 +581,25 @@ class PDFProcessor:
         Args:
             task_dir: 任务目录
             total_pages: 总页数
+            start_page: 起始页码（指定页码范围时页码不从1开始）
+            completed_pages: 检查点中已完成页面的结果 {页码: 页面结果}，断点续跑时保留
         """
         try:
-            # 初始化所有页面为pending状态
+            completed_pages = completed_pages or {}
+
+            # 已完成的页面沿用检查点结果，其余页面为pending状态
             pages = [
-                {
+                {**completed_pages[i], 'page': i, 'status': 'completed'} if i in completed_pages else {
                     'page': i,
                     'status': 'pending'
                 }
-                for i in range(1, total_pages + 1)
+                for i in range(start_page, start_page + total_pages)
             ]
 
             task_data = {
-                'status': 'pending',
+                'status': 'processing' if completed_pages else 'pending',
                 'total_pages': total_pages,
-                'processed_pages': 0,
+                'processed_pages': len(completed_pages),
                 'pages': pages
             }
 
@@ -495,6 +629,16 @@ class PDFProcessor:
             status: 状态（processing/completed/error）
             page_data: 页面处理结果数据（可选）
         """
+        with self._status_lock:
+            self._update_page_status_locked(task_dir, page_number, status, page_data)
+
+    def _update_page_status_locked(
+        self,
+        task_dir: Path,
+        page_number: int,
+        status: str,
+        page_data: Dict[str, Any] = None
+    ) -> None:
         try:
             task_json_path = task_dir / 'task.json'
 
@@ -536,19 +680,36 @@ class PDFProcessor:
         except Exception as e:
             logger.error(f"更新页面状态失败: {str(e)}", exc_info=True)
 
+    def save_routing_report(self, task_dir: Path, routing: Dict[str, Any]) -> None:
+        """将页面路由报告写入task.json"""
+        with self._status_lock:
+            try:
+                task_json_path = task_dir / 'task.json'
+                with open(task_json_path, 'r', encoding='utf-8') as f:
+                    task_data = json.load(f)
+                task_data['routing'] = routing
+                with open(task_json_path, 'w', encoding='utf-8') as f:
+                    json.dump(task_data, f, ensure_ascii=False, indent=2)
+            except Exception as e:
+                logger.error(f"保存路由报告失败: {str(e)}", exc_info=True)
+
     def process_pdf_document(
         self,
         pdf_path: str,
         task_id: str,
-        task_dir: Path
+        task_dir: Path,
+        pages: Optional[List[int]] = None
     ) -> Dict[str, Any]:
         """
         处理完整PDF文档
 
+        已有页面检查点时只处理未完成的页面（断点续跑）。
+
         Args:
             pdf_path: PDF文件路径
             task_id: 任务UUID
             task_dir: 任务目录
+            pages: 指定重新处理的页码；为 None 时处理所有未完成的页面
 
         Returns:
             处理结果
@@ -591,52 +752,106 @@ class PDFProcessor:
                 start_page = end_page
 
             actual_page_count = end_page - start_page + 1
+            page_range = list(range(start_page, end_page + 1))
             logger.info(f"处理页码范围: {start_page}-{end_page}，共 {actual_page_count} 页")
 
-            # 初始化进度：总页数已知，已处理0页
-            self._update_task_progress(task_id, total_pages=actual_page_count, processed_pages=0)
+            # 页面检查点：指定页码时只重新处理这些页，否则跳过已完成的页面
+            checkpoint = PageCheckpointStore(task_id)
+            checkpoint.prepare(page_range)
+            if pages:
+                pages_to_process = sorted(set(pages) & set(page_range))
+                ignored = sorted(set(pages) - set(page_range))
+                if ignored:
+                    logger.warning(f"页码 {ignored} 不在处理范围 {start_page}-{end_page} 内，已忽略")
+                checkpoint.reset(pages_to_process)
+            else:
+                pages_to_process = checkpoint.incomplete_pages(page_range)
+            completed_pages = checkpoint.completed_results(page_range)
+            if completed_pages:
+                logger.info(f"检查点中已有 {len(completed_pages)} 页完成，本次处理 {len(pages_to_process)} 页")
+
+            # 初始化进度：总页数已知，已处理页数来自检查点
+            # 处理过程中数据库只按时间间隔写入粗粒度进度，逐页状态走事件流
+            progress_writer = CoarseProgressWriter(
+                task_id, actual_page_count, interval=PDFExtractorConfig.PROGRESS_DB_INTERVAL_SECONDS
+            )
+            progress_writer.update(len(completed_pages), force=True)
+            events = TaskEventStream(task_id, total_pages=actual_page_count)
+            events.publish(
+                'task_started',
+                total_pages=actual_page_count,
+                start_page=start_page,
+                end_page=end_page,
+                completed_pages=sorted(completed_pages),
+                pages_to_process=pages_to_process
+            )
 
-            # 初始化task.json，所有页面状态为pending
-            self.init_task_json(task_dir, actual_page_count)
+            # 初始化task.json，未完成的页面状态为pending
+            self.init_task_json(task_dir, actual_page_count, start_page, completed_pages=completed_pages)
+
+            # 多页并行处理：跨页上下文来自相邻页文本层片段，页面之间不再串行依赖
+            progress_lock = threading.Lock()
+            completed = {'count': len(completed_pages)}
+
+            def on_page_done(page_result: Dict[str, Any]) -> None:
+                if page_result.get('status') != 'completed':
+                    return
+                with progress_lock:
+                    completed['count'] += 1
+                    processed_count = completed['count']
+                events.publish('progress', processed_pages=processed_count, total_pages=actual_page_count)
+                progress_writer.update(processed_count)
+                logger.info(f"进度更新: {processed_count}/{actual_page_count} 页已完成")
 
-            # 处理每一页，传递前页内容作为上下文，实现跨页格式一致性
-            page_results = []
-            previous_page_content = None  # 用于存储前一页的格式化内容
+            pipeline = PagePipeline(
+                self,
+                cpu_workers=PDFExtractorConfig.CPU_WORKERS,
+                llm_concurrency=PDFExtractorConfig.LLM_CONCURRENCY,
+                context_chars=PDFExtractorConfig.PAGE_CONTEXT_CHARS,
+                ocr_client_factory=self._create_ocr_batch_client if PDFExtractorConfig.OCR_BATCH_ENABLED else None,
+                memory_limit_mb=PDFExtractorConfig.MEMORY_LIMIT_MB
+            )
+            # 文档级快速路径判断：整份文档需要视觉模型时所有页面跳过本地路由
+            fast_path = None
+            if PDFExtractorConfig.FAST_PATH_ENABLED and pages_to_process:
+                fast_path = PageRouter.check_document(pdf_path)
+                logger.info(f"快速路径文档级判断: {fast_path}")
 
-            for page_num in range(start_page, end_page + 1):
-                page_result = self.process_single_page(
+            page_results = []
+            if pages_to_process:
+                page_results = pipeline.run(
                     pdf_path,
-                    page_num,
+                    pages_to_process,
                     task_dir,
                     task_id,
-                    previous_page_content=previous_page_content  # 传入前页内容
+                    translate_options=self._get_translate_options(task_id),
+                    on_page_done=on_page_done,
+                    fast_path=fast_path
                 )
-                page_results.append(page_result)
-
-                # 如果处理成功，读取当前页的格式化内容作为下一页的参考
-                if page_result.get('status') == 'completed':
-                    try:
-                        final_md_path = task_dir / page_result.get('final_markdown', '')
-                        if final_md_path.exists():
-                            with open(final_md_path, 'r', encoding='utf-8') as f:
-                                previous_page_content = f.read()
-                                logger.debug(f"已缓存第 {page_num} 页内容作为下一页的格式参考")
-                    except Exception as e:
-                        logger.warning(f"读取第 {page_num} 页内容失败，下一页将无上下文参考: {str(e)}")
-                        previous_page_content = None
-
-                # 实时更新数据库进度
-                processed_count = sum(1 for r in page_results if r.get('status') == 'completed')
-                self._update_task_progress(task_id, total_pages=actual_page_count, processed_pages=processed_count)
-                logger.info(f"进度更新: {processed_count}/{actual_page_count} 页已完成")
 
-            # 合并所有页面（已经是翻译后的内容）
+            # 路由报告：本次处理的页面 + 检查点中已完成的页面
+            routing = summarize_routes(
+                [
+                    {'page_number': r['page'], 'route': r['route'], 'reason': r.get('route_reason', '')}
+                    for r in [*completed_pages.values(), *page_results]
+                    if r.get('status') == 'completed' and r.get('route')
+                ],
+                document=fast_path
+            )
+            self.save_routing_report(task_dir, routing)
+            progress_writer.flush()
+            logger.info(
+                f"页面路由统计: 本地 {routing[ROUTE_LOCAL]} 页, 视觉模型 {routing[ROUTE_VISION]} 页"
+            )
+
+            # 由检查点中的页面片段按块合并（已经是翻译后的内容）
             final_md_path = self.merge_page_markdowns(
                 task_dir,
                 actual_page_count,
                 task_id,
                 start_page,
-                end_page
+                end_page,
+                fragments=checkpoint.iter_fragments(start_page, end_page)
             )
 
             # 最终结果
@@ -644,10 +859,10 @@ class PDFProcessor:
                 'status': 'success',
                 'task_id': task_id,
                 'total_pages': actual_page_count,
-                'processed_pages': sum(
-                    1 for r in page_results if r.get('status') == 'completed'
-                ),
+                'processed_pages': checkpoint.completed_count(start_page, end_page),
+                'failed_pages': [r['page'] for r in page_results if r.get('status') != 'completed'],
                 'final_markdown': str(final_md_path),
+                'routing': routing,
                 'page_results': page_results
             }
 
@@ -0,0 +1,184 @@
+"""
+任务事件流
+
+每个提取任务对应一个 Redis Stream，处理过程中追加事件：
+- task_started / task_finished：任务开始与结束
+- page_started / page_finished / page_failed：页面状态，page_finished 携带该页的 markdown 片段和各阶段耗时
+- progress：已完成页数
+
+SSE 接口（views.stream_task_events）按事件ID增量读取，客户端断线后可从 Last-Event-ID 继续。
+事件流写入失败不影响处理流程；Redis 不可用时页面结果仍写入检查点和 task.json。
+
+数据库中的任务行只在任务结束时更新状态，处理过程中由 CoarseProgressWriter 按时间间隔写入粗粒度进度。
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('django')
+
+TERMINAL_EVENT = 'task_finished'
+
+
+def _get_redis_client():
+    """优先复用 django-redis 的连接池，未安装时按缓存地址直接连接"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+    except ImportError:
+        import redis
+        from django.conf import settings
+        cache_location = settings.CACHES['default'].get('LOCATION', 'redis://localhost:6379/1')
+        return redis.from_url(cache_location)
+
+
+class TaskEventStream:
+    """单个任务的事件流（Redis Stream）"""
+
+    STREAM_PREFIX = "pdf_extractor:events"
+    # 每页的事件数（page_started、page_finished/page_failed、progress），外加任务级事件的余量
+    EVENTS_PER_PAGE = 3
+    EXTRA_EVENTS = 100
+    # 按页数裁剪时保留的事件数下限
+    MAX_LEN = 5000
+    # 任务结束后事件流保留时间，供晚到的客户端读取
+    TTL_SECONDS = 24 * 3600
+
+    def __init__(self, task_id: str, client=None, total_pages: Optional[int] = None):
+        """
+        Args:
+            total_pages: 任务总页数，用于计算裁剪上限；None 表示不裁剪
+                （事件数本身受页数限制，事件流按 TTL 过期）。
+                裁剪上限必须覆盖整个任务的事件，否则大文档前面页面的片段会在客户端读取前被裁掉。
+        """
+        self.task_id = str(task_id)
+        self.key = f"{self.STREAM_PREFIX}:{self.task_id}"
+        self._client = client
+        self.max_len = self.max_len_for(total_pages) if total_pages else None
+
+    @classmethod
+    def max_len_for(cls, total_pages: int) -> int:
+        """按总页数计算事件流裁剪上限"""
+        return max(cls.MAX_LEN, total_pages * cls.EVENTS_PER_PAGE + cls.EXTRA_EVENTS)
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _get_redis_client()
+        return self._client
+
+    def publish(self, event_type: str, **fields: Any) -> Optional[str]:
+        """
+        追加事件
+
+        Returns:
+            事件ID，写入失败时为 None
+        """
+        payload = {'type': event_type, 'task_id': self.task_id, 'timestamp': time.time(), **fields}
+        try:
+            pipe = self.client.pipeline()
+            pipe.xadd(
+                self.key,
+                {'data': json.dumps(payload, ensure_ascii=False)},
+                maxlen=self.max_len,
+                approximate=True
+            )
+            pipe.expire(self.key, self.TTL_SECONDS)
+            event_id = pipe.execute()[0]
+            return event_id.decode() if isinstance(event_id, bytes) else event_id
+        except Exception as e:
+            logger.warning(f"写入任务事件失败 {self.task_id} ({event_type}): {str(e)}")
+            return None
+
+    def read(
+        self,
+        last_id: str = '0-0',
+        block_ms: Optional[int] = None,
+        count: int = 100
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        读取 last_id 之后的事件
+
+        Args:
+            last_id: 上次读到的事件ID，'0-0' 表示从头读取
+            block_ms: 没有新事件时最多阻塞的毫秒数，None 表示不阻塞
+
+        Returns:
+            [(事件ID, 事件), ...]
+        """
+        response = self.client.xread({self.key: last_id}, count=count, block=block_ms)
+        events = []
+        for _, entries in response or []:
+            for event_id, fields in entries:
+                event_id = event_id.decode() if isinstance(event_id, bytes) else event_id
+                data = fields.get(b'data', fields.get('data'))
+                try:
+                    events.append((event_id, json.loads(data)))
+                except (TypeError, ValueError):
+                    logger.warning(f"任务事件格式错误 {self.task_id}: {event_id}")
+        return events
+
+    def reset(self) -> None:
+        """任务重新排队前清空上一次执行的事件，避免客户端读到旧的结束事件"""
+        try:
+            self.client.delete(self.key)
+        except Exception as e:
+            logger.warning(f"清空任务事件失败 {self.task_id}: {str(e)}")
+
+
+def format_sse(event_id: str, event: Dict[str, Any]) -> str:
+    """格式化为一条 SSE 消息"""
+    data = json.dumps(event, ensure_ascii=False)
+    return f"id: {event_id}\nevent: {event.get('type', 'message')}\ndata: {data}\n\n"
+
+
+class CoarseProgressWriter:
+    """
+    粗粒度进度写入
+
+    页面完成时不再每页更新数据库，距上次写入超过 interval 秒才写一次；
+    flush() 在任务结束前写入最终进度。
+    """
+
+    def __init__(self, task_id: str, total_pages: int, interval: float = 10.0):
+        self.task_id = task_id
+        self.total_pages = total_pages
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._processed = 0
+        self._written = None
+        self._last_write = 0.0
+        self.writes = 0
+
+    def update(self, processed_pages: int, force: bool = False) -> bool:
+        """记录最新进度，需要时写入数据库，返回本次是否写入"""
+        with self._lock:
+            self._processed = max(self._processed, processed_pages)
+            now = time.monotonic()
+            if not force and now - self._last_write < self.interval:
+                return False
+            if self._processed == self._written:
+                return False
+            processed = self._processed
+            self._written = processed
+            self._last_write = now
+            self.writes += 1
+        self._write(processed)
+        return True
+
+    def flush(self) -> bool:
+        return self.update(self._processed, force=True)
+
+    def _write(self, processed_pages: int) -> None:
+        try:
+            from django.utils import timezone
+            from webapps.toolkit.models import PDFExtractorTask
+            PDFExtractorTask.objects.filter(id=self.task_id).update(
+                total_pages=self.total_pages,
+                processed_pages=processed_pages,
+                updated_at=timezone.now()
+            )
+        except Exception as e:
+            logger.warning(f"更新任务进度失败: {self.task_id}, 错误: {str(e)}")
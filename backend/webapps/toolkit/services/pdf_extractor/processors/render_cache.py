@@ -0,0 +1,211 @@
+"""
+渲染/裁剪缓存
+
+同一份PDF重新处理、任务重试或被其他用户再次上传时，页面渲染、区域裁剪和图片编码的结果完全相同。
+缓存以内容寻址，键由 (PDF内容哈希, 页码, DPI, 区域坐标, 产物类型) 计算，
+产物保存在本地磁盘，总大小超过上限时按最近访问时间淘汰（LRU）。
+
+- 写入先落临时文件再 os.replace，多进程并发写同一个键也不会读到半个文件
+- 命中时更新文件 mtime 作为访问时间（不依赖 atime，noatime 挂载下同样有效）
+- 各进程只统计自己写入的字节数，超过上限或距上次扫描超过一定时间时重新扫描目录
+"""
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence
+
+logger = logging.getLogger('django')
+
+# 淘汰后保留的比例，避免每次写入都触发淘汰
+_EVICT_TARGET_RATIO = 0.9
+# 多进程写入时，本进程的大小估算可能偏小，定期重新扫描目录
+_RESCAN_INTERVAL_SECONDS = 60
+
+
+def page_cache_key(pdf_hash: str, page_number: int, dpi: int) -> str:
+    """页面级缓存键：同一PDF、同一页、同一DPI渲染出的截图完全相同"""
+    return f"{pdf_hash}:p{page_number}:d{dpi}"
+
+
+def png_size(data: bytes) -> list:
+    """从PNG文件头（IHDR）读取 [宽, 高]，无需解码整张图片"""
+    width, height = struct.unpack('>II', data[16:24])
+    return [width, height]
+
+
+class RenderCache:
+    """磁盘上的内容寻址缓存，按总大小做LRU淘汰"""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self._last_scan = 0.0
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'bytes_written': 0, 'evictions': 0}
+
+    # ==================== 读写 ====================
+
+    def get(self, page_key: str, bbox: Optional[Sequence[int]] = None, variant: str = 'png') -> Optional[bytes]:
+        path = self._path(page_key, bbox, variant)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except OSError as e:
+            logger.warning(f"读取渲染缓存失败 {path.name}: {str(e)}")
+            self._count('misses')
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            # 文件可能刚被其他进程淘汰，不影响本次读取
+            pass
+        self._count('hits')
+        return data
+
+    def put(self, page_key: str, data: bytes, bbox: Optional[Sequence[int]] = None, variant: str = 'png') -> None:
+        path = self._path(page_key, bbox, variant)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+        except OSError as e:
+            # 缓存写入失败不影响处理流程
+            logger.warning(f"写入渲染缓存失败 {path.name}: {str(e)}")
+            return
+
+        with self._lock:
+            self._stats['writes'] += 1
+            self._stats['bytes_written'] += len(data)
+            if self._total_bytes is not None:
+                self._total_bytes += len(data)
+            need_scan = (
+                self._total_bytes is None
+                or self._total_bytes > self.max_bytes
+                or time.monotonic() - self._last_scan > _RESCAN_INTERVAL_SECONDS
+            )
+        if need_scan:
+            self._evict()
+
+    def get_or_create(
+        self,
+        page_key: str,
+        factory: Callable[[], bytes],
+        bbox: Optional[Sequence[int]] = None,
+        variant: str = 'png'
+    ) -> bytes:
+        """命中直接返回，未命中时调用 factory 生成并写入缓存"""
+        data = self.get(page_key, bbox, variant)
+        if data is None:
+            data = factory()
+            self.put(page_key, data, bbox, variant)
+        return data
+
+    # ==================== 统计与清理 ====================
+
+    def stats(self) -> Dict[str, int]:
+        """当前进程的命中统计"""
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self) -> None:
+        for path in self._iter_entries():
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._total_bytes = 0
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for path in self._iter_entries():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        evicted = 0
+        if total > self.max_bytes:
+            target = int(self.max_bytes * _EVICT_TARGET_RATIO)
+            # 最久未访问的先淘汰
+            for _, size, path in sorted(entries, key=lambda e: e[0]):
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            logger.info(f"渲染缓存淘汰 {evicted} 个文件，剩余 {total / 1024 / 1024:.1f}MB")
+
+        with self._lock:
+            self._total_bytes = total
+            self._last_scan = time.monotonic()
+            self._stats['evictions'] += evicted
+
+    def _iter_entries(self):
+        if not self.root.exists():
+            return
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.startswith('.tmp-'):
+                    yield Path(entry.path)
+
+    def _path(self, page_key: str, bbox: Optional[Sequence[int]], variant: str) -> Path:
+        box = ','.join(str(int(v)) for v in bbox) if bbox is not None else '-'
+        digest = hashlib.sha256(f"{page_key}|{box}|{variant}".encode('utf-8')).hexdigest()
+        return self.root / digest[:2] / digest
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+
+_render_cache: Optional[RenderCache] = None
+_render_cache_configured = False
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> Optional[RenderCache]:
+    """按 PDFExtractorConfig 创建进程内的缓存实例，未启用时返回 None"""
+    global _render_cache, _render_cache_configured
+    if _render_cache_configured:
+        return _render_cache
+    with _render_cache_lock:
+        if not _render_cache_configured:
+            from ..config import PDFExtractorConfig
+            if PDFExtractorConfig.RENDER_CACHE_ENABLED:
+                _render_cache = RenderCache(
+                    PDFExtractorConfig.RENDER_CACHE_DIR,
+                    PDFExtractorConfig.RENDER_CACHE_MAX_MB * 1024 * 1024
+                )
+            _render_cache_configured = True
+    return _render_cache
+
+
+def set_render_cache(cache: Optional[RenderCache]) -> Optional[RenderCache]:
+    """替换进程内的缓存实例（None 表示禁用），返回原实例"""
+    global _render_cache, _render_cache_configured
+    with _render_cache_lock:
+        previous = _render_cache
+        _render_cache = cache
+        _render_cache_configured = True
+    return previous
@@ -11,16 +11,25 @@ Step1: PDF文本提取器（OCR版）
 """
 import logging
 import base64
+import hashlib
 import os
 import requests
 import re
 from pathlib import Path
-from typing import Dict, Any
-import fitz  # PyMuPDF
+from typing import Dict, Any, List, Optional, Tuple
 from html.parser import HTMLParser
 
+from tools.core.parse_cache import get_parse_cache
+
+from .document_session import PDFDocumentSession, open_session
+from .render_cache import get_render_cache, page_cache_key, png_size
+
 logger = logging.getLogger('django')
 
+# OCR结果在解析结果缓存中的解析器名称与版本；OCR模型或提示词变化时递增版本
+OCR_CACHE_PARSER = 'pdf_extractor.ocr'
+OCR_CACHE_VERSION = '1'
+
 
 class HTMLTableParser(HTMLParser):
     """HTML表格解析器，用于将HTML表格转换为Markdown表格"""
@@ -367,6 +376,49 @@ def convert_html_to_markdown(text: str) -> str:
     return text
 
 
+def render_page_png(
+    pdf_path: str,
+    page_number: int,
+    dpi: int = 144,
+    session: Optional[PDFDocumentSession] = None
+) -> Tuple[bytes, List[int]]:
+    """
+    将PDF页面渲染为PNG
+
+    模块级函数，可直接提交到进程池执行。传入 session 时复用已打开的文档。
+    启用渲染缓存时，同一文件内容、页码和DPI只渲染一次。
+
+    Returns:
+        (PNG数据, [宽, 高])
+    """
+    session, owned = open_session(pdf_path, session)
+    try:
+        cache = get_render_cache()
+        if cache is not None:
+            image_bytes = cache.get_or_create(
+                page_cache_key(session.content_hash, page_number, dpi),
+                lambda: session.render_png(page_number, dpi)[0]
+            )
+            image_size = png_size(image_bytes)
+        else:
+            image_bytes, image_size = session.render_png(page_number, dpi)
+        logger.info(f"页面 {page_number} 渲染完成 - 尺寸: {image_size[0]}x{image_size[1]}, 大小: {len(image_bytes)} bytes")
+        return image_bytes, image_size
+    finally:
+        if owned:
+            session.close()
+
+
+def save_page_image(image_bytes: bytes, image_path: Path) -> Path:
+    """保存页面截图为 full_page.png（供Step3使用）"""
+    from PIL import Image
+    from io import BytesIO
+    image_pil = Image.open(BytesIO(image_bytes))  # 从PNG数据加载
+    image_pil.save(image_path, 'PNG', optimize=True)
+    logger.info(f"页面图片已保存: {image_path}")
+    return image_path
+
+
 class TextExtractor:
     """PDF文本提取器 - 基于OCR模型"""
 
@@ -423,16 +475,18 @@ class TextExtractor:
         pdf_path: str,
         page_number: int,
         output_dir: Path = None,
-        save_debug: bool = True
+        save_debug: bool = True,
+        session: Optional[PDFDocumentSession] = None
     ) -> Dict[str, Any]:
         """
-        提取单个PDF页面
+        提取单个PDF页面（渲染 + OCR识别）
 
         Args:
             pdf_path: PDF文件路径
             page_number: 页码（从1开始）
             output_dir: 输出目录（可选，用于保存调试信息）
             save_debug: 是否保存调试信息
+            session: 共享的文档会话（可选），不传时临时打开PDF
 
         Returns:
             Dict包含:
@@ -449,40 +503,60 @@ class TextExtractor:
             logger.info(f"开始提取页面 {page_number}")
             logger.info(f"=" * 60)
 
-            # 步骤1: 打开PDF并验证页码
-            logger.info(f"[步骤1/4] 打开PDF文档...")
-            pdf_path = Path(pdf_path)
-            if not pdf_path.exists():
-                raise FileNotFoundError(f"PDF文件不存在: {pdf_path}")
-
-            doc = fitz.open(pdf_path)
-
-            if page_number < 1 or page_number > doc.page_count:
-                raise ValueError(
-                    f"页码无效: {page_number}，总页数: {doc.page_count}"
-                )
-
-            # 步骤2: 渲染页面为图片
-            logger.info(f"[步骤2/4] 渲染页面为图片 (DPI: {self.ocr_dpi})...")
-            page = doc[page_number - 1]
-
-            # 计算缩放矩阵（DPI转换）
-            zoom = self.ocr_dpi / 72.0  # PDF默认72 DPI
-            mat = fitz.Matrix(zoom, zoom)
+            image_bytes, image_size = render_page_png(pdf_path, page_number, self.ocr_dpi, session=session)
+        except Exception as e:
+            logger.error(
+                f"提取页面 {page_number} 失败: {str(e)}",
+                exc_info=True
+            )
+            return {
+                'success': False,
+                'page_number': page_number,
+                'error': str(e)
+            }
 
-            # 渲染页面为图片
-            pix = page.get_pixmap(matrix=mat)
-            image_bytes = pix.tobytes('png')  # 转换为PNG格式（与OCR测试脚本一致）
+        return self.recognize_page(
+            image_bytes,
+            image_size,
+            page_number,
+            output_dir=output_dir,
+            save_debug=save_debug
+        )
 
-            logger.info(f"页面渲染完成 - 尺寸: {pix.width}x{pix.height}, 大小: {len(image_bytes)} bytes")
+    def _cached_ocr(self, image_bytes: bytes, page_number: int, ocr_client=None) -> Dict[str, Any]:
+        """
+        OCR识别页面图片，成功的结果按图片内容缓存（tools.core.parse_cache）
 
-            # 步骤3: 转换为base64
-            logger.info(f"[步骤3/4] 转换图片为base64...")
+        同一文档重复提交或不同文档包含相同页面时，不再重复调用OCR模型。
+        """
+        cache = get_parse_cache()
+        if cache is None:
+            return self._request_ocr(image_bytes, page_number, ocr_client)
+
+        result, hit = cache.get_or_parse(
+            hashlib.sha256(image_bytes).hexdigest(),
+            OCR_CACHE_PARSER, OCR_CACHE_VERSION,
+            lambda: self._request_ocr(image_bytes, page_number, ocr_client),
+            options={'mode': self.ocr_mode, 'max_tokens': self.ocr_max_tokens, 'temperature': self.ocr_temperature},
+            cacheable=lambda r: bool(r.get('success'))
+        )
+        if hit:
+            logger.info(f"[页面 {page_number}] 命中OCR结果缓存")
+        return result
+
+    def _request_ocr(self, image_bytes: bytes, page_number: int, ocr_client=None) -> Dict[str, Any]:
+        """调用OCR批量客户端或OCR服务，返回原始识别结果"""
+        if ocr_client is not None:
+            logger.info(f"[页面 {page_number}] 提交到OCR批量客户端...")
+            ocr_result = ocr_client.recognize(image_bytes, key=page_number)
+        else:
+            # 转换为base64
+            logger.info(f"[页面 {page_number}] 转换图片为base64...")
             image_base64 = base64.b64encode(image_bytes).decode('utf-8')
             logger.info(f"Base64转换完成 - 长度: {len(image_base64)} 字符")
 
-            # 步骤4: 通过HTTP调用OCR服务识别
-            logger.info(f"[步骤4/4] 调用OCR服务识别...")
+            # 通过HTTP调用OCR服务识别
+            logger.info(f"[页面 {page_number}] 调用OCR服务识别...")
             response = requests.post(
                 f"{self.ocr_api_url}/image/",
                 json={
@@ -499,8 +573,38 @@ class TextExtractor:
 
             ocr_result = response.json()
 
-            # 关闭文档
-            doc.close()
+        return ocr_result
+
+    def recognize_page(
+        self,
+        image_bytes: bytes,
+        image_size: List[int],
+        page_number: int,
+        output_dir: Path = None,
+        save_debug: bool = True,
+        save_image: bool = True,
+        ocr_client=None
+    ) -> Dict[str, Any]:
+        """
+        对已渲染的页面图片调用OCR识别
+
+        渲染与识别拆开后，渲染可以放到进程池里执行，识别（网络请求）单独限制并发。
+        传入 ocr_client（OCRBatchClient）时，与其他页面合并成批次直接发送到OCR模型的批量接口。
+
+        Args:
+            image_bytes: 页面PNG数据
+            image_size: 页面图片尺寸 [宽, 高]
+            page_number: 页码（从1开始）
+            output_dir: 输出目录（可选，用于保存调试信息）
+            save_debug: 是否保存调试信息
+            save_image: 是否保存 full_page.png（渲染阶段已保存时传 False）
+            ocr_client: OCR批量客户端（可选）
+
+        Returns:
+            同 extract_page
+        """
+        try:
+            ocr_result = self._cached_ocr(image_bytes, page_number, ocr_client)
 
             # 检查识别结果
             if not ocr_result.get('success'):
@@ -515,7 +619,7 @@ class TextExtractor:
             # 提取结果
             markdown_raw = ocr_result.get('result', '')
             markdown_cleaned = ocr_result.get('result_cleaned', '')
-            image_size = ocr_result.get('image_size', [pix.width, pix.height])
+            image_size = ocr_result.get('image_size', image_size)
             image_count = ocr_result.get('image_count', 0)
             image_regions = ocr_result.get('image_regions', [])  # 新增: 图片区域坐标
 
@@ -533,12 +637,8 @@ class TextExtractor:
                 output_dir.mkdir(parents=True, exist_ok=True)
 
                 # 保存渲染的图片为 full_page.png（供Step3使用，跳过Step2）
-                from PIL import Image
-                from io import BytesIO
-                image_pil = Image.open(BytesIO(image_bytes))  # 从PNG数据加载
-                image_path = output_dir / "full_page.png"
-                image_pil.save(image_path, 'PNG', optimize=True)
-                logger.info(f"页面图片已保存: {image_path}")
+                if save_image:
+                    save_page_image(image_bytes, output_dir / "full_page.png")
 
                 # 保存原始结果
                 raw_path = output_dir / f"page_{page_number}_step1_raw.md"
@@ -595,7 +695,8 @@ class TextExtractor:
         pdf_path: str,
         page_numbers: list[int],
         output_dir: Path = None,
-        save_debug: bool = True
+        save_debug: bool = True,
+        session: Optional[PDFDocumentSession] = None
     ) -> Dict[str, Any]:
         """
         批量提取多个PDF页面
@@ -605,6 +706,7 @@ class TextExtractor:
             page_numbers: 页码列表（从1开始）
             output_dir: 输出目录（可选）
             save_debug: 是否保存调试信息
+            session: 共享的文档会话（可选），不传时整批共用一个临时会话
 
         Returns:
             Dict包含:
@@ -620,20 +722,26 @@ class TextExtractor:
         success_count = 0
         failed_count = 0
 
-        for page_number in page_numbers:
-            result = self.extract_page(
-                pdf_path=pdf_path,
-                page_number=page_number,
-                output_dir=output_dir,
-                save_debug=save_debug
-            )
+        session, owned = open_session(pdf_path, session)
+        try:
+            for page_number in page_numbers:
+                result = self.extract_page(
+                    pdf_path=pdf_path,
+                    page_number=page_number,
+                    output_dir=output_dir,
+                    save_debug=save_debug,
+                    session=session
+                )
 
-            results.append(result)
+                results.append(result)
 
-            if result.get('success'):
-                success_count += 1
-            else:
-                failed_count += 1
+                if result.get('success'):
+                    success_count += 1
+                else:
+                    failed_count += 1
+        finally:
+            if owned:
+                session.close()
 
         logger.info(f"批量提取完成 - 成功: {success_count}/{len(page_numbers)}, 失败: {failed_count}")
 
@@ -669,21 +777,19 @@ class TextExtractor:
         """
         logger.info(f"开始提取PDF所有页面: {pdf_path}")
 
-        # 获取总页数
-        doc = fitz.open(pdf_path)
-        total_pages = doc.page_count
-        doc.close()
+        with PDFDocumentSession(pdf_path) as session:
+            total_pages = session.page_count
+            logger.info(f"PDF总页数: {total_pages}")
 
-        logger.info(f"PDF总页数: {total_pages}")
-
-        # 批量提取所有页面
-        page_numbers = list(range(1, total_pages + 1))
-        return self.extract_pages_batch(
-            pdf_path=pdf_path,
-            page_numbers=page_numbers,
-            output_dir=output_dir,
-            save_debug=save_debug
-        )
+            # 批量提取所有页面
+            page_numbers = list(range(1, total_pages + 1))
+            return self.extract_pages_batch(
+                pdf_path=pdf_path,
+                page_numbers=page_numbers,
+                output_dir=output_dir,
+                save_debug=save_debug,
+                session=session
+            )
 
     def get_service_info(self) -> Dict[str, Any]:
         """
@@ -4,12 +4,15 @@
 将PDF页面渲染为高质量图片
 """
 import logging
+from io import BytesIO
 from pathlib import Path
 from typing import Optional
 import numpy as np
-import fitz  # PyMuPDF
 from PIL import Image
 
+from .document_session import PDFDocumentSession, open_session
+from .render_cache import get_render_cache, page_cache_key
+
 logger = logging.getLogger('django')
 
 
@@ -28,7 +31,8 @@ class PageRenderer:
     def render_page_to_image(
         self,
         pdf_path: str,
-        page_number: int
+        page_number: int,
+        session: Optional[PDFDocumentSession] = None
     ) -> np.ndarray:
         """
         将PDF页面渲染为图像
@@ -36,6 +40,7 @@ class PageRenderer:
         Args:
             pdf_path: PDF文件路径
             page_number: 页面编号（从1开始）
+            session: 共享的文档会话（可选），不传时临时打开PDF
 
         Returns:
             numpy数组格式的图像 (RGB)
@@ -44,41 +49,33 @@ class PageRenderer:
             FileNotFoundError: PDF文件不存在
             ValueError: 页码无效
         """
+        owned = False
         try:
-            pdf_path = Path(pdf_path)
-            if not pdf_path.exists():
-                raise FileNotFoundError(f"PDF文件不存在: {pdf_path}")
-
-            # 打开PDF文档
-            doc = fitz.open(pdf_path)
-
-            # 验证页码
-            if page_number < 1 or page_number > doc.page_count:
-                raise ValueError(
-                    f"页码无效: {page_number}，总页数: {doc.page_count}"
-                )
-
-            # 获取页面（PyMuPDF页码从0开始）
-            page = doc[page_number - 1]
-
-            # 计算缩放比例（DPI转换）
-            zoom = self.dpi / 72.0  # PDF默认72 DPI
-            mat = fitz.Matrix(zoom, zoom)
-
-            # 渲染页面为图像
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-
-            # 转换为numpy数组
-            img_data = np.frombuffer(pix.samples, dtype=np.uint8)
-            img_data = img_data.reshape(pix.height, pix.width, pix.n)
-
-            # 确保是RGB格式
-            if pix.n == 4:  # RGBA
-                img_data = img_data[:, :, :3]
-            elif pix.n == 1:  # 灰度
-                img_data = np.stack([img_data] * 3, axis=-1)
-
-            doc.close()
+            session, owned = open_session(pdf_path, session)
+
+            # 渲染缓存命中时直接解码缓存的PNG
+            cache = get_render_cache()
+            cache_key = page_cache_key(session.content_hash, page_number, self.dpi) if cache else None
+            cached = cache.get(cache_key) if cache else None
+            if cached is not None:
+                with Image.open(BytesIO(cached)) as img:
+                    img_data = np.array(img.convert('RGB'))
+            else:
+                # 渲染页面为图像
+                pix = session.render_pixmap(page_number, self.dpi, alpha=False)
+
+                # 转换为numpy数组
+                img_data = np.frombuffer(pix.samples, dtype=np.uint8)
+                img_data = img_data.reshape(pix.height, pix.width, pix.n)
+
+                # 确保是RGB格式
+                if pix.n == 4:  # RGBA
+                    img_data = img_data[:, :, :3]
+                elif pix.n == 1:  # 灰度
+                    img_data = np.stack([img_data] * 3, axis=-1)
+
+                if cache:
+                    cache.put(cache_key, pix.tobytes('png'))
 
             logger.info(
                 f"成功渲染页面 {page_number}，"
@@ -93,6 +90,9 @@ class PageRenderer:
                 exc_info=True
             )
             raise
+        finally:
+            if owned:
+                session.close()
 
     def save_image(
         self,
@@ -132,7 +132,8 @@ class PageRenderer:
         self,
         pdf_path: str,
         page_number: int,
-        output_dir: Path
+        output_dir: Path,
+        session: Optional[PDFDocumentSession] = None
     ) -> tuple[np.ndarray, Path]:
         """
         渲染页面并保存为完整截图
@@ -141,12 +142,13 @@ class PageRenderer:
             pdf_path: PDF文件路径
             page_number: 页码（从1开始）
             output_dir: 输出目录
+            session: 共享的文档会话（可选）
 
         Returns:
             (渲染的图像, 保存的文件路径)
         """
         # 渲染页面
-        image = self.render_page_to_image(pdf_path, page_number)
+        image = self.render_page_to_image(pdf_path, page_number, session=session)
 
         # 保存为full_page.png
         output_path = output_dir / "full_page.png"
@@ -5,11 +5,14 @@
 """
 import logging
 import json
+from io import BytesIO
 from pathlib import Path
 from typing import List, Tuple, Optional
 import numpy as np
 from PIL import Image
 
+from .render_cache import get_render_cache
+
 logger = logging.getLogger('django')
 
 
@@ -24,7 +27,8 @@ class BBoxCropper:
         self,
         image: np.ndarray,
         output_dir: Path,
-        page_number: int = 1
+        page_number: int = 1,
+        page_key: Optional[str] = None
     ) -> Tuple[int, List[Path]]:
         """
         从Step1保存的坐标文件读取bbox并裁剪图片
@@ -33,6 +37,7 @@ class BBoxCropper:
             image: 完整页面图像（numpy数组）
             output_dir: 输出目录（需要包含Step1的坐标文件）
             page_number: 页码
+            page_key: 页面的渲染缓存键，提供时按 (页面, 像素坐标) 复用已编码的裁剪图
 
         Returns:
             元组(裁剪的图片数量, 保存的文件路径列表)
@@ -61,6 +66,7 @@ class BBoxCropper:
             # 裁剪并保存每个区域
             saved_paths = []
             image_height, image_width = image.shape[:2]
+            cache = get_render_cache() if page_key else None
 
             for i, bbox in enumerate(regions, 1):
                 # bbox格式: [x1, y1, x2, y2] (左上角, 右下角)
@@ -72,15 +78,21 @@ class BBoxCropper:
                 x2 = max(x1 + 1, min(x2, image_width))
                 y2 = max(y1 + 1, min(y2, image_height))
 
-                # 裁剪区域
-                cropped = image[y1:y2, x1:x2]
+                def encode_crop(x1=x1, y1=y1, x2=x2, y2=y2) -> bytes:
+                    # 裁剪区域并编码为PNG
+                    buffer = BytesIO()
+                    Image.fromarray(image[y1:y2, x1:x2]).save(buffer, 'PNG')
+                    return buffer.getvalue()
+
+                if cache is not None:
+                    data = cache.get_or_create(page_key, encode_crop, bbox=(x1, y1, x2, y2), variant='crop.png')
+                else:
+                    data = encode_crop()
 
                 # 保存为 image_{i}.png
                 filename = f"image_{i}.png"
                 output_path = output_dir / filename
-
-                pil_image = Image.fromarray(cropped)
-                pil_image.save(output_path, 'PNG')
+                output_path.write_bytes(data)
 
                 saved_paths.append(output_path)
                 logger.info(
@@ -113,7 +125,8 @@ class BBoxCropper:
         self,
         image: np.ndarray,
         output_dir: Path,
-        page_number: int = 1
+        page_number: int = 1,
+        page_key: Optional[str] = None
     ) -> Tuple[int, List[Path]]:
         """
         执行裁剪并保存（别名方法，兼容旧接口）
@@ -126,4 +139,4 @@ class BBoxCropper:
         Returns:
             (裁剪的图片数量, 保存的文件路径列表)
         """
-        return self.crop_regions_from_step1(image, output_dir, page_number)
+        return self.crop_regions_from_step1(image, output_dir, page_number, page_key=page_key)
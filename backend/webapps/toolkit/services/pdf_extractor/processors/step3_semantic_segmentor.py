@@ -6,13 +6,16 @@
 """
 import logging
 import json
+from io import BytesIO
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import numpy as np
 from PIL import Image
 
+from .render_cache import get_render_cache
+
 logger = logging.getLogger('django')
 
 
@@ -127,6 +130,18 @@ class SemanticSegmentor:
         Returns:
             裁剪后的区域图像
         """
+        x1, y1, x2, y2 = self._pixel_box(image, region)
+
+        # 裁剪区域
+        region_img = image[y1:y2, x1:x2]
+
+        logger.debug(f"裁剪区域 {region.id}: ({x1}, {y1}) 尺寸 {x2 - x1}x{y2 - y1}")
+
+        return region_img
+
+    @staticmethod
+    def _pixel_box(image: np.ndarray, region: ImageRegion) -> Tuple[int, int, int, int]:
+        """将 [x, y, width, height] 限制在图像范围内，返回 (x1, y1, x2, y2)"""
         x, y, w, h = region.bbox
 
         # 确保坐标在图像范围内
@@ -136,18 +151,14 @@ class SemanticSegmentor:
         w = max(1, min(w, width - x))
         h = max(1, min(h, height - y))
 
-        # 裁剪区域
-        region_img = image[y:y+h, x:x+w]
-
-        logger.debug(f"裁剪区域 {region.id}: ({x}, {y}) 尺寸 {w}x{h}")
-
-        return region_img
+        return x, y, x + w, y + h
 
     def save_region_images(
         self,
         image: np.ndarray,
         regions: List[ImageRegion],
-        output_dir: Path
+        output_dir: Path,
+        page_key: Optional[str] = None
     ) -> List[Path]:
         """
         保存所有区域图片
@@ -156,26 +167,35 @@ class SemanticSegmentor:
             image: 原始图像
             regions: 区域列表
             output_dir: 输出目录
+            page_key: 页面的渲染缓存键，提供时按 (页面, 像素坐标) 复用已编码的裁剪图
 
         Returns:
             保存的文件路径列表
         """
         saved_paths = []
+        cache = get_render_cache() if page_key else None
 
         for region in regions:
-            # 提取区域
-            region_img = self.extract_region(image, region)
+            box = self._pixel_box(image, region)
+
+            def encode_region(region=region) -> bytes:
+                # 提取区域并编码为PNG
+                buffer = BytesIO()
+                Image.fromarray(self.extract_region(image, region)).save(buffer, 'PNG', optimize=True)
+                return buffer.getvalue()
+
+            if cache is not None:
+                data = cache.get_or_create(page_key, encode_region, bbox=box, variant='crop.png')
+            else:
+                data = encode_region()
 
             # 保存图片
             filename = f"image_{region.id}.png"
             save_path = output_dir / filename
-
-            # 转换为PIL Image并保存
-            pil_img = Image.fromarray(region_img)
-            pil_img.save(save_path, 'PNG', optimize=True)
+            save_path.write_bytes(data)
 
             saved_paths.append(save_path)
-            logger.info(f"保存区域图片 {region.id}: {save_path} (尺寸: {region_img.shape[1]}x{region_img.shape[0]})")
+            logger.info(f"保存区域图片 {region.id}: {save_path} (尺寸: {box[2] - box[0]}x{box[3] - box[1]})")
 
         return saved_paths
 
@@ -237,7 +257,8 @@ class SemanticSegmentor:
         self,
         image: np.ndarray,
         output_dir: Path,
-        page_number: int = 1
+        page_number: int = 1,
+        page_key: Optional[str] = None
     ) -> Tuple[List[ImageRegion], List[Path]]:
         """
         执行语义分割并保存所有区域（简化版：直接使用OCR坐标）
@@ -246,6 +267,7 @@ class SemanticSegmentor:
             image: 输入图像
             output_dir: 输出目录
             page_number: 页码（用于文件命名）
+            page_key: 页面的渲染缓存键（可选）
 
         Returns:
             (区域列表, 保存的文件路径列表)
@@ -257,10 +279,21 @@ class SemanticSegmentor:
             logger.warning("未找到OCR识别的图片区域")
             return regions, []
 
-        # 2. 生成并保存可视化图像
-        visualization = self.visualize_regions(image, regions)
+        # 2. 生成并保存可视化图像（可视化结果只取决于页面和所有区域坐标）
+        def encode_visualization() -> bytes:
+            buffer = BytesIO()
+            Image.fromarray(self.visualize_regions(image, regions)).save(buffer, 'PNG')
+            return buffer.getvalue()
+
+        cache = get_render_cache() if page_key else None
         vis_path = output_dir / "visualization.png"
-        Image.fromarray(visualization).save(vis_path)
+        if cache is not None:
+            all_boxes = [v for region in regions for v in (region.id, *region.bbox)]
+            vis_path.write_bytes(
+                cache.get_or_create(page_key, encode_visualization, bbox=all_boxes, variant='regions.png')
+            )
+        else:
+            vis_path.write_bytes(encode_visualization())
         logger.info(f"保存可视化图像: {vis_path}")
 
         # 3. 保存元数据JSON
@@ -283,7 +316,7 @@ class SemanticSegmentor:
         logger.info(f"保存元数据: {metadata_path}")
 
         # 4. 保存所有区域图片
-        saved_paths = self.save_region_images(image, regions, output_dir)
+        saved_paths = self.save_region_images(image, regions, output_dir, page_key=page_key)
 
         # 返回结果（包含visualization和metadata路径）
         saved_paths.extend([vis_path, metadata_path])
@@ -12,22 +12,30 @@ logger = logging.getLogger('django')
 
 
 @app.task(bind=True, name='toolkit.process_pdf_extraction')
-def process_pdf_extraction(self, task_id: str, file_path: str):
+def process_pdf_extraction(self, task_id: str, file_path: str, pages: list = None):
     """
     处理PDF文档提取任务
 
+    每页结果写入页面检查点。worker 崩溃后任务被重新投递时，
+    只处理尚未完成的页面。
+
     Args:
         self: Celery任务实例
         task_id: 任务UUID字符串
         file_path: PDF文件路径
+        pages: 只重新处理这些页码（可选），见 rerun_task_pages 接口
 
     Returns:
         任务处理结果
     """
     from .models import PDFExtractorTask
     from .services.pdf_extractor.processors import PDFProcessor
+    from .services.pdf_extractor.processors.progress_stream import TaskEventStream
     from .utils import FileManager
 
+    # 任务状态落库之后再发送结束事件，客户端收到后即可读取最终结果
+    events = TaskEventStream(task_id)
+
     try:
         logger.info(f"开始处理PDF提取任务: {task_id}")
 
@@ -48,7 +56,8 @@ def process_pdf_extraction(self, task_id: str, file_path: str):
         result = processor.process_pdf_document(
             pdf_path=file_path,
             task_id=task_id,
-            task_dir=task_dir
+            task_dir=task_dir,
+            pages=pages
         )
 
         if result['status'] == 'success':
@@ -59,6 +68,17 @@ def process_pdf_extraction(self, task_id: str, file_path: str):
             task.save()
 
             logger.info(f"PDF提取任务完成: {task_id}, 共 {result['total_pages']} 页")
+            if result.get('failed_pages'):
+                logger.warning(f"PDF提取任务 {task_id} 有页面处理失败: {result['failed_pages']}，可通过重新处理接口重试")
+
+            events.publish(
+                'task_finished',
+                status='completed',
+                total_pages=result['total_pages'],
+                processed_pages=result['processed_pages'],
+                failed_pages=result.get('failed_pages', []),
+                routing={k: result.get('routing', {}).get(k) for k in ('local', 'vision')}
+            )
 
             # 4. 调用飞书转换（仅对已关联飞书账号的用户）
             try:
@@ -80,6 +100,7 @@ def process_pdf_extraction(self, task_id: str, file_path: str):
                 'task_id': task_id,
                 'total_pages': result['total_pages'],
                 'processed_pages': result['processed_pages'],
+                'failed_pages': result.get('failed_pages', []),
                 'final_markdown': result['final_markdown']
             }
         else:
@@ -88,6 +109,7 @@ def process_pdf_extraction(self, task_id: str, file_path: str):
             task.save()
 
             logger.error(f"PDF提取任务失败: {task_id}, 错误: {result.get('error')}")
+            events.publish('task_finished', status='error', error=result.get('error', '未知错误'))
 
             return {
                 'status': 'error',
@@ -113,6 +135,7 @@ def process_pdf_extraction(self, task_id: str, file_path: str):
             task.save()
         except Exception:
             pass
+        events.publish('task_finished', status='error', error=str(e))
 
         return {
             'status': 'error',
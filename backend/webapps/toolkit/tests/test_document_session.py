@@ -0,0 +1,78 @@
+"""
+PDF文档会话测试
+
+1. pdfplumber 只打开一次，同一页的对象树按页缓存
+2. 页面分析、渲染复用同一个会话时结果与单独打开一致
+3. 每个进程的会话按文件路径复用
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+import fitz
+from django.test import TestCase
+
+from webapps.toolkit.services.pdf_extractor.processors.components.step1_page_analyzer import PageAnalyzer
+from webapps.toolkit.services.pdf_extractor.processors.document_session import PDFDocumentSession
+from webapps.toolkit.services.pdf_extractor.processors.step1_text_extractor import render_page_png
+
+
+class PDFDocumentSessionTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.pdf_path = str(self.tmp_dir / 'sample.pdf')
+        doc = fitz.open()
+        for i in range(1, 5):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"page {i} heading")
+            page.draw_rect(fitz.Rect(72, 100, 300, 200))
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def tearDown(self):
+        PDFDocumentSession.close_process_session(self.pdf_path)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_plumber_opened_once_and_pages_cached(self):
+        with PDFDocumentSession(self.pdf_path) as session:
+            analyzer = PageAnalyzer()
+            for page_number in (1, 2, 1, 2, 3):
+                analyzer.analyze_page(self.pdf_path, page_number, session=session)
+
+            self.assertEqual(session.stats['plumber_opens'], 1)
+            self.assertEqual(session.stats['plumber_page_misses'], 3)
+            self.assertEqual(session.stats['plumber_page_hits'], 2)
+
+            session.release_page(1)
+            analyzer.analyze_page(self.pdf_path, 1, session=session)
+            self.assertEqual(session.stats['plumber_page_misses'], 4)
+        self.assertTrue(session.closed)
+
+    def test_shared_session_matches_standalone(self):
+        analyzer = PageAnalyzer()
+        with PDFDocumentSession(self.pdf_path) as session:
+            shared = analyzer.analyze_page(self.pdf_path, 2, session=session).to_dict()
+            shared_png = render_page_png(self.pdf_path, 2, 72, session=session)
+        standalone = analyzer.analyze_page(self.pdf_path, 2).to_dict()
+
+        self.assertEqual(shared, standalone)
+        self.assertEqual(shared_png, render_page_png(self.pdf_path, 2, 72))
+
+    def test_analyze_multiple_pages(self):
+        results = PageAnalyzer().analyze_multiple_pages(self.pdf_path)
+        self.assertEqual(sorted(results), [1, 2, 3, 4])
+        self.assertIn('page 3 heading', results[3].raw_text)
+
+    def test_process_session_reused_until_closed(self):
+        session = PDFDocumentSession.for_process(self.pdf_path)
+        self.assertIs(PDFDocumentSession.for_process(self.pdf_path), session)
+
+        PDFDocumentSession.close_process_session(self.pdf_path)
+        self.assertTrue(session.closed)
+        self.assertIsNot(PDFDocumentSession.for_process(self.pdf_path), session)
+
+    def test_invalid_page(self):
+        with PDFDocumentSession(self.pdf_path) as session:
+            with self.assertRaises(ValueError):
+                session.render_png(5)
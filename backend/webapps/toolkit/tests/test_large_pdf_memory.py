@@ -0,0 +1,219 @@
+"""
+大文档内存测试
+
+1. 超过内存预算时页面流水线逐页处理，不再并行领取新页面，但不会停滞
+2. 合成的1000页PDF全部走视觉模型路径（渲染、OCR批量接口、区域裁剪），
+   在固定内存上限内处理完成：截图和裁剪图落盘而不是驻留内存，最终文档包含所有页面
+"""
+import base64
+import json
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+import fitz
+from django.test import SimpleTestCase, TransactionTestCase
+
+from webapps.toolkit.models import PDFExtractorTask
+from webapps.toolkit.services.ocr_model.config import OCRModelConfig
+from webapps.toolkit.services.pdf_extractor.config import PDFExtractorConfig
+from webapps.toolkit.services.pdf_extractor.processors.memory_budget import MemoryBudget, process_tree_rss
+from webapps.toolkit.services.pdf_extractor.processors.page_pipeline import PagePipeline
+from webapps.toolkit.services.pdf_extractor.processors.processor_main import PDFProcessor
+
+PAGE_COUNT = 1000
+# 处理过程中进程RSS相对开始时的最大增长
+RSS_GROWTH_LIMIT_MB = 512
+# 桩OCR服务对每页返回的文本和图片区域（DeepSeek-OCR 归一化坐标 0-999）
+STUB_OCR_TEXT = "stub ocr text"
+STUB_OCR_REGION = [100, 300, 600, 700]
+
+
+def _build_pdf(path: Path, page_count: int, with_image: bool = False) -> None:
+    figure = None
+    if with_image:
+        figure = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 48), False)
+        figure.set_rect(figure.irect, (40, 120, 200))
+    doc = fitz.open()
+    for page in range(1, page_count + 1):
+        pdf_page = doc.new_page()
+        if figure is not None:
+            pdf_page.insert_image(fitz.Rect(72, 450, 400, 700), pixmap=figure)
+        pdf_page.insert_text((72, 72), f"Chapter {page}", fontsize=20)
+        for line in range(20):
+            pdf_page.insert_text(
+                (72, 110 + line * 16),
+                f"Page {page} line {line}: the quick brown fox jumps over the lazy dog.",
+                fontsize=11
+            )
+    doc.save(str(path))
+    doc.close()
+
+
+class _StubOCRServer:
+    """模拟OCR模型的 /ocr/batch 接口：每张图片返回同样的文本和一个图片区域"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.images = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub.lock:
+                    stub.images += len(body['images'])
+                det = json.dumps([STUB_OCR_REGION])
+                results = [
+                    {
+                        'result': f"{STUB_OCR_TEXT}\n\n<|ref|>image<|/ref|><|det|>{det}<|/det|>",
+                        # PNG 的 IHDR 块记录宽高
+                        'image_size': list(struct.unpack('>II', base64.b64decode(image)[16:24])),
+                        'mode': body['mode'],
+                    }
+                    for image in body['images']
+                ]
+                payload = json.dumps({'results': results, 'total': len(results)}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _PeakRSSSampler:
+    """后台线程定时采样进程RSS"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = process_tree_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, process_tree_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+
+class _SlowProcessor:
+    """记录同时处理的页面数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def process_page_stages(self, pdf_path, page_number, task_dir, task_id, runner=None,
+                            translate_options=None, page_context=None, fast_path=None):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        return {'page': page_number, 'status': 'completed'}
+
+
+class MemoryBudgetTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.pdf_path = str(self.tmp_dir / 'sample.pdf')
+        _build_pdf(Path(self.pdf_path), 8)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_over_budget_pages_run_one_at_a_time(self):
+        processor = _SlowProcessor()
+        # 1MB 的上限总是超出
+        pipeline = PagePipeline(processor, cpu_workers=0, llm_concurrency=4, memory_limit_mb=1)
+        results = pipeline.run(self.pdf_path, list(range(1, 9)), self.tmp_dir, None)
+
+        self.assertEqual([r['page'] for r in results], list(range(1, 9)))
+        self.assertEqual(processor.max_active, 1)
+
+    def test_disabled_budget_never_waits(self):
+        budget = MemoryBudget(0)
+        with budget.page_slot(), budget.page_slot():
+            pass
+        self.assertEqual((budget.stats()['admitted'], budget.stats()['throttled']), (2, 0))
+
+
+class LargePDFMemoryTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.pdf_path = self.tmp_dir / 'large.pdf'
+        _build_pdf(self.pdf_path, PAGE_COUNT, with_image=True)
+        self.task = PDFExtractorTask.objects.create(original_filename='large.pdf', file_path=str(self.pdf_path))
+        self.task_dir = self.tmp_dir / str(self.task.id)
+        self.task_dir.mkdir()
+        self.ocr = _StubOCRServer()
+
+    def tearDown(self):
+        self.ocr.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_thousand_pages_within_memory_limit(self):
+        baseline = process_tree_rss()
+        processor = PDFProcessor(api_key='test-key', dpi=72)
+
+        # 关闭快速路径，所有页面都渲染截图、经OCR批量接口识别并裁剪图片区域
+        with mock.patch.multiple(
+            PDFExtractorConfig,
+            CPU_WORKERS=0,
+            FAST_PATH_ENABLED=False,
+            OCR_BATCH_ENABLED=True,
+            MEMORY_LIMIT_MB=(baseline >> 20) + RSS_GROWTH_LIMIT_MB,
+        ), mock.patch.object(OCRModelConfig, 'API_URL', self.ocr.url), _PeakRSSSampler() as sampler:
+            result = processor.process_pdf_document(str(self.pdf_path), str(self.task.id), self.task_dir)
+
+        self.assertEqual(result['status'], 'success', result.get('error'))
+        self.assertEqual((result['processed_pages'], result['failed_pages']), (PAGE_COUNT, []))
+        self.assertEqual(result['routing']['vision'], PAGE_COUNT)
+        self.assertEqual(self.ocr.images, PAGE_COUNT)
+
+        # 每页的截图和裁剪出的区域图都在磁盘上
+        spilled_bytes = 0
+        for page in result['page_results']:
+            self.assertEqual(page['regions_count'], 1)
+            images = [page['full_image'], *(f for f in page['region_files'] if f.endswith('.png'))]
+            self.assertGreaterEqual(len(images), 2)
+            for image in images:
+                spilled_bytes += (self.task_dir / image).stat().st_size
+
+        merged = Path(result['final_markdown']).read_text(encoding='utf-8')
+        self.assertEqual(merged.count(STUB_OCR_TEXT), PAGE_COUNT)
+
+        growth_mb = (sampler.peak - baseline) / 1024 / 1024
+        self.assertLess(
+            growth_mb, RSS_GROWTH_LIMIT_MB,
+            f"RSS增长 {growth_mb:.0f}MB（落盘图片 {spilled_bytes / 1024 / 1024:.0f}MB）"
+        )
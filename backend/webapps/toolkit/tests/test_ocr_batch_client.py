@@ -0,0 +1,133 @@
+"""
+OCR批量客户端测试（本地桩OCR服务）
+
+1. 多个页面线程提交的图片合并成批次，结果按图片分发回各自的调用方
+2. 批次受图片数和字节数限制，在途批次数不超过上限
+3. 服务返回失败时对应图片得到失败结果，统计吞吐量和排队深度
+"""
+import base64
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from webapps.toolkit.services.ocr_model import OCRBatchClient, OCRModelService
+
+
+class _StubOCRServer:
+    """模拟OCR模型的 /ocr/batch 接口：把图片内容原样作为识别结果返回"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.batches = []
+        self.active = 0
+        self.max_active = 0
+        self.fail_marker = b'broken'
+        self.stopped = False
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                images = [base64.b64decode(item) for item in body['images']]
+                with stub.lock:
+                    stub.batches.append(images)
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.active -= 1
+
+                results = [
+                    {'error': '识别失败'} if image == stub.fail_marker else {
+                        'result': f"text of {image.decode()} <|ref|>image<|/ref|><|det|>[[1, 2, 3, 4]]<|/det|>",
+                        'image_size': [100, 200],
+                        'mode': body['mode'],
+                    }
+                    for image in images
+                ]
+                payload = json.dumps({'results': results, 'total': len(results)}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class OCRBatchClientTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.stub = _StubOCRServer()
+        self.service = OCRModelService(api_url=self.stub.url, timeout=10)
+
+    def tearDown(self):
+        self.stub.stop()
+
+    def _recognize_pages(self, client, pages):
+        with ThreadPoolExecutor(max_workers=len(pages)) as pool:
+            futures = {page: pool.submit(client.recognize, f"page-{page}".encode(), page) for page in pages}
+            return {page: future.result(timeout=10) for page, future in futures.items()}
+
+    def test_results_mapped_back_to_pages(self):
+        with OCRBatchClient(self.service, max_batch_images=4, max_in_flight=2, linger_ms=30) as client:
+            results = self._recognize_pages(client, range(1, 21))
+            stats = client.stats()
+
+        for page, result in results.items():
+            self.assertTrue(result['success'])
+            self.assertTrue(result['result'].startswith(f"text of page-{page} "))
+            self.assertEqual(result['result_cleaned'].strip(), f"text of page-{page} [[[!image]]]")
+            self.assertEqual(result['image_regions'], [[1, 2, 3, 4]])
+
+        self.assertTrue(all(len(batch) <= 4 for batch in self.stub.batches))
+        self.assertLess(len(self.stub.batches), 20)
+        self.assertLessEqual(self.stub.max_active, 2)
+        self.assertEqual(sum(len(batch) for batch in self.stub.batches), 20)
+        self.assertEqual((stats['completed'], stats['failed'], stats['queue_depth']), (20, 0, 0))
+        self.assertGreater(stats['images_per_second'], 0)
+        self.assertGreater(stats['avg_batch_size'], 1)
+
+    def test_batch_bytes_limit(self):
+        # 每张图片base64后8字节，上限20字节时每批最多2张
+        with OCRBatchClient(self.service, max_batch_images=8, max_batch_bytes=20, linger_ms=50) as client:
+            self._recognize_pages(client, range(1, 7))
+
+        self.assertTrue(all(len(batch) <= 2 for batch in self.stub.batches))
+
+    def test_failed_images(self):
+        with OCRBatchClient(self.service, max_batch_images=4, linger_ms=50) as client:
+            futures = [client.submit(b'page-1'), client.submit(b'broken'), client.submit(b'page-3')]
+            results = [future.result(timeout=10) for future in futures]
+            stats = client.stats()
+
+        self.assertEqual([r['success'] for r in results], [True, False, True])
+        self.assertEqual(results[1]['error'], '识别失败')
+        self.assertEqual((stats['completed'], stats['failed']), (2, 1))
+
+    def test_service_unavailable(self):
+        self.stub.stop()
+        with OCRBatchClient(self.service, linger_ms=10) as client:
+            result = client.recognize(b'page-1', timeout=10)
+
+        self.assertFalse(result['success'])
+        self.assertIn('OCR API请求失败', result['error'])
@@ -0,0 +1,87 @@
+"""
+PDF页面流水线测试
+
+1. 跨页上下文从文本层截取相邻页首尾片段
+2. 进程池渲染结果与当前线程渲染一致
+3. 并行处理时结果仍按页码顺序返回
+"""
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import fitz
+from django.test import TestCase
+
+from webapps.toolkit.services.pdf_extractor.processors.document_session import PDFDocumentSession
+from webapps.toolkit.services.pdf_extractor.processors.page_pipeline import (
+    PageContextIndex,
+    PagePipeline,
+    PageStageRunner,
+    render_page_stage,
+)
+
+
+class _RecordingProcessor:
+    """只记录调度情况的处理器，页面耗时随机"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def process_page_stages(self, pdf_path, page_number, task_dir, task_id,
+                            runner=None, translate_options=None, page_context=None, fast_path=None):
+        with runner.llm_slot():
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(random.uniform(0.005, 0.03))
+            with self.lock:
+                self.active -= 1
+        return {'page': page_number, 'status': 'completed', 'context': page_context}
+
+
+class PagePipelineTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.pdf_path = str(self.tmp_dir / 'sample.pdf')
+        doc = fitz.open()
+        for i in range(1, 7):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"page {i} start")
+            page.insert_text((72, 700), f"page {i} end")
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def tearDown(self):
+        PDFDocumentSession.close_process_session(self.pdf_path)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_context_from_neighbour_pages(self):
+        context = PageContextIndex.build(self.pdf_path, [3], max_chars=100).around(3)
+        self.assertIn('page 2 end', context['previous_tail'])
+        self.assertIn('page 4 start', context['next_head'])
+        self.assertEqual(PageContextIndex.build(self.pdf_path, [1]).around(1)['previous_tail'], '')
+
+    def test_process_pool_render_matches_inline(self):
+        inline = render_page_stage(self.pdf_path, 2, 72, str(self.tmp_dir / 'inline'))
+        runner = PageStageRunner(cpu_workers=2)
+        try:
+            pooled = runner.cpu(render_page_stage, self.pdf_path, 2, 72, str(self.tmp_dir / 'pooled'))
+        finally:
+            runner.shutdown()
+        self.assertEqual(Path(inline['image_path']).read_bytes(), Path(pooled['image_path']).read_bytes())
+        self.assertEqual(pooled['image_path'], str(self.tmp_dir / 'pooled' / 'full_page.png'))
+
+    def test_results_in_page_order_with_bounded_concurrency(self):
+        processor = _RecordingProcessor()
+        pipeline = PagePipeline(processor, cpu_workers=0, llm_concurrency=3)
+        results = pipeline.run(self.pdf_path, [1, 2, 3, 4, 5, 6], self.tmp_dir, None)
+
+        self.assertEqual([r['page'] for r in results], [1, 2, 3, 4, 5, 6])
+        self.assertLessEqual(processor.max_active, 3)
+        self.assertIn('page 5 start', results[3]['context']['next_head'])
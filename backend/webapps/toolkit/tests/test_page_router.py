@@ -0,0 +1,119 @@
+"""
+PDF页面路由与文本层转换测试
+
+1. 文本丰富、无图形的页面走本地路径，含矢量图形的页面走视觉模型
+2. 本地转换按字号识别标题，合并段落行并保留列表
+3. 路由报告按页码汇总
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+import fitz
+from django.test import TestCase
+
+from webapps.toolkit.services.pdf_extractor.processors.components import TextLayerConverter
+from webapps.toolkit.services.pdf_extractor.processors.document_session import PDFDocumentSession
+from webapps.toolkit.services.pdf_extractor.processors.page_pipeline import route_page_stage
+from webapps.toolkit.services.pdf_extractor.processors.page_router import (
+    ROUTE_LOCAL,
+    ROUTE_VISION,
+    PageRouter,
+    summarize_routes,
+)
+
+_PARAGRAPH = (
+    "Quarterly revenue increased across every region while operating costs remained stable. "
+    "The board approved the updated budget and asked management to report on hiring progress. "
+) * 4
+
+
+def _line(text, size):
+    return {'spans': [{'text': text, 'size': size}]}
+
+
+class PageRouterTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.pdf_path = str(self.tmp_dir / 'report.pdf')
+        doc = fitz.open()
+        # 第1页：纯文本
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(72, 72, 540, 760), _PARAGRAPH * 2, fontsize=10)
+        # 第2页：同样的文本 + 曲线图（间隔排布的曲线，不会被识别为表格）
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(72, 72, 540, 400), _PARAGRAPH, fontsize=10)
+        for i in range(6):
+            page.draw_circle(fitz.Point(110 + i * 70, 620 - (i % 3) * 40), 18, fill=(0.2, 0.4, 0.6))
+        page.draw_bezier(fitz.Point(72, 740), fitz.Point(200, 650), fitz.Point(360, 780), fitz.Point(520, 690))
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def tearDown(self):
+        PDFDocumentSession.close_process_session(self.pdf_path)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_routes_text_page_locally(self):
+        router = PageRouter()
+        with PDFDocumentSession(self.pdf_path) as session:
+            text_route = router.route_page(self.pdf_path, 1, session=session)
+            chart_route = router.route_page(self.pdf_path, 2, session=session)
+
+        self.assertEqual(text_route.route, ROUTE_LOCAL)
+        self.assertEqual(chart_route.route, ROUTE_VISION)
+        self.assertIn('矢量图形', chart_route.reason)
+        self.assertEqual(text_route.metrics['strategy'], 'direct_text')
+
+    def test_route_stage_writes_local_markdown(self):
+        routed = route_page_stage(self.pdf_path, 1, str(self.tmp_dir / 'page_1'), 0.8, 20)
+
+        self.assertEqual(routed['route']['route'], ROUTE_LOCAL)
+        self.assertIn('Quarterly revenue increased', routed['markdown'])
+        step1_path = self.tmp_dir / 'page_1' / 'page_1_step1_final.md'
+        self.assertEqual(step1_path.read_text(encoding='utf-8'), routed['markdown'])
+
+        routed = route_page_stage(self.pdf_path, 2, str(self.tmp_dir / 'page_2'), 0.8, 20)
+        self.assertEqual(routed['route']['route'], ROUTE_VISION)
+        self.assertIsNone(routed['markdown'])
+
+    def test_convert_headings_paragraphs_and_lists(self):
+        page_dict = {'blocks': [
+            {'type': 0, 'lines': [_line('Annual Report', 24)]},
+            {'type': 0, 'lines': [_line('1 Overview', 14)]},
+            {'type': 0, 'lines': [
+                _line('Revenue grew stead-', 10),
+                _line('ily this year and', 10),
+                _line('margins improved.', 10),
+            ]},
+            {'type': 0, 'lines': [
+                _line('• Lower costs', 10),
+                _line('• Better pricing', 10),
+            ]},
+            {'type': 0, 'lines': [_line('营业收入同比增长，', 10), _line('利润率有所提升。', 10)]},
+            {'type': 1},
+        ]}
+
+        markdown = TextLayerConverter().convert_page_dict(page_dict)
+
+        self.assertEqual(markdown, (
+            "# Annual Report\n\n"
+            "## 1 Overview\n\n"
+            "Revenue grew steadily this year and margins improved.\n\n"
+            "- Lower costs\n- Better pricing\n\n"
+            "营业收入同比增长，利润率有所提升。\n"
+        ))
+
+    def test_summarize_routes(self):
+        routing = summarize_routes(
+            [
+                {'page_number': 3, 'route': ROUTE_VISION, 'reason': '包含图片（1）或表格（0）'},
+                {'page_number': 1, 'route': ROUTE_LOCAL, 'reason': '文本丰富'},
+                {'page_number': 2, 'route': ROUTE_LOCAL, 'reason': '文本丰富'},
+            ],
+            document={'fast_path_allowed': True}
+        )
+
+        self.assertEqual((routing[ROUTE_LOCAL], routing[ROUTE_VISION]), (2, 1))
+        self.assertEqual(list(routing['pages']), ['1', '2', '3'])
+        self.assertEqual(routing['pages']['3']['route'], ROUTE_VISION)
@@ -0,0 +1,100 @@
+"""
+PDF提取任务事件流测试
+
+1. 事件按写入顺序读取，可从任意事件ID之后继续
+2. 数据库进度按时间间隔粗粒度写入，结束时写入最终进度
+3. SSE 消息格式
+4. 裁剪上限按页数计算，覆盖整个任务的事件
+"""
+import json
+import uuid
+
+from django.test import SimpleTestCase, TestCase
+
+from webapps.toolkit.models import PDFExtractorTask
+from webapps.toolkit.services.pdf_extractor.processors.progress_stream import (
+    CoarseProgressWriter,
+    TaskEventStream,
+    format_sse,
+)
+
+
+class TaskEventStreamTestCase(TestCase):
+
+    def setUp(self):
+        self.stream = TaskEventStream(str(uuid.uuid4()))
+        try:
+            self.stream.client.ping()
+        except Exception as e:
+            self.skipTest(f"Redis不可用: {e}")
+
+    def tearDown(self):
+        self.stream.reset()
+
+    def test_read_in_order_and_resume(self):
+        self.stream.publish('task_started', total_pages=2)
+        first_id = self.stream.publish('page_finished', page=1, markdown='# 第一页', timings={'ocr': 1.5})
+        self.stream.publish('task_finished', status='completed')
+
+        events = self.stream.read()
+        self.assertEqual([e['type'] for _, e in events], ['task_started', 'page_finished', 'task_finished'])
+        self.assertEqual(events[1][1]['markdown'], '# 第一页')
+        self.assertEqual(events[1][0], first_id)
+
+        # 断线重连：从第一页事件之后继续
+        resumed = self.stream.read(first_id)
+        self.assertEqual([e['type'] for _, e in resumed], ['task_finished'])
+
+    def test_reset_clears_previous_run(self):
+        self.stream.publish('task_finished', status='error')
+        self.stream.reset()
+        self.assertEqual(self.stream.read(), [])
+
+
+class TaskEventStreamMaxLenTestCase(SimpleTestCase):
+
+    def test_max_len_covers_all_pages(self):
+        self.assertIsNone(TaskEventStream('task').max_len)
+        self.assertEqual(TaskEventStream('task', total_pages=10).max_len, TaskEventStream.MAX_LEN)
+
+        stream = TaskEventStream('task', total_pages=3000)
+        self.assertGreaterEqual(stream.max_len, 3000 * TaskEventStream.EVENTS_PER_PAGE + 2)
+
+
+class CoarseProgressWriterTestCase(TestCase):
+
+    def setUp(self):
+        self.task = PDFExtractorTask.objects.create(original_filename='sample.pdf', file_path='/tmp/sample.pdf')
+
+    def test_throttled_writes(self):
+        writer = CoarseProgressWriter(str(self.task.id), total_pages=100, interval=3600)
+
+        self.assertTrue(writer.update(0, force=True))
+        for processed in range(1, 100):
+            writer.update(processed)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.total_pages, self.task.processed_pages), (100, 0))
+
+        self.assertTrue(writer.flush())
+        self.assertFalse(writer.flush())
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.processed_pages, 99)
+        self.assertEqual(writer.writes, 2)
+
+    def test_progress_never_goes_back(self):
+        writer = CoarseProgressWriter(str(self.task.id), total_pages=10, interval=0)
+        writer.update(5)
+        writer.update(3)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.processed_pages, 5)
+
+
+class FormatSSETestCase(TestCase):
+
+    def test_format(self):
+        message = format_sse('1-0', {'type': 'page_finished', 'page': 1, 'markdown': '第一行\n第二行'})
+        lines = message.split('\n')
+
+        self.assertEqual(lines[:2], ['id: 1-0', 'event: page_finished'])
+        self.assertEqual(json.loads(lines[2][len('data: '):])['markdown'], '第一行\n第二行')
+        self.assertTrue(message.endswith('\n\n'))
@@ -0,0 +1,135 @@
+"""
+PDF提取器渲染/裁剪缓存测试
+
+1. 按 (页面键, 坐标, 产物类型) 寻址，未命中时只生成一次
+2. 总大小超过上限时淘汰最久未访问的文件
+3. 同一PDF重复渲染、重复裁剪时命中缓存，结果与不使用缓存一致
+4. 渲染阶段命中缓存时直接写出 full_page.png，不再重新编码
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import fitz
+import numpy as np
+from django.test import TestCase
+
+from webapps.toolkit.services.pdf_extractor.processors import page_pipeline
+from webapps.toolkit.services.pdf_extractor.processors.document_session import PDFDocumentSession
+from webapps.toolkit.services.pdf_extractor.processors.render_cache import (
+    RenderCache,
+    page_cache_key,
+    png_size,
+    set_render_cache,
+)
+from webapps.toolkit.services.pdf_extractor.processors.step1_text_extractor import render_page_png
+from webapps.toolkit.services.pdf_extractor.processors.step3_bbox_cropper import BBoxCropper
+
+
+class RenderCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.cache = RenderCache(self.tmp_dir / 'cache', max_bytes=10 * 1024 * 1024)
+        self.previous_cache = set_render_cache(self.cache)
+
+    def tearDown(self):
+        set_render_cache(self.previous_cache)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _make_pdf(self, name: str = 'sample.pdf') -> str:
+        pdf_path = str(self.tmp_dir / name)
+        doc = fitz.open()
+        for i in range(1, 3):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"page {i}")
+            page.draw_rect(fitz.Rect(72, 100, 300, 200), fill=(0.2, 0.4, 0.6))
+        doc.save(pdf_path)
+        doc.close()
+        return pdf_path
+
+    def test_get_or_create_addresses_by_bbox_and_variant(self):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return b'crop-a'
+
+        key = page_cache_key('abc', 1, 144)
+        self.assertEqual(self.cache.get_or_create(key, factory, bbox=(0, 0, 10, 10)), b'crop-a')
+        self.assertEqual(self.cache.get_or_create(key, factory, bbox=(0, 0, 10, 10)), b'crop-a')
+        self.assertEqual(len(calls), 1)
+
+        self.assertIsNone(self.cache.get(key, bbox=(0, 0, 10, 11)))
+        self.assertIsNone(self.cache.get(key, bbox=(0, 0, 10, 10), variant='b64'))
+        self.assertIsNone(self.cache.get(page_cache_key('abc', 1, 72), bbox=(0, 0, 10, 10)))
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['writes']), (1, 1))
+        self.assertEqual(list((self.tmp_dir / 'cache').rglob('.tmp-*')), [])
+
+    def test_evicts_least_recently_used(self):
+        cache = RenderCache(self.tmp_dir / 'lru', max_bytes=300)
+        now = time.time()
+        for age, name in ((30, 'a'), (20, 'b'), (10, 'c')):
+            cache.put(name, b'x' * 100)
+            os.utime(cache._path(name, None, 'png'), (now - age, now - age))
+
+        # 访问 a 之后它变成最近使用
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('d', b'x' * 100)
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('d'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+    def test_render_hits_cache_for_same_content(self):
+        pdf_path = self._make_pdf()
+        copy_path = str(self.tmp_dir / 'copy.pdf')
+        shutil.copy(pdf_path, copy_path)
+
+        first, size = render_page_png(pdf_path, 2, 72)
+        # 文件名不同、内容相同的PDF同样命中
+        second, _ = render_page_png(copy_path, 2, 72)
+
+        self.assertEqual(first, second)
+        self.assertEqual(png_size(first), size)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+        set_render_cache(None)
+        with PDFDocumentSession(pdf_path) as session:
+            self.assertEqual(render_page_png(pdf_path, 2, 72, session=session)[0], first)
+
+    def test_render_stage_skips_encoding_on_hit(self):
+        pdf_path = self._make_pdf()
+        first = page_pipeline.render_page_stage(pdf_path, 1, 72, str(self.tmp_dir / 'first'))
+
+        with mock.patch.object(page_pipeline, 'save_page_image') as save:
+            second = page_pipeline.render_page_stage(pdf_path, 1, 72, str(self.tmp_dir / 'second'))
+
+        save.assert_not_called()
+        self.assertEqual(Path(first['image_path']).read_bytes(), Path(second['image_path']).read_bytes())
+        self.assertEqual(first['image_size'], second['image_size'])
+
+    def test_crops_reused_when_reprocessing(self):
+        image = np.zeros((200, 300, 3), dtype=np.uint8)
+        image[50:150, 100:250] = (10, 200, 30)
+        regions = {'regions': [[100, 50, 250, 150], [0, 0, 40, 40]]}
+
+        outputs = []
+        for run in ('first', 'second'):
+            page_dir = self.tmp_dir / run
+            page_dir.mkdir()
+            (page_dir / 'page_1_image_regions.json').write_text(json.dumps(regions), encoding='utf-8')
+            count, paths = BBoxCropper().crop_regions_from_step1(image, page_dir, 1, page_key='doc:p1:d144')
+            self.assertEqual(count, 2)
+            outputs.append([p.read_bytes() for p in paths])
+
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(self.cache.stats()['hits'], 2)
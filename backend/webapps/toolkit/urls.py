@@ -16,6 +16,8 @@ urlpatterns = [
     path('extractor/progress/', views.query_task_progress, name='query_task_progress'),
     path('extractor/tasks/', views.get_user_tasks, name='get_user_tasks'),
     path('extractor/content/<uuid:task_id>/', views.get_task_content, name='get_task_content'),
+    path('extractor/rerun/<uuid:task_id>/', views.rerun_task_pages, name='rerun_task_pages'),
+    path('extractor/events/<uuid:task_id>/', views.stream_task_events, name='stream_task_events'),
 
     # OCR服务接口
     path('ocr/health/', ocr_views.ocr_health_check, name='ocr_health_check'),
@@ -487,3 +487,23 @@ class RequestValidator:
                 return False, f'无效的任务ID格式: {task_id}'
 
         return True, ''
+
+    @classmethod
+    def validate_page_numbers(cls, pages: Any) -> Tuple[bool, str]:
+        """
+        验证重新处理的页码列表
+
+        Args:
+            pages: 页码列表（从1开始）
+
+        Returns:
+            (是否有效, 错误信息)
+        """
+        if not isinstance(pages, list) or not pages:
+            return False, '页码列表不能为空'
+
+        for page in pages:
+            if isinstance(page, bool) or not isinstance(page, int) or page < 1:
+                return False, f'无效的页码: {page}'
+
+        return True, ''
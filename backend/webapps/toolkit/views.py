@@ -3,18 +3,21 @@
 """
 import json
 import logging
-from django.http import JsonResponse
+import time
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.files.uploadedfile import UploadedFile
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
 
 from .services import DocumentProcessorService, PDFExtractorService
-from .models import PDFExtractorTask
+from .models import PDFExtractorTask, PDFExtractorPage
 from .utils import FileManager, RequestValidator, TaskProgressManager
 from .tasks import process_pdf_extraction
+from .services.pdf_extractor.processors.progress_stream import TaskEventStream
 
 logger = logging.getLogger('django')
 
@@ -354,6 +357,182 @@ def get_task_content(request, task_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+def rerun_task_pages(request, task_id):
+    """
+    重新处理任务中的部分页面（仅限当前用户的任务）
+
+    已完成的其他页面直接复用页面检查点中的结果，处理完成后重新合并最终文档。
+
+    Request:
+        - pages: 页码列表（可选），不传时重新处理所有失败或未完成的页面
+
+    Returns:
+        重新处理的页码列表
+    """
+    try:
+        # 1. 获取当前用户
+        user = request.user
+        if not user.is_authenticated:
+            return Response({
+                'status': 'error',
+                'message': '用户未登录',
+                'code': 401
+            }, status=status.HTTP_401_UNAUTHORIZED)
+
+        # 2. 验证任务是否存在且属于当前用户
+        try:
+            task = PDFExtractorTask.objects.get(id=task_id, user=user)
+        except PDFExtractorTask.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': '任务不存在或无权访问',
+                'code': 404
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if task.status in ('pending', 'processing'):
+            return Response({
+                'status': 'error',
+                'message': f'任务正在处理中，当前状态: {task.status}',
+                'code': 400
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 3. 确定需要重新处理的页面
+        pages = request.data.get('pages')
+        if pages is not None:
+            is_valid, error_msg = RequestValidator.validate_page_numbers(pages)
+            if not is_valid:
+                return Response({
+                    'status': 'error',
+                    'message': error_msg,
+                    'code': 400
+                }, status=status.HTTP_400_BAD_REQUEST)
+            pages = sorted(set(pages))
+            rerun_pages = pages
+        else:
+            checkpoints = PDFExtractorPage.objects.filter(task=task)
+            rerun_pages = list(
+                checkpoints.exclude(status='completed').order_by('page_number').values_list('page_number', flat=True)
+            )
+            # 没有检查点记录的旧任务整体重新处理
+            if checkpoints.exists() and not rerun_pages:
+                return Response({
+                    'status': 'error',
+                    'message': '没有失败或未完成的页面',
+                    'code': 400
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 4. 提交Celery异步任务
+        task.status = 'pending'
+        task.save(update_fields=['status', 'updated_at'])
+        TaskEventStream(str(task.id)).reset()
+
+        process_pdf_extraction.apply_async(
+            args=[str(task.id), task.file_path, pages],
+            queue='pdf_extractor'
+        )
+        logger.info(f"重新处理PDF提取任务: {task.id}, 页码: {rerun_pages or '全部'}")
+
+        return Response({
+            'status': 'success',
+            'data': {
+                'task_id': str(task.id),
+                'pages': rerun_pages,
+                'message': f'已提交{len(rerun_pages)}页重新处理' if rerun_pages else '已提交整体重新处理'
+            },
+            'code': 200
+        })
+
+    except Exception as e:
+        logger.error(f"重新处理任务页面失败: {str(e)}", exc_info=True)
+        return Response({
+            'status': 'error',
+            'message': f'重新处理失败: {str(e)}',
+            'code': 500
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """让内容协商接受 Accept: text/event-stream，错误响应仍以JSON输出"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+@api_view(['GET'])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def stream_task_events(request, task_id):
+    """
+    任务事件流（SSE，仅限当前用户的任务）
+
+    推送页面开始/完成/失败、各阶段耗时和已完成页面的markdown片段，
+    客户端无需等待整份文档完成即可阅读前面的页面。收到 task_finished 事件后连接结束。
+
+    Request:
+        - Last-Event-ID 请求头或 last_event_id 参数（可选）：从该事件之后继续推送
+
+    Returns:
+        text/event-stream，每条消息的 event 为事件类型，data 为事件JSON
+    """
+    from .services.pdf_extractor.config import PDFExtractorConfig
+    from .services.pdf_extractor.processors.progress_stream import TERMINAL_EVENT, format_sse
+
+    user = request.user
+    if not user.is_authenticated:
+        return Response({
+            'status': 'error',
+            'message': '用户未登录',
+            'code': 401
+        }, status=status.HTTP_401_UNAUTHORIZED)
+
+    if not PDFExtractorTask.objects.filter(id=task_id, user=user).exists():
+        return Response({
+            'status': 'error',
+            'message': '任务不存在或无权访问',
+            'code': 404
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    task_id = str(task_id)
+    last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id') or '0-0'
+    stream = TaskEventStream(task_id)
+
+    def event_source():
+        cursor = last_event_id
+        deadline = time.monotonic() + PDFExtractorConfig.SSE_MAX_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                entries = stream.read(cursor, block_ms=PDFExtractorConfig.SSE_BLOCK_MS)
+            except Exception as e:
+                logger.error(f"读取任务事件失败 {task_id}: {str(e)}", exc_info=True)
+                yield format_sse(cursor, {'type': 'error', 'message': '读取任务事件失败'})
+                return
+
+            if not entries:
+                # 没有新事件：任务已经结束（事件流过期或结束事件未写入）时补发结束事件，否则发送心跳
+                task_status = PDFExtractorTask.objects.filter(id=task_id).values_list('status', flat=True).first()
+                if task_status in ('completed', 'error'):
+                    yield format_sse(cursor, {'type': TERMINAL_EVENT, 'task_id': task_id, 'status': task_status})
+                    return
+                yield ": keepalive\n\n"
+                continue
+
+            for event_id, event in entries:
+                cursor = event_id
+                if event.get('markdown'):
+                    event['markdown'] = FileManager.process_markdown_for_environment(event['markdown'], task_id)
+                yield format_sse(event_id, event)
+                if event.get('type') == TERMINAL_EVENT:
+                    return
+
+    response = StreamingHttpResponse(event_source(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # 关闭 Nginx 的响应缓冲，事件立即送达
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @api_view(['GET'])
 def get_user_tasks(request):
     """